@@ -849,6 +849,7 @@ class base_client_job(base_job.base_job):
             pids.append(forked_pid)
 
         old_log_path = os.path.join(self.resultdir, old_log_filename)
+        self._logger.flush()
         old_log = open(old_log_path, "a")
         exceptions = []
         for i, pid in enumerate(pids):
@@ -885,8 +886,11 @@ class base_client_job(base_job.base_job):
     def complete(self, status):
         """Write pending reports, clean up, and exit"""
         # We are about to exit 'complete' so clean up the control file.
+        # Stop syncing first, folding the journal into the state file.
+        self._state.set_backing_file(None)
         dest = os.path.join(self.resultdir, os.path.basename(self._state_file))
         shutil.move(self._state_file, dest)
+        _remove_state_journal(self._state_file)
 
         self.harness.run_complete()
         self.disable_external_logging()
@@ -899,6 +903,7 @@ class base_client_job(base_job.base_job):
         self._state_file = self.control + '.state'
         if os.path.exists(init_state_file):
             shutil.move(init_state_file, self._state_file)
+            _remove_state_journal(self._state_file)
         self._state.set_backing_file(self._state_file)
 
         # initialize the state engine, if necessary
@@ -1200,6 +1205,7 @@ def runjob(control, drop_caches, options):
     if not options.cont and os.path.isfile(state):
         logging.debug('Cleaning up previously found state file')
         os.remove(state)
+        _remove_state_journal(state)
 
     # instantiate the job object ready for the control file.
     myjob = None
@@ -1332,3 +1338,13 @@ def _is_control_file_for_test(path, testname):
             match = re.match(_NAME_PATTERN, line)
             if match is not None:
                 return match.group(1) == testname
+
+
+def _remove_state_journal(state_file):
+    """Remove the journal of changes kept next to a state file.
+
+    @param state_file: The path of the state file.
+    """
+    journal = state_file + base_job.job_state.JOURNAL_SUFFIX
+    if os.path.exists(journal):
+        os.remove(journal)
@@ -12,11 +12,12 @@ import sys
 import time
 import traceback
 
-from autotest_lib.client.common_lib import error, utils
+from autotest_lib.client.common_lib import base_job, error, utils
 
 def fork_start(tmp, l):
     sys.stdout.flush()
     sys.stderr.flush()
+    base_job.flush_status_logs()
     pid = os.fork()
     if pid:
         # Parent
@@ -52,6 +53,7 @@ def fork_start(tmp, l):
 
                 sys.stdout.flush()
                 sys.stderr.flush()
+                base_job.flush_status_logs()
         finally:
             # clear exception information to allow garbage collection of
             # objects referenced by the exception's traceback
@@ -64,6 +66,7 @@ def fork_start(tmp, l):
         try:
             sys.stdout.flush()
             sys.stderr.flush()
+            base_job.flush_status_logs()
         finally:
             os._exit(0)
 
@@ -0,0 +1,209 @@
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Compress result files and directories with a bounded process pool.
+
+A file or directory is archived with tar and compressed with gzip, the default
+codec, or with zstd if it's requested and either the zstandard module or the
+zstd binary is available. Independent paths are compressed concurrently.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tarfile
+
+from distutils import spawn
+
+try:
+    from autotest_lib.client.bin.result_tools import utils_lib
+except ImportError:
+    import utils_lib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+# Extension of the archive compressed by each codec.
+EXTENSIONS = {
+        GZIP: '.tgz',
+        ZSTD: '.tar.zst',
+        }
+
+# Maximum number of processes to compress files, regardless of the number of
+# CPUs.
+MAX_PROCESSES = 4
+
+_ZSTD_BINARY = spawn.find_executable('zstd')
+
+def zstd_available():
+    """Check if zstd compression is available.
+
+    @return: True if the zstandard module or the zstd binary can be used.
+    """
+    return zstandard is not None or _ZSTD_BINARY is not None
+
+
+def get_codec(codec):
+    """Get the codec to use, falling back to gzip if zstd is not available.
+
+    @param codec: Name of the requested codec, GZIP or ZSTD.
+    @return: Name of the codec to use.
+    @raise ValueError: If the codec is unknown.
+    """
+    if codec not in EXTENSIONS:
+        raise ValueError('Unknown compression codec: %s' % codec)
+    if codec == ZSTD and not zstd_available():
+        utils_lib.LOG('zstd is not available, compress with gzip instead.')
+        return GZIP
+    return codec
+
+
+def get_archive_path(path, codec=GZIP):
+    """Get the path of the archive of a file or directory.
+
+    @param path: Path to the file or directory.
+    @param codec: Name of the codec.
+    @return: Path to the archive.
+    """
+    return path + EXTENSIONS[codec]
+
+
+def _compress_with_zstd_binary(path, archive_path):
+    """Archive a path with tar and pipe it to the zstd binary.
+
+    @param path: Path to the file or directory.
+    @param archive_path: Path to the archive.
+    @raise IOError: If zstd fails.
+    """
+    process = subprocess.Popen(
+            [_ZSTD_BINARY, '-q', '-f', '-o', archive_path],
+            stdin=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdin, mode='w|') as tar:
+            tar.add(path, arcname=os.path.basename(path))
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+    if returncode:
+        raise IOError('zstd failed to compress %s, exit code: %d' %
+                      (path, returncode))
+
+
+def compress(path, codec=GZIP):
+    """Archive and compress a file or directory next to it.
+
+    The path itself is left in place.
+
+    @param path: Path to the file or directory.
+    @param codec: Name of the codec, GZIP or ZSTD. ZSTD falls back to GZIP if
+            it's not available.
+    @return: Path to the archive.
+    """
+    codec = get_codec(codec)
+    archive_path = get_archive_path(path, codec)
+    arcname = os.path.basename(path)
+    if codec == GZIP:
+        with tarfile.open(archive_path, 'w:gz') as tar:
+            tar.add(path, arcname=arcname)
+    elif zstandard is not None:
+        with open(archive_path, 'wb') as f:
+            compressor = zstandard.ZstdCompressor()
+            with compressor.stream_writer(f) as writer:
+                with tarfile.open(fileobj=writer, mode='w|') as tar:
+                    tar.add(path, arcname=arcname)
+    else:
+        _compress_with_zstd_binary(path, archive_path)
+    return archive_path
+
+
+def _compress_task(args):
+    """Compress a path in a pool process.
+
+    @param args: A tuple of (path, codec).
+    @return: A tuple of (path, archive_path, error). archive_path is None and
+            error is a message if the path failed to be compressed.
+    """
+    path, codec = args
+    codec = get_codec(codec)
+    try:
+        return path, compress(path, codec), None
+    except (IOError, OSError, tarfile.TarError) as e:
+        # Don't leave a partial archive behind.
+        archive_path = get_archive_path(path, codec)
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        return path, None, str(e)
+
+
+class Pool(object):
+    """A bounded pool of processes to throttle or compress results.
+
+    The processes are started at the first call of map() with more than one
+    item. Items are processed in the calling process if the pool has only one
+    process, or if the calling process is a daemon process, which is not
+    allowed to have child processes.
+    """
+
+    def __init__(self, processes=None):
+        """Initialize the pool.
+
+        @param processes: Maximum number of processes. Default is None to use
+                the number of CPUs, up to MAX_PROCESSES.
+        """
+        if processes is None:
+            processes = min(multiprocessing.cpu_count(), MAX_PROCESSES)
+        if multiprocessing.current_process().daemon:
+            processes = 1
+        self.processes = max(1, processes)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(terminate=exc_type is not None)
+
+    def close(self, terminate=False):
+        """Wait for the processes to exit.
+
+        @param terminate: True to stop the processes without waiting for the
+                outstanding work.
+        """
+        if self._pool is not None:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def map(self, func, items):
+        """Apply a function to each item.
+
+        @param func: A module level function taking one item.
+        @param items: A list of items to be passed to func.
+        @return: A list of the results of func, in the order of items.
+        """
+        if self.processes == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        return self._pool.map(func, items, chunksize=1)
+
+    def compress(self, paths, codec=GZIP):
+        """Compress paths concurrently.
+
+        @param paths: A list of paths to files or directories.
+        @param codec: Name of the codec, GZIP or ZSTD.
+        @return: A list of (path, archive_path, error) in the order of paths,
+                see _compress_task.
+        """
+        codec = get_codec(codec)
+        return self.map(_compress_task, [(path, codec) for path in paths])
@@ -0,0 +1,85 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""unittest for compression_lib.py
+"""
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import common
+from autotest_lib.client.bin.result_tools import compression_lib
+from autotest_lib.client.bin.result_tools import unittest_lib
+
+
+class CompressionLibTest(unittest.TestCase):
+    """Test class for compression_lib."""
+
+    def setUp(self):
+        """Setup directory for test."""
+        self.test_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.test_dir, 'folder')
+        os.mkdir(self.folder)
+        self.files = []
+        for i in range(4):
+            path = os.path.join(self.folder, 'file%d.log' % i)
+            unittest_lib.create_file(path, 10 * 1024)
+            self.files.append(path)
+
+    def tearDown(self):
+        """Cleanup the test directory."""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def testCompressDirectory(self):
+        """Test compress method archives the directory next to it."""
+        archive_path = compression_lib.compress(self.folder)
+        self.assertEqual(self.folder + '.tgz', archive_path)
+        self.assertTrue(os.path.isdir(self.folder))
+        with tarfile.open(archive_path) as tar:
+            self.assertEqual(
+                    ['folder'] + ['folder/file%d.log' % i for i in range(4)],
+                    sorted(tar.getnames()))
+
+    def testGetCodec_ZstdFallback(self):
+        """Test get_codec falls back to gzip if zstd is not available."""
+        old_values = compression_lib.zstandard, compression_lib._ZSTD_BINARY
+        compression_lib.zstandard = None
+        compression_lib._ZSTD_BINARY = None
+        try:
+            self.assertEqual(compression_lib.GZIP,
+                             compression_lib.get_codec(compression_lib.ZSTD))
+            self.assertEqual(
+                    self.files[0] + '.tgz',
+                    compression_lib.compress(self.files[0],
+                                             compression_lib.ZSTD))
+        finally:
+            compression_lib.zstandard, compression_lib._ZSTD_BINARY = (
+                    old_values)
+        self.assertRaises(ValueError, compression_lib.get_codec, 'lzma')
+
+    def testPoolCompress(self):
+        """Test Pool.compress returns results in order, including errors."""
+        missing = os.path.join(self.test_dir, 'missing')
+        paths = self.files + [missing]
+        with compression_lib.Pool(processes=2) as pool:
+            results = pool.compress(paths)
+        self.assertEqual(paths, [path for path, _, _ in results])
+        for path, archive_path, error in results[:-1]:
+            self.assertEqual(path + '.tgz', archive_path)
+            self.assertIsNone(error)
+            with tarfile.open(archive_path) as tar:
+                self.assertEqual([os.path.basename(path)], tar.getnames())
+        _, archive_path, error = results[-1]
+        self.assertIsNone(archive_path)
+        self.assertTrue(error)
+
+
+# this is so the test can be run in standalone mode
+if __name__ == '__main__':
+    """Main"""
+    unittest.main()
@@ -38,31 +38,39 @@ NO_DEDUPE_FILE_PATTERNS = [
 # regex pattern to get the prefix of a file.
 PREFIX_PATTERN = '([a-zA-Z_-]*).*'
 
-def _group_by(file_infos, keys):
-    """Group the file infos by the given keys.
+def _group_by(file_infos, get_key):
+    """Group the file infos by the given key.
 
     @param file_infos: A list of ResultInfo objects.
-    @param keys: A list of names of the attribute to group the file infos by.
+    @param get_key: A function returning the key to group a file info by.
     @return: A dictionary of grouped_key: [ResultInfo].
     """
     grouped_infos = {}
     for info in file_infos:
-        key_values = []
-        for key in keys:
-            key_values.append(getattr(info, key))
-        grouped_key = os.sep.join(key_values)
+        grouped_key = get_key(info)
         if grouped_key not in grouped_infos:
             grouped_infos[grouped_key] = []
         grouped_infos[grouped_key].append(info)
     return grouped_infos
 
 
-def _dedupe_files(summary, file_infos, max_result_size_KB):
+def _parent_dir_and_prefix(info):
+    """Get the parent directory and the file name prefix of a file info.
+
+    @param info: A ResultInfo object.
+    @return: A tuple of (parent directory, prefix).
+    """
+    return (os.path.dirname(info.path),
+            re.match(PREFIX_PATTERN, info.name).group(1))
+
+
+def _dedupe_files(summary, file_infos, max_result_size_KB, plan):
     """Delete the given file and update the summary.
 
     @param summary: A ResultInfo object containing result summary.
     @param file_infos: A list of ResultInfo objects to be de-duplicated.
     @param max_result_size_KB: Maximum test result size in KB.
+    @param plan: A throttler_lib.ThrottlePlan object.
     """
     # Sort file infos based on the modify date of the file.
     file_infos.sort(
@@ -71,14 +79,17 @@ def _dedupe_files(summary, file_infos, max_result_size_KB):
             OLDEST_FILES_TO_KEEP_COUNT:-NEWEST_FILES_TO_KEEP_COUNT]
 
     for file_info in file_infos_to_delete:
-        if throttler_lib.try_delete_file_on_disk(file_info.path):
+        old_size = file_info.trimmed_size
+        if (plan.dry_run or
+            throttler_lib.try_delete_file_on_disk(file_info.path)):
             file_info.trimmed_size = 0
+            plan.record('dedupe', file_info, old_size)
 
             if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
                 return
 
 
-def throttle(summary, max_result_size_KB):
+def throttle(summary, max_result_size_KB, plan=None):
     """Throttle the files in summary by de-duplicating files.
 
     Stop throttling until all files are processed or the result size is already
@@ -86,20 +97,20 @@ def throttle(summary, max_result_size_KB):
 
     @param summary: A ResultInfo object containing result summary.
     @param max_result_size_KB: Maximum test result size in KB.
+    @param plan: A throttler_lib.ThrottlePlan object shared with other
+            throttlers. Default is None to create one for the summary.
     """
-    _, grouped_files = throttler_lib.sort_result_files(summary)
+    if plan is None:
+        plan = throttler_lib.ThrottlePlan(summary)
+    _, grouped_files = plan.sort_result_files()
     for pattern in throttler_lib.RESULT_THROTTLE_PRIORITY:
         throttable_files = list(throttler_lib.get_throttleable_files(
                 grouped_files[pattern], NO_DEDUPE_FILE_PATTERNS))
 
-        for info in throttable_files:
-            info.parent_dir = os.path.dirname(info.path)
-            info.prefix = re.match(PREFIX_PATTERN, info.name).group(1)
-
         # Group files for each parent directory
-        grouped_infos = _group_by(throttable_files, ['parent_dir', 'prefix'])
+        grouped_infos = _group_by(throttable_files, _parent_dir_and_prefix)
 
-        for infos in grouped_infos.values():
+        for (parent_dir, prefix), infos in grouped_infos.items():
             if (len(infos) <=
                 OLDEST_FILES_TO_KEEP_COUNT + NEWEST_FILES_TO_KEEP_COUNT):
                 # No need to dedupe if the count of file is too few.
@@ -107,9 +118,9 @@ def throttle(summary, max_result_size_KB):
 
             # Remove files can be deduped
             utils_lib.LOG('De-duplicating files in %s with the same prefix of '
-                          '"%s"' % (infos[0].parent_dir, infos[0].prefix))
+                          '"%s"' % (parent_dir, prefix))
             #dedupe_file_infos = [i.result_info for i in infos]
-            _dedupe_files(summary, infos, max_result_size_KB)
+            _dedupe_files(summary, infos, max_result_size_KB, plan)
 
             if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
                 return
@@ -41,7 +41,7 @@ def _delete_file(file_info):
 
 def throttle(summary, max_result_size_KB,
              file_size_threshold_byte=DEFAULT_FILE_SIZE_THRESHOLD_BYTE,
-             exclude_file_patterns=[]):
+             exclude_file_patterns=[], plan=None):
     """Throttle the files in summary by trimming file content.
 
     Stop throttling until all files are processed or the result size is already
@@ -55,14 +55,21 @@ def throttle(summary, max_result_size_KB,
             max_result_size_KB.
     @param exclude_file_patterns: A list of regex pattern for files not to be
             throttled. Default is an empty list.
+    @param plan: A throttler_lib.ThrottlePlan object shared with other
+            throttlers. Default is None to create one for the summary.
     """
-    file_infos, _ = throttler_lib.sort_result_files(summary)
-    file_infos = throttler_lib.get_throttleable_files(
-            file_infos,
-            exclude_file_patterns + NON_DELETABLE_FILE_PATH_PATTERNS)
+    if plan is None:
+        plan = throttler_lib.ThrottlePlan(summary)
+    file_infos = plan.get_throttleable_files(
+            exclude_file_patterns + NON_DELETABLE_FILE_PATH_PATTERNS,
+            min_size_byte=file_size_threshold_byte)
 
     for info in file_infos:
-        if info.trimmed_size > file_size_threshold_byte:
+        old_size = info.trimmed_size
+        if plan.dry_run:
+            info.trimmed_size = 0
+        else:
             _delete_file(info)
-            if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
-                return
+        plan.record('delete', info, old_size)
+        if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
+            return
@@ -89,8 +89,13 @@ class ResultInfo(dict):
     }
     """
 
+    # A summary holds one ResultInfo per result file, so avoid the cost of a
+    # per-instance __dict__.
+    __slots__ = ('_initialized', '_parent_result_info', '_name', '_details',
+                 '_path', '_is_dir', '_previous_collected_size')
+
     def __init__(self, parent_dir, name=None, parent_result_info=None,
-                 original_info=None):
+                 original_info=None, is_dir=None, size=None):
         """Initialize a collection of size information for a given result path.
 
         A ResultInfo object can be initialized in two ways:
@@ -112,6 +117,10 @@ class ResultInfo(dict):
                 which means a file's original size is 100 bytes, and trimmed
                 down to 50 bytes. This argument is used when the object is
                 restored from a json string.
+        @param is_dir: Whether the file given by `name` is a directory, if
+                known already. Saves a stat call.
+        @param size: Size in bytes of the file given by `name`, if known
+                already. Saves a stat call.
         """
         super(ResultInfo, self).__init__()
 
@@ -129,7 +138,7 @@ class ResultInfo(dict):
         self._parent_result_info = parent_result_info
 
         if original_info is None:
-            self._init_from_file(parent_dir, name)
+            self._init_from_file(parent_dir, name, is_dir, size)
         else:
             self._init_with_original_info(parent_dir, original_info)
 
@@ -137,11 +146,13 @@ class ResultInfo(dict):
         self._previous_collected_size = 0
         self._initialized = True
 
-    def _init_from_file(self, parent_dir, name):
+    def _init_from_file(self, parent_dir, name, is_dir=None, size=None):
         """Initialize with the physical file.
 
         @param parent_dir: Path to the parent directory.
         @param name: Name of the result file or directory.
+        @param is_dir: Whether the file is a directory, None to check.
+        @param size: Size in bytes of the file, None to check.
         """
         assert name != None
         self._name = name
@@ -154,7 +165,9 @@ class ResultInfo(dict):
 
         # rstrip is to remove / when name is ROOT_DIR ('').
         self._path = os.path.join(parent_dir, self.name).rstrip(os.sep)
-        self._is_dir = os.path.isdir(self._path)
+        if is_dir is None:
+            is_dir = os.path.isdir(self._path)
+        self._is_dir = is_dir
 
         if self.is_dir:
             # The value of key utils_lib.DIRS is a list of ResultInfo objects.
@@ -166,6 +179,8 @@ class ResultInfo(dict):
             # Set directory size to 0, it will be updated later after its
             # sub-directories are added.
             self.original_size = 0
+        elif size is not None:
+            self.original_size = size
         else:
             self.original_size = self.size
 
@@ -247,6 +262,9 @@ class ResultInfo(dict):
                         all_dirs=None):
         """Get the ResultInfo for the given path.
 
+        The tree is walked iteratively, with each directory listed once by
+        scandir and each file stat'ed once.
+
         @param parent_dir: The parent directory of the given file.
         @param name: Name of the result file or directory.
         @param parent_result_info: A ResultInfo instance for the parent
@@ -254,14 +272,15 @@ class ResultInfo(dict):
         @param top_dir: The top directory to collect ResultInfo. This is to
                 check if a directory is a subdir of the original directory to
                 collect summary.
-        @param all_dirs: A set of paths that have been collected. This is to
-                prevent infinite recursive call caused by symlink.
+        @param all_dirs: A set of (st_dev, st_ino) of the directories that have
+                been collected. This is to prevent infinite recursive call
+                caused by symlink.
 
         @return: A ResultInfo instance containing the directory summary.
         """
         is_top_level = top_dir is None
         top_dir = top_dir or parent_dir
-        all_dirs = all_dirs or set()
+        all_dirs = all_dirs if all_dirs is not None else set()
 
         # If the given parent_dir is a file and name is ROOT_DIR, that means
         # the ResultInfo is for a single file with root directory of the default
@@ -279,25 +298,32 @@ class ResultInfo(dict):
 
         path = os.path.join(parent_dir, name)
         if os.path.isdir(path):
-            real_path = os.path.realpath(path)
-            # The assumption here is that results are copied back to drone by
-            # copying the symlink, not the content, which is true with currently
-            # used rsync in cros_host.get_file call.
-            # Skip scanning the child folders if any of following condition is
-            # true:
-            # 1. The directory is a symlink and link to a folder under `top_dir`
-            # 2. The directory was scanned already.
-            if ((os.path.islink(path) and real_path.startswith(top_dir)) or
-                real_path in all_dirs):
-                return dir_info
-            all_dirs.add(real_path)
-            for f in sorted(os.listdir(path)):
-                dir_info.files.append(ResultInfo.build_from_path(
-                        parent_dir=path,
-                        name=f,
-                        parent_result_info=dir_info,
-                        top_dir=top_dir,
-                        all_dirs=all_dirs))
+            # Directories still to be scanned, in the order the recursive walk
+            # would visit them.
+            pending = [(dir_info, path, os.path.islink(path))]
+            while pending:
+                info, info_path, is_link = pending.pop()
+                if not ResultInfo._should_scan_dir(info_path, is_link,
+                                                   top_dir, all_dirs):
+                    continue
+                sub_dirs = []
+                for entry in result_info_lib.scan_dir(info_path):
+                    try:
+                        is_dir = entry.is_dir()
+                        size = 0 if is_dir else entry.stat().st_size
+                    except OSError:
+                        # File was deleted already, or is a broken symlink.
+                        is_dir, size = False, 0
+                    sub_info = ResultInfo(parent_dir=info_path,
+                                          name=entry.name,
+                                          parent_result_info=info,
+                                          is_dir=is_dir,
+                                          size=size)
+                    info.files.append(sub_info)
+                    if is_dir:
+                        sub_dirs.append((sub_info, entry.path,
+                                         entry.is_symlink()))
+                pending.extend(reversed(sub_dirs))
 
         # Update all directory's original size at the end of the tree building.
         if is_top_level:
@@ -305,6 +331,38 @@ class ResultInfo(dict):
 
         return dir_info
 
+    @staticmethod
+    def _should_scan_dir(path, is_link, top_dir, all_dirs):
+        """Check if the content of a directory should be collected.
+
+        The assumption here is that results are copied back to drone by
+        copying the symlink, not the content, which is true with currently
+        used rsync in cros_host.get_file call.
+        Skip scanning the child folders if any of following condition is true:
+        1. The directory is a symlink and link to a folder under `top_dir`
+        2. The directory was scanned already.
+
+        @param path: Path to the directory.
+        @param is_link: Whether the path is a symlink.
+        @param top_dir: The top directory to collect ResultInfo.
+        @param all_dirs: A set of (st_dev, st_ino) of the directories that have
+                been collected. Updated with the directory if it is to be
+                scanned.
+
+        @return: True if the directory should be scanned.
+        """
+        if is_link and os.path.realpath(path).startswith(top_dir):
+            return False
+        try:
+            dir_stat = os.stat(path)
+        except OSError:
+            return False
+        dir_id = (dir_stat.st_dev, dir_stat.st_ino)
+        if dir_id in all_dirs:
+            return False
+        all_dirs.add(dir_id)
+        return True
+
     @property
     def details(self):
         """Get the details of the result.
@@ -516,7 +574,7 @@ class ResultInfo(dict):
                     f.original_size for f in self.files])
         elif self.original_size is None:
             # Only set original_size if it's not initialized yet.
-            self.orginal_size = self.size
+            self.original_size = self.size
 
         # Update the size of parent result infos.
         if not skip_parent_update and self._parent_result_info is not None:
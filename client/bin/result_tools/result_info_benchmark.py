@@ -0,0 +1,118 @@
+#!/usr/bin/python2
+# Lint as: python2, python3
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark ResultInfo.build_from_path on a generated result tree.
+
+Compares the scandir based builder with the previous recursive
+listdir/isdir/realpath builder, reporting wall time and peak memory of each
+in a separate process, e.g.
+
+    ./result_info_benchmark.py --files 200000
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import common
+from autotest_lib.client.bin.result_tools import result_info
+from autotest_lib.client.bin.result_tools import utils_lib
+
+
+def _legacy_build_from_path(parent_dir, name=utils_lib.ROOT_DIR,
+                            parent_result_info=None, top_dir=None,
+                            all_dirs=None):
+    """The recursive builder ResultInfo.build_from_path used before."""
+    is_top_level = top_dir is None
+    top_dir = top_dir or parent_dir
+    all_dirs = all_dirs or set()
+    dir_info = result_info.ResultInfo(parent_dir=parent_dir, name=name,
+                                      parent_result_info=parent_result_info)
+    path = os.path.join(parent_dir, name)
+    if os.path.isdir(path):
+        real_path = os.path.realpath(path)
+        if ((os.path.islink(path) and real_path.startswith(top_dir)) or
+            real_path in all_dirs):
+            return dir_info
+        all_dirs.add(real_path)
+        for f in sorted(os.listdir(path)):
+            dir_info.files.append(_legacy_build_from_path(
+                    parent_dir=path, name=f, parent_result_info=dir_info,
+                    top_dir=top_dir, all_dirs=all_dirs))
+    if is_top_level:
+        dir_info.update_dir_original_size()
+    return dir_info
+
+
+def _generate_tree(root, num_files, files_per_dir):
+    """Create num_files small files spread over a two level tree."""
+    for i in range(num_files):
+        dir_index = i // files_per_dir
+        folder = os.path.join(root, 'sysinfo_%d' % (dir_index // 100),
+                              'var_log_%d' % dir_index)
+        if i % files_per_dir == 0:
+            os.makedirs(folder)
+        with open(os.path.join(folder, 'messages.%d' % i), 'w') as f:
+            f.write('x' * (i % 512))
+
+
+def _run(builder, root, queue):
+    """Build the summary in this process and report time and memory."""
+    start = time.time()
+    summary = builder(root)
+    elapsed = time.time() - start
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, max_rss_kb, summary.original_size))
+
+
+def _measure(builder, root):
+    """Run a builder in a fresh process.
+
+    @return: A tuple of (seconds, peak RSS in KB, total size in bytes).
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run,
+                                      args=(builder, root, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    """Generate the tree, run both builders and print a comparison."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=200000,
+                        help='Number of files in the generated tree.')
+    parser.add_argument('--files-per-dir', type=int, default=200,
+                        help='Number of files per leaf directory.')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='result_info_benchmark_')
+    try:
+        _generate_tree(root, args.files, args.files_per_dir)
+        print('%-10s %10s %12s %14s' % ('builder', 'seconds', 'peak RSS KB',
+                                         'total bytes'))
+        for name, builder in (
+                ('recursive', _legacy_build_from_path),
+                ('scandir', result_info.ResultInfo.build_from_path)):
+            seconds, max_rss_kb, size = _measure(builder, root)
+            print('%-10s %10.2f %12d %14d' % (name, seconds, max_rss_kb,
+                                               size))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
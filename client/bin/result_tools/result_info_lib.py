@@ -6,6 +6,15 @@
 """
 
 import os
+import stat
+
+try:
+    _scandir = os.scandir
+except AttributeError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
 
 
 def _get_file_stat(path):
@@ -40,3 +49,56 @@ def get_last_modification_time(path):
     """
     stat = _get_file_stat(path)
     return stat.st_mtime if stat else 0
+
+
+class _DirEntry(object):
+    """Minimal stand-in for os.DirEntry when scandir is not available."""
+
+    __slots__ = ('name', 'path', '_lstat', '_stat')
+
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = os.path.join(parent, name)
+        self._lstat = None
+        self._stat = None
+
+    def stat(self, follow_symlinks=True):
+        """Get the (cached) os.stat or os.lstat of the entry."""
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_symlink(self):
+        """Whether the entry is a symlink."""
+        try:
+            return stat.S_ISLNK(self.stat(follow_symlinks=False).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self):
+        """Whether the entry is a directory or a symlink to one."""
+        try:
+            return stat.S_ISDIR(self.stat().st_mode)
+        except OSError:
+            return False
+
+
+def scan_dir(path):
+    """List the entries of a directory, sorted by name.
+
+    The entries cache their stat results, so each file in the directory is
+    stat'ed at most once.
+
+    @param path: Path to the directory.
+    @return: A list of os.DirEntry like objects.
+    """
+    if _scandir is not None:
+        entries = list(_scandir(path))
+    else:
+        entries = [_DirEntry(path, name) for name in os.listdir(path)]
+    entries.sort(key=lambda entry: entry.name)
+    return entries
@@ -6,9 +6,11 @@ import os
 import re
 
 try:
+    from autotest_lib.client.bin.result_tools import compression_lib
     from autotest_lib.client.bin.result_tools import throttler_lib
     from autotest_lib.client.bin.result_tools import utils_lib
 except ImportError:
+    import compression_lib
     import throttler_lib
     import utils_lib
 
@@ -61,26 +63,25 @@ HEAD_SIZE_PERCENT = 0.20
 # Default size in byte to trim the file down to.
 DEFAULT_FILE_SIZE_LIMIT_BYTE = 100 * 1024
 
-def _trim_file(file_info, file_size_limit_byte):
+def _trim_file_on_disk(path, original_size, file_size_limit_byte):
     """Remove the file content in the middle to reduce the file size.
 
-    @param file_info: A ResultInfo object containing summary for the file to be
-            shrunk.
+    @param path: Path to the file to be shrunk.
+    @param original_size: Original size in bytes of the file.
     @param file_size_limit_byte: Maximum file size in bytes after trimming.
+    @return: True if the file is trimmed, False otherwise.
     """
     utils_lib.LOG('Trimming file %s to reduce size from %d bytes to %d bytes' %
-                  (file_info.path, file_info.original_size,
-                   file_size_limit_byte))
-    new_path = os.path.join(os.path.dirname(file_info.path),
-                            file_info.name + '_trimmed')
-    original_size_bytes = file_info.original_size
-    with open(new_path, 'w') as new_file, open(file_info.path) as old_file:
+                  (path, original_size, file_size_limit_byte))
+    new_path = path + '_trimmed'
+    original_size_bytes = original_size
+    with open(new_path, 'w') as new_file, open(path) as old_file:
         # Read the beginning part of the old file, if it's already started with
         # TRIMMED_FILE_HEADER, no need to add the header again.
         header =  old_file.read(len(TRIMMED_FILE_HEADER))
         if header != TRIMMED_FILE_HEADER:
             new_file.write(TRIMMED_FILE_HEADER)
-            new_file.write(ORIGINAL_SIZE_TEMPLATE % file_info.original_size)
+            new_file.write(ORIGINAL_SIZE_TEMPLATE % original_size)
         else:
             line = old_file.readline()
             match = re.match(ORIGINAL_SIZE_REGEX, line)
@@ -103,18 +104,32 @@ def _trim_file(file_info, file_size_limit_byte):
         new_file.write(TRIMMED_FILE_INJECT_TEMPLATE % bytes_to_skip)
         old_file.seek(seek_pos, os.SEEK_END)
         new_file.write(old_file.read())
-    stat = os.stat(file_info.path)
-    if not throttler_lib.try_delete_file_on_disk(file_info.path):
+    stat = os.stat(path)
+    if not throttler_lib.try_delete_file_on_disk(path):
         # Clean up the intermediate file.
         throttler_lib.try_delete_file_on_disk(new_path)
-        utils_lib.LOG('Failed to shrink %s' % file_info.path)
-        return
+        utils_lib.LOG('Failed to shrink %s' % path)
+        return False
 
-    os.rename(new_path, file_info.path)
+    os.rename(new_path, path)
     # Modify the new file's timestamp to the old one.
-    os.utime(file_info.path, (stat.st_atime, stat.st_mtime))
-    # Update the trimmed_size.
-    file_info.trimmed_size = file_info.size
+    os.utime(path, (stat.st_atime, stat.st_mtime))
+    return True
+
+
+def _trim_task(args):
+    """Trim a file in a pool process.
+
+    @param args: A tuple of (path, original_size, file_size_limit_byte), see
+            _trim_file_on_disk.
+    @return: True if the file is trimmed, False otherwise.
+    """
+    path = args[0]
+    try:
+        return _trim_file_on_disk(*args)
+    except (IOError, OSError) as e:
+        utils_lib.LOG('Failed to shrink %s, Error: %s' % (path, e))
+        return False
 
 
 def _get_shrinkable_files(file_infos, file_size_limit_byte):
@@ -149,7 +164,7 @@ def _get_shrinkable_files(file_infos, file_size_limit_byte):
 
 def throttle(summary, max_result_size_KB,
              file_size_limit_byte=DEFAULT_FILE_SIZE_LIMIT_BYTE,
-             skip_autotest_log=False):
+             skip_autotest_log=False, plan=None, processes=None):
     """Throttle the files in summary by trimming file content.
 
     Stop throttling until all files are processed or the result file size is
@@ -162,15 +177,35 @@ def throttle(summary, max_result_size_KB,
             result size is under the given max_result_size_KB.
     @param skip_autotest_log: True to skip shrink Autotest logs, default is
             False.
+    @param plan: A throttler_lib.ThrottlePlan object shared with other
+            throttlers. Default is None to create one for the summary.
+    @param processes: Maximum number of processes to trim files concurrently.
+            Default is None to use compression_lib.Pool's default.
     """
-    file_infos, _ = throttler_lib.sort_result_files(summary)
+    if plan is None:
+        plan = throttler_lib.ThrottlePlan(summary)
     extra_patterns = ([throttler_lib.AUTOTEST_LOG_PATTERN] if skip_autotest_log
                       else [])
-    file_infos = throttler_lib.get_throttleable_files(
-            file_infos, extra_patterns)
+    file_infos = plan.get_throttleable_files(
+            extra_patterns, min_size_byte=file_size_limit_byte)
     file_infos = _get_shrinkable_files(file_infos, file_size_limit_byte)
-    for info in file_infos:
-        _trim_file(info, file_size_limit_byte)
-
-        if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
-            return
+    with compression_lib.Pool(1 if plan.dry_run else processes) as pool:
+        for batch in throttler_lib.get_batches(
+                summary, max_result_size_KB, file_infos, pool.processes):
+            if plan.dry_run:
+                trimmed = [True] * len(batch)
+            else:
+                trimmed = pool.map(
+                        _trim_task,
+                        [(info.path, info.original_size, file_size_limit_byte)
+                         for info in batch])
+            for info, is_trimmed in zip(batch, trimmed):
+                if not is_trimmed:
+                    continue
+                old_size = info.trimmed_size
+                info.trimmed_size = (file_size_limit_byte if plan.dry_run
+                                     else info.size)
+                plan.record('shrink', info, old_size)
+
+            if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
+                return
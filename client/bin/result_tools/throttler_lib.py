@@ -17,6 +17,7 @@ except ImportError:
 # deletion, trimming or compression.
 NON_THROTTLEABLE_FILE_NAMES = set([
         '.autoserv_execute',
+        '.parse.job.lock',
         '.parse.lock',
         '.parse.log',
         '.parser_execute',
@@ -106,6 +107,175 @@ def sort_result_files(summary):
     return sorted_files, grouped_files
 
 
+def _get_priority(path):
+    """Get the item in RESULT_THROTTLE_PRIORITY matching the given path.
+
+    @param path: Path to a result file.
+    @return: The first pattern in RESULT_THROTTLE_PRIORITY matching the path.
+    """
+    for pattern in RESULT_THROTTLE_PRIORITY:
+        if re.match(pattern, path):
+            return pattern
+
+
+def _is_non_throttleable(info):
+    """Check if a file must not be throttled regardless of the throttler.
+
+    @param info: A ResultInfo object of a file.
+    @return: True if the file is in NON_THROTTLEABLE_FILE_NAMES or its path
+            matches NON_THROTTLEABLE_FILE_PATTERNS.
+    """
+    if info.name in NON_THROTTLEABLE_FILE_NAMES:
+        return True
+    for pattern in NON_THROTTLEABLE_FILE_PATTERNS:
+        if re.match(pattern, info.path):
+            return True
+    return False
+
+
+class ThrottlePlan(object):
+    """Result files classified and sorted once for a run of throttlers.
+
+    The files are grouped by RESULT_THROTTLE_PRIORITY and sorted by size when
+    the plan is created. Throttlers report every file they shrink, compress or
+    delete through record() and replace(), so the groups can be kept in order
+    without listing the summary and matching all the patterns again.
+
+    In dry run mode throttlers only update the sizes in the summary with their
+    estimates instead of changing any file on disk, and the recorded actions
+    make a report of what a real run would do.
+    """
+
+    def __init__(self, summary, dry_run=False):
+        """Initialize the plan.
+
+        @param summary: A ResultInfo object containing result summary.
+        @param dry_run: True to only estimate the effect of each throttler.
+        """
+        self.summary = summary
+        self.dry_run = dry_run
+        # A list of (action, path, saved bytes) of the throttling done so far.
+        self.actions = []
+        self._groups = {pattern: [] for pattern in RESULT_THROTTLE_PRIORITY}
+        # ResultInfo can't hold extra attributes, keep what is known about each
+        # file in dictionaries keyed by the id of the ResultInfo object.
+        self._priorities = {}
+        self._non_throttleable = set()
+        for info in _list_files(summary.files):
+            self._add(info)
+        for infos in self._groups.values():
+            infos.sort(key=lambda info: -info.trimmed_size)
+        self._unsorted_groups = set()
+
+    def _add(self, info):
+        """Classify a file and add it to the end of its group.
+
+        @param info: A ResultInfo object of a file.
+        """
+        pattern = _get_priority(info.path)
+        self._groups[pattern].append(info)
+        self._priorities[id(info)] = pattern
+        if _is_non_throttleable(info):
+            self._non_throttleable.add(id(info))
+
+    def _sort(self):
+        """Sort the groups with files changed since they were last sorted.
+
+        Files removed from the plan are dropped from their groups here. The
+        groups stay nearly sorted between changes, which is the best case for
+        the sort.
+        """
+        for pattern in self._unsorted_groups:
+            infos = [info for info in self._groups[pattern]
+                     if id(info) in self._priorities]
+            infos.sort(key=lambda info: -info.trimmed_size)
+            self._groups[pattern] = infos
+        self._unsorted_groups.clear()
+
+    def sort_result_files(self):
+        """Get the files sorted like the module level sort_result_files.
+
+        @return: A tuple of (sorted_files, grouped_files), see
+                sort_result_files.
+        """
+        self._sort()
+        grouped_files = {pattern: list(self._groups[pattern])
+                         for pattern in RESULT_THROTTLE_PRIORITY}
+        sorted_files = []
+        for pattern in RESULT_THROTTLE_PRIORITY:
+            sorted_files.extend(grouped_files[pattern])
+        return sorted_files, grouped_files
+
+    def get_throttleable_files(self, extra_patterns=[], min_size_byte=0):
+        """Get the files can be throttled, in the order of sort_result_files.
+
+        @param extra_patterns: Extra patterns of file path that should not be
+                throttled.
+        @param min_size_byte: Only files larger than this size are returned.
+                As each group is sorted by size, the rest of a group is skipped
+                once a file not larger than this size is reached.
+        @yield: ResultInfo objects that can be throttled.
+        """
+        self._sort()
+        for pattern in RESULT_THROTTLE_PRIORITY:
+            # Iterate over a copy, as the caller may replace the files.
+            for info in list(self._groups[pattern]):
+                # Files being deleted in earlier throttling have a size of 0,
+                # so they are skipped here too.
+                if info.trimmed_size <= min_size_byte:
+                    break
+                if (id(info) not in self._priorities or
+                    id(info) in self._non_throttleable):
+                    continue
+                if any(re.match(p, info.path) for p in extra_patterns):
+                    continue
+                yield info
+
+    def record(self, action, info, old_size):
+        """Record a throttling action after the file's size is updated.
+
+        @param action: Name of the action, e.g., `shrink`.
+        @param info: A ResultInfo object of the throttled file.
+        @param old_size: Trimmed size of the file before the action.
+        """
+        self.actions.append((action, info.path, old_size - info.trimmed_size))
+        self._unsorted_groups.add(self._priorities[id(info)])
+
+    def replace(self, old_info, new_info):
+        """Replace a file with a new one, e.g., the compressed file.
+
+        @param old_info: A ResultInfo object removed from the summary.
+        @param new_info: A ResultInfo object added to the summary.
+        """
+        self.remove(old_info)
+        self._add(new_info)
+        self._unsorted_groups.add(self._priorities[id(new_info)])
+
+    def remove(self, info):
+        """Remove a file no longer in the summary.
+
+        @param info: A ResultInfo object removed from the summary.
+        """
+        pattern = self._priorities.pop(id(info), None)
+        if pattern is not None:
+            self._non_throttleable.discard(id(info))
+            self._unsorted_groups.add(pattern)
+
+    def get_report(self):
+        """Get a report of the throttling actions.
+
+        @return: A list of lines, one for each action and a total at the end.
+        """
+        lines = ['%-8s %12s  %s' % (action, utils_lib.get_size_string(saved),
+                                    path)
+                 for action, path, saved in self.actions]
+        total = sum(saved for _, _, saved in self.actions)
+        lines.append('%d actions, %s %s' %
+                     (len(self.actions), utils_lib.get_size_string(total),
+                      'to be saved' if self.dry_run else 'saved'))
+        return lines
+
+
 def get_throttleable_files(file_infos, extra_patterns=[]):
     """Filter the files can be throttled.
 
@@ -148,6 +318,33 @@ def check_throttle_limit(summary, max_result_size_KB):
         return False
 
 
+def get_batches(summary, max_result_size_KB, file_infos, batch_size):
+    """Split files into batches to be throttled concurrently.
+
+    A batch is closed when it has batch_size files, or when throttling all the
+    files in it could bring the result size down to max_result_size_KB, so
+    files are not throttled more than needed. The caller should throttle each
+    batch and check the throttle limit before getting the next one.
+
+    @param summary: A ResultInfo object containing result summary.
+    @param max_result_size_KB: Maximum test result size in KB.
+    @param file_infos: An iterable of ResultInfo objects to be throttled.
+    @param batch_size: Maximum number of files in a batch.
+    @yield: Lists of ResultInfo objects.
+    """
+    batch = []
+    excess_size = summary.trimmed_size - max_result_size_KB * 1024
+    for info in file_infos:
+        batch.append(info)
+        excess_size -= info.trimmed_size
+        if len(batch) >= batch_size or excess_size <= 0:
+            yield batch
+            batch = []
+            excess_size = summary.trimmed_size - max_result_size_KB * 1024
+    if batch:
+        yield batch
+
+
 def try_delete_file_on_disk(path):
     """Try to delete the give file on disk.
 
@@ -95,6 +95,49 @@ class ThrottlerLibTest(unittest.TestCase):
             self.assertEqual(os.path.join(*EXPECTED_THROTTABLE_FILES[i]),
                              throttleables[i].path)
 
+    def testThrottlePlan(self):
+        """Test ThrottlePlan keeps the files sorted after they're throttled."""
+        summary = result_info.ResultInfo(parent_dir='',
+                                         original_info=SAMPLE_SUMMARY)
+        plan = throttler_lib.ThrottlePlan(summary)
+        sorted_files, _ = plan.sort_result_files()
+        self.assertEqual([os.path.join(*f) for f in EXPECTED_FILES],
+                         [info.path for info in sorted_files])
+
+        # Files not larger than min_size_byte are skipped.
+        throttleables = list(plan.get_throttleable_files(
+                min_size_byte=unittest_lib.SIZE))
+        self.assertEqual([os.path.join('', 'file2.tar')],
+                         [info.path for info in throttleables])
+
+        # A file shrunk is moved behind the larger files in its group.
+        file2 = summary.get_file('file2.tar')
+        file2.trimmed_size = unittest_lib.SIZE // 2
+        plan.record('shrink', file2, 2 * unittest_lib.SIZE)
+        sorted_files, _ = plan.sort_result_files()
+        self.assertEqual(
+                [os.path.join('', 'sysinfo', 'var', 'log', 'file4'),
+                 os.path.join('', 'sysinfo', 'file3'),
+                 os.path.join('', 'file1'),
+                 os.path.join('', 'keyval'),
+                 os.path.join('', 'file2.tar'),
+                 os.path.join('', 'file.deleted')],
+                [info.path for info in sorted_files])
+        self.assertEqual(
+                [('shrink', os.path.join('', 'file2.tar'),
+                  2 * unittest_lib.SIZE - unittest_lib.SIZE // 2)],
+                plan.actions)
+
+        # A replaced file is no longer returned.
+        file1 = summary.get_file('file1')
+        summary.remove_file('file1')
+        summary.add_file(None, {'file1.tgz': FILE_SIZE_DICT})
+        plan.replace(file1, summary.get_file('file1.tgz'))
+        throttleables = list(plan.get_throttleable_files(['.*\.tgz']))
+        self.assertEqual([os.path.join('', 'sysinfo', 'var', 'log', 'file4'),
+                          os.path.join('', 'sysinfo', 'file3'),
+                          os.path.join('', 'file2.tar')],
+                         [info.path for info in throttleables])
 
 # this is so the test can be run in standalone mode
 if __name__ == '__main__':
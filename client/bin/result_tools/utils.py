@@ -257,11 +257,18 @@ def merge_summaries(path):
     return client_collected_bytes, merged_summary, summary_files
 
 
-def _throttle_results(summary, max_result_size_KB):
+def _throttle_results(summary, max_result_size_KB, dry_run=False):
     """Throttle the test results by limiting to the given maximum size.
 
+    The result files are classified and sorted once, all the throttlers share
+    the same throttler_lib.ThrottlePlan.
+
     @param summary: A ResultInfo object containing result summary.
     @param max_result_size_KB: Maximum test result size in KB.
+    @param dry_run: True to only update the summary with the estimated sizes
+            without changing any file on disk. Default is False.
+    @return: The throttler_lib.ThrottlePlan object with the actions done or,
+            in a dry run, planned, or None if no throttling is needed.
     """
     if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
         utils_lib.LOG(
@@ -269,10 +276,13 @@ def _throttle_results(summary, max_result_size_KB):
                 'throttle.' %
                 (utils_lib.get_size_string(summary.trimmed_size),
                  max_result_size_KB))
-        return
+        return None
+
+    plan = throttler_lib.ThrottlePlan(summary, dry_run=dry_run)
 
     args = {'summary': summary,
-            'max_result_size_KB': max_result_size_KB}
+            'max_result_size_KB': max_result_size_KB,
+            'plan': plan}
     args_skip_autotest_log = copy.copy(args)
     args_skip_autotest_log['skip_autotest_log'] = True
     # Apply the throttlers in following order.
@@ -295,8 +305,8 @@ def _throttle_results(summary, max_result_size_KB):
     # max_result_size_KB, try to delete files with various threshold, starting
     # at 5MB then lowering to 100KB.
     delete_file_thresholds = [5*1024*1024, 1*1024*1024, 100*1024]
-    # Try to keep tgz files first.
-    exclude_file_patterns = ['.*\.tgz']
+    # Try to keep compressed files first.
+    exclude_file_patterns = ['.*\.tgz', '.*\.tar\.zst']
     for threshold in delete_file_thresholds:
         new_args = copy.copy(args)
         new_args.update({'file_size_threshold_byte': threshold,
@@ -313,11 +323,12 @@ def _throttle_results(summary, max_result_size_KB):
         try:
             args_without_summary = copy.copy(args)
             del args_without_summary['summary']
+            del args_without_summary['plan']
             utils_lib.LOG('Applying throttler %s, args: %s' %
                           (throttler.__name__, args_without_summary))
             throttler.throttle(**args)
             if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
-                return
+                return plan
         except:
             utils_lib.LOG('Failed to apply throttler %s. Exception: %s' %
                           (throttler, traceback.format_exc()))
@@ -329,6 +340,7 @@ def _throttle_results(summary, max_result_size_KB):
                 utils_lib.LOG('Result size was reduced from %s to %s.' %
                               (utils_lib.get_size_string(old_size),
                                utils_lib.get_size_string(new_size)))
+    return plan
 
 
 def _setup_logging():
@@ -359,15 +371,25 @@ def _parse_options():
                         default=False,
                         help='-d to delete all result summary files in the '
                         'given path.')
+    parser.add_argument('-n', action='store_true', dest='dry_run',
+                        default=False,
+                        help='-n to only report the throttling actions and '
+                        'the bytes they would save, no file is changed.')
     return parser.parse_args()
 
 
-def execute(path, max_size_KB):
+def execute(path, max_size_KB, dry_run=False):
     """Execute the script with given arguments.
 
     @param path: Path to build directory summary.
     @param max_size_KB: Maximum result size in KB.
+    @param dry_run: True to only report how the results would be throttled,
+            without saving the summary or changing any file.
     """
+    if dry_run:
+        _report_throttling(path, max_size_KB)
+        return
+
     utils_lib.LOG('Running result_tools/utils on path: %s' % path)
     if max_size_KB > 0:
         utils_lib.LOG('Throttle result size to : %s' %
@@ -409,6 +431,24 @@ def execute(path, max_size_KB):
                 result_info.save_summary(summary, summary_file)
 
 
+def _report_throttling(path, max_size_KB):
+    """Log the actions to throttle the results and the bytes each one saves.
+
+    @param path: Path to the results.
+    @param max_size_KB: Maximum result size in KB.
+    """
+    summary = result_info.ResultInfo.build_from_path(path)
+    old_size = summary.trimmed_size
+    plan = _throttle_results(summary, max_size_KB, dry_run=True)
+    if plan is None:
+        return
+    utils_lib.LOG('Dry run of throttling %s from %s to %s:' %
+                  (path, utils_lib.get_size_string(old_size),
+                   utils_lib.get_size_string(max_size_KB * 1024)))
+    for line in plan.get_report():
+        utils_lib.LOG(line)
+
+
 def _delete_summaries(path):
     """Delete all directory summary files in the given directory.
 
@@ -434,7 +474,7 @@ def main():
     if options.delete_summaries:
         _delete_summaries(options.path)
     else:
-        execute(options.path, options.max_size_KB)
+        execute(options.path, options.max_size_KB, options.dry_run)
 
 
 if __name__ == '__main__':
@@ -227,6 +227,22 @@ class GetDirSummaryTest(unittest.TestCase):
         summary = result_info.ResultInfo.build_from_path(self.test_dir)
         self.assertEqual(EXPECTED_SUMMARY, summary)
 
+    def test_BuildFromPath_SymlinkLoop(self):
+        """Test ResultInfo.build_from_path stops at a symlink loop."""
+        outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside_dir, ignore_errors=True)
+        unittest_lib.create_file(os.path.join(outside_dir, 'file5'))
+        os.symlink(outside_dir, os.path.join(outside_dir, 'loop'))
+        os.symlink(outside_dir, os.path.join(self.test_dir, 'outside'))
+
+        summary = result_info.ResultInfo.build_from_path(self.test_dir)
+        outside = summary.get_file('outside')
+        self.assertEqual(outside.get_file_names(), set(['file5', 'loop']))
+        self.assertEqual(outside.get_file('loop').files, [])
+        self.assertEqual(summary.original_size,
+                         EXPECTED_SUMMARY[''][utils_lib.ORIGINAL_SIZE_BYTES] +
+                         SIZE)
+
 
 class MergeSummaryTest(unittest.TestCase):
     """Test class for merge_summaries method"""
@@ -475,7 +491,8 @@ class ThrottleTest(unittest.TestCase):
     def testThrottleResults(self):
         """Test _throttle_results method."""
         summary = result_info.ResultInfo.build_from_path(self.test_dir)
-        result_utils._throttle_results(summary, LARGE_SIZE * 10 // 1024)
+        self.assertIsNone(result_utils._throttle_results(
+                summary, LARGE_SIZE * 10 // 1024))
         self.assertEqual(EXPECTED_THROTTLED_SUMMARY_NO_THROTTLE, summary)
 
         result_utils._throttle_results(summary, LARGE_SIZE * 3 // 1024)
@@ -540,6 +557,36 @@ class ThrottleTest(unittest.TestCase):
         self.assertEqual(0, entry.trimmed_size)
         self.assertEqual(LARGE_SIZE, entry.original_size)
 
+    def testThrottleResults_DryRun(self):
+        """Test _throttle_results method does not change files in a dry run."""
+        files = {}
+        for root, _, names in os.walk(self.test_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                files[path] = os.stat(path).st_size
+        summary = result_info.ResultInfo.build_from_path(self.test_dir)
+        max_size_KB = (3*SMALL_SIZE + SHRINK_SIZE) // 1024 + 2
+        plan = result_utils._throttle_results(summary, max_size_KB,
+                                              dry_run=True)
+
+        new_files = {}
+        for root, _, names in os.walk(self.test_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                new_files[path] = os.stat(path).st_size
+        self.assertEqual(files, new_files)
+
+        # The summary holds the estimated sizes.
+        self.assertTrue(summary.trimmed_size <= max_size_KB * 1024)
+        actions = [(action, os.path.relpath(path, self.test_dir))
+                   for action, path, _ in plan.actions]
+        self.assertIn(('shrink', 'files_to_shink/file.txt'), actions)
+        self.assertIn(('zip', 'files_to_zip/file.xml.tgz'), actions)
+        self.assertIn(('delete', 'files_to_delete/file.png'), actions)
+        self.assertEqual(3 * LARGE_SIZE + 5 * SMALL_SIZE - summary.trimmed_size,
+                         sum(saved for _, _, saved in plan.actions))
+        self.assertEqual(len(plan.actions) + 1, len(plan.get_report()))
+
 
 # this is so the test can be run in standalone mode
 if __name__ == '__main__':
@@ -7,12 +7,14 @@
 
 import re
 import os
-import tarfile
+import zlib
 
 try:
+    from autotest_lib.client.bin.result_tools import compression_lib
     from autotest_lib.client.bin.result_tools import throttler_lib
     from autotest_lib.client.bin.result_tools import utils_lib
 except ImportError:
+    import compression_lib
     import throttler_lib
     import utils_lib
 
@@ -26,6 +28,7 @@ UNZIPPABLE_EXTENSIONS = set([
         '.tgz',
         '.xz',
         '.zip',
+        '.zst',
         ])
 
 # Regex for files that should not be compressed.
@@ -37,34 +40,56 @@ UNZIPPABLE_FILE_PATTERNS = [
 # Files smaller than the threshold will not be compressed.
 DEFAULT_FILE_SIZE_THRESHOLD_BYTE = 100 * 1024
 
-def _zip_file(file_info):
-    """Zip the file to reduce the file size.
+# Bytes read from the start of a file to estimate its compressed size in a dry
+# run.
+COMPRESSION_SAMPLE_SIZE_BYTE = 256 * 1024
+# Size of the tar header and gzip framing added to a compressed file.
+TGZ_OVERHEAD_BYTE = 1024
+
+def _remove_old_archive(file_info, codec, plan):
+    """Remove an archive left by an earlier compression of the file.
 
     @param file_info: A ResultInfo object containing summary for the file to be
-            shrunk.
+            compressed.
+    @param codec: Name of the compression codec.
+    @param plan: A throttler_lib.ThrottlePlan object.
+    @return: True if the file can be compressed, False if the old archive
+            failed to be deleted.
     """
-    utils_lib.LOG('Compressing file %s' % file_info.path)
     parent_result_info = file_info.parent_result_info
-    new_name = file_info.name + '.tgz'
-    new_path = os.path.join(os.path.dirname(file_info.path), new_name)
+    new_path = compression_lib.get_archive_path(file_info.path, codec)
     if os.path.exists(new_path):
         utils_lib.LOG('File %s already exists, removing...' % new_path)
         if not throttler_lib.try_delete_file_on_disk(new_path):
-            return
+            return False
+        new_name = os.path.basename(new_path)
+        plan.remove(parent_result_info.get_file(new_name))
         parent_result_info.remove_file(new_name)
-    with tarfile.open(new_path, 'w:gz') as tar:
-        tar.add(file_info.path, arcname=os.path.basename(file_info.path))
+    return True
+
+
+def _replace_with_archive(file_info, new_path):
+    """Replace the file with its compressed archive, on disk and in summary.
+
+    @param file_info: A ResultInfo object containing summary for the file
+            being compressed.
+    @param new_path: Path to the archive of the file.
+    @return: The ResultInfo object of the compressed file, or None if the file
+            failed to be compressed.
+    """
+    parent_result_info = file_info.parent_result_info
     stat = os.stat(file_info.path)
     if not throttler_lib.try_delete_file_on_disk(file_info.path):
         # Clean up the intermediate file.
         throttler_lib.try_delete_file_on_disk(new_path)
         utils_lib.LOG('Failed to compress %s' % file_info.path)
-        return
+        return None
 
     # Modify the new file's timestamp to the old one.
     os.utime(new_path, (stat.st_atime, stat.st_mtime))
     # Get the original file size before compression.
     original_size = file_info.original_size
+    new_name = os.path.basename(new_path)
     parent_result_info.remove_file(file_info.name)
     parent_result_info.add_file(new_name)
     new_file_info = parent_result_info.get_file(new_name)
@@ -72,6 +97,78 @@ def _zip_file(file_info):
     new_file_info.original_size = original_size
     # Set the trimmed size to be the physical file size of the compressed file.
     new_file_info.trimmed_size = new_file_info.size
+    return new_file_info
+
+
+def _zip_files(file_infos, codec, plan, pool):
+    """Compress the files concurrently to reduce their size.
+
+    @param file_infos: A list of ResultInfo objects containing summary for the
+            files to be compressed.
+    @param codec: Name of the compression codec.
+    @param plan: A throttler_lib.ThrottlePlan object.
+    @param pool: A compression_lib.Pool object.
+    @return: A list of (file_info, new_file_info) for the compressed files.
+    """
+    file_infos = [info for info in file_infos
+                  if _remove_old_archive(info, codec, plan)]
+    for info in file_infos:
+        utils_lib.LOG('Compressing file %s' % info.path)
+    results = pool.compress([info.path for info in file_infos], codec)
+    zipped = []
+    for info, (_, new_path, error) in zip(file_infos, results):
+        if error:
+            utils_lib.LOG('Failed to compress %s, Error: %s' %
+                          (info.path, error))
+            continue
+        new_info = _replace_with_archive(info, new_path)
+        if new_info is not None:
+            zipped.append((info, new_info))
+    return zipped
+
+
+def _estimate_compressed_size(file_info):
+    """Estimate the size of a file after it's compressed to a tgz file.
+
+    Only the start of the file is compressed, the ratio is applied to the rest.
+
+    @param file_info: A ResultInfo object of the file.
+    @return: The estimated size in bytes of the compressed file.
+    """
+    try:
+        with open(file_info.path, 'rb') as f:
+            sample = f.read(COMPRESSION_SAMPLE_SIZE_BYTE)
+    except IOError as e:
+        utils_lib.LOG('Failed to read %s, Error: %s' % (file_info.path, e))
+        return file_info.trimmed_size
+    if not sample:
+        return file_info.trimmed_size
+    ratio = float(len(zlib.compress(sample, 9))) / len(sample)
+    return min(file_info.trimmed_size,
+               int(file_info.trimmed_size * ratio) + TGZ_OVERHEAD_BYTE)
+
+
+def _simulate_zip_file(file_info, codec, plan):
+    """Update the summary as if the file is compressed, without touching disk.
+
+    @param file_info: A ResultInfo object of the file to be compressed.
+    @param codec: Name of the compression codec.
+    @param plan: A throttler_lib.ThrottlePlan object.
+    @return: The ResultInfo object of the compressed file.
+    """
+    parent_result_info = file_info.parent_result_info
+    new_name = os.path.basename(
+            compression_lib.get_archive_path(file_info.path, codec))
+    if new_name in parent_result_info.get_file_names():
+        plan.remove(parent_result_info.get_file(new_name))
+        parent_result_info.remove_file(new_name)
+    new_info = {new_name: {
+            utils_lib.ORIGINAL_SIZE_BYTES: file_info.original_size,
+            utils_lib.TRIMMED_SIZE_BYTES: _estimate_compressed_size(file_info)
+            }}
+    parent_result_info.remove_file(file_info.name)
+    parent_result_info.add_file(None, new_info)
+    return parent_result_info.get_file(new_name)
 
 
 def _get_zippable_files(file_infos, file_size_threshold_byte):
@@ -103,7 +200,8 @@ def _get_zippable_files(file_infos, file_size_threshold_byte):
 
 def throttle(summary, max_result_size_KB,
              file_size_threshold_byte=DEFAULT_FILE_SIZE_THRESHOLD_BYTE,
-             skip_autotest_log=False):
+             skip_autotest_log=False, plan=None, processes=None,
+             codec=compression_lib.GZIP):
     """Throttle the files in summary by compressing file.
 
     Stop throttling until all files are processed or the result file size is
@@ -115,15 +213,34 @@ def throttle(summary, max_result_size_KB,
             qualified for compression.
     @param skip_autotest_log: True to skip shrink Autotest logs, default is
             False.
+    @param plan: A throttler_lib.ThrottlePlan object shared with other
+            throttlers. Default is None to create one for the summary.
+    @param processes: Maximum number of processes to compress files
+            concurrently. Default is None to use compression_lib.Pool's
+            default.
+    @param codec: Name of the compression codec, default is gzip. zstd falls
+            back to gzip if it's not available.
     """
-    file_infos, _ = throttler_lib.sort_result_files(summary)
+    if plan is None:
+        plan = throttler_lib.ThrottlePlan(summary)
+    codec = compression_lib.get_codec(codec)
     extra_patterns = ([throttler_lib.AUTOTEST_LOG_PATTERN] if skip_autotest_log
                       else [])
-    file_infos = throttler_lib.get_throttleable_files(
-            file_infos, extra_patterns)
+    file_infos = plan.get_throttleable_files(
+            extra_patterns, min_size_byte=file_size_threshold_byte)
     file_infos = _get_zippable_files(file_infos, file_size_threshold_byte)
-    for info in file_infos:
-        _zip_file(info)
-
-        if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
-            return
+    with compression_lib.Pool(1 if plan.dry_run else processes) as pool:
+        for batch in throttler_lib.get_batches(
+                summary, max_result_size_KB, file_infos, pool.processes):
+            if plan.dry_run:
+                zipped = [(info, _simulate_zip_file(info, codec, plan))
+                          for info in batch]
+            else:
+                zipped = _zip_files(batch, codec, plan, pool)
+            for info, new_info in zipped:
+                old_size = info.trimmed_size
+                plan.replace(info, new_info)
+                plan.record('zip', new_info, old_size)
+
+            if throttler_lib.check_throttle_limit(summary, max_result_size_KB):
+                return
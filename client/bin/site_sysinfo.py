@@ -3,10 +3,13 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import errno
 import logging
 import os
 import stat
 
+from multiprocessing import pool
+
 from autotest_lib.client.common_lib import log
 from autotest_lib.client.common_lib import error, utils, global_config
 from autotest_lib.client.bin import base_sysinfo, utils
@@ -20,6 +23,68 @@ collect_corefiles = get_value('CLIENT', 'collect_corefiles',
 logfile = base_sysinfo.logfile
 command = base_sysinfo.command
 
+# Bytes copied per system call when copying new log data.
+_COPY_CHUNK_SIZE = 1024 * 1024
+# Errors of copy_file_range and sendfile for files they can't copy, e.g.
+# across filesystems on older kernels.
+_UNSUPPORTED_COPY_ERRNOS = (errno.EINVAL, errno.ENOSYS, errno.EXDEV,
+                            errno.EOPNOTSUPP)
+
+
+def _read_write(in_fd, out_fd, offset):
+    """Copy a chunk of in_fd from offset to out_fd through a buffer.
+
+    @return: The number of bytes copied, 0 at the end of in_fd.
+    """
+    os.lseek(in_fd, offset, os.SEEK_SET)
+    data = os.read(in_fd, _COPY_CHUNK_SIZE)
+    written = 0
+    while written < len(data):
+        written += os.write(out_fd, data[written:])
+    return len(data)
+
+
+def _get_copy_functions():
+    """List the ways to copy chunks of files, the most efficient first.
+
+    copy_file_range and sendfile copy in the kernel but only exist in newer
+    versions of python.
+
+    @return: A list of functions taking (in_fd, out_fd, offset) and
+        returning the number of bytes copied.
+    """
+    copy_functions = []
+    if hasattr(os, 'copy_file_range'):
+        copy_functions.append(lambda in_fd, out_fd, offset: os.copy_file_range(
+                in_fd, out_fd, _COPY_CHUNK_SIZE, offset))
+    if hasattr(os, 'sendfile'):
+        copy_functions.append(lambda in_fd, out_fd, offset: os.sendfile(
+                out_fd, in_fd, offset, _COPY_CHUNK_SIZE))
+    copy_functions.append(_read_write)
+    return copy_functions
+
+
+def _copy_to_end(in_fd, out_fd, offset):
+    """Copy the data of in_fd from offset to its end, in chunks.
+
+    @param in_fd: File descriptor to copy from.
+    @param out_fd: File descriptor to append to.
+    @param offset: Position in in_fd to start copying from.
+    """
+    copy_functions = _get_copy_functions()
+    while True:
+        try:
+            copied = copy_functions[0](in_fd, out_fd, offset)
+        except OSError as e:
+            if (len(copy_functions) == 1 or
+                    e.errno not in _UNSUPPORTED_COPY_ERRNOS):
+                raise
+            copy_functions.pop(0)
+            continue
+        if not copied:
+            return
+        offset += copied
+
 
 class logdir(base_sysinfo.loggable):
     """Represents a log directory."""
@@ -122,13 +187,15 @@ class logdir(base_sysinfo.loggable):
 
 class file_stat(object):
     """Store the file size and inode, used for retrieving new data in file."""
-    def __init__(self, file_path):
+    def __init__(self, file_path, stat=None):
         """Collect the size and inode information of a file.
 
         @param file_path: full path to the file.
+        @param stat: os.stat result of the file, if already known.
 
         """
-        stat = os.stat(file_path)
+        if stat is None:
+            stat = os.stat(file_path)
         # Start size of the file, skip that amount of bytes when do diff.
         self.st_size = stat.st_size
         # inode of the file. If inode is changed, treat this as a new file and
@@ -146,6 +213,9 @@ class diffable_logdir(logdir):
     method is called in after_iteration_loggables.
 
     """
+    # Number of files whose new data is copied at the same time.
+    DIFF_THREADS = 4
+
     def __init__(self, directory, excludes=logdir.DEFAULT_EXCLUDES,
                  keep_file_hierarchy=True, append_diff_in_name=True):
         """
@@ -174,8 +244,8 @@ class diffable_logdir(logdir):
 
         """
         # Dictionary used to store the initial status of files in src_dir.
-        for file_path in self._get_all_files(src_dir):
-            self._log_stats[file_path] = file_stat(file_path)
+        for file_path, new_stat in self._get_all_file_stats(src_dir):
+            self._log_stats[file_path] = file_stat(file_path, new_stat)
         self.file_stats_collected = True
 
 
@@ -187,33 +257,81 @@ class diffable_logdir(logdir):
             including subdirectories.
 
         """
-        if not os.path.exists(path):
-            yield []
-        for root, dirs, files in os.walk(path):
-            for f in files:
-                if f.startswith('autoserv'):
+        for file_path, _ in self._get_all_file_stats(path):
+            yield file_path
+
+
+    def _get_all_file_stats(self, path):
+        """Iterate through the files in given path and their stat results.
+
+        Uses os.scandir where available, which tells directories apart
+        without a stat call for each entry.  Otherwise each entry is
+        lstat'ed once, and only symlinks are stat'ed again.
+
+        @param path: root directory.
+        @return: an iterator of (full path, os.stat result) tuples of all
+            files in given path including subdirectories.
+
+        """
+        directories = [path]
+        while directories:
+            directory = directories.pop()
+            try:
+                if hasattr(os, 'scandir'):
+                    entries = [(entry.name, entry.path,
+                                entry.is_dir(follow_symlinks=False),
+                                entry.stat)
+                               for entry in os.scandir(directory)]
+                else:
+                    entries = []
+                    for name in os.listdir(directory):
+                        full_path = os.path.join(directory, name)
+                        try:
+                            lstat_result = os.lstat(full_path)
+                        except OSError:
+                            continue
+                        # Only symlinks need another stat, to follow them.
+                        entries.append(
+                                (name, full_path,
+                                 stat.S_ISDIR(lstat_result.st_mode),
+                                 lambda p=full_path, s=lstat_result:
+                                         os.stat(p)
+                                         if stat.S_ISLNK(s.st_mode) else s))
+            except OSError:
+                continue
+            for name, full_path, is_dir, get_stat in entries:
+                if is_dir:
+                    directories.append(full_path)
                     continue
-                if f.endswith('.journal') or f.endswith('.journal~'):
+                if name.startswith('autoserv'):
                     continue
-                full_path = os.path.join(root, f)
-                # Only list regular files or symlinks to those (os.stat follows
+                if name.endswith('.journal') or name.endswith('.journal~'):
+                    continue
+                # Only list regular files or symlinks to those (stat follows
                 # symlinks)
-                if stat.S_ISREG(os.stat(full_path).st_mode):
-                    yield full_path
+                try:
+                    file_stat_result = get_stat()
+                except OSError:
+                    continue
+                if stat.S_ISREG(file_stat_result.st_mode):
+                    yield full_path, file_stat_result
 
 
-    def _copy_new_data_in_file(self, file_path, src_dir, dest_dir):
+    def _copy_new_data_in_file(self, file_path, src_dir, dest_dir,
+                               new_stat=None):
         """Copy all new data in a file to target directory.
 
         @param file_path: full path to the file to be copied.
         @param src_dir: source directory to do the diff.
         @param dest_dir: target directory to store new data of src_dir.
+        @param new_stat: os.stat result of the file, if already known.
 
         """
         bytes_to_skip = 0
         if file_path in self._log_stats:
             prev_stat = self._log_stats[file_path]
-            new_stat = os.stat(file_path)
+            if new_stat is None:
+                new_stat = os.stat(file_path)
             if new_stat.st_ino == prev_stat.st_ino:
                 bytes_to_skip = prev_stat.st_size
             if new_stat.st_size == bytes_to_skip:
@@ -222,18 +340,20 @@ class diffable_logdir(logdir):
                 # File is modified to a smaller size, copy whole file.
                 bytes_to_skip = 0
         try:
-            with open(file_path, 'r') as in_log:
-                if bytes_to_skip > 0:
-                    in_log.seek(bytes_to_skip)
+            with open(file_path, 'rb') as in_log:
                 # Skip src_dir in path, e.g., src_dir/[sub_dir]/file_name.
                 target_path = os.path.join(dest_dir,
                                            os.path.relpath(file_path, src_dir))
                 target_dir = os.path.dirname(target_path)
-                if not os.path.exists(target_dir):
+                try:
                     os.makedirs(target_dir)
-                with open(target_path, "w") as out_log:
-                    out_log.write(in_log.read())
-        except IOError as e:
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+                with open(target_path, 'wb') as out_log:
+                    _copy_to_end(in_log.fileno(), out_log.fileno(),
+                                 bytes_to_skip)
+        except (IOError, OSError) as e:
             logging.error('Diff %s failed with error: %s', file_path, e)
 
 
@@ -253,8 +373,19 @@ class diffable_logdir(logdir):
         if not os.path.exists(dest_dir):
             os.makedirs(dest_dir)
 
-        for src_file in self._get_all_files(src_dir):
-            self._copy_new_data_in_file(src_file, src_dir, dest_dir)
+        files = list(self._get_all_file_stats(src_dir))
+        copy = lambda file_and_stat: self._copy_new_data_in_file(
+                file_and_stat[0], src_dir, dest_dir, file_and_stat[1])
+        if len(files) < 2 or self.DIFF_THREADS < 2:
+            for file_and_stat in files:
+                copy(file_and_stat)
+            return
+        thread_pool = pool.ThreadPool(min(self.DIFF_THREADS, len(files)))
+        try:
+            thread_pool.map(copy, files)
+        finally:
+            thread_pool.close()
+            thread_pool.join()
 
 
     def run(self, log_dir, collect_init_status=True, collect_all=False):
@@ -0,0 +1,137 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark copying the new data of a log directory with diffable_logdir.
+
+Generates a log directory, collects its initial status, appends the given
+amount of data to its files, and times copying the new data the way
+diffable_logdir did before, reading all the new data of a file at once, and
+as it does now, in chunks. Each copy runs in its own process to report its
+peak memory use, e.g.
+
+    ./site_sysinfo_benchmark.py --size-mb 4096 --files 8
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import common
+from autotest_lib.client.bin import site_sysinfo
+
+
+def _legacy_copy_new_data_in_file(self, file_path, src_dir, dest_dir):
+    """Copy all new data in a file like diffable_logdir did before."""
+    bytes_to_skip = 0
+    if file_path in self._log_stats:
+        prev_stat = self._log_stats[file_path]
+        new_stat = os.stat(file_path)
+        if new_stat.st_ino == prev_stat.st_ino:
+            bytes_to_skip = prev_stat.st_size
+        if new_stat.st_size == bytes_to_skip:
+            return
+        elif new_stat.st_size < prev_stat.st_size:
+            bytes_to_skip = 0
+    with open(file_path, 'r') as in_log:
+        if bytes_to_skip > 0:
+            in_log.seek(bytes_to_skip)
+        target_path = os.path.join(dest_dir,
+                                   os.path.relpath(file_path, src_dir))
+        target_dir = os.path.dirname(target_path)
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        with open(target_path, 'w') as out_log:
+            out_log.write(in_log.read())
+
+
+def _legacy_log_diff(self, src_dir, dest_dir):
+    """Copy the new data of all files like diffable_logdir did before."""
+    if not os.path.exists(dest_dir):
+        os.makedirs(dest_dir)
+    for src_file in self._get_all_files(src_dir):
+        _legacy_copy_new_data_in_file(self, src_file, src_dir, dest_dir)
+
+
+def _write_data(path, size_bytes):
+    """Append size_bytes of log lines to a file."""
+    line = b'Jan 02 03:04:05 localhost kernel: [123.456] some log line\n'
+    chunk = line * (1024 * 1024 // len(line))
+    with open(path, 'ab') as f:
+        while size_bytes > 0:
+            f.write(chunk[:size_bytes])
+            size_bytes -= len(chunk)
+
+
+def _run(log_diff, info, dest_dir):
+    """Copy the new data in a child process.
+
+    @return: A tuple of (seconds, peak memory use of the child in KiB).
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        try:
+            os.close(read_fd)
+            start = time.time()
+            log_diff(info, info.dir, dest_dir)
+            elapsed = time.time() - start
+            os.write(write_fd, ('%f %d' % (
+                    elapsed, resource.getrusage(
+                            resource.RUSAGE_SELF).ru_maxrss)).encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1024).decode()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    seconds, max_rss = result.split()
+    return float(seconds), int(max_rss)
+
+
+def main():
+    """Copy the new data of a generated log directory both ways."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=2048,
+                        help='Megabytes of new data, spread over the files.')
+    parser.add_argument('--files', type=int, default=8,
+                        help='Number of log files.')
+    parser.add_argument('--dir', default=None,
+                        help='Directory to generate the logs in, on the '
+                             'filesystem to measure.')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(dir=args.dir)
+    try:
+        src_dir = os.path.join(tmpdir, 'src')
+        paths = [os.path.join(src_dir, 'sub%d' % (i % 2), 'log%d' % i)
+                 for i in range(args.files)]
+        for path in paths:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            _write_data(path, 1024 * 1024)
+        info = site_sysinfo.diffable_logdir(src_dir,
+                                            keep_file_hierarchy=False)
+        info.run(log_dir=None, collect_init_status=True)
+        for path in paths:
+            _write_data(path, args.size_mb * 1024 * 1024 // args.files)
+
+        print('%-8s %10s %12s' % ('path', 'seconds', 'max_rss_kib'))
+        for name, log_diff in (('legacy', _legacy_log_diff),
+                               ('new', site_sysinfo.diffable_logdir._log_diff)):
+            dest_dir = os.path.join(tmpdir, name)
+            print('%-8s %10.2f %12d' % ((name,) +
+                                        _run(log_diff, info, dest_dir)))
+            shutil.rmtree(dest_dir)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
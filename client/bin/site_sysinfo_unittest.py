@@ -10,6 +10,7 @@ from __future__ import print_function
 __author__ = 'dshi@google.com (Dan Shi)'
 
 import six.moves.cPickle as pickle
+import errno
 import filecmp
 import os
 import random
@@ -149,6 +150,80 @@ class diffable_logdir_test(unittest.TestCase):
         self.assert_trees_equal(self.src_dir, full_sysinfo_path)
 
 
+    def test_diffable_logdir_large_append(self):
+        """Test new data spanning several copy chunks is copied in full."""
+        info = site_sysinfo.diffable_logdir(self.src_dir,
+                                            keep_file_hierarchy=False,
+                                            append_diff_in_name=False)
+        info.run(log_dir=None, collect_init_status=True)
+
+        large_file = self.existing_files_path[0]
+        with open(large_file, 'rb') as f:
+            old_data = f.read()
+        new_data = os.urandom(int(site_sysinfo._COPY_CHUNK_SIZE * 2.5))
+        with open(large_file, 'ab') as f:
+            f.write(new_data)
+        info.run(self.dest_dir, collect_init_status=False)
+
+        with open(large_file.replace('src', 'dest'), 'rb') as f:
+            self.assertEqual(new_data, f.read())
+        for file_path in self.existing_files_path[1:]:
+            self.assertFalse(os.path.exists(file_path.replace('src', 'dest')))
+        with open(large_file, 'rb') as f:
+            self.assertEqual(old_data + new_data, f.read())
+
+
+    def test_get_all_file_stats(self):
+        """Test the walk lists regular files and only stats symlinks."""
+        link_path = os.path.join(self.src_dir, 'link')
+        os.symlink(self.existing_files_path[0], link_path)
+        dir_link_path = os.path.join(self.src_dir, 'dir_link')
+        os.symlink(os.path.join(self.src_dir, 'sub'), dir_link_path)
+        info = site_sysinfo.diffable_logdir(self.src_dir)
+
+        stat_paths = []
+        os_stat = os.stat
+        def counting_stat(path):
+            stat_paths.append(path)
+            return os_stat(path)
+        site_sysinfo.os.stat = counting_stat
+        try:
+            file_stats = dict(info._get_all_file_stats(self.src_dir))
+        finally:
+            site_sysinfo.os.stat = os_stat
+
+        self.assertItemsEqual(self.existing_files_path + [link_path],
+                              file_stats)
+        for path, file_stat in file_stats.items():
+            self.assertEqual(os_stat(path), file_stat)
+        if not hasattr(os, 'scandir'):
+            self.assertItemsEqual([link_path, dir_link_path], stat_paths)
+
+
+    def test_copy_to_end_fallback(self):
+        """Test copying falls back when the kernel copy isn't supported."""
+        src_path = self.existing_files_path[0]
+        dest_path = os.path.join(self.tempdir.name, 'copy')
+        with open(src_path, 'rb') as f:
+            data = f.read()
+
+        def unsupported(in_fd, out_fd, offset):
+            raise OSError(errno.EXDEV, 'Cross-device link')
+
+        get_copy_functions = site_sysinfo._get_copy_functions
+        site_sysinfo._get_copy_functions = lambda: (
+                [unsupported] + get_copy_functions())
+        try:
+            with open(src_path, 'rb') as in_file:
+                with open(dest_path, 'wb') as out_file:
+                    site_sysinfo._copy_to_end(in_file.fileno(),
+                                              out_file.fileno(), 2)
+        finally:
+            site_sysinfo._get_copy_functions = get_copy_functions
+        with open(dest_path, 'rb') as f:
+            self.assertEqual(data[2:], f.read())
+
+
 class LogdirTestCase(unittest.TestCase):
     """Tests logdir.run"""
 
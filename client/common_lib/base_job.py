@@ -4,6 +4,8 @@
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
+import atexit
+import collections
 import copy
 import errno
 import fcntl
@@ -12,7 +14,9 @@ import os
 import re
 import six
 import six.moves.cPickle as pickle
+import struct
 import tempfile
+import threading
 import time
 import traceback
 import weakref
@@ -157,21 +161,19 @@ def with_backing_lock(method):
 
 # decorator for use with job_state methods
 def with_backing_file(method):
-    """A decorator to perform a lock-read-*-write-unlock cycle.
+    """A decorator to perform a lock-refresh-*-unlock cycle.
 
     When applied to a method, this decorator will automatically wrap
-    calls to the method in a lock-and-read before the call followed by a
-    write-and-unlock. Any operation that is reading or writing state
-    should be decorated with this method to ensure that backing file
-    state is consistently maintained.
+    calls to the method in a lock-and-refresh before the call followed by
+    an unlock. Any operation that is reading or writing state should be
+    decorated with this method to ensure that backing file state is
+    consistently maintained; operations changing the state must also
+    record their change with _append_to_journal.
     """
     @with_backing_lock
     def wrapped_method(self, *args, **dargs):
         self._read_from_backing_file()
-        try:
-            return method(self, *args, **dargs)
-        finally:
-            self._write_to_backing_file()
+        return method(self, *args, **dargs)
     wrapped_method.__name__ = method.__name__
     wrapped_method.__doc__ = method.__doc__
     return wrapped_method
@@ -187,10 +189,22 @@ class job_state(object):
     as names. Additionally, the namespace 'stateful_property' is used for
     storing the valued associated with properties constructed using the
     property_factory method.
+
+    The backing file holds a pickle of the whole state. Changes made since
+    it was written are appended to a journal next to it, which is folded
+    back into the backing file when it grows too large, so that accessing
+    the state doesn't rewrite the whole file each time. The in-memory state
+    is only refreshed when the backing file or its journal changed.
     """
 
     NO_DEFAULT = object()
     PICKLE_PROTOCOL = 2  # highest protocol available in python 2.4
+    JOURNAL_SUFFIX = '.journal'
+    # Fold the journal into the backing file once it grows larger than
+    # this, or than the backing file.
+    JOURNAL_COMPACT_SIZE = 64 * 1024
+    # Each journal entry is a pickled change prefixed by its length.
+    _JOURNAL_HEADER = struct.Struct('>I')
 
 
     def __init__(self):
@@ -199,12 +213,21 @@ class job_state(object):
         self._backing_file = None
         self._backing_file_initialized = False
         self._backing_file_lock = None
+        # The (inode, mtime, size) of the backing file and the length of its
+        # journal that the in-memory state is up to date with.
+        self._backing_file_stamp = None
+        self._journal_offset = 0
 
 
     def _lock_backing_file(self):
-        """Acquire a lock on the backing file."""
+        """Acquire a lock on the backing file.
+
+        The lock is taken on the journal, which unlike the backing file is
+        never replaced, and the locked file is then used to append to it.
+        """
         if self._backing_file:
-            self._backing_file_lock = open(self._backing_file, 'a')
+            self._backing_file_lock = open(
+                    self._backing_file + self.JOURNAL_SUFFIX, 'ab')
             fcntl.flock(self._backing_file_lock, fcntl.LOCK_EX)
 
 
@@ -234,19 +257,10 @@ class job_state(object):
         """
 
         # we can assume that the file exists
-        if os.path.getsize(file_path) == 0:
-            on_disk_state = {}
-        else:
-            # This _is_ necessary in the instance that the pickled job is transferred between the
-            # server_job and the job on the DUT. The two can be on different autotest versions
-            # (e.g. for non-SSP / client tests the server-side is versioned with the drone vs
-            # client-side versioned with the Chrome OS being tested).
-            try:
-                with open(file_path, 'r') as rf:
-                    on_disk_state = pickle.load(rf)
-            except UnicodeDecodeError:
-                with open(file_path, 'rb') as rf:
-                    on_disk_state = pickle.load(rf)
+        on_disk_state = self._load_state_file(file_path)
+        changes, _ = self._read_journal(file_path + self.JOURNAL_SUFFIX, 0)
+        for change in changes:
+            self._apply_change(on_disk_state, change)
         if merge:
             # merge the on-disk state with the in-memory state
             for namespace, namespace_dict in six.iteritems(on_disk_state):
@@ -282,33 +296,181 @@ class job_state(object):
         @warning: This method is intentionally concurrency-unsafe. It makes no
             attempt to control concurrent access to the file at file_path.
         """
-        with open(file_path, 'wb') as wf:
+        # write to a temporary file first so that a crash can't leave a
+        # partially written state behind
+        temp_path = '%s.%d.tmp' % (file_path, os.getpid())
+        with open(temp_path, 'wb') as wf:
             pickle.dump(self._state, wf, self.PICKLE_PROTOCOL)
+        os.rename(temp_path, file_path)
+        # all the changes in the journal are part of the state just written
+        journal_path = file_path + self.JOURNAL_SUFFIX
+        if os.path.exists(journal_path):
+            open(journal_path, 'wb').close()
+
+
+    @staticmethod
+    def _load_state_file(file_path):
+        """Load the state pickled in the file at file_path.
+
+        @param file_path: The path of an existing, possibly empty, file.
+
+        @return: The state dictionary.
+        """
+        if os.path.getsize(file_path) == 0:
+            return {}
+        # This _is_ necessary in the instance that the pickled job is transferred between the
+        # server_job and the job on the DUT. The two can be on different autotest versions
+        # (e.g. for non-SSP / client tests the server-side is versioned with the drone vs
+        # client-side versioned with the Chrome OS being tested).
+        try:
+            with open(file_path, 'r') as rf:
+                return pickle.load(rf)
+        except UnicodeDecodeError:
+            with open(file_path, 'rb') as rf:
+                return pickle.load(rf)
+
+
+    @classmethod
+    def _read_journal(cls, journal_path, offset):
+        """Read the changes appended to a journal after offset.
+
+        A change only partially written, e.g. by a process that crashed
+        while appending it, is ignored along with anything after it.
+
+        @param journal_path: The path of the journal.
+        @param offset: The position to read from.
+
+        @return: A tuple of (list of changes, position after the last
+            complete change).
+        """
+        try:
+            with open(journal_path, 'rb') as journal:
+                journal.seek(offset)
+                data = journal.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return [], offset
+        changes = []
+        position = 0
+        header_size = cls._JOURNAL_HEADER.size
+        while position + header_size <= len(data):
+            size, = cls._JOURNAL_HEADER.unpack_from(data, position)
+            start = position + header_size
+            if start + size > len(data):
+                break
+            changes.append(pickle.loads(data[start:start + size]))
+            position = start + size
+        return changes, offset + position
+
+
+    @staticmethod
+    def _apply_change(state, change):
+        """Apply a change read from a journal to a state dictionary.
+
+        @param state: The state dictionary to update.
+        @param change: A tuple of the operation, the namespace and, unless
+            the whole namespace is discarded, the name and the new value.
+        """
+        operation, namespace = change[:2]
+        if operation == 'set':
+            state.setdefault(namespace, {})[change[2]] = change[3]
+        elif operation == 'discard':
+            namespace_dict = state.get(namespace, {})
+            namespace_dict.pop(change[2], None)
+            if not namespace_dict:
+                state.pop(namespace, None)
+        elif operation == 'discard_namespace':
+            state.pop(namespace, None)
+
+
+    def _stat_backing_file(self):
+        """Get the identity of the current version of the backing file.
+
+        @return: A tuple of the inode, mtime and size of the backing file,
+            or None if it doesn't exist.
+        """
+        try:
+            stat = os.stat(self._backing_file)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
 
     def _read_from_backing_file(self):
         """Refresh the current state from the backing file.
 
         If the backing file has never been read before (indicated by checking
         self._backing_file_initialized) it will merge the file with the
-        in-memory state, rather than overwriting it.
+        in-memory state, rather than overwriting it. Otherwise the state is
+        only reloaded if another process rewrote the backing file, and only
+        the changes appended to the journal since the last refresh are read.
         """
-        if self._backing_file:
-            merge_backing_file = not self._backing_file_initialized
-            self.read_from_file(self._backing_file, merge=merge_backing_file)
+        if not self._backing_file:
+            return
+        if not self._backing_file_initialized:
+            if not os.path.exists(self._backing_file):
+                open(self._backing_file, 'a').close()
+            self.read_from_file(self._backing_file, merge=True)
             self._backing_file_initialized = True
+            return
+
+        stamp = self._stat_backing_file()
+        journal_size = os.fstat(self._backing_file_lock.fileno()).st_size
+        if (stamp != self._backing_file_stamp
+                or journal_size < self._journal_offset):
+            if stamp:
+                self._state = self._load_state_file(self._backing_file)
+            else:
+                self._state = {}
+            self._backing_file_stamp = stamp
+            self._journal_offset = 0
+        if journal_size > self._journal_offset:
+            changes, self._journal_offset = self._read_journal(
+                    self._backing_file + self.JOURNAL_SUFFIX,
+                    self._journal_offset)
+            for change in changes:
+                self._apply_change(self._state, change)
 
 
     def _write_to_backing_file(self):
         """Flush the current state to the backing file."""
         if self._backing_file:
             self.write_to_file(self._backing_file)
+            self._backing_file_stamp = self._stat_backing_file()
+            self._journal_offset = 0
+
+
+    def _append_to_journal(self, change):
+        """Record a change of the state in the journal of the backing file.
+
+        Must be called with the backing file locked, after applying the
+        change to the in-memory state.
+
+        @param change: A change, as taken by _apply_change.
+        """
+        if not self._backing_file:
+            return
+        data = pickle.dumps(change, self.PICKLE_PROTOCOL)
+        self._backing_file_lock.write(
+                self._JOURNAL_HEADER.pack(len(data)) + data)
+        self._backing_file_lock.flush()
+        self._journal_offset += self._JOURNAL_HEADER.size + len(data)
+        backing_file_size = (self._backing_file_stamp[2]
+                             if self._backing_file_stamp else 0)
+        if self._journal_offset > max(self.JOURNAL_COMPACT_SIZE,
+                                      backing_file_size):
+            self._write_to_backing_file()
 
 
     @with_backing_file
     def _synchronize_backing_file(self):
         """Synchronizes the contents of the in-memory and on-disk state."""
-        # state is implicitly synchronized in _with_backing_file methods
-        pass
+        # fold the journal into the backing file
+        if self._journal_offset:
+            self._write_to_backing_file()
 
 
     def set_backing_file(self, file_path):
@@ -362,6 +524,7 @@ class job_state(object):
         """
         namespace_dict = self._state.setdefault(namespace, {})
         namespace_dict[name] = copy.deepcopy(value)
+        self._append_to_journal(('set', namespace, name, value))
         logging.debug('Persistent state %s.%s now set to %r', namespace,
                       name, value)
 
@@ -390,6 +553,7 @@ class job_state(object):
             del self._state[namespace][name]
             if len(self._state[namespace]) == 0:
                 del self._state[namespace]
+            self._append_to_journal(('discard', namespace, name))
             logging.debug('Persistent state %s.%s deleted', namespace, name)
         else:
             logging.debug(
@@ -405,6 +569,7 @@ class job_state(object):
         """
         if namespace in self._state:
             del self._state[namespace]
+            self._append_to_journal(('discard_namespace', namespace))
         logging.debug('Persistent state %s.* deleted', namespace)
 
 
@@ -605,13 +770,41 @@ class status_indenter(object):
         """Decrease indentation by one level."""
 
 
+# The live status_logger instances, to flush on exit and before forking.
+_status_loggers = weakref.WeakSet()
+
+
+def flush_status_logs():
+    """Write out the lines buffered by all the status loggers.
+
+    Must be called before forking a process that may record status entries,
+    and before a process exits without running atexit handlers.
+    """
+    for logger in list(_status_loggers):
+        logger.flush()
+
+
+atexit.register(flush_status_logs)
+
+
 class status_logger(object):
     """Represents a status log file. Responsible for translating messages
     into on-disk status log lines.
 
+    Lines are buffered and written out together, with the log files kept
+    open between writes. The buffer is flushed by START and END entries,
+    by a timer FLUSH_INTERVAL_SECS after the oldest buffered line, and on
+    exit. Each flush writes whole lines with a single append, so readers of
+    the logs never see a partial line.
+
     @property global_filename: The filename to write top-level logs to.
     @property subdir_filename: The filename to write subdir-level logs to.
     """
+
+    FLUSH_INTERVAL_SECS = 1
+    # The least recently written log files are closed beyond this many.
+    MAX_OPEN_FILES = 16
+
     def __init__(self, job, indenter, global_filename='status',
                  subdir_filename='status', record_hook=None):
         """Construct a logger instance.
@@ -634,6 +827,17 @@ class status_logger(object):
         self.global_filename = global_filename
         self.subdir_filename = subdir_filename
         self._record_hook = record_hook
+        self._pid = os.getpid()
+        # lines to append, by log file path
+        self._buffers = collections.OrderedDict()
+        # the timer flushing the buffer, armed by its first line
+        self._timer = None
+        # guards the buffer and files against the timer thread
+        self._lock = threading.RLock()
+        # (file descriptor, inode) of the open log files, by path, least
+        # recently written first
+        self._files = collections.OrderedDict()
+        _status_loggers.add(self)
 
 
     def render_entry(self, log_entry):
@@ -677,14 +881,20 @@ class status_logger(object):
             log_files.append(os.path.join(job.resultdir, log_entry.subdir,
                                           self.subdir_filename))
 
-        # write out to entry to the log files
-        log_text = self.render_entry(log_entry)
-        for log_file in log_files:
-            fileobj = open(log_file, 'a')
-            try:
-                print(log_text, file=fileobj)
-            finally:
-                fileobj.close()
+        # buffer the entry for the log files, opening new ones right away
+        # so that unwritable logs still fail here
+        self._check_pid()
+        log_text = self.render_entry(log_entry) + '\n'
+        with self._lock:
+            for log_file in log_files:
+                if log_file not in self._files:
+                    self._get_file(log_file)
+                self._buffers.setdefault(log_file, []).append(log_text)
+            if self._timer is None:
+                self._timer = threading.Timer(self.FLUSH_INTERVAL_SECS,
+                                              self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
 
         # adjust the indentation if this was a START or END entry
         if log_entry.is_start():
@@ -692,6 +902,79 @@ class status_logger(object):
         elif log_entry.is_end():
             self._indenter.decrement()
 
+        if log_entry.is_start() or log_entry.is_end():
+            self.flush()
+
+
+    def flush(self):
+        """Write out the buffered lines to the log files."""
+        self._check_pid()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            buffers, self._buffers = self._buffers, collections.OrderedDict()
+            for log_file, lines in six.iteritems(buffers):
+                data = ''.join(lines)
+                if isinstance(data, six.text_type):
+                    data = data.encode('utf-8')
+                fd = self._get_file(log_file)
+                while data:
+                    data = data[os.write(fd, data):]
+
+
+    def _flush_on_timer(self):
+        """Flush the buffer from the timer thread, logging any failure."""
+        try:
+            self.flush()
+        except Exception:
+            logging.exception('Failed to flush the status logs.')
+
+
+    def _check_pid(self):
+        """Drop the buffer and files inherited from a parent process.
+
+        The lines buffered before forking are the parent's to write out.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._buffers = collections.OrderedDict()
+        # the timer thread is not forked, and may have held the lock
+        self._timer = None
+        self._lock = threading.RLock()
+        for fd, _ in six.itervalues(self._files):
+            os.close(fd)
+        self._files = collections.OrderedDict()
+
+
+    def _get_file(self, log_file):
+        """Get a descriptor appending to a log file, opening it if needed.
+
+        A log file replaced or removed since it was opened is opened again.
+
+        @param log_file: The path of the log file.
+
+        @return: A file descriptor open for appending to the log file.
+        """
+        fd_and_inode = self._files.pop(log_file, None)
+        if fd_and_inode:
+            try:
+                inode = os.stat(log_file).st_ino
+            except OSError:
+                inode = None
+            if inode != fd_and_inode[1]:
+                os.close(fd_and_inode[0])
+                fd_and_inode = None
+        if not fd_and_inode:
+            fd = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         0o666)
+            fd_and_inode = fd, os.fstat(fd).st_ino
+            while len(self._files) >= self.MAX_OPEN_FILES:
+                os.close(self._files.popitem(last=False)[1][0])
+        self._files[log_file] = fd_and_inode
+        return fd_and_inode[0]
+
 
 class base_job(object):
     """An abstract base class for the various autotest job classes.
@@ -12,6 +12,7 @@ import shutil
 from six.moves import range
 import stat
 import tempfile
+import time
 import unittest
 
 import common
@@ -59,6 +60,9 @@ class stub_job_state(base_job.job_state):
     def _write_to_backing_file(self):
         pass
 
+    def _append_to_journal(self, change):
+        pass
+
     def _lock_backing_file(self):
         pass
 
@@ -497,8 +501,10 @@ class test_job_state_with_backing_file(test_job_state):
 
 
     def tearDown(self):
-        if os.path.exists(self.backing_file):
-            os.remove(self.backing_file)
+        for path in (self.backing_file,
+                     self.backing_file + base_job.job_state.JOURNAL_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
 
 
     def test_set_is_persistent(self):
@@ -737,6 +743,78 @@ class test_job_state_set_backing_file(unittest.TestCase):
         self.assertRaises(KeyError, state2.get, 'n7', 'shared5')
 
 
+class test_job_state_journal(unittest.TestCase):
+    def setUp(self):
+        self.testdir = tempfile.mkdtemp(suffix='unittest')
+        self.original_wd = os.getcwd()
+        os.chdir(self.testdir)
+        self.journal = 'backing_file' + base_job.job_state.JOURNAL_SUFFIX
+
+
+    def tearDown(self):
+        os.chdir(self.original_wd)
+        shutil.rmtree(self.testdir, ignore_errors=True)
+
+
+    def test_changes_are_journaled(self):
+        state = base_job.job_state()
+        state.set_backing_file('backing_file')
+        inode = os.stat('backing_file').st_ino
+        state.set('ns', 'var1', 'value1')
+        state.set('ns', 'var2', 'value2')
+        state.discard('ns', 'var1')
+        self.assertEqual(inode, os.stat('backing_file').st_ino)
+        self.assertTrue(os.path.getsize(self.journal) > 0)
+        written_state = base_job.job_state()
+        written_state.read_from_file('backing_file')
+        self.assertFalse(written_state.has('ns', 'var1'))
+        self.assertEqual('value2', written_state.get('ns', 'var2'))
+
+
+    def test_journal_is_compacted(self):
+        state = base_job.job_state()
+        state.set_backing_file('backing_file')
+        for i in range(200):
+            state.set('ns', 'var', 'x' * 1024 + str(i))
+        self.assertTrue(os.path.getsize(self.journal) <
+                        base_job.job_state.JOURNAL_COMPACT_SIZE)
+        state.set_backing_file(None)
+        self.assertEqual(0, os.path.getsize(self.journal))
+        written_state = base_job.job_state()
+        written_state.read_from_file('backing_file')
+        self.assertEqual('x' * 1024 + '199', written_state.get('ns', 'var'))
+
+
+    def test_partial_change_is_ignored(self):
+        state = base_job.job_state()
+        state.set_backing_file('backing_file')
+        state.set('ns', 'var1', 'value1')
+        state.set('ns', 'var2', 'value2')
+        with open(self.journal, 'r+b') as journal:
+            journal.truncate(os.path.getsize(self.journal) - 1)
+        written_state = base_job.job_state()
+        written_state.set_backing_file('backing_file')
+        self.assertEqual('value1', written_state.get('ns', 'var1'))
+        self.assertFalse(written_state.has('ns', 'var2'))
+        written_state.set('ns', 'var3', 'value3')
+        state.set_backing_file(None)
+        state.set_backing_file('backing_file')
+        self.assertEqual('value3', state.get('ns', 'var3'))
+
+
+    def test_rewritten_backing_file_is_reloaded(self):
+        state1 = base_job.job_state()
+        state1.set_backing_file('backing_file')
+        state2 = base_job.job_state()
+        state2.set_backing_file('backing_file')
+        state1.set('ns', 'var1', 'value1')
+        self.assertEqual('value1', state2.get('ns', 'var1'))
+        state1.set_backing_file(None)
+        state1.set('ns', 'var2', 'value2')
+        state1.set_backing_file('backing_file')
+        self.assertEqual('value2', state2.get('ns', 'var2'))
+
+
 class test_job_state_backing_file_locking(unittest.TestCase):
     def setUp(self):
         self.testdir = tempfile.mkdtemp(suffix='unittest')
@@ -1155,6 +1233,7 @@ class test_status_logger(unittest.TestCase):
         entries = [self.make_dummy_entry('LINE%d' % x) for x in range(3)]
         for entry in entries:
             self.logger.record_entry(entry)
+        self.logger.flush()
         self.assertEqual('LINE0\nLINE1\nLINE2\n', open('status').read())
 
 
@@ -1167,6 +1246,7 @@ class test_status_logger(unittest.TestCase):
         self.logger.record_entry(self.make_dummy_entry('LINE2', subdir='sub'))
         self.logger.record_entry(self.make_dummy_entry('LINE3'))
 
+        self.logger.flush()
         self.assertEqual('LINE1\nLINE2\nLINE3\n', open('global.log').read())
         self.assertEqual('LINE1\nLINE2\n', open('sub/subdir.log').read())
 
@@ -1188,6 +1268,7 @@ class test_status_logger(unittest.TestCase):
         self.logger.record_entry(self.make_dummy_entry('LINE3', subdir='sub2'))
         self.logger.record_entry(self.make_dummy_entry('LINE4'))
 
+        self.logger.flush()
         self.assertEqual('LINE1\nLINE2\n', open('global.log').read())
         self.assertEqual('LINE1\n', open('sub2/subdir.log').read())
         self.assertEqual('LINE3\nLINE4\n', open('global.log2').read())
@@ -1202,6 +1283,7 @@ class test_status_logger(unittest.TestCase):
         self.logger.record_entry(self.make_dummy_entry('LINE3', subdir='abc'))
         self.logger.record_entry(self.make_dummy_entry('LINE4', subdir='123'))
 
+        self.logger.flush()
         self.assertEqual('LINE1\nLINE2\nLINE3\nLINE4\n', open('status').read())
         self.assertEqual('LINE2\nLINE3\n', open('abc/status').read())
         self.assertEqual('LINE4\n', open('123/status').read())
@@ -1215,6 +1297,7 @@ class test_status_logger(unittest.TestCase):
             'LINE3', subdir='sub_nowrite'), log_in_subdir=False)
         self.logger.record_entry(self.make_dummy_entry('LINE4', subdir='sub'))
 
+        self.logger.flush()
         self.assertEqual('LINE1\nLINE2\nLINE3\nLINE4\n', open('status').read())
         self.assertEqual('LINE2\nLINE4\n', open('sub/status').read())
         self.assert_(not os.path.exists('sub_nowrite/status'))
@@ -1232,6 +1315,7 @@ class test_status_logger(unittest.TestCase):
 
         expected_log = ('LINE1\n\tLINE2\n\tLINE3\n\t\tLINE4\n\t\tLINE5\n'
                         '\tLINE6\nLINE7\nLINE8\n')
+        self.logger.flush()
         self.assertEqual(expected_log, open('status').read())
 
 
@@ -1244,6 +1328,7 @@ class test_status_logger(unittest.TestCase):
 
         expected_log = ('LINE1\n  blah\nLINE2\n'
                         '\tLINE3\n  blah\n  two\nLINE4\n')
+        self.logger.flush()
         self.assertEqual(expected_log, open('status').read())
 
 
@@ -1259,7 +1344,58 @@ class test_status_logger(unittest.TestCase):
         self.assertEqual(entries, recorded_entries)
 
 
+    def test_buffers_until_boundary(self):
+        self.logger.record_entry(self.make_dummy_entry('LINE1'))
+        self.assertEqual('', open('status').read())
+        self.logger.record_entry(self.make_dummy_entry('LINE2', start=True))
+        self.assertEqual('LINE1\nLINE2\n', open('status').read())
+        self.logger.record_entry(self.make_dummy_entry('LINE3'))
+        self.logger.record_entry(self.make_dummy_entry('LINE4', end=True))
+        self.assertEqual('LINE1\nLINE2\n\tLINE3\nLINE4\n',
+                         open('status').read())
+
+
+    def test_flushes_after_interval(self):
+        self.logger.FLUSH_INTERVAL_SECS = 0.01
+        self.logger.record_entry(self.make_dummy_entry('LINE1'))
+        deadline = time.time() + 5
+        while not open('status').read() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual('LINE1\n', open('status').read())
+
+
+    def test_flush_status_logs(self):
+        self.logger.record_entry(self.make_dummy_entry('LINE1'))
+        base_job.flush_status_logs()
+        self.assertEqual('LINE1\n', open('status').read())
+
+
+    def test_reopens_replaced_log(self):
+        self.logger.record_entry(self.make_dummy_entry('LINE1'))
+        self.logger.flush()
+        os.rename('status', 'status.old')
+        self.logger.record_entry(self.make_dummy_entry('LINE2'))
+        self.logger.flush()
+        self.assertEqual('LINE1\n', open('status.old').read())
+        self.assertEqual('LINE2\n', open('status').read())
+
+
+    def test_forked_child_drops_parent_buffer(self):
+        self.logger.record_entry(self.make_dummy_entry('LINE1'))
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.record_entry(self.make_dummy_entry('LINE2'))
+                self.logger.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.logger.flush()
+        self.assertEqual('LINE2\nLINE1\n', open('status').read())
+
+
     def tearDown(self):
+        self.logger.flush()
         os.chdir(self.original_wd)
         shutil.rmtree(self.testdir, ignore_errors=True)
 
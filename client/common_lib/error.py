@@ -469,6 +469,10 @@ class UnmodifiableAttributeException(RPCException):
     """Raised when an RPC tries to modify static attributes."""
 
 
+class HostInfoVersionMismatchException(RPCException):
+    """Raised when the host information changed since a client read it."""
+
+
 class InvalidBgJobCall(Exception):
     """Raised when an invalid call is made to a BgJob object."""
 
@@ -25,9 +25,15 @@ more failures identified by a `Verifier` object.
 import collections
 import logging
 import re
+import sys
+import time
+
+from multiprocessing import pool
 
 import common
 from autotest_lib.client.common_lib import error
+from autotest_lib.client.common_lib import global_config
+import six
 
 try:
     from chromite.lib import metrics
@@ -46,6 +52,11 @@ VERIFY_SUCCESS = True
 VERIFY_FAILED = False
 VERIFY_NOT_RUN = None
 
+# Number of threads running verifiers with `THREAD_SAFE` set ahead of the
+# walk of the verifier DAG.  See `_VerifyScheduler`.
+VERIFY_MAX_WORKERS = global_config.global_config.get_config_value(
+        'AUTOSERV', 'verify_max_workers', type=int, default=4)
+
 
 class AutoservVerifyError(error.AutoservError):
     """
@@ -358,7 +369,17 @@ class Verifier(_DependencyNode):
         debug log messages.
 
     Subclasses must override all of the above attributes; subclasses
-    should not override or extend any other attributes of this class.
+    should not override or extend any other attributes of this class,
+    except for `THREAD_SAFE`.
+
+    Subclasses can set `THREAD_SAFE` when `verify()` and
+    `_is_applicable()` can run in a background thread, at the same time
+    as other verifiers:  They must not use signals (e.g. timeouts from
+    `timeout_util`, see `server.hosts.repair_utils.verify_timeout()`
+    instead), change the state of the host object, or depend on state
+    set up by verifiers they don't depend on.  `RepairStrategy`
+    may then start them ahead of the walk of the DAG, as soon as their
+    dependencies pass.
 
     The description string should be a simple sentence explaining what
     must be true for the verifier to pass.  Do not include a terminating
@@ -377,6 +398,11 @@ class Verifier(_DependencyNode):
     @property _result           Cached result of verification.
     """
 
+    THREAD_SAFE = False
+
+    # The `_VerifyScheduler` of the walk of the DAG in progress, if any.
+    _scheduler = None
+
     def __init__(self, tag, dependencies):
         super(Verifier, self).__init__(tag, 'verify', dependencies)
         self._result = None
@@ -427,7 +453,10 @@ class Verifier(_DependencyNode):
         logging.info('Verifying this condition: %s', self.description)
         try:
             logging.debug('Start verify task: %s.', type(self).__name__)
-            self.verify(host)
+            if self._scheduler:
+                self._scheduler.run_verify(self)
+            else:
+                self.verify(host)
             self._record_good(host, silent)
         except Exception as e:
             message = 'Failed: %s'
@@ -445,6 +474,8 @@ class Verifier(_DependencyNode):
             logging.debug('Finished verify task: %s.', type(self).__name__)
 
         self._result = True
+        if self._scheduler:
+            self._scheduler.verified(self)
 
     def verify(self, host):
         """
@@ -758,6 +789,192 @@ class _RootVerifier(Verifier):
         return 'All host verification checks pass'
 
 
+class _VerifyScheduler(object):
+    """
+    Utility class used by `RepairStrategy` to walk a verifier DAG.
+
+    The DAG is still walked depth first in the calling thread, exactly
+    as by calling `_verify_host()` on its root:  applicability checks,
+    status records and the failures reported happen in the same order.
+    While the walk goes on, verifiers with `THREAD_SAFE` set are started
+    on a pool of threads as soon as all their dependencies pass, so that
+    when the walk reaches them it only waits for their result.  The
+    result of a verifier started this way that the walk doesn't reach,
+    e.g. because a verifier depending on it isn't applicable, is
+    discarded.
+
+    The time taken by each verifier is logged when the walk ends, along
+    with the critical path of the DAG:  the chain of dependencies that
+    takes the longest, which bounds how fast the walk can get.
+
+    Use instances as context managers around the walk of the DAG.
+    """
+
+    def __init__(self, root, host, max_workers):
+        """
+        @param root         The root `Verifier` of the DAG.
+        @param host         The host being verified.
+        @param max_workers  The number of threads to run verifiers in.
+        """
+        self._root = root
+        self._host = host
+        self._max_workers = max_workers
+        self._nodes = []
+        self._dependents = collections.defaultdict(list)
+        self._add_nodes(root, set())
+        self._pool = None
+        # Verifiers started in the background, with their AsyncResult.
+        self._started = {}
+        # Start and end times of the verifiers run.
+        self._times = {}
+        self._start_time = None
+
+    def _add_nodes(self, node, seen):
+        """Collect the nodes of the DAG and their dependents."""
+        if node in seen:
+            return
+        seen.add(node)
+        self._nodes.append(node)
+        for dep in node._dependency_list:
+            self._dependents[dep].append(node)
+            self._add_nodes(dep, seen)
+
+    def __enter__(self):
+        self._start_time = time.time()
+        for node in self._nodes:
+            node._scheduler = self
+        if (self._max_workers > 1 and
+                any(node.THREAD_SAFE for node in self._nodes)):
+            self._pool = pool.ThreadPool(self._max_workers)
+            for node in self._nodes:
+                self._start_if_ready(node)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for node in self._nodes:
+            node._scheduler = None
+        if self._pool:
+            # Verifiers the walk didn't reach may still be running.
+            self._pool.close()
+            self._pool.join()
+        self._log_timing_report()
+
+    def _start_if_ready(self, node):
+        """
+        Start a verifier in the background if all its dependencies pass.
+
+        @param node   The `Verifier` to start.
+        """
+        if (self._pool and node.THREAD_SAFE and node not in self._started
+                and node._result is None
+                and all(dep._result is True
+                        for dep in node._dependency_list)):
+            self._started[node] = self._pool.apply_async(
+                    self._run_in_background, (node,))
+
+    def _run_in_background(self, node):
+        """
+        Run a verifier in a pool thread.
+
+        @param node   The `Verifier` to run.
+        @return A tuple of (start time, end time, exc_info of the
+                failure or None), or None if the verifier isn't
+                applicable.
+        """
+        try:
+            if not node._is_applicable(self._host):
+                return None
+        except Exception:
+            return None
+        logging.debug('Start verify task in the background: %s.',
+                      type(node).__name__)
+        start = time.time()
+        try:
+            node.verify(self._host)
+            exc_info = None
+        except Exception:
+            exc_info = sys.exc_info()
+        return start, time.time(), exc_info
+
+    def run_verify(self, node):
+        """
+        Get the result of `verify()` for a verifier reached by the walk.
+
+        Waits for the verifier if it was started in the background, runs
+        it otherwise.
+
+        @param node   The `Verifier` reached.
+        @raises The exception raised by `verify()`.
+        """
+        started = self._started.pop(node, None)
+        outcome = None
+        if started:
+            # Wait with a timeout so that signals are still handled.
+            while not started.ready():
+                started.wait(1)
+            outcome = started.get()
+        if outcome is None:
+            start = time.time()
+            try:
+                node.verify(self._host)
+            finally:
+                self._times[node] = (start, time.time())
+            return
+        start, end, exc_info = outcome
+        self._times[node] = (start, end)
+        if exc_info:
+            six.reraise(*exc_info)
+
+    def verified(self, node):
+        """
+        Start the verifiers that were waiting for a verifier to pass.
+
+        @param node   The `Verifier` that passed.
+        """
+        for dependent in self._dependents[node]:
+            self._start_if_ready(dependent)
+
+    def _get_critical_path(self, node, paths):
+        """
+        Find the longest chain of verifiers run ending with a node.
+
+        @param node   The last `Verifier` of the chain.
+        @param paths  Dictionary of the chains found so far, by node.
+        @return A tuple of (seconds, list of (node, seconds)).
+        """
+        if node not in paths:
+            seconds, path = 0, []
+            for dep in node._dependency_list:
+                dep_seconds, dep_path = self._get_critical_path(dep, paths)
+                if dep_seconds > seconds or not path:
+                    seconds, path = dep_seconds, dep_path
+            if node in self._times:
+                start, end = self._times[node]
+                seconds += end - start
+                path = path + [(node, end - start)]
+            paths[node] = (seconds, path)
+        return paths[node]
+
+    def _log_timing_report(self):
+        """Log the time taken by each verifier and the critical path."""
+        if not self._times:
+            return
+        logging.debug('Verifier timings (start offset, seconds):')
+        for node, (start, end) in sorted(self._times.items(),
+                                         key=lambda item: item[1]):
+            logging.debug('    %-30s %7.2f %7.2f', node.tag,
+                          start - self._start_time, end - start)
+        seconds, path = self._get_critical_path(self._root, {})
+        logging.info(
+                'Verified in %.2f seconds, %.2f seconds of verifiers; '
+                'critical path of %.2f seconds: %s',
+                time.time() - self._start_time,
+                sum(end - start for start, end in self._times.values()),
+                seconds,
+                ' -> '.join('%s (%.2f)' % (node.tag, node_seconds)
+                            for node, node_seconds in path))
+
+
 class RepairStrategy(object):
     """
     A class for organizing `Verifier` and `RepairAction` objects.
@@ -767,7 +984,8 @@ class RepairStrategy(object):
     methods for invoking those objects in the required order, when
     needed:
       * The `verify()` method walks the verifier DAG in dependency
-        order.
+        order.  Verifiers with `THREAD_SAFE` set may be started ahead
+        of the walk, see `_VerifyScheduler`.
       * The `repair()` method invokes the repair actions in list order.
         Each repair action will invoke its dependencies and triggers as
         needed.
@@ -959,7 +1177,17 @@ class RepairStrategy(object):
         @param silent   If true, don't log host status records.
         """
         self._verify_root._reverify()
-        self._verify_root._verify_host(host, silent)
+        self._verify_dag(host, silent)
+
+    def _verify_dag(self, host, silent):
+        """
+        Walk the verifier DAG on the given host.
+
+        @param host     The target to be verified.
+        @param silent   If true, don't log host status records.
+        """
+        with _VerifyScheduler(self._verify_root, host, VERIFY_MAX_WORKERS):
+            self._verify_root._verify_host(host, silent)
 
     def repair(self, host, silent=False):
         """
@@ -986,7 +1214,7 @@ class RepairStrategy(object):
 
         result = 'failure'
         try:
-            self._verify_root._verify_host(host, silent)
+            self._verify_dag(host, silent)
             result = 'success' if attempted else 'not_attempted'
         except:
             if not attempted:
@@ -13,6 +13,7 @@ from __future__ import print_function
 
 import functools
 import logging
+import threading
 import unittest
 
 import common
@@ -173,6 +174,40 @@ class _StubVerifier(hosts.Verifier):
         return self._description
 
 
+class _ThreadSafeStubVerifier(_StubVerifier):
+    """`_StubVerifier` that can be started ahead of the walk of the DAG."""
+
+    THREAD_SAFE = True
+
+
+class _WaitingVerifier(hosts.Verifier):
+    """
+    Verifier passing only if another verifier runs at the same time.
+
+    @property started   Event set when this verifier starts.
+    @property other     The `_WaitingVerifier` to wait for.
+    """
+
+    THREAD_SAFE = True
+
+    def __init__(self, tag, deps):
+        super(_WaitingVerifier, self).__init__(tag, deps)
+        self.started = threading.Event()
+        self.other = None
+
+
+    def verify(self, host):
+        self.started.set()
+        self.other.started.wait(10)
+        if not self.other.started.is_set():
+            raise hosts.AutoservVerifyError('Ran alone')
+
+
+    @property
+    def description(self):
+        return 'Run at the same time as "%s"' % self.other.tag
+
+
 class _StubRepairFailure(Exception):
     """Exception to be raised by `_StubRepairAction.repair()`."""
     pass
@@ -1346,6 +1381,71 @@ class RepairStrategyRepairTests(_RepairStrategyTestCase):
             # repair counts are now 2 for both verifiers
 
 
+class VerifySchedulerTests(_RepairStrategyTestCase):
+    """Unit tests for running thread safe verifiers ahead of the walk."""
+
+    def _make_thread_safe_verifier(self, count, tag, deps):
+        verifier = _ThreadSafeStubVerifier(tag, deps, count)
+        self.nodes[tag] = verifier
+        return verifier
+
+
+    def test_concurrent(self):
+        """Independent thread safe verifiers run at the same time."""
+        strategy = hosts.RepairStrategy(
+                [(_WaitingVerifier, 'a', ()), (_WaitingVerifier, 'b', ())],
+                (), 'unittest')
+        a, b = strategy._verify_root._dependency_list
+        a.other, b.other = b, a
+        strategy.verify(self._fake_host)
+        self.assertEqual(self._fake_host.get_log_records(),
+                         [('GOOD', None, 'verify.a', ''),
+                          ('GOOD', None, 'verify.b', ''),
+                          ('GOOD', None, 'verify.PASS', '')])
+
+
+    def test_records_in_walk_order(self):
+        """Status records and failures are those of the serial walk."""
+        verify_data = [
+                (functools.partial(self._make_verifier, 0), 'base', ()),
+                (functools.partial(self._make_thread_safe_verifier, 1),
+                 'left', ('base',)),
+                (functools.partial(self._make_verifier, 0),
+                 'middle', ()),
+                (functools.partial(self._make_thread_safe_verifier, 0),
+                 'right', ('base',)),
+                (functools.partial(self._make_thread_safe_verifier, 0),
+                 'top', ('left',)),
+        ]
+        strategy = hosts.RepairStrategy(verify_data, (), 'unittest')
+        for silent in self._generate_silent():
+            with self.assertRaises(hosts.AutoservVerifyDependencyError) as e:
+                strategy.verify(self._fake_host, silent)
+            self.assertEqual(e.exception.failures,
+                             self._make_expected_failures(self.nodes['left']))
+            self._check_log_records(silent,
+                                    ('middle', 'GOOD'),
+                                    ('base', 'GOOD'),
+                                    ('right', 'GOOD'),
+                                    ('left', 'FAIL'))
+        self.assertEqual(self.nodes['top'].verify_count, 0)
+        self.assertEqual(self.nodes['right'].verify_count, 2)
+
+
+    def test_unreached_verifier(self):
+        """Verifiers the walk doesn't reach aren't recorded."""
+        verify_data = [
+                (functools.partial(self._make_thread_safe_verifier, 0),
+                 'hidden', ()),
+                (_SkipVerifier, 'skip', ('hidden',)),
+        ]
+        strategy = hosts.RepairStrategy(verify_data, (), 'unittest')
+        strategy.verify(self._fake_host)
+        self.assertEqual(self._fake_host.get_log_records(),
+                         [('GOOD', None, 'verify.PASS', '')])
+        self.assertIsNone(strategy.verifier_is_good('hidden'))
+
+
 class VerifierResultTestCases(_DependencyNodeTestCase):
     """
     Test to check that we can find correct verifier and
@@ -1128,14 +1128,13 @@ def system_output_parallel(commands, timeout=None, ignore_status=False,
 
 
 def strip_unicode(input_obj):
-    if type(input_obj) == list:
+    input_type = type(input_obj)
+    if input_type is list:
         return [strip_unicode(i) for i in input_obj]
-    elif type(input_obj) == dict:
-        output = {}
-        for key in input_obj.keys():
-            output[str(key)] = strip_unicode(input_obj[key])
-        return output
-    elif type(input_obj) == six.text_type:
+    elif input_type is dict:
+        return dict((str(key), strip_unicode(value))
+                    for key, value in six.iteritems(input_obj))
+    elif input_type is six.text_type:
         return str(input_obj)
     else:
         return input_obj
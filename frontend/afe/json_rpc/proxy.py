@@ -19,13 +19,26 @@
   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
+import errno
+import httplib
 import os
 import socket
+import StringIO
 import subprocess
+import threading
+import time
 import urllib
 import urllib2
+import urlparse
+import zlib
 from autotest_lib.client.common_lib import error as exceptions
 from autotest_lib.client.common_lib import global_config
+from autotest_lib.client.common_lib import utils
+
+try:
+    from chromite.lib import metrics
+except ImportError:
+    metrics = utils.metrics_mock
 
 from json import decoder
 
@@ -112,6 +125,14 @@ class ServiceProxy(object):
         # shadow_config.
         self.__use_sso_client = global_config.global_config.get_config_value(
             'CLIENT', 'use_sso_client', type=bool, default=False)
+        # Reuse keep-alive connections to the server across calls, and ask
+        # for gzip encoded responses.
+        self.__use_connection_pool = (
+                global_config.global_config.get_config_value(
+                        'CLIENT', 'rpc_connection_pool', type=bool,
+                        default=True))
+        self.__accept_gzip = global_config.global_config.get_config_value(
+            'CLIENT', 'rpc_accept_gzip', type=bool, default=False)
 
 
     def __getattr__(self, name):
@@ -126,14 +147,8 @@ class ServiceProxy(object):
         postdata = json_encoder_class().encode({'method': self.__serviceName,
                                                 'params': args + (kwargs,),
                                                 'id': 'jsonrpc'})
-        url_with_args = self.__serviceURL + '?' + urllib.urlencode({
-            'method': self.__serviceName})
-        if self.__use_sso_client:
-            respdata = _sso_request(url_with_args, self.__headers, postdata,
-                                    min_rpc_timeout)
-        else:
-            respdata = _raw_http_request(url_with_args, self.__headers,
-                                         postdata, min_rpc_timeout)
+        respdata = self._request(self.__serviceName, postdata,
+                                 min_rpc_timeout)
 
         try:
             resp = decoder.JSONDecoder().decode(respdata)
@@ -145,6 +160,388 @@ class ServiceProxy(object):
             return resp['result']
 
 
+    def batch(self, min_rpc_timeout=None):
+        """Get a context manager sending several calls in a single request.
+
+        Calls made on the returned Batch are queued, and sent in one JSON-RPC
+        batch request when the context exits, e.g.
+
+            with afe_proxy.batch() as batch:
+                hosts = batch.get_hosts(hostname='host1')
+                labels = batch.get_labels(name__startswith='board:')
+            print hosts.result(), labels.result()
+
+        The server has to support batch requests.
+
+        @param min_rpc_timeout: Minimum timeout of the batch request.
+        @returns: A Batch.
+        """
+        return Batch(self, min_rpc_timeout)
+
+
+    def _send_batch(self, requests, min_rpc_timeout):
+        """Send a batch request.
+
+        @param requests: A list of request dicts.
+        @param min_rpc_timeout: Minimum timeout of the request.
+        @returns: The list of response dicts.
+        """
+        postdata = json_encoder_class().encode(requests)
+        respdata = self._request('batch', postdata, min_rpc_timeout)
+        try:
+            resp = decoder.JSONDecoder().decode(respdata)
+        except ValueError:
+            raise JSONRPCException('Error decoding JSON reponse:\n' + respdata)
+        if isinstance(resp, dict) and resp.get('error') is not None:
+            raise BuildException(resp['error'])
+        if not isinstance(resp, list):
+            raise JSONRPCException(
+                    'Unexpected response to a batch request:\n' + respdata)
+        return resp
+
+
+    def _request(self, method, postdata, min_rpc_timeout):
+        """Send an encoded request to the server.
+
+        @param method: Name of the RPC method, or 'batch'.
+        @param postdata: The JSON encoded request.
+        @param min_rpc_timeout: Minimum timeout of the request.
+        @returns: The raw response.
+        """
+        url_with_args = self.__serviceURL + '?' + urllib.urlencode({
+            'method': method})
+        start_time = time.time()
+        if self.__use_sso_client:
+            respdata = _sso_request(url_with_args, self.__headers, postdata,
+                                    min_rpc_timeout)
+        elif self.__use_connection_pool:
+            respdata = _pooled_http_request(url_with_args, self.__headers,
+                                            postdata, min_rpc_timeout,
+                                            self.__accept_gzip)
+        else:
+            respdata = _raw_http_request(url_with_args, self.__headers,
+                                         postdata, min_rpc_timeout)
+        _record_call(method, time.time() - start_time, len(postdata),
+                     len(respdata))
+        return respdata
+
+
+class BatchCall(object):
+    """A call queued in a Batch, whose result is known once it's sent."""
+
+    def __init__(self, method):
+        """
+        @param method: Name of the RPC method.
+        """
+        self.method = method
+        self._response = None
+
+
+    def result(self):
+        """Get the result of the call.
+
+        @returns: The result of the RPC.
+        @raises JSONRPCException: If the batch was not sent yet, or a subclass
+                built from the error of the RPC.
+        """
+        if self._response is None:
+            raise JSONRPCException('%s was not sent yet.' % self.method)
+        if self._response['error'] is not None:
+            raise BuildException(self._response['error'])
+        return self._response['result']
+
+
+class Batch(object):
+    """Queue RPCs to send them in a single JSON-RPC batch request.
+
+    See ServiceProxy.batch.
+    """
+
+    def __init__(self, service_proxy, min_rpc_timeout=None):
+        """
+        @param service_proxy: The ServiceProxy of the server.
+        @param min_rpc_timeout: Minimum timeout of the batch request.
+        """
+        self._service_proxy = service_proxy
+        self._min_rpc_timeout = min_rpc_timeout
+        self._requests = []
+        self._calls = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        def queue_call(*args, **kwargs):
+            """Queue a call of the RPC, see BatchCall."""
+            call = BatchCall(name)
+            self._requests.append({'method': name,
+                                   'params': args + (kwargs,),
+                                   'id': len(self._requests)})
+            self._calls.append(call)
+            return call
+        return queue_call
+
+
+    def send(self):
+        """Send the queued calls, if there are any."""
+        if not self._requests:
+            return
+        requests, calls = self._requests, self._calls
+        self._requests, self._calls = [], []
+        responses = self._service_proxy._send_batch(requests,
+                                                    self._min_rpc_timeout)
+        responses = dict((response.get('id'), response)
+                         for response in responses)
+        for request, call in zip(requests, calls):
+            if request['id'] not in responses:
+                raise JSONRPCException('No response to %s in the batch.' %
+                                       call.method)
+            call._response = responses[request['id']]
+
+
+# Stats of the calls made by this process, per RPC method.
+_call_stats = {}
+_call_stats_lock = threading.Lock()
+
+
+def _record_call(method, seconds, request_bytes, response_bytes):
+    """Record the latency and sizes of an RPC.
+
+    @param method: Name of the RPC method.
+    @param seconds: Time taken by the call.
+    @param request_bytes: Size of the JSON request.
+    @param response_bytes: Size of the JSON response, after decompression.
+    """
+    fields = {'method': method}
+    metrics.SecondsDistribution(
+            'chromeos/autotest/json_rpc/client/durations').add(
+                    seconds, fields=fields)
+    metrics.Counter(
+            'chromeos/autotest/json_rpc/client/request_bytes').increment_by(
+                    request_bytes, fields=fields)
+    metrics.Counter(
+            'chromeos/autotest/json_rpc/client/response_bytes').increment_by(
+                    response_bytes, fields=fields)
+    with _call_stats_lock:
+        stats = _call_stats.setdefault(
+                method, {'calls': 0, 'seconds': 0.0, 'request_bytes': 0,
+                         'response_bytes': 0})
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['request_bytes'] += request_bytes
+        stats['response_bytes'] += response_bytes
+
+
+def get_call_stats():
+    """Get the stats of the RPCs made by this process.
+
+    @returns: A dict mapping RPC method names to dicts of the number of
+              'calls', the total 'seconds' they took, and their total
+              'request_bytes' and 'response_bytes'.
+    """
+    with _call_stats_lock:
+        return dict((method, dict(stats))
+                    for method, stats in _call_stats.iteritems())
+
+
+def _get_timeout(timeout):
+    """Get the socket timeout of a request, like _raw_http_request does.
+
+    @param timeout: Minimum timeout requested by the caller, or None.
+    @returns: The timeout in seconds, or None to never time out.
+    """
+    default_timeout = socket.getdefaulttimeout()
+    if not default_timeout:
+        return None
+    return max(timeout, default_timeout)
+
+
+class _ConnectionPool(object):
+    """A thread safe pool of keep-alive HTTP connections to one server.
+
+    Connections are only shared within a process: a forked child starts with
+    an empty pool rather than sharing the sockets of its parent.
+    """
+
+    # Maximum number of idle connections to keep open.
+    MAX_IDLE_CONNECTIONS = 8
+
+    def __init__(self, scheme, netloc):
+        """
+        @param scheme: 'http' or 'https'.
+        @param netloc: host[:port] of the server.
+        """
+        if scheme == 'https':
+            self._connection_class = httplib.HTTPSConnection
+        else:
+            self._connection_class = httplib.HTTPConnection
+        self._netloc = netloc
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+
+    def _get_connection(self, timeout):
+        """Get an idle connection, or a new one if there's none.
+
+        @param timeout: Socket timeout of the connection.
+        @returns: A tuple of (connection, True if it was idle in the pool).
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                connection = self._idle.pop()
+                connection.sock.settimeout(timeout)
+                return connection, True
+        return self._connection_class(self._netloc, timeout=timeout), False
+
+
+    def _put_connection(self, connection):
+        """Return a connection to the pool, or close it if the pool is full.
+
+        @param connection: An httplib connection with no pending response.
+        """
+        with self._lock:
+            if (self._pid == os.getpid() and
+                    len(self._idle) < self.MAX_IDLE_CONNECTIONS):
+                self._idle.append(connection)
+                return
+        connection.close()
+
+
+    def request(self, path, headers, body, timeout):
+        """Make a POST request, reusing an idle connection if possible.
+
+        @param path: Path and query of the URL.
+        @param headers: A dict of HTTP headers.
+        @param body: Data to POST.
+        @param timeout: Socket timeout in seconds, or None.
+
+        @returns: A tuple of (httplib.HTTPResponse, response body).
+        """
+        while True:
+            connection, reused = self._get_connection(timeout)
+            try:
+                connection.request('POST', path, body, headers)
+            except socket.timeout:
+                connection.close()
+                raise
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                # The server may have closed an idle connection in the
+                # meantime, try again with the next one.
+                if reused:
+                    continue
+                raise
+            try:
+                response = connection.getresponse()
+            except (httplib.HTTPException, socket.error) as e:
+                connection.close()
+                # The request was sent, only send it again if the server
+                # closed the idle connection without reading it.
+                if reused and _is_closed_without_response(e):
+                    continue
+                raise
+            try:
+                data = response.read()
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._put_connection(connection)
+            return response, data
+
+
+def _is_closed_without_response(e):
+    """Check whether a request failed with its connection closed unanswered.
+
+    @param e: The exception raised while waiting for the response.
+    @returns: True if the connection was closed or reset before any byte of
+              the response was received.
+    """
+    if isinstance(e, httplib.BadStatusLine):
+        # Python 2.7.18 reports an empty status line with a message.
+        return (not e.line or e.line == "''" or
+                e.line.startswith('No status line received'))
+    return (isinstance(e, socket.error) and
+            not isinstance(e, socket.timeout) and
+            e.errno == errno.ECONNRESET)
+
+
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+
+def _get_connection_pool(scheme, netloc):
+    """Get the connection pool of a server.
+
+    @param scheme: 'http' or 'https'.
+    @param netloc: host[:port] of the server.
+    """
+    with _connection_pools_lock:
+        pool = _connection_pools.get((scheme, netloc))
+        if pool is None:
+            pool = _connection_pools[(scheme, netloc)] = _ConnectionPool(
+                    scheme, netloc)
+        return pool
+
+
+def _pooled_http_request(url_with_args, headers, postdata, timeout,
+                         accept_gzip=False):
+    """Make an HTTP request over a pooled keep-alive connection.
+
+    Falls back to _raw_http_request if the request has to go through a proxy
+    or is redirected, which urllib2 handles.
+
+    @param url_with_args: url with the GET params formatted.
+    @headers: Any extra headers to include in the request.
+    @postdata: data for a POST request.
+    @timeout: minimum timeout to use (in seconds).
+    @accept_gzip: True to ask for a gzip encoded response.
+
+    @returns: the response from the http request.
+    @raises urllib2.HTTPError: if the server returns an error status.
+    """
+    url = urlparse.urlsplit(url_with_args)
+    if (url.scheme not in ('http', 'https') or
+            (url.scheme in urllib.getproxies() and
+             not urllib.proxy_bypass(url.hostname))):
+        return _raw_http_request(url_with_args, headers, postdata, timeout)
+
+    request_headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    request_headers.update(headers)
+    if accept_gzip:
+        request_headers['Accept-Encoding'] = 'gzip'
+    path = url.path or '/'
+    if url.query:
+        path += '?' + url.query
+    pool = _get_connection_pool(url.scheme, url.netloc)
+    response, data = pool.request(path, request_headers, postdata,
+                                  _get_timeout(timeout))
+    if 300 <= response.status < 400:
+        return _raw_http_request(url_with_args, headers, postdata, timeout)
+    if not 200 <= response.status < 300:
+        raise urllib2.HTTPError(url_with_args, response.status,
+                                response.reason, response.msg,
+                                StringIO.StringIO(data))
+    if response.getheader('Content-Encoding') == 'gzip':
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+
 def _raw_http_request(url_with_args, headers, postdata, timeout):
     """Make a raw HTPP request.
 
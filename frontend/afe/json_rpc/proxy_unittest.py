@@ -0,0 +1,162 @@
+#!/usr/bin/python2
+
+"""Unit tests for frontend/afe/json_rpc/proxy.py."""
+
+import BaseHTTPServer
+import gzip
+import httplib
+import json
+import SocketServer
+import StringIO
+import threading
+import unittest
+import urllib2
+
+import common
+from autotest_lib.client.common_lib import global_config
+from autotest_lib.frontend.afe.json_rpc import proxy
+
+
+class _RpcRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Echo the method of JSON-RPC requests over keep-alive connections."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(
+                self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.connections.add(self.client_address)
+        if isinstance(request, list):
+            self.server.methods.extend(r['method'] for r in request)
+        else:
+            self.server.methods.append(request['method'])
+        if isinstance(request, list):
+            body = json.dumps([self._get_response(r) for r in request])
+        elif request['method'] == 'fail':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        elif request['method'] == 'truncate':
+            # Close the connection in the middle of the response.
+            self.send_response(200)
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            self.wfile.write('{"result"')
+            self.close_connection = 1
+            return
+        else:
+            body = json.dumps(self._get_response(request))
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            buf = StringIO.StringIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+                f.write(body)
+            body = buf.getvalue()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if request['method'] == 'bye':
+            # Close the connection once idle, without telling the client.
+            self.close_connection = 1
+
+
+    def _get_response(self, request):
+        if request['method'] == 'missing':
+            return {'result': None, 'id': request['id'],
+                    'error': {'name': 'ServiceMethodNotFound',
+                              'message': 'missing', 'traceback': ''}}
+        return {'result': request['method'], 'id': request['id'],
+                'error': None}
+
+
+    def log_message(self, *args):
+        pass
+
+
+class _RpcServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Serve each connection in its own thread."""
+
+    daemon_threads = True
+
+
+class ServiceProxyTest(unittest.TestCase):
+    """Tests ServiceProxy over pooled connections."""
+
+    def setUp(self):
+        self.server = _RpcServer(('localhost', 0), _RpcRequestHandler)
+        self.server.connections = set()
+        self.server.methods = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://localhost:%d/afe/server/rpc/' % (
+                self.server.server_port)
+
+
+    def tearDown(self):
+        proxy._connection_pools.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        global_config.global_config.reset_config_values()
+
+
+    def test_connection_reused(self):
+        """Sequential calls share one keep-alive connection."""
+        service = proxy.ServiceProxy(self.url)
+        for _ in range(3):
+            self.assertEqual(service.get_hosts(), 'get_hosts')
+        self.assertEqual(len(self.server.connections), 1)
+        stats = proxy.get_call_stats()['get_hosts']
+        self.assertGreaterEqual(stats['calls'], 3)
+        self.assertGreater(stats['response_bytes'], 0)
+
+
+    def test_stale_connection(self):
+        """Calls on idle connections closed by the server are sent again."""
+        service = proxy.ServiceProxy(self.url)
+        self.assertEqual(service.bye(), 'bye')
+        self.assertEqual(service.get_hosts(), 'get_hosts')
+        self.assertEqual(len(self.server.connections), 2)
+
+
+    def test_no_retry_after_response(self):
+        """Calls are not sent again once the server started to respond."""
+        service = proxy.ServiceProxy(self.url)
+        self.assertEqual(service.get_hosts(), 'get_hosts')
+        self.assertRaises(httplib.HTTPException, service.truncate)
+        self.assertEqual(self.server.methods, ['get_hosts', 'truncate'])
+
+
+    def test_gzip(self):
+        """Gzip encoded responses are decompressed."""
+        global_config.global_config.override_config_value(
+                'CLIENT', 'rpc_accept_gzip', 'True')
+        service = proxy.ServiceProxy(self.url)
+        self.assertEqual(service.get_jobs(), 'get_jobs')
+
+
+    def test_http_error(self):
+        """Error statuses raise HTTPError, like with urllib2."""
+        service = proxy.ServiceProxy(self.url)
+        self.assertRaises(urllib2.HTTPError, service.fail)
+        self.assertEqual(service.get_hosts(), 'get_hosts')
+
+
+    def test_batch(self):
+        """Calls queued in a batch are sent in one request."""
+        service = proxy.ServiceProxy(self.url)
+        with service.batch() as batch:
+            hosts = batch.get_hosts(hostname='host1')
+            missing = batch.missing()
+            labels = batch.get_labels()
+            self.assertRaises(proxy.JSONRPCException, hosts.result)
+        self.assertEqual(hosts.result(), 'get_hosts')
+        self.assertEqual(labels.result(), 'get_labels')
+        self.assertRaises(proxy.JSONRPCException, missing.result)
+        self.assertEqual(proxy.get_call_stats()['batch']['calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
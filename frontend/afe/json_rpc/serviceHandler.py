@@ -36,27 +36,51 @@ except django_exceptions.ImproperlyConfigured:
 json_decoder = decoder.JSONDecoder()
 
 
+# Results which are lists of more items than this are encoded this many items
+# at a time, see ServiceHandler.translateResultStream.
+RESULT_CHUNK_SIZE = 1000
+
+
+def _convertList(value):
+    # Decoded lists are not shared, convert them in place.
+    for i, item in enumerate(value):
+        converter = _CONVERTERS.get(type(item))
+        if converter is not None:
+            value[i] = converter(item)
+    return value
+
+
+def _convertDict(value):
+    new_dict = {}
+    for key, val in value.iteritems():
+        converter = _CONVERTERS.get(type(val))
+        if converter is not None:
+            val = converter(val)
+        new_dict[str(key)] = val
+    return new_dict
+
+
+# Converters of the JSON types which need one, by type. The decoder only
+# returns these exact types, so there's no need to check for subclasses.
+_CONVERTERS = {
+    float: int,
+    unicode: str,
+    list: _convertList,
+    dict: _convertDict,
+}
+
+
 def customConvertJson(value):
     """\
     Recursively process JSON values and do type conversions.
     -change floats to ints
     -change unicodes to strs
+    Lists are converted in place.
     """
-    if isinstance(value, float):
-        return int(value)
-    elif isinstance(value, unicode):
-        return str(value)
-    elif isinstance(value, list):
-        return [customConvertJson(item) for item in value]
-    elif isinstance(value, dict):
-        new_dict = {}
-        for key, val in value.iteritems():
-            new_key = customConvertJson(key)
-            new_val = customConvertJson(val)
-            new_dict[new_key] = new_val
-        return new_dict
-    else:
+    converter = _CONVERTERS.get(type(value))
+    if converter is None:
         return value
+    return converter(value)
 
 
 def ServiceMethod(fn):
@@ -114,6 +138,33 @@ class ServiceHandler(object):
         return results
 
 
+    def dispatchBatchRequest(self, requests):
+        """
+        Invoke the json RPC calls of a decoded batch request.
+        @param requests: a non empty list of decoded json requests
+        @returns a list of dictionaries, one per request, see dispatchRequest.
+                 A malformed request gets a BadServiceRequest error rather
+                 than failing the whole batch.
+        """
+        if not requests:
+            raise BadServiceRequest(requests)
+        return [self._dispatchBatchEntry(request) for request in requests]
+
+
+    def _dispatchBatchEntry(self, request):
+        try:
+            if not isinstance(request, dict):
+                raise BadServiceRequest(request)
+            return self.dispatchRequest(request)
+        except BadServiceRequest, err:
+            results = self.blank_result_dict()
+            if isinstance(request, dict):
+                results['id'] = request.get('id')
+            results['err_traceback'] = traceback.format_exc()
+            results['err'] = err
+            return results
+
+
     def _getRequestId(self, request):
         try:
             return request['id']
@@ -123,6 +174,9 @@ class ServiceHandler(object):
 
     def handleRequest(self, jsonRequest):
         request = self.translateRequest(jsonRequest)
+        if isinstance(request, list):
+            return self.translateBatchResult(
+                    self.dispatchBatchRequest(request))
         results = self.dispatchRequest(request)
         return self.translateResult(results)
 
@@ -175,3 +229,51 @@ class ServiceHandler(object):
                                         "error":err})
 
         return data
+
+
+    @classmethod
+    def translateResultStream(cls, result_dict):
+        """
+        Translate a result like translateResult, in chunks if it's long.
+
+        A list result of more than RESULT_CHUNK_SIZE items is encoded
+        RESULT_CHUNK_SIZE items at a time as the chunks are consumed, so that
+        it can be streamed without building one huge string. The first chunk
+        is encoded right away, so that an unserializable result still gets an
+        error response in most cases.
+
+        @param result_dict: a dictionary containing the result, error,
+                            traceback and id.
+        @returns the translated json result, or an iterator of its chunks.
+        """
+        result = result_dict['result']
+        if (result_dict['err'] is not None or type(result) is not list or
+                len(result) <= RESULT_CHUNK_SIZE):
+            return cls.translateResult(result_dict)
+        try:
+            first_chunk = json_encoder.encode(result[:RESULT_CHUNK_SIZE])
+            request_id = json_encoder.encode(result_dict['id'])
+        except TypeError:
+            return cls.translateResult(result_dict)
+        return cls._iterResultChunks(result, first_chunk, request_id)
+
+
+    @staticmethod
+    def _iterResultChunks(result, first_chunk, request_id):
+        # Each chunk is a json list, strip the brackets to join them.
+        yield '{"result": [' + first_chunk[1:-1]
+        for start in xrange(RESULT_CHUNK_SIZE, len(result), RESULT_CHUNK_SIZE):
+            chunk = json_encoder.encode(result[start:start + RESULT_CHUNK_SIZE])
+            yield ', ' + chunk[1:-1]
+        yield '], "id": %s, "error": null}' % request_id
+
+
+    @classmethod
+    def translateBatchResult(cls, result_dicts):
+        """
+        @param result_dicts: a list of dictionaries containing the result,
+                             error, traceback and id of each request.
+        @returns translated json array of the results
+        """
+        return '[%s]' % ', '.join(cls.translateResult(result_dict)
+                                  for result_dict in result_dicts)
@@ -1,5 +1,6 @@
 #!/usr/bin/python2
 
+import json
 import unittest
 import common
 from autotest_lib.frontend import setup_django_environment
@@ -45,6 +46,14 @@ json_request3 = """
 }
 """
 
+json_batch_request = """
+[
+    {"method": "service_1", "params": [7, 9], "id": 0},
+    {"method": "service_3", "params": ["I wonder if this works"], "id": 1},
+    {"params": [], "id": 2}
+]
+"""
+
 
 class TestServiceHandler(unittest.TestCase):
     def setUp(self):
@@ -68,5 +77,40 @@ class TestServiceHandler(unittest.TestCase):
         self.assertNotEquals(response_obj['error'], 'None')
 
 
+    def test_handleBatchRequest(self):
+        response = self.serviceHandler.handleRequest(json_batch_request)
+        response_objs = json.loads(response)
+        self.assertEquals([r['id'] for r in response_objs], [0, 1, 2])
+        self.assertEquals(response_objs[0]['result'], 16)
+        self.assertEquals(response_objs[0]['error'], None)
+        self.assertEquals(response_objs[1]['error']['name'],
+                          'ServiceMethodNotFound')
+        self.assertEquals(response_objs[2]['error']['name'],
+                          'BadServiceRequest')
+
+
+    def test_handleEmptyBatchRequest(self):
+        self.assertRaises(serviceHandler.BadServiceRequest,
+                          self.serviceHandler.handleRequest, '[]')
+
+
+    def test_translateResultStream(self):
+        result = self.serviceHandler.blank_result_dict()
+        result['id'] = 'jsonrpc'
+        result['result'] = [{'id': i} for i in range(2500)]
+        chunks = list(self.serviceHandler.translateResultStream(result))
+        self.assertEquals(len(chunks), 4)
+        self.assertEquals(json.loads(''.join(chunks)),
+                          {'result': result['result'], 'id': 'jsonrpc',
+                           'error': None})
+
+
+    def test_translateResultStreamShortResult(self):
+        result = self.serviceHandler.blank_result_dict()
+        result['result'] = 16
+        self.assertEquals(self.serviceHandler.translateResultStream(result),
+                          expected_response1)
+
+
 if __name__ == "__main__":
     unittest.main()
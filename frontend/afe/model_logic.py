@@ -1150,6 +1150,42 @@ class ModelExtensions(rdb_model_extensions.ModelValidators):
         @param serialized: Representation of an object and its dependencies, as
                            returned by serialize.
 
+        @raises ValueError: if serialized contains related objects, i.e. not
+                            only local fields.
+        """
+        self._deserialize_local(self._get_local_values(serialized))
+
+
+    @classmethod
+    @transaction.commit_on_success
+    def update_all_from_serialized(cls, updates):
+        """Updates local fields of existing objects in a single transaction.
+
+        This is the bulk version of update_from_serialized(). The objects
+        are known to exist, so each is saved with a single UPDATE.
+
+        @param updates: List of (object, serialized) tuples, with the objects
+                        of this class.
+
+        @raises ValueError: if a serialized contains related objects, i.e.
+                            not only local fields.
+        """
+        for instance, serialized in updates:
+            for link, value in instance._get_local_values(serialized):
+                setattr(instance, link, value)
+            # See comment in _deserialize_local about overridden save().
+            super(cls, instance).save(force_update=True)
+
+
+    def _get_local_values(self, serialized):
+        """Get the local fields of an object from its serialized form.
+
+        @param serialized: Representation of an object and its dependencies, as
+                           returned by serialize.
+
+        @returns: List of tuples like returned by
+                  _split_local_from_foreign_values.
+
         @raises ValueError: if serialized contains related objects, i.e. not
                             only local fields.
         """
@@ -1158,8 +1194,7 @@ class ModelExtensions(rdb_model_extensions.ModelValidators):
         if related:
             raise ValueError('Serialized must not contain foreign '
                              'objects: %s' % related)
-
-        self._deserialize_local(local)
+        return local
 
 
     def custom_deserialize_relation(self, link, data):
@@ -5,7 +5,7 @@ server.
 
 __author__ = 'showard@google.com (Steve Howard)'
 
-import getpass, os
+import getpass, hashlib, json, os
 from json_rpc import proxy
 from autotest_lib.client.common_lib import utils
 
@@ -41,6 +41,22 @@ def get_proxy(*args, **kwargs):
     return proxy.ServiceProxy(*args, **kwargs)
 
 
+def get_host_info_version(labels, attributes):
+    """Compute the version of the labels and attributes of a host.
+
+    The AFE and its clients compute the version the same way, so that a
+    client can pass the version of the host information it read to
+    update_host_info, which rejects the update if the host changed since.
+
+    @param labels: A list of label names.
+    @param attributes: A dict of attribute names to values.
+
+    @returns A string identifying the labels and attributes.
+    """
+    data = json.dumps([sorted(set(labels)), attributes], sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
 def _base_authorization_headers(username, server):
     """
     Don't call this directly, call authorization_headers().
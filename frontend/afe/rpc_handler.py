@@ -36,6 +36,21 @@ def should_log_message(name):
     return COMPILED_REGEXP.match(name)
 
 
+def _encode_error_result(meth_id, err):
+    """Encode the result of a request which failed before being dispatched.
+
+    @param meth_id: the id of the request.
+    @param err: the error raised for the request.
+
+    @return: the json encoded error result.
+    """
+    error_result = serviceHandler.ServiceHandler.blank_result_dict()
+    error_result['id'] = meth_id
+    error_result['err'] = err
+    error_result['err_traceback'] = traceback.format_exc()
+    return serviceHandler.ServiceHandler.translateResult(error_result)
+
+
 class RpcMethodHolder(object):
     'Dummy class to hold RPC interface methods as attributes.'
 
@@ -109,12 +124,7 @@ class RpcValidator(object):
         @return: a raw http response including the encoded error result. It
             will be parsed by service proxy.
         """
-        error_result = serviceHandler.ServiceHandler.blank_result_dict()
-        error_result['id'] = meth_id
-        error_result['err'] = err
-        error_result['err_traceback'] = traceback.format_exc()
-        result = self.encode_result(error_result)
-        return rpc_utils.raw_http_response(result)
+        return rpc_utils.raw_http_response(_encode_error_result(meth_id, err))
 
 
 class RpcHandler(object):
@@ -218,24 +228,75 @@ class RpcHandler(object):
         json_request = self.raw_request_data(request)
         decoded_request = self.decode_request(json_request)
 
+        # A batch request is a list of requests, each dispatched, validated
+        # and logged on its own, answered with the list of their results.
+        if isinstance(decoded_request, list):
+            if not decoded_request:
+                raise serviceHandler.BadServiceRequest(decoded_request)
+            results = [self._handle_batch_entry(entry, user, remote_ip)
+                       for entry in decoded_request]
+            return rpc_utils.raw_http_response('[%s]' % ', '.join(results))
+        result = self._handle_decoded_request(decoded_request, user,
+                                              remote_ip, stream=True)
+        if isinstance(result, basestring):
+            return rpc_utils.raw_http_response(result)
+        return rpc_utils.streaming_http_response(result)
+
+
+    def _handle_decoded_request(self, decoded_request, user, remote_ip,
+                                stream=False):
+        """Validate, dispatch and log a single decoded request.
+
+        @param decoded_request: the decoded request.
+        @param user: current user.
+        @param remote_ip: the caller's ip.
+        @param stream: whether a long result may be encoded in chunks, see
+                ServiceHandler.translateResultStream.
+
+        @return: the json encoded result, or an iterator of its chunks if
+                stream is True.
+        @raise serviceHandler.BadServiceRequest: if the request is malformed.
+        """
         # Validate whether method can be called by the remote_ip
         try:
             meth_id = decoded_request['id']
             meth_name = decoded_request['method']
             self._rpc_validator.validate_rpc_only_called_by_main(
                     meth_name, remote_ip)
-        except KeyError:
+        except (KeyError, TypeError):
             raise serviceHandler.BadServiceRequest(decoded_request)
         except error.RPCException as e:
-            return self._rpc_validator.encode_validate_result(meth_id, e)
+            return _encode_error_result(meth_id, e)
 
         decoded_request['remote_ip'] = remote_ip
         decoded_result = self.dispatch_request(decoded_request)
-        result = self.encode_result(decoded_result)
+        if stream:
+            result = self._dispatcher.translateResultStream(decoded_result)
+        else:
+            result = self.encode_result(decoded_result)
         if rpcserver_logging.LOGGING_ENABLED:
             self.log_request(user, decoded_request, decoded_result,
                              remote_ip)
-        return rpc_utils.raw_http_response(result)
+        return result
+
+
+    def _handle_batch_entry(self, decoded_request, user, remote_ip):
+        """Handle a request of a batch, encoding errors in its result.
+
+        @param decoded_request: the decoded request.
+        @param user: current user.
+        @param remote_ip: the caller's ip.
+
+        @return: the json encoded result.
+        """
+        try:
+            return self._handle_decoded_request(decoded_request, user,
+                                                remote_ip)
+        except serviceHandler.BadServiceRequest as e:
+            meth_id = None
+            if isinstance(decoded_request, dict):
+                meth_id = decoded_request.get('id')
+            return _encode_error_result(meth_id, e)
 
 
     def handle_jsonp_rpc_request(self, request):
@@ -38,6 +38,7 @@ import datetime
 import logging
 import os
 import sys
+import time
 import warnings
 
 from django.db import connection as db_connection
@@ -55,6 +56,7 @@ from autotest_lib.frontend.afe import control_file as control_file_lib
 from autotest_lib.frontend.afe import model_attributes
 from autotest_lib.frontend.afe import model_logic
 from autotest_lib.frontend.afe import models
+from autotest_lib.frontend.afe import rpc_client_lib
 from autotest_lib.frontend.afe import rpc_utils
 from autotest_lib.frontend.tko import models as tko_models
 from autotest_lib.frontend.tko import rpc_interface as tko_rpc_interface
@@ -91,6 +93,13 @@ RESPECT_STATIC_LABELS = global_config.global_config.get_config_value(
 RESPECT_STATIC_ATTRIBUTES = global_config.global_config.get_config_value(
         'SKYLAB', 'respect_static_attributes', type=bool, default=False)
 
+# Maximum number of seconds wait_for_jobs_finished blocks a server process,
+# and the interval between its checks of the database.
+WAIT_FOR_JOBS_MAX_TIMEOUT_SECS = _CONFIG.get_config_value(
+        'AUTOTEST_WEB', 'wait_for_jobs_max_timeout_secs', type=int,
+        default=120)
+WAIT_FOR_JOBS_CHECK_INTERVAL_SECS = 2
+
 # Relevant CrosDynamicSuiteExceptions are defined in client/common_lib/error.py.
 
 # labels
@@ -551,6 +560,123 @@ def host_remove_labels(id, labels):
                          id=id, labels=labels)
 
 
+def _get_host_info_version(host_obj):
+    """Compute the version of the labels and attributes of a host.
+
+    @param host_obj: A Host object.
+
+    @returns The version of the labels and attributes get_hosts returns for
+            the host, see rpc_client_lib.get_host_info_version.
+    """
+    host = get_hosts(id=host_obj.id, valid_only=False)[0]
+    return rpc_client_lib.get_host_info_version(host['labels'],
+                                                host['attributes'])
+
+
+@transaction.commit_on_success
+def update_host_info_impl(hostname, labels_to_add=(), labels_to_remove=(),
+                          attributes_to_set=None, attributes_to_delete=(),
+                          expected_version=None):
+    """Update the labels and attributes of a host only in local DB.
+
+    *** DO NOT CALL THIS RPC from client code ***
+    This RPC exists for main-shard communication only.
+    Call update_host_info instead.
+
+    @param hostname: The hostname of the host.
+    @param labels_to_add: Names of the labels to add.
+    @param labels_to_remove: Names of the labels to remove.
+    @param attributes_to_set: A dict of the attributes to add or change.
+    @param attributes_to_delete: Names of the attributes to delete.
+    @param expected_version: See update_host_info.
+
+    @raises HostInfoVersionMismatchException: If the host information doesn't
+            have the expected version.
+    @raises ValidationError: If adding more than one platform/board label.
+
+    @returns The version of the host information after the update.
+    """
+    # Lock the host row, so that concurrent updates of the host are applied
+    # one after the other, each to the version the previous one left.
+    host_obj = models.Host.objects.select_for_update().get(hostname=hostname)
+    if (expected_version is not None and
+        _get_host_info_version(host_obj) != expected_version):
+        raise error.HostInfoVersionMismatchException(
+                'Labels or attributes of host %s changed since they were '
+                'read.' % hostname)
+
+    if labels_to_remove:
+        remove_labels_from_host(host_obj.id, labels_to_remove)
+    if labels_to_add:
+        label_objs = models.Label.smart_get_bulk(labels_to_add)
+        platforms = [label.name for label in label_objs if label.platform]
+        if len(platforms) > 1:
+            raise model_logic.ValidationError(
+                {'labels': ('Adding more than one platform: %s' %
+                            ', '.join(platforms))})
+        if platforms:
+            models.Host.check_no_platform([host_obj])
+        if any(label_name.startswith('board:')
+               for label_name in labels_to_add):
+            models.Host.check_board_labels_allowed([host_obj], labels_to_add)
+        add_labels_to_host(host_obj.id, labels_to_add)
+
+    if attributes_to_set or attributes_to_delete:
+        models.AclGroup.check_for_acl_violation_hosts([host_obj])
+    for attribute in attributes_to_delete:
+        host_obj.set_or_delete_attribute(attribute, None)
+    for attribute, value in (attributes_to_set or {}).iteritems():
+        host_obj.set_or_delete_attribute(attribute, value)
+    return _get_host_info_version(host_obj)
+
+
+@rpc_utils.route_rpc_to_main
+def update_host_info(hostname, labels_to_add=(), labels_to_remove=(),
+                     attributes_to_set=None, attributes_to_delete=(),
+                     expected_version=None):
+    """Update the labels and attributes of a host in a single transaction.
+
+    The changes are only applied if the labels and attributes of the host
+    still have the version they are based on, so that concurrent updates
+    don't overwrite each other.
+
+    @param hostname: The hostname of the host.
+    @param labels_to_add: Names of the labels to add.
+    @param labels_to_remove: Names of the labels to remove.
+    @param attributes_to_set: A dict of the attributes to add or change.
+    @param attributes_to_delete: Names of the attributes to delete.
+    @param expected_version: The version of the host information the changes
+            are based on, see rpc_client_lib.get_host_info_version. None to
+            apply the changes whatever the version.
+
+    @raises HostInfoVersionMismatchException: If the host information doesn't
+            have the expected version.
+    @raises ValidationError: If adding more than one platform/board label.
+
+    @returns The version of the host information after the update.
+    """
+    # Create the labels on the main/shards.
+    for label in labels_to_add:
+        _create_label_everywhere(label, [hostname])
+
+    version = update_host_info_impl(
+            hostname, labels_to_add=labels_to_add,
+            labels_to_remove=labels_to_remove,
+            attributes_to_set=attributes_to_set,
+            attributes_to_delete=attributes_to_delete,
+            expected_version=expected_version)
+
+    if (labels_to_add or labels_to_remove or attributes_to_set or
+        attributes_to_delete):
+        host_obj = models.Host.smart_get(hostname)
+        rpc_utils.fanout_rpc([host_obj], 'update_host_info_impl', False,
+                             hostname=hostname, labels_to_add=labels_to_add,
+                             labels_to_remove=labels_to_remove,
+                             attributes_to_set=attributes_to_set,
+                             attributes_to_delete=attributes_to_delete)
+    return version
+
+
 def get_host_attribute(attribute, **host_filter_data):
     """
     @param attribute: string name of attribute
@@ -623,6 +749,55 @@ def delete_host(id):
     models.Host.smart_get(id).delete()
 
 
+def _get_static_label_replacements(hosts):
+    """Get the static labels replacing the labels of hosts.
+
+    @param hosts: A list of Host objects with label_list populated.
+
+    @returns A dictionary mapping ids of replaced labels to the StaticLabel
+            objects with the same names.
+    """
+    labels = dict((label.id, label)
+                  for host in hosts for label in host.label_list)
+    if not labels:
+        return {}
+    replaced_ids = models.ReplacedLabel.objects.filter(
+            label__id__in=labels.keys()).values_list('label_id', flat=True)
+    replaced_names = dict((labels[label_id].name, label_id)
+                          for label_id in replaced_ids)
+    if not replaced_names:
+        return {}
+    static_labels = models.StaticLabel.objects.filter(
+            name__in=replaced_names.keys())
+    return dict((replaced_names[static_label.name], static_label)
+                for static_label in static_labels)
+
+
+def _get_current_jobs(host_ids):
+    """Get the currently running job and special task of hosts.
+
+    @param host_ids: A list of host ids.
+
+    @returns A tuple of two dictionaries, mapping host ids to the id of
+            their current job, and to their current special task as
+            '<id>-<task>'. Idle hosts are left out.
+    """
+    if not host_ids:
+        return {}, {}
+    current_jobs = {}
+    entries = models.HostQueueEntry.objects.filter(
+            host_id__in=host_ids, active=True, complete=False)
+    for host_id, job_id in entries.values_list('host_id', 'job_id'):
+        current_jobs.setdefault(host_id, job_id)
+    current_special_tasks = {}
+    tasks = models.SpecialTask.objects.filter(
+            host_id__in=host_ids, is_active=True, is_complete=False)
+    for host_id, task_id, task in tasks.values_list('host_id', 'id', 'task'):
+        current_special_tasks.setdefault(host_id,
+                                         '%d-%s' % (task_id, task.lower()))
+    return current_jobs, current_special_tasks
+
+
 def get_hosts(multiple_labels=(), exclude_only_if_needed_labels=False,
               valid_only=True, include_current_job=False, **filter_data):
     """Get a list of dictionaries which contains the information of hosts.
@@ -649,6 +824,13 @@ def get_hosts(multiple_labels=(), exclude_only_if_needed_labels=False,
     models.Host.objects.populate_relationships(hosts,
                                                models.StaticHostAttribute,
                                                'staticattribute_list')
+    # Look up static labels and current jobs for all hosts at once, rather
+    # than with a few queries per host.
+    if RESPECT_STATIC_LABELS:
+        static_labels = _get_static_label_replacements(hosts)
+    if include_current_job:
+        current_jobs, current_special_tasks = _get_current_jobs(
+                [host_obj.id for host_obj in hosts])
     host_dicts = []
     for host_obj in hosts:
         host_dict = host_obj.get_object_dict()
@@ -660,9 +842,8 @@ def get_hosts(multiple_labels=(), exclude_only_if_needed_labels=False,
             # Only keep static labels which has a corresponding entries in
             # afe_labels.
             for label in host_obj.label_list:
-                if label.is_replaced_by_static():
-                    static_label = models.StaticLabel.smart_get(label.name)
-                    label_list.append(static_label)
+                if label.id in static_labels:
+                    label_list.append(static_labels[label.id])
                 else:
                     label_list.append(label)
 
@@ -681,19 +862,9 @@ def get_hosts(multiple_labels=(), exclude_only_if_needed_labels=False,
                     host_dict['attributes'][attr.attribute] = attr.value
 
         if include_current_job:
-            host_dict['current_job'] = None
-            host_dict['current_special_task'] = None
-            entries = models.HostQueueEntry.objects.filter(
-                    host_id=host_dict['id'], active=True, complete=False)
-            if entries:
-                host_dict['current_job'] = (
-                        entries[0].get_object_dict()['job'])
-            tasks = models.SpecialTask.objects.filter(
-                    host_id=host_dict['id'], is_active=True, is_complete=False)
-            if tasks:
-                host_dict['current_special_task'] = (
-                        '%d-%s' % (tasks[0].get_object_dict()['id'],
-                                   tasks[0].get_object_dict()['task'].lower()))
+            host_dict['current_job'] = current_jobs.get(host_obj.id)
+            host_dict['current_special_task'] = current_special_tasks.get(
+                    host_obj.id)
         host_dicts.append(host_dict)
 
     return rpc_utils.prepare_for_serialization(host_dicts)
@@ -1241,6 +1412,36 @@ def get_num_jobs(not_yet_run=False, running=False, finished=False,
     return models.Job.query_count(filter_data)
 
 
+def wait_for_jobs_finished(job_ids, timeout_secs=60):
+    """\
+    Block until any of the given jobs has finished, or a timeout passes.
+
+    A job has finished when all its HQEs are complete, as with
+    get_jobs(finished=True). Unknown job ids are ignored.
+
+    @param job_ids: A list of job ids.
+    @param timeout_secs: Maximum number of seconds to wait, capped by
+            WAIT_FOR_JOBS_MAX_TIMEOUT_SECS.
+    @returns A sorted list of the ids of the finished jobs, empty if none
+            finished before the timeout.
+    """
+    job_ids = set(models.Job.objects.filter(id__in=job_ids).values_list(
+            'id', flat=True))
+    deadline = time.time() + min(timeout_secs, WAIT_FOR_JOBS_MAX_TIMEOUT_SECS)
+    while job_ids:
+        unfinished_ids = set(models.HostQueueEntry.objects.filter(
+                job__in=job_ids, complete=False).values_list(
+                        'job_id', flat=True))
+        finished_ids = job_ids - unfinished_ids
+        if finished_ids or time.time() >= deadline:
+            return sorted(finished_ids)
+        # End the current transaction, so that the next check sees the HQEs
+        # completed in the meantime.
+        transaction.commit_unless_managed()
+        time.sleep(WAIT_FOR_JOBS_CHECK_INTERVAL_SECS)
+    return []
+
+
 def get_jobs_summary(**filter_data):
     """\
     Like get_jobs(), but adds 'status_counts' and 'result_counts' field.
@@ -1478,6 +1679,47 @@ def get_host_special_tasks(host_id, **filter_data):
                              host_id=host_id, **filter_data)
 
 
+def get_hosts_special_tasks(host_ids, **filter_data):
+    """Get special task entries for several hosts.
+
+    Like get_host_special_tasks, for a list of hosts.  The tasks of
+    hosts not assigned to a shard are queried locally, the tasks of the
+    other hosts are queried from their shards, with one query per shard.
+    A shard failing to answer only fails the query of its hosts.
+
+    @param host_ids     Ids in the database of the target hosts.
+    @param filter_data  Filter keywords to pass to the underlying
+                        database query.
+
+    @returns A dict with the list of the special tasks found as 'tasks',
+             and the list of the ids of the hosts whose shard could not
+             be queried as 'failed_host_ids'.
+    """
+    hosts = models.Host.query_objects({'id__in': host_ids}, valid_only=False)
+    local_host_ids = []
+    shard_host_ids = collections.defaultdict(list)
+    for host in hosts.select_related('shard'):
+        if host.shard:
+            shard_host_ids[host.shard.hostname].append(host.id)
+        else:
+            local_host_ids.append(host.id)
+    tasks = []
+    failed_host_ids = []
+    if local_host_ids:
+        tasks.extend(get_special_tasks(host_id__in=local_host_ids,
+                                       **filter_data))
+    for shard_hostname, ids in shard_host_ids.iteritems():
+        shard_afe = frontend.AFE(server=shard_hostname)
+        try:
+            tasks.extend(shard_afe.run('get_special_tasks', host_id__in=ids,
+                                       **filter_data))
+        except Exception as e:
+            logging.warning('Failed to get the special tasks of %d hosts '
+                            'from shard %s: %s', len(ids), shard_hostname, e)
+            failed_host_ids.extend(ids)
+    return {'tasks': tasks, 'failed_host_ids': failed_host_ids}
+
+
 def get_num_special_tasks(**kwargs):
     """Get the number of special task entries from the local database.
 
@@ -2077,11 +2319,8 @@ def shard_heartbeat(shard_hostname, jobs=(), hqes=(), known_job_ids=(),
     shard_obj = rpc_utils.retrieve_shard(shard_hostname=shard_hostname)
     rpc_utils.persist_records_sent_from_shard(shard_obj, jobs, hqes)
     assert len(known_host_ids) == len(known_host_statuses)
-    for i in range(len(known_host_ids)):
-        host_model = models.Host.objects.get(pk=known_host_ids[i])
-        if host_model.status != known_host_statuses[i]:
-            host_model.status = known_host_statuses[i]
-            host_model.save()
+    rpc_utils.update_host_statuses_from_shard(known_host_ids,
+                                              known_host_statuses)
 
     hosts, jobs, suite_keyvals, inc_ids = rpc_utils.find_records_for_shard(
             shard_obj, known_job_ids=known_job_ids,
@@ -4,6 +4,7 @@
 import datetime
 import mox
 import unittest
+import urllib2
 
 import common
 from autotest_lib.client.common_lib import control_data
@@ -16,6 +17,7 @@ from autotest_lib.frontend import setup_django_environment
 from autotest_lib.frontend.afe import frontend_test_utils
 from autotest_lib.frontend.afe import model_logic
 from autotest_lib.frontend.afe import models
+from autotest_lib.frontend.afe import rpc_client_lib
 from autotest_lib.frontend.afe import rpc_interface
 from autotest_lib.frontend.afe import rpc_utils
 from autotest_lib.server import frontend
@@ -25,6 +27,7 @@ from autotest_lib.server.cros.dynamic_suite import constants
 from autotest_lib.server.cros.dynamic_suite import control_file_getter
 from autotest_lib.server.cros.dynamic_suite import frontend_wrappers
 from autotest_lib.server.cros.dynamic_suite import suite_common
+from django.db import connection
 
 
 CLIENT = control_data.CONTROL_TYPE_NAMES.CLIENT
@@ -407,6 +410,61 @@ class RpcInterfaceTestWithStaticLabel(ShardHeartbeatTest,
         self.assertEquals(host['platform'], 'static_platform')
 
 
+    def _add_busy_hosts(self, count):
+        """Add hosts with a static label, a running job and special task."""
+        static_label = models.Label.smart_get('static')
+        if not models.StaticLabel.objects.filter(name='static'):
+            models.StaticLabel.objects.create(name='static')
+        for _ in range(count):
+            host = models.Host.objects.create(
+                    hostname='busy_host%d' % models.Host.objects.count())
+            host.labels.add(static_label)
+            job = self._create_job(hosts=[host.id], active=True)
+            job.hostqueueentry_set.update(active=True)
+            models.SpecialTask.objects.create(
+                    host=host, task=models.SpecialTask.Task.VERIFY,
+                    is_active=True, requested_by=models.User.current_user())
+
+
+    def _get_hosts_counting_queries(self):
+        """Call get_hosts with current jobs, counting the database queries.
+
+        @returns A tuple of (host dictionaries, number of queries).
+        """
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            hosts = rpc_interface.get_hosts(include_current_job=True)
+            return hosts, len(connection.queries) - start
+        finally:
+            connection.use_debug_cursor = None
+
+
+    def test_get_hosts_query_count(self):
+        """get_hosts runs the same number of queries for more hosts."""
+        self._add_busy_hosts(2)
+        hosts, queries = self._get_hosts_counting_queries()
+        self._add_busy_hosts(10)
+        more_hosts, more_queries = self._get_hosts_counting_queries()
+        self.assertEqual(len(hosts) + 10, len(more_hosts))
+        self.assertEqual(queries, more_queries)
+
+        busy_hosts = [host for host in more_hosts
+                      if host['hostname'].startswith('busy_host')]
+        self.assertEqual(12, len(busy_hosts))
+        for host in busy_hosts:
+            self.assertEqual(['static'], host['labels'])
+            job = models.HostQueueEntry.objects.get(host__id=host['id']).job
+            self.assertEqual(job.id, host['current_job'])
+            task = models.SpecialTask.objects.get(host__id=host['id'])
+            self.assertEqual('%d-verify' % task.id,
+                             host['current_special_task'])
+        idle_host = [host for host in more_hosts
+                     if host['hostname'] == 'host1'][0]
+        self.assertIsNone(idle_host['current_job'])
+        self.assertIsNone(idle_host['current_special_task'])
+
+
     def test_get_hosts_multiple_labels(self):
         self._fake_host_with_static_labels()
         hosts = rpc_interface.get_hosts(
@@ -737,6 +795,56 @@ class RpcInterfaceTest(unittest.TestCase,
         self.assertEquals(rpc_interface.ping_db(), [True])
 
 
+    def _get_host_info_version(self, hostname):
+        host = rpc_interface.get_hosts(hostname=hostname)[0]
+        return rpc_client_lib.get_host_info_version(host['labels'],
+                                                    host['attributes'])
+
+
+    def test_update_host_info(self):
+        self.hosts[0].set_attribute('attr1', 'value1')
+        self.hosts[0].set_attribute('attr2', 'value2')
+        version = rpc_interface.update_host_info(
+                'host1', labels_to_add=['label2', 'new_label'],
+                labels_to_remove=['label1'],
+                attributes_to_set={'attr1': 'new_value1', 'attr3': 'value3'},
+                attributes_to_delete=['attr2'],
+                expected_version=self._get_host_info_version('host1'))
+
+        host = rpc_interface.get_hosts(hostname='host1')[0]
+        self.assertEquals(sorted(host['labels']),
+                          ['label2', 'myplatform', 'new_label'])
+        self.assertEquals(host['attributes'],
+                          {'attr1': 'new_value1', 'attr3': 'value3'})
+        self.assertEquals(version, self._get_host_info_version('host1'))
+
+
+    def test_update_host_info_version_mismatch(self):
+        version = self._get_host_info_version('host1')
+        self.hosts[0].labels.add(self.label2)
+        self.assertRaises(error.HostInfoVersionMismatchException,
+                          rpc_interface.update_host_info, 'host1',
+                          labels_to_remove=['label1'],
+                          attributes_to_set={'attr1': 'value1'},
+                          expected_version=version)
+        host = rpc_interface.get_hosts(hostname='host1')[0]
+        self.assertEquals(sorted(host['labels']),
+                          ['label1', 'label2', 'myplatform'])
+        self.assertEquals(host['attributes'], {})
+
+
+    def test_update_host_info_replaces_platform(self):
+        models.Label.objects.create(name='platform2', platform=True)
+        self.assertRaises(model_logic.ValidationError,
+                          rpc_interface.update_host_info, 'host1',
+                          labels_to_add=['platform2'])
+        rpc_interface.update_host_info('host1', labels_to_add=['platform2'],
+                                       labels_to_remove=['myplatform'])
+        self.assertEquals(
+                rpc_interface.get_hosts(hostname='host1')[0]['platform'],
+                'platform2')
+
+
     def test_get_hosts_by_attribute(self):
         host1 = models.Host.objects.create(hostname='test_host1')
         host1.set_attribute('test_attribute1', 'test_value1')
@@ -879,6 +987,34 @@ class RpcInterfaceTest(unittest.TestCase,
                             [standalone_job])
 
 
+    def test_wait_for_jobs_finished(self):
+        running = self._create_job(hosts=[1, 2])
+        finished = self._create_job(hosts=[1])
+        finished.hostqueueentry_set.update(complete=True)
+
+        self.assertEqual(
+                rpc_interface.wait_for_jobs_finished(
+                        [running.id, finished.id, 1000], timeout_secs=60),
+                [finished.id])
+        self.assertEqual(
+                rpc_interface.wait_for_jobs_finished([running.id],
+                                                     timeout_secs=0),
+                [])
+        self.assertEqual(rpc_interface.wait_for_jobs_finished([1000]), [])
+
+
+    def test_wait_for_jobs_finished_blocks(self):
+        job = self._create_job(hosts=[1])
+        def complete_job(_):
+            job.hostqueueentry_set.update(complete=True)
+        self.god.stub_with(rpc_interface.time, 'sleep', complete_job)
+
+        self.assertEqual(
+                rpc_interface.wait_for_jobs_finished([job.id],
+                                                     timeout_secs=60),
+                [job.id])
+
+
     def _create_job_helper(self, **kwargs):
         return rpc_interface.create_job(name='test',
                                         priority=priorities.Priority.DEFAULT,
@@ -949,6 +1085,28 @@ class RpcInterfaceTest(unittest.TestCase,
         self.assertEquals(tasks[0]['is_complete'], True)
 
 
+    def test_get_hosts_special_tasks(self):
+        """Tasks are gathered from shards, down shards fail their hosts."""
+        self._setup_special_tasks()
+        for host, shard_hostname in zip(self.hosts[1:3],
+                                        ['shard1', 'shard2']):
+            host.shard = models.Shard.objects.create(hostname=shard_hostname)
+            host.save()
+
+        def run(afe, call, **dargs):
+            if afe.server == 'shard2':
+                raise urllib2.URLError('down')
+            return [{'id': 10, 'host': {'id': host_id}}
+                    for host_id in dargs['host_id__in']]
+        self.god.stub_with(frontend.AFE, 'run', run)
+
+        result = rpc_interface.get_hosts_special_tasks(
+                [host.id for host in self.hosts[:3]], is_complete=True)
+        self.assertEquals([task['host']['id'] for task in result['tasks']],
+                          [self.hosts[0].id, self.hosts[1].id])
+        self.assertEquals(result['failed_host_ids'], [self.hosts[2].id])
+
+
     def test_get_latest_special_task(self):
         # a particular usage of get_special_tasks()
         self._setup_special_tasks()
@@ -0,0 +1,222 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark encoding RPC responses and decoding RPC requests.
+
+Generates rows shaped like the results of get_hosts, get_host_queue_entries
+and get_detailed_test_views, and times preparing and encoding them the way
+the RPC server did before, in one string, and as it does now, streamed in
+chunks. Also times decoding a request with a long list argument. Reports the
+size of the largest string held in memory at once, e.g.
+
+    ./rpc_serialization_benchmark.py --rows 1000 10000 50000
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import time
+
+import common
+# import has side-effects, must appear before any django imports.
+from autotest_lib.frontend import setup_django_environment
+
+from autotest_lib.frontend.afe import rpc_utils
+from autotest_lib.frontend.afe.json_rpc import serviceHandler
+
+
+_TIME = datetime.datetime(2026, 1, 2, 3, 4, 5)
+
+
+def _host(i):
+    """@return: A row like the ones of get_hosts."""
+    return {'id': i, 'hostname': 'chromeos1-row%d-rack%d-host%d' % (
+                    i // 1000, i // 100 % 10, i % 100),
+            'locked': i % 7 == 0, 'locked_by': None, 'lock_time': None,
+            'lock_reason': '', 'synch_id': None, 'status': 'Ready',
+            'invalid': False, 'protection': 0, 'dirty': False,
+            'leased': False, 'shard': None,
+            'labels': ['board:eve', 'model:eve', 'pool:suites',
+                       'sku:eve_intel_skylake_core_i5_8Gb', 'bluetooth',
+                       'camera', 'internal_display', 'power:battery',
+                       'storage:ssd', 'cts_abi_x86'],
+            'platform': 'eve', 'acls': ['Everyone'],
+            'attributes': {'serial_number': 'SN%08d' % i,
+                           'powerunit_hostname': 'rpm%d' % (i // 50)}}
+
+
+def _job(i):
+    """@return: A job dict nested in the rows of get_host_queue_entries."""
+    return {'id': i, 'owner': 'chromeos-test',
+            'name': 'eve-release/R120-15662.0.0/bvt-inline/test%d' % i,
+            'priority': 50, 'control_file': 'job.run_test("dummy_Pass")\n' * 20,
+            'control_type': 2, 'created_on': _TIME, 'synch_count': 1,
+            'timeout': 24, 'run_verify': False, 'email_list': '',
+            'reboot_before': 1, 'reboot_after': 1, 'parse_failed_repair': True,
+            'max_runtime_hrs': 72, 'max_runtime_mins': 1440,
+            'drone_set': None, 'parameterized_job': None,
+            'parent_job': i // 100, 'test_retry': 0, 'run_reset': True,
+            'timeout_mins': 1440, 'shard': None, 'require_ssp': None}
+
+
+def _host_queue_entry(i):
+    """@return: A row like the ones of get_host_queue_entries."""
+    return {'id': i, 'job': _job(i), 'host': _host(i), 'profile': '',
+            'meta_host': None, 'active': False, 'complete': True,
+            'deleted': False, 'execution_subdir': 'chromeos1-host%d' % i,
+            'atomic_group': None, 'aborted': False,
+            'started_on': _TIME, 'finished_on': _TIME,
+            'status': 'Completed'}
+
+
+def _test_view(i):
+    """@return: A row like the ones of get_detailed_test_views."""
+    return {'test_idx': i, 'test_name': 'dummy_Pass.test%d' % i,
+            'subdir': 'dummy_Pass.test%d' % i, 'kernel': '4.4.0',
+            'status': 'GOOD', 'reason': '', 'job_tag': '%d-chromeos-test/'
+            'chromeos1-host%d' % (i, i), 'job_name': 'eve-release/R120/bvt',
+            'job_owner': 'chromeos-test', 'job_queued_time': _TIME,
+            'job_started_time': _TIME, 'job_finished_time': _TIME,
+            'afe_job_id': i, 'afe_parent_job_id': i // 100,
+            'hostname': 'chromeos1-host%d' % i, 'platform': 'eve',
+            'machine_owner': '', 'test_started_time': _TIME,
+            'test_finished_time': _TIME, 'build': 'eve-release/R120',
+            'build_version': 'R120-15662.0.0', 'board': 'eve',
+            'suite': 'bvt-inline', 'attributes': {'sysinfo-uname': 'Linux'},
+            'labels': [], 'iterations': [{'attr_keyval': {},
+                                          'perf_keyval': {'time': 1.5}}]}
+
+
+def _legacy_prepare_data(data):
+    """Prepare data for serialization like rpc_utils did before."""
+    if isinstance(data, dict):
+        new_data = {}
+        for key, value in data.iteritems():
+            new_data[key] = _legacy_prepare_data(value)
+        return new_data
+    elif (isinstance(data, list) or isinstance(data, tuple) or
+          isinstance(data, set)):
+        return [_legacy_prepare_data(item) for item in data]
+    elif isinstance(data, datetime.date):
+        if data is rpc_utils.NULL_DATETIME or data is rpc_utils.NULL_DATE:
+            return None
+        return str(data)
+    else:
+        return data
+
+
+def _legacy_convert_json(value):
+    """Convert a decoded request like serviceHandler did before."""
+    if isinstance(value, float):
+        return int(value)
+    elif isinstance(value, unicode):
+        return str(value)
+    elif isinstance(value, list):
+        return [_legacy_convert_json(item) for item in value]
+    elif isinstance(value, dict):
+        new_dict = {}
+        for key, val in value.iteritems():
+            new_dict[_legacy_convert_json(key)] = _legacy_convert_json(val)
+        return new_dict
+    else:
+        return value
+
+
+def _legacy_encode(rows):
+    """Prepare and encode a response in one string.
+
+    @return: The size of the largest string built.
+    """
+    result = serviceHandler.ServiceHandler.blank_result_dict()
+    result['id'] = 'jsonrpc'
+    if 'id' in rows[0]:
+        rows = rpc_utils._gather_unique_dicts(rows)
+    result['result'] = _legacy_prepare_data(rows)
+    return len(serviceHandler.ServiceHandler.translateResult(result))
+
+
+def _encode(rows):
+    """Prepare and encode a response in chunks.
+
+    @return: The size of the largest string built.
+    """
+    result = serviceHandler.ServiceHandler.blank_result_dict()
+    result['id'] = 'jsonrpc'
+    result['result'] = rpc_utils.prepare_for_serialization(rows)
+    chunks = serviceHandler.ServiceHandler.translateResultStream(result)
+    if isinstance(chunks, basestring):
+        return len(chunks)
+    return max(len(chunk) for chunk in chunks)
+
+
+def _legacy_decode(request):
+    """Decode a request like serviceHandler did before.
+
+    @return: The size of the request.
+    """
+    _legacy_convert_json(serviceHandler.json_decoder.decode(request))
+    return len(request)
+
+
+def _decode(request):
+    """Decode a request.
+
+    @return: The size of the request.
+    """
+    serviceHandler.ServiceHandler.translateRequest(request)
+    return len(request)
+
+
+def _time(func, data, repeat):
+    """Time the best of repeat runs of func on data.
+
+    @return: A tuple of (seconds, the value returned by func).
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        value = func(data)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def main():
+    """Run the legacy and new paths on each data set and print them."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 10000, 50000],
+                        help='Numbers of rows of the responses.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+
+    print('%-22s %8s %10s %10s %12s %12s' % (
+            'data', 'rows', 'legacy_s', 'new_s', 'legacy_max_b',
+            'new_max_b'))
+    for rows in args.rows:
+        cases = [('get_hosts', _legacy_encode, _encode,
+                  [_host(i) for i in range(rows)]),
+                 ('get_host_queue_entries', _legacy_encode, _encode,
+                  [_host_queue_entry(i) for i in range(rows)]),
+                 ('get_detailed_test_views', _legacy_encode, _encode,
+                  [_test_view(i) for i in range(rows)]),
+                 ('request', _legacy_decode, _decode,
+                  serviceHandler.json_encoder.encode(
+                          {'method': 'get_hosts', 'id': 'jsonrpc',
+                           'params': [{'hostname__in': [
+                                   _host(i)['hostname']
+                                   for i in range(rows)]}]}))]
+        for name, legacy_func, func, data in cases:
+            legacy_seconds, legacy_size = _time(legacy_func, data,
+                                                args.repeat)
+            seconds, size = _time(func, data, args.repeat)
+            print('%-22s %8d %10.3f %10.3f %12d %12d' % (
+                    name, rows, legacy_seconds, seconds, legacy_size, size))
+
+
+if __name__ == '__main__':
+    main()
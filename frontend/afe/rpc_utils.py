@@ -65,20 +65,43 @@ def prepare_rows_as_nested_dicts(query, nested_dict_column_names):
     return prepare_for_serialization(all_dicts)
 
 
+# Types of the values _prepare_data leaves as they are.
+_PLAIN_TYPES = frozenset([str, unicode, int, long, float, bool, type(None)])
+
+
 def _prepare_data(data):
     """
     Recursively process data structures, performing necessary type
     conversions to values in data to allow for RPC serialization:
     -convert datetimes to strings
     -convert tuples and sets to lists
+    Dicts and lists are only copied if some of their values are converted.
     """
-    if isinstance(data, dict):
-        new_data = {}
+    if type(data) in _PLAIN_TYPES:
+        return data
+    elif isinstance(data, dict):
+        new_data = None
         for key, value in data.iteritems():
-            new_data[key] = _prepare_data(value)
-        return new_data
-    elif (isinstance(data, list) or isinstance(data, tuple) or
-          isinstance(data, set)):
+            if type(value) in _PLAIN_TYPES:
+                continue
+            new_value = _prepare_data(value)
+            if new_value is not value:
+                if new_data is None:
+                    new_data = dict(data)
+                new_data[key] = new_value
+        return data if new_data is None else new_data
+    elif isinstance(data, list):
+        new_data = None
+        for i, item in enumerate(data):
+            if type(item) in _PLAIN_TYPES:
+                continue
+            new_item = _prepare_data(item)
+            if new_item is not item:
+                if new_data is None:
+                    new_data = list(data)
+                new_data[i] = new_item
+        return data if new_data is None else new_data
+    elif isinstance(data, tuple) or isinstance(data, set):
         return [_prepare_data(item) for item in data]
     elif isinstance(data, datetime.date):
         if data is NULL_DATETIME or data is NULL_DATE:
@@ -106,6 +129,16 @@ def raw_http_response(response_data, content_type=None):
     return response
 
 
+def streaming_http_response(response_chunks, content_type=None):
+    """Build a response sending its content as it's produced.
+
+    @param response_chunks: An iterator of strings.
+    @param content_type: The content type of the response.
+    """
+    return django.http.StreamingHttpResponse(response_chunks,
+                                             mimetype=content_type)
+
+
 def _gather_unique_dicts(dict_iterable):
     """\
     Pick out unique objects (by ID) from an iterable of object dicts.
@@ -983,11 +1016,13 @@ def _persist_records_with_type_sent_from_shard(
     @returns: List of primary keys of the processed records.
     """
     pks = []
+    updates = []
+    current_records = record_type.objects.in_bulk(
+            [serialized_record['id'] for serialized_record in records])
     for serialized_record in records:
         pk = serialized_record['id']
-        try:
-            current_record = record_type.objects.get(pk=pk)
-        except record_type.DoesNotExist:
+        current_record = current_records.get(pk)
+        if current_record is None:
             raise error.UnallowedRecordsSentToMain(
                 'Object with pk %s of type %s does not exist on main.' % (
                     pk, record_type))
@@ -1000,9 +1035,11 @@ def _persist_records_with_type_sent_from_shard(
             # variety. Silently skip this record.
             pass
         else:
-            current_record.update_from_serialized(serialized_record)
+            updates.append((current_record, serialized_record))
             pks.append(pk)
 
+    if updates:
+        record_type.update_all_from_serialized(updates)
     return pks
 
 
@@ -1032,6 +1069,35 @@ def persist_records_sent_from_shard(shard, jobs, hqes):
             job_ids_sent=job_ids_persisted)
 
 
+def update_host_statuses_from_shard(host_ids, host_statuses):
+    """Update the statuses of hosts to the ones sent from a shard.
+
+    All the hosts are loaded with one query, and the hosts changed to the same
+    status are updated with one query. Hosts which don't exist on the main are
+    skipped, find_records_for_shard() reports them back to the shard.
+
+    @param host_ids: List of ids of hosts the shard has.
+    @param host_statuses: List of statuses of the hosts on the shard, in the
+                          order of host_ids.
+    """
+    statuses = dict(zip(host_ids, host_statuses))
+    if not statuses:
+        return
+    changed_hosts = [host for host in models.Host.objects.filter(
+                             id__in=statuses.keys())
+                     if host.status != statuses[host.id]]
+    if not changed_hosts:
+        return
+    models.AclGroup.check_for_acl_violation_hosts(changed_hosts)
+    ids_by_status = collections.defaultdict(list)
+    for host in changed_hosts:
+        ids_by_status[statuses[host.id]].append(host.id)
+    for status, ids in ids_by_status.iteritems():
+        models.Host.objects.filter(id__in=ids).update(status=status)
+    for host in changed_hosts:
+        logging.info('%s -> %s', host.hostname, statuses[host.id])
+
+
 def forward_single_host_rpc_to_shard(func):
     """This decorator forwards rpc calls that modify a host to a shard.
 
@@ -6,6 +6,7 @@
 
 """Unit tests for frontend/afe/rpc_utils.py."""
 
+import datetime
 import mock
 import unittest
 
@@ -15,6 +16,7 @@ from autotest_lib.frontend import setup_django_environment
 from autotest_lib.frontend.afe import frontend_test_utils
 from autotest_lib.frontend.afe import models
 from autotest_lib.frontend.afe import rpc_utils
+from django.db import connection
 
 
 class DjangoModelTest(unittest.TestCase):
@@ -50,6 +52,53 @@ class RpcUtilsTest(unittest.TestCase,
         self.assertFalse(rpc_utils._check_is_server_test('InvalidType'))
 
 
+    def testUpdateHostStatusesFromShard(self):
+        """Ensure host statuses are updated with one query per status."""
+        host_ids = [host.id for host in self.hosts]
+        statuses = ['Repairing', 'Running'] + ['Ready'] * (len(host_ids) - 2)
+        models.Host.objects.filter(id__in=host_ids[2:]).update(status='Ready')
+        missing_host_id = max(host_ids) + 1
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            rpc_utils.update_host_statuses_from_shard(
+                    host_ids + [missing_host_id], statuses + ['Ready'])
+            host_queries = [query['sql'] for query in connection.queries[start:]
+                            if '"afe_hosts"' in query['sql']]
+        finally:
+            connection.use_debug_cursor = None
+        # Select the hosts, then update them to 2 statuses.
+        self.assertEqual(3, len(host_queries))
+        self.assertEqual(
+                statuses,
+                [models.Host.objects.get(id=host_id).status
+                 for host_id in host_ids])
+
+
+class PrepareForSerializationTest(unittest.TestCase):
+    """Unit tests for prepare_for_serialization."""
+
+    def test_converts_values(self):
+        """Test datetimes, tuples and sets are converted without mutation."""
+        row = {'id': 1, 'time': datetime.datetime(2020, 1, 2, 3, 4, 5),
+               'null_time': rpc_utils.NULL_DATETIME, 'ids': (1, 2),
+               'nested': {'labels': set(['a'])}}
+        prepared = rpc_utils.prepare_for_serialization([row])
+        self.assertEqual(prepared, [{'id': 1, 'time': '2020-01-02 03:04:05',
+                                     'null_time': None, 'ids': [1, 2],
+                                     'nested': {'labels': ['a']}}])
+        self.assertEqual(row['ids'], (1, 2))
+        self.assertEqual(row['nested'], {'labels': set(['a'])})
+
+
+    def test_no_copy_if_unchanged(self):
+        """Test data that needs no conversion is not copied."""
+        rows = [{'id': 1, 'name': 'a', 'labels': ['x', 'y'],
+                 'attributes': {'k': 'v'}}]
+        prepared = rpc_utils.prepare_for_serialization(rows)
+        self.assertIs(prepared[0], rows[0])
+
+
 class ConvertToKwargsOnlyTest(unittest.TestCase):
     """Unit tests for _convert_to_kwargs_only()."""
 
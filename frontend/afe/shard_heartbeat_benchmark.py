@@ -0,0 +1,136 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark the database work of shard_heartbeat on synthetic shards.
+
+For each shard size, half the hosts report a new status and a tenth of the
+hosts upload a finished job with its host queue entry. The per record path
+shard_heartbeat used before is compared with the bulk one, reporting wall
+time and the number of queries on the test database, e.g.
+
+    ./shard_heartbeat_benchmark.py --hosts 500 2000 5000
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import time
+
+import common
+# import has side-effects, must appear before any django imports.
+from autotest_lib.frontend import setup_django_environment
+
+from autotest_lib.frontend import setup_test_environment
+from autotest_lib.frontend.afe import models
+from autotest_lib.frontend.afe import rpc_utils
+from django.db import connection
+
+
+def _legacy_update_host_statuses(host_ids, host_statuses):
+    """Update host statuses one by one, as shard_heartbeat did before."""
+    for i in range(len(host_ids)):
+        host_model = models.Host.objects.get(pk=host_ids[i])
+        if host_model.status != host_statuses[i]:
+            host_model.status = host_statuses[i]
+            host_model.save()
+
+
+def _legacy_persist_records(shard, records, record_type, *args):
+    """Persist records one by one, as persist_records_sent_from_shard did."""
+    pks = []
+    for serialized_record in records:
+        current_record = record_type.objects.get(pk=serialized_record['id'])
+        current_record.sanity_check_update_from_shard(
+                shard, serialized_record, *args)
+        current_record.update_from_serialized(serialized_record)
+        pks.append(serialized_record['id'])
+    return pks
+
+
+def _legacy_heartbeat(shard, jobs, hqes, host_ids, host_statuses):
+    """Do the database work of the previous shard_heartbeat."""
+    job_ids = _legacy_persist_records(shard, jobs, models.Job)
+    _legacy_persist_records(shard, hqes, models.HostQueueEntry, job_ids)
+    _legacy_update_host_statuses(host_ids, host_statuses)
+
+
+def _bulk_heartbeat(shard, jobs, hqes, host_ids, host_statuses):
+    """Do the database work of shard_heartbeat."""
+    rpc_utils.persist_records_sent_from_shard(shard, jobs, hqes)
+    rpc_utils.update_host_statuses_from_shard(host_ids, host_statuses)
+
+
+def _create_shard(num_hosts):
+    """Create a shard with hosts and a finished job on a tenth of them.
+
+    @return: A tuple of (shard, serialized jobs, serialized hqes, host ids,
+             host statuses reported by the shard).
+    """
+    label = models.Label.objects.create(name='board:benchmark')
+    shard = models.Shard.objects.create(hostname='shard1')
+    shard.labels.add(label)
+    models.Host.objects.bulk_create(
+            [models.Host(hostname='host%d' % i, status='Ready', shard=shard)
+             for i in range(num_hosts)])
+    hosts = list(models.Host.objects.all())
+    jobs = []
+    hqes = []
+    for host in hosts[::10]:
+        job = models.Job.objects.create(
+                name='job', owner='autotest_system', control_file='control',
+                synch_count=1, shard=shard,
+                created_on=datetime.datetime.now())
+        hqe = models.HostQueueEntry.objects.create(
+                job=job, host=host, status='Running', active=True)
+        job.name = 'job-done'
+        jobs.append(job.serialize(include_dependencies=False))
+        hqe.status = 'Completed'
+        hqe.active = False
+        hqe.complete = True
+        hqes.append(hqe.serialize(include_dependencies=False))
+    statuses = ['Repairing' if i % 2 else 'Ready' for i in range(num_hosts)]
+    return shard, jobs, hqes, [host.id for host in hosts], statuses
+
+
+def _measure(heartbeat, num_hosts):
+    """Run a heartbeat on a fresh database.
+
+    @return: A tuple of (seconds, number of queries).
+    """
+    setup_test_environment.set_up()
+    try:
+        args = _create_shard(num_hosts)
+        connection.use_debug_cursor = True
+        start_queries = len(connection.queries)
+        start = time.time()
+        heartbeat(*args)
+        elapsed = time.time() - start
+        queries = len(connection.queries) - start_queries
+    finally:
+        connection.use_debug_cursor = None
+        setup_test_environment.tear_down()
+    return elapsed, queries
+
+
+def main():
+    """Run both heartbeats for each shard size and print a comparison."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, nargs='+',
+                        default=[500, 2000, 5000],
+                        help='Numbers of hosts of the shards.')
+    args = parser.parse_args()
+
+    print('%-8s %-8s %10s %10s' % ('hosts', 'path', 'seconds', 'queries'))
+    for num_hosts in args.hosts:
+        for name, heartbeat in (('legacy', _legacy_heartbeat),
+                                ('bulk', _bulk_heartbeat)):
+            seconds, queries = _measure(heartbeat, num_hosts)
+            print('%-8d %-8s %10.2f %10d' % (num_hosts, name, seconds,
+                                             queries))
+
+
+if __name__ == '__main__':
+    main()
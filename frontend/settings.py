@@ -100,6 +100,8 @@ TEMPLATE_LOADERS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    # Compresses responses for clients which accept gzip, it must be first.
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'frontend.apache_auth.ApacheAuthMiddleware',
@@ -24,6 +24,7 @@ from autotest_lib.client.common_lib import global_config
 from autotest_lib.client.common_lib import packages
 from autotest_lib.client.common_lib import utils as client_utils
 from autotest_lib.server import installable_object
+from autotest_lib.server import package_cache
 from autotest_lib.server import utils
 from autotest_lib.server import utils as server_utils
 from autotest_lib.server.cros.dynamic_suite.constants import JOB_REPO_URL
@@ -1447,18 +1448,35 @@ class client_logger(object):
         # iterate over src_dirs until we find one that exists, then tar it
         for src_dir in src_dirs:
             if os.path.exists(src_dir):
+                with package_cache.get_package(
+                        pkg_name, src_dir, self._tar_package) as tarball_path:
+                    if tarball_path:
+                        self.host.send_file(tarball_path, remote_dest)
+                        return
                 try:
                     logging.info('Bundling %s into %s', src_dir, pkg_name)
                     temp_dir = autotemp.tempdir(unique_id='autoserv-packager',
                                                 dir=self.job.tmpdir)
-                    tarball_path = self.job.pkgmgr.tar_package(
-                        pkg_name, src_dir, temp_dir.name, " .")
+                    tarball_path = self._tar_package(pkg_name, src_dir,
+                                                     temp_dir.name)
                     self.host.send_file(tarball_path, remote_dest)
                 finally:
                     temp_dir.clean()
                 return
 
 
+    def _tar_package(self, pkg_name, src_dir, dest_dir):
+        """Tar a package directory into dest_dir.
+
+        @param pkg_name: The tarball name of the package.
+        @param src_dir: The directory of the package.
+        @param dest_dir: The directory to create the tarball in.
+
+        @return: The path of the tarball.
+        """
+        return self.job.pkgmgr.tar_package(pkg_name, src_dir, dest_dir, " .")
+
+
     def log_warning(self, msg, warning_type):
         """Injects a WARN message into the current status logging stream."""
         timestamp = int(time.time())
@@ -11,6 +11,7 @@ import abc
 import logging
 import os
 import re
+import time
 
 import common
 from autotest_lib.client.common_lib import error, utils
@@ -21,6 +22,15 @@ from six.moves import filter
 
 # Relevant CrosDynamicSuiteExceptions are defined in client/common_lib/error.py.
 
+# Listings of the directories searched by FileSystemGetter, by pattern and
+# directory, kept while the modification time of the directory stays the same.
+_directory_listings = {}
+
+# A listing is not kept if the directory was modified less than this many
+# seconds before it was listed, as later changes within the resolution of
+# the mtime would go unnoticed.
+_RACY_SECS = 2
+
 
 class ControlFileGetter(six.with_metaclass(abc.ABCMeta, object)):
     """
@@ -64,6 +74,27 @@ class ControlFileGetter(six.with_metaclass(abc.ABCMeta, object)):
         pass
 
 
+    def get_index_scope(self):
+        """
+        Name the control files of this getter in the control file index.
+
+        @return A string, the same for getters of the same control files, or
+                None if the control files of this getter can't be indexed.
+        """
+        return None
+
+
+    def get_control_file_stamp(self, test_path):
+        """
+        Return a value telling whether a control file changed.
+
+        @param test_path: the path to the control file.
+        @return A value that changes whenever the contents of the control file
+                change, or None if that can't be told without reading it.
+        """
+        return None
+
+
 class SuiteControlFileGetter(ControlFileGetter):
     """Interface that additionally supports getting by suite."""
 
@@ -198,8 +229,45 @@ class FileSystemGetter(CacheingAndFilteringControlFileGetter):
                           'Getting all control files instead.')
 
 
+        directories = list(self._paths)
+        files = []
+        while len(directories) > 0:
+            directory = directories.pop()
+            listing = self._list_directory(directory)
+            if listing:
+                files.extend(listing[0])
+                directories.extend(listing[1])
+        self._files = files
+        if not self._files:
+            msg = 'No control files under ' + ','.join(self._paths)
+            raise error.NoControlFileList(msg)
+        return [f for f in self._files if self._is_useful_file(f)]
+
+
+    def _list_directory(self, directory):
+        """
+        List the control files and subdirectories of |directory|.
+
+        Listings are kept while the modification time of |directory| stays
+        the same, so that only the directories that changed are read again.
+        Directories modified just before they were listed are always read
+        again, see |_RACY_SECS|.
+
+        @param directory: the directory to list.
+        @return A tuple of (control file paths, subdirectory paths), or None
+                if |directory| doesn't exist.
+        """
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return None
+        key = (self._CONTROL_PATTERN, directory)
+        cached = _directory_listings.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        listed_time = time.time()
+
         regexp = re.compile(self._CONTROL_PATTERN)
-        directories = self._paths
         # Some of our callers are ill-considered and request that we
         # search all of /usr/local/autotest (crbug.com/771823).
         # Fixing the callers immediately is somewhere between a
@@ -208,32 +276,54 @@ class FileSystemGetter(CacheingAndFilteringControlFileGetter):
         blacklist = {
             'site-packages', 'venv', 'results', 'logs', 'containers',
         }
-        while len(directories) > 0:
-            directory = directories.pop()
-            if not os.path.exists(directory):
-                continue
-            try:
-                for name in os.listdir(directory):
-                    if name in blacklist:
-                        continue
-                    fullpath = os.path.join(directory, name)
-                    if os.path.isfile(fullpath):
-                        if regexp.search(name):
-                            # if we are a control file
-                            self._files.append(fullpath)
-                    elif (not os.path.islink(fullpath)
-                          and os.path.isdir(fullpath)):
-                        directories.append(fullpath)
-            except OSError:
-                # Some directories under results/ like the Chrome Crash
-                # Reports will cause issues when attempted to be searched.
-                logging.error('Unable to search directory %s for control '
-                              'files.', directory)
-                pass
-        if not self._files:
-            msg = 'No control files under ' + ','.join(self._paths)
-            raise error.NoControlFileList(msg)
-        return [f for f in self._files if self._is_useful_file(f)]
+        files = []
+        directories = []
+        try:
+            for name in os.listdir(directory):
+                if name in blacklist:
+                    continue
+                fullpath = os.path.join(directory, name)
+                if os.path.isfile(fullpath):
+                    if regexp.search(name):
+                        # if we are a control file
+                        files.append(fullpath)
+                elif (not os.path.islink(fullpath)
+                      and os.path.isdir(fullpath)):
+                    directories.append(fullpath)
+        except OSError:
+            # Some directories under results/ like the Chrome Crash
+            # Reports will cause issues when attempted to be searched.
+            logging.error('Unable to search directory %s for control '
+                          'files.', directory)
+            return files, directories
+        if listed_time - mtime >= _RACY_SECS:
+            _directory_listings[key] = (mtime, (files, directories))
+        else:
+            _directory_listings.pop(key, None)
+        return files, directories
+
+
+    def get_index_scope(self):
+        """
+        Name the control files under |self._paths| in the index.
+
+        @return A string naming the searched directories.
+        """
+        return 'filesystem:' + ','.join(sorted(self._paths))
+
+
+    def get_control_file_stamp(self, test_path):
+        """
+        Return the modification time and size of the file at |test_path|.
+
+        @return A tuple of (mtime, size), or None if the file can't be
+                stat'ed.
+        """
+        try:
+            st = os.stat(test_path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
 
 
     def get_control_file_contents(self, test_path):
@@ -280,6 +370,27 @@ class DevServerGetter(CacheingAndFilteringControlFileGetter,
         return DevServerGetter(build, ds)
 
 
+    def get_index_scope(self):
+        """
+        Name the control files of |self._build| in the index.
+
+        @return A string naming the build.
+        """
+        return 'devserver:' + self._build
+
+
+    def get_control_file_stamp(self, test_path):
+        """
+        Return the build of the control file at |test_path|.
+
+        The control files of a build never change, so the build tells them
+        apart without fetching them from |self._dev_server|.
+
+        @return |self._build|.
+        """
+        return self._build
+
+
     def _get_control_file_list(self, suite_name=''):
         """
         Gather a list of paths to control files from |self._dev_server|.
@@ -7,6 +7,10 @@
 """Unit tests for client/common_lib/cros/control_file_getter.py."""
 
 import mox
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 import common
@@ -167,5 +171,55 @@ class DevServerGetterTest(mox.MoxTestBase):
                           name)
 
 
+class FileSystemGetterTest(unittest.TestCase):
+    """Unit tests for control_file_getter.FileSystemGetter."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.tmpdir, 'test')
+        os.mkdir(self.test_dir)
+        self._add_control_file('control')
+        self.getter = control_file_getter.FileSystemGetter([self.tmpdir])
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def _add_control_file(self, name, mtime=None):
+        """Create a control file, keeping the test directory's mtime.
+
+        @param name: The name of the control file.
+        @param mtime: The mtime to give the test directory, or None to
+                      keep the one set by creating the file.
+        """
+        open(os.path.join(self.test_dir, name), 'w').close()
+        if mtime is not None:
+            os.utime(self.test_dir, (mtime, mtime))
+
+
+    def _listed_names(self):
+        return sorted(os.path.basename(path)
+                      for path in self.getter.get_control_file_list())
+
+
+    def testListingKept(self):
+        """Listings of directories not modified since are reused."""
+        mtime = time.time() - 60
+        os.utime(self.test_dir, (mtime, mtime))
+        self.assertEqual(['control'], self._listed_names())
+        self._add_control_file('control.new', mtime)
+        self.assertEqual(['control'], self._listed_names())
+
+
+    def testRacyListingNotKept(self):
+        """Directories modified just before being listed are read again."""
+        mtime = time.time()
+        os.utime(self.test_dir, (mtime, mtime))
+        self.assertEqual(['control'], self._listed_names())
+        self._add_control_file('control.new', mtime)
+        self.assertEqual(['control', 'control.new'], self._listed_names())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,182 @@
+# Lint as: python2, python3
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Persistent index of parsed control files.
+
+Parsing the control files is most of the work of finding the tests of a
+suite. The index keeps the ControlData parsed from each control file along
+with a stamp from the control file getter telling whether the file changed,
+e.g. its mtime and size on disk, or the build it comes from on a devserver,
+so that only the control files that changed are parsed again.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+from six.moves import cPickle as pickle
+
+import common
+from autotest_lib.client.common_lib import global_config
+
+
+INDEX_DIR = (global_config.global_config.get_config_value(
+        'CROS', 'control_file_index_dir', default='') or
+             os.path.join(tempfile.gettempdir(), 'autotest_control_file_index'))
+# Index files not used for this long are removed.
+INDEX_MAX_AGE_SECS = 7 * 24 * 60 * 60
+# Bump when the contents of the index files change.
+_FORMAT_VERSION = 1
+
+
+class ControlFileIndex(object):
+    """The ControlData of a set of control files, by path.
+
+    The index of a scope is loaded from disk when created, and replaced with
+    the control files looked up or added since by save().
+    """
+
+    def __init__(self, scope, index_dir=None):
+        """
+        @param scope: A string naming the set of control files indexed, e.g.
+                      the control files of a suite of a build.
+        @param index_dir: Directory of the index files. Defaults to
+                          INDEX_DIR.
+        """
+        self._index_dir = index_dir or INDEX_DIR
+        # Pickles don't carry over between python 2 and 3.
+        scope = '%d:%s' % (sys.version_info[0], scope)
+        self._path = os.path.join(
+                self._index_dir,
+                hashlib.sha1(scope.encode('utf-8')).hexdigest())
+        self._entries = self._load()
+        self._used = {}
+        self._changed = False
+
+
+    def _load(self):
+        """Read the index file of the scope.
+
+        @return: A dict of path: (stamp, ControlData), empty if the index
+                 file is missing or unusable.
+        """
+        if not self._is_safe_dir():
+            return {}
+        try:
+            with open(self._path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return {}
+        try:
+            version, entries = pickle.loads(zlib.decompress(data))
+        except Exception as e:
+            logging.warning('Ignoring bad control file index %s: %s',
+                            self._path, e)
+            return {}
+        return entries if version == _FORMAT_VERSION else {}
+
+
+    def _is_safe_dir(self):
+        """Check the index directory is only writable by us.
+
+        The index files are pickles, which must not be loaded from a
+        directory anyone else can write to, like a shared /tmp.
+
+        @return: True if the directory is ours and not writable by others.
+        """
+        try:
+            st = os.stat(self._index_dir)
+        except OSError:
+            return False
+        return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+    def get(self, path, stamp):
+        """Get the ControlData of a control file if it didn't change.
+
+        @param path: The path of the control file.
+        @param stamp: The stamp of the control file from the getter.
+
+        @return: The indexed ControlData, or None if the control file isn't
+                 indexed with this stamp.
+        """
+        entry = self._entries.get(path)
+        if stamp is None or entry is None or entry[0] != stamp:
+            return None
+        self._used[path] = entry
+        return entry[1]
+
+
+    def add(self, path, stamp, test):
+        """Index the ControlData of a control file.
+
+        @param path: The path of the control file.
+        @param stamp: The stamp of the control file from the getter, taken
+                      before reading it.
+        @param test: The ControlData parsed from the control file.
+        """
+        if stamp is not None:
+            self._used[path] = (stamp, test)
+            self._changed = True
+
+
+    def save(self):
+        """Replace the index file with the control files used since loading.
+
+        The index file is only rewritten when it changed, and index files
+        left unused for INDEX_MAX_AGE_SECS are removed. Failures are logged,
+        the index is only an optimization.
+        """
+        try:
+            if not os.path.isdir(self._index_dir):
+                os.makedirs(self._index_dir, 0o700)
+            if not self._is_safe_dir():
+                logging.warning('Not saving the control file index, %s is '
+                                'writable by others.', self._index_dir)
+                return
+            if self._changed or len(self._used) != len(self._entries):
+                self._write()
+            elif self._entries:
+                os.utime(self._path, None)
+            self._remove_old_index_files()
+        except (IOError, OSError) as e:
+            logging.warning('Failed to save control file index %s: %s',
+                            self._path, e)
+
+
+    def _write(self):
+        """Atomically write the control files used to the index file."""
+        data = zlib.compress(pickle.dumps((_FORMAT_VERSION, self._used),
+                                          pickle.HIGHEST_PROTOCOL))
+        fd, temp_path = tempfile.mkstemp(dir=self._index_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(temp_path, self._path)
+        except:
+            os.unlink(temp_path)
+            raise
+        self._entries = dict(self._used)
+        self._changed = False
+
+
+    def _remove_old_index_files(self):
+        """Remove the index files not used for INDEX_MAX_AGE_SECS."""
+        oldest = time.time() - INDEX_MAX_AGE_SECS
+        for name in os.listdir(self._index_dir):
+            path = os.path.join(self._index_dir, name)
+            try:
+                if os.stat(path).st_mtime < oldest:
+                    os.unlink(path)
+            except OSError:
+                pass
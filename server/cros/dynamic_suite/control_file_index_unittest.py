@@ -0,0 +1,160 @@
+#!/usr/bin/python2
+#
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for server/cros/dynamic_suite/control_file_index.py."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import common
+
+from autotest_lib.server.cros.dynamic_suite import control_file_getter
+from autotest_lib.server.cros.dynamic_suite import control_file_index
+from autotest_lib.server.cros.dynamic_suite import suite_common
+
+
+_CONTROL = """
+AUTHOR = 'chromeos-test'
+NAME = '%s'
+TIME = 'SHORT'
+TEST_TYPE = 'client'
+ATTRIBUTES = 'suite:%s'
+DOC = 'A test.'
+
+job.run_test('dummy_Pass')
+"""
+
+
+class ControlFileIndexTest(unittest.TestCase):
+    """Tests ControlFileIndex."""
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+
+
+    def _index(self):
+        return control_file_index.ControlFileIndex('scope', self.index_dir)
+
+
+    def test_saved_entries(self):
+        """Saved control files are found again while their stamp is kept."""
+        index = self._index()
+        index.add('a/control', 1, {'name': 'a'})
+        index.add('b/control', 1, {'name': 'b'})
+        index.save()
+
+        index = self._index()
+        self.assertEqual(index.get('a/control', 1), {'name': 'a'})
+        self.assertIsNone(index.get('b/control', 2))
+        self.assertIsNone(index.get('c/control', 1))
+        index.save()
+
+        index = self._index()
+        self.assertEqual(index.get('a/control', 1), {'name': 'a'})
+        self.assertIsNone(index.get('b/control', 1))
+
+
+    def test_no_stamp(self):
+        """Control files without a stamp aren't indexed."""
+        index = self._index()
+        index.add('a/control', None, {'name': 'a'})
+        index.save()
+        self.assertIsNone(self._index().get('a/control', None))
+
+
+    def test_unsafe_dir(self):
+        """Index files aren't loaded from a directory others can write."""
+        index = self._index()
+        index.add('a/control', 1, {'name': 'a'})
+        index.save()
+        os.chmod(self.index_dir, 0o777)
+        self.assertIsNone(self._index().get('a/control', 1))
+
+
+class RetrieveForSuiteTest(unittest.TestCase):
+    """Tests finding the tests of a suite with the index."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.tmpdir, 'index')
+        self.tests_dir = os.path.join(self.tmpdir, 'tests')
+        for name in ('one', 'two'):
+            self._write_control(name, 'bvt')
+        self.index_dir_orig = control_file_index.INDEX_DIR
+        control_file_index.INDEX_DIR = self.index_dir
+        self.parse_orig = suite_common.parse_cf_text_many
+        self.parsed = []
+
+        def parse_cf_text_many(control_file_texts, **dargs):
+            control_file_texts = list(control_file_texts)
+            self.parsed.extend(path for path, _ in control_file_texts)
+            return self.parse_orig(control_file_texts, **dargs)
+
+        suite_common.parse_cf_text_many = parse_cf_text_many
+
+
+    def tearDown(self):
+        control_file_index.INDEX_DIR = self.index_dir_orig
+        suite_common.parse_cf_text_many = self.parse_orig
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def _write_control(self, name, suite):
+        test_dir = os.path.join(self.tests_dir, name)
+        if not os.path.isdir(test_dir):
+            os.makedirs(test_dir)
+        path = os.path.join(test_dir, 'control')
+        with open(path, 'w') as f:
+            f.write(_CONTROL % (name, suite))
+        return path
+
+
+    def _retrieve(self):
+        self.parsed = []
+        getter = control_file_getter.FileSystemGetter([self.tests_dir])
+        return suite_common.retrieve_for_suite(getter)
+
+
+    def test_only_changed_parsed(self):
+        """Only new and changed control files are parsed again."""
+        tests = self._retrieve()
+        self.assertEqual(len(self.parsed), 2)
+        self.assertEqual(sorted(t.name for t in tests.values()),
+                         ['one', 'two'])
+
+        tests = self._retrieve()
+        self.assertEqual(self.parsed, [])
+        self.assertEqual(sorted(t.name for t in tests.values()),
+                         ['one', 'two'])
+
+        changed = self._write_control('one', 'bvt-inline')
+        added = self._write_control('three', 'bvt')
+        tests = self._retrieve()
+        self.assertEqual(sorted(self.parsed), sorted([changed, added]))
+        self.assertEqual(tests[changed].suite, 'bvt-inline')
+        self.assertEqual(len(tests), 3)
+        self.assertIn('dummy_Pass', tests[added].text)
+
+
+    def test_test_args(self):
+        """Control files are parsed again for other test args."""
+        self._retrieve()
+        getter = control_file_getter.FileSystemGetter([self.tests_dir])
+        self.parsed = []
+        tests = suite_common.retrieve_for_suite(getter,
+                                                test_args={'arg': 'value'})
+        self.assertEqual(len(self.parsed), 2)
+        self.assertTrue(all("arg='value'" in t.text for t in tests.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
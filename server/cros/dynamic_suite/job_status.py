@@ -3,15 +3,24 @@
 # found in the LICENSE file.
 
 import datetime
+import httplib
+import logging
 import os
 import random
+import socket
 import time
+import urllib2
 
 
 from autotest_lib.client.common_lib import base_job, global_config, log
 from autotest_lib.client.common_lib import time_utils
+from autotest_lib.frontend.afe.json_rpc import proxy
 
 _DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+# Seconds to block in the wait_for_jobs_finished RPC, and the extra seconds
+# allowed for the HTTP request on top of it.
+_WAIT_FOR_JOBS_TIMEOUT_SECONDS = 120
+_WAIT_FOR_JOBS_RPC_MARGIN_SECONDS = 30
 
 HQE_MAXIMUM_ABORT_RATE_FLOAT = global_config.global_config.get_config_value(
             'SCHEDULER', 'hqe_maximum_abort_rate_float', type=float,
@@ -103,6 +112,8 @@ class JobResultWaiter(object):
         self._afe = afe
         self._tko = tko
         self._job_ids = set()
+        # Cleared if the AFE doesn't support wait_for_jobs_finished.
+        self._wait_for_jobs_supported = True
 
     def add_job(self, job):
         """Add job to wait on.
@@ -129,17 +140,60 @@ class JobResultWaiter(object):
         @yields an iterator of Statuses, one per test.
         """
         while self._job_ids:
-            for job in self._get_finished_jobs():
-                for result in _yield_job_results(self._afe, self._tko, job):
-                    yield result
-                self._job_ids.remove(job.id)
-            self._sleep()
+            jobs = self._get_finished_jobs()
+            if jobs:
+                # Fetch the results of all the jobs finished since the last
+                # poll with one RPC and one TKO query, instead of one of each
+                # per job.
+                job_ids = [job.id for job in jobs]
+                entries = self._afe.get_host_queue_entries_by_job(job_ids)
+                statuses = self._tko.get_jobs_test_statuses_from_db(job_ids)
+                for job in jobs:
+                    for result in _yield_results(job, entries[job.id],
+                                                 statuses[job.id]):
+                        yield result
+                    self._job_ids.remove(job.id)
+            self._wait()
 
     def _get_finished_jobs(self):
         # This is an RPC call which serializes to JSON, so we can't pass
         # in sets.
         return self._afe.get_jobs(id__in=list(self._job_ids), finished=True)
 
+    def _wait(self):
+        """Wait until one of the jobs may have finished.
+
+        Blocks in the wait_for_jobs_finished RPC, which returns as soon as one
+        of the jobs finishes, and falls back to sleeping for the poll interval
+        if the AFE doesn't support it or it fails.
+        """
+        if not self._job_ids:
+            return
+        if self._wait_for_jobs_supported:
+            try:
+                self._afe.run('wait_for_jobs_finished',
+                              job_ids=list(self._job_ids),
+                              timeout_secs=_WAIT_FOR_JOBS_TIMEOUT_SECONDS,
+                              min_rpc_timeout=(
+                                      _WAIT_FOR_JOBS_TIMEOUT_SECONDS +
+                                      _WAIT_FOR_JOBS_RPC_MARGIN_SECONDS))
+                return
+            except proxy.JSONRPCException as e:
+                if 'ServiceMethodNotFound' in str(e):
+                    logging.info('The AFE does not support '
+                                 'wait_for_jobs_finished, polling for job '
+                                 'results instead.')
+                    self._wait_for_jobs_supported = False
+                else:
+                    logging.warning('wait_for_jobs_finished failed, polling '
+                                    'for job results instead: %s', e)
+            except (socket.error, urllib2.URLError,
+                    httplib.HTTPException) as e:
+                # socket.timeout is a socket.error.
+                logging.warning('wait_for_jobs_finished failed, polling '
+                                'for job results instead: %s', e)
+        self._sleep()
+
     def _sleep(self):
         time.sleep(_DEFAULT_POLL_INTERVAL_SECONDS * (random.random() + 0.5))
 
@@ -168,6 +222,19 @@ def _yield_job_results(afe, tko, job):
     # empty it will contain frontend.TestStatus' with fields populated
     # using the results of the db query.
     statuses = tko.get_job_test_statuses_from_db(job.id)
+    return _yield_results(job, entries, statuses)
+
+
+def _yield_results(job, entries, statuses):
+    """
+    Yields the results of an individual job from its HQEs and test statuses.
+
+    @param job: Job object to get results from, as defined in
+                server/frontend.py
+    @param entries: List of the HQE dictionaries of the job.
+    @param statuses: List of frontend.TestStatus of the job.
+    @yields an iterator of Statuses, one per test.
+    """
     if not statuses:
         yield Status('ABORT', job.name)
 
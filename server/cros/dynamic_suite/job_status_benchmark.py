@@ -0,0 +1,161 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark the calls JobResultWaiter makes to collect suite results.
+
+Runs the waiter against a fake AFE and TKO for suites of several sizes, with
+the child jobs finishing over a number of polls, and counts the calls made to
+each, one HQE RPC and one TKO query per job as the waiter did before, and per
+poll with the batched results, e.g.
+
+    ./job_status_benchmark.py --tests 100 500 2000 --latency 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import common
+from autotest_lib.server.cros.dynamic_suite import job_status
+from autotest_lib.server.cros.dynamic_suite.fakes import FakeJob
+from autotest_lib.server.cros.dynamic_suite.fakes import FakeStatus
+
+
+class _CallCounter(object):
+    """Count calls by name, simulating a round trip time for each."""
+
+    def __init__(self, latency):
+        """
+        @param latency: Seconds to sleep per call.
+        """
+        self.calls = {}
+        self._latency = latency
+
+
+    def _call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self._latency:
+            time.sleep(self._latency)
+
+
+class _FakeAFE(_CallCounter):
+    """Fake AFE whose jobs finish in the given number of polls."""
+
+    def __init__(self, jobs, polls, latency):
+        super(_FakeAFE, self).__init__(latency)
+        self._jobs = dict((job.id, job) for job in jobs)
+        self._pending = sorted(self._jobs)
+        self._per_poll = max(1, len(jobs) // polls)
+
+
+    def get_jobs(self, id__in, finished):
+        self._call('get_jobs')
+        finished_ids, self._pending = (self._pending[:self._per_poll],
+                                       self._pending[self._per_poll:])
+        return [self._jobs[job_id] for job_id in finished_ids]
+
+
+    def run(self, call, job):
+        self._call(call)
+        return [s.entry for s in self._jobs[job].statuses]
+
+
+    def get_host_queue_entries_by_job(self, job_ids):
+        self._call('get_host_queue_entries_by_job')
+        return dict((job_id, [s.entry for s in self._jobs[job_id].statuses])
+                    for job_id in job_ids)
+
+
+class _FakeTKO(_CallCounter):
+    """Fake TKO returning the statuses of the fake jobs."""
+
+    def __init__(self, jobs, latency):
+        super(_FakeTKO, self).__init__(latency)
+        self._jobs = dict((job.id, job) for job in jobs)
+
+
+    def get_job_test_statuses_from_db(self, job_id):
+        self._call('get_job_test_statuses_from_db')
+        return self._jobs[job_id].statuses
+
+
+    def get_jobs_test_statuses_from_db(self, job_ids):
+        self._call('get_jobs_test_statuses_from_db')
+        return dict((job_id, self._jobs[job_id].statuses)
+                    for job_id in job_ids)
+
+
+def _legacy_wait_for_results(afe, tko, job_ids):
+    """Collect results the way JobResultWaiter did before, one job at a time.
+
+    @yields an iterator of Statuses, one per test.
+    """
+    job_ids = set(job_ids)
+    while job_ids:
+        for job in afe.get_jobs(id__in=list(job_ids), finished=True):
+            for result in job_status._yield_job_results(afe, tko, job):
+                yield result
+            job_ids.remove(job.id)
+
+
+def _batched_wait_for_results(afe, tko, job_ids):
+    """Collect results with JobResultWaiter.
+
+    @yields an iterator of Statuses, one per test.
+    """
+    waiter = job_status.JobResultWaiter(afe, tko)
+    waiter._job_ids.update(job_ids)
+    waiter._wait = lambda: None
+    return waiter.wait_for_results()
+
+
+def _measure(wait_for_results, num_tests, polls, latency):
+    """Collect the results of a suite of num_tests child jobs.
+
+    @return: A tuple of (seconds, number of results, number of AFE calls,
+             number of TKO calls).
+    """
+    jobs = [FakeJob(i, [FakeStatus('GOOD', 'test%d' % i, '',
+                                   hostname='host%d' % i)])
+            for i in range(num_tests)]
+    for job in jobs:
+        for status in job.statuses:
+            status.entry['job'] = {'id': job.id, 'name': job.name}
+    afe = _FakeAFE(jobs, polls, latency)
+    tko = _FakeTKO(jobs, latency)
+    start = time.time()
+    results = list(wait_for_results(afe, tko, [job.id for job in jobs]))
+    return (time.time() - start, len(results), sum(afe.calls.values()),
+            sum(tko.calls.values()))
+
+
+def main():
+    """Collect suite results both ways and print a comparison."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tests', type=int, nargs='+',
+                        default=[100, 500, 2000],
+                        help='Numbers of child jobs of the suites.')
+    parser.add_argument('--polls', type=int, default=20,
+                        help='Number of polls the child jobs finish over.')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Milliseconds of round trip time per call.')
+    args = parser.parse_args()
+
+    print('%-8s %-8s %10s %10s %10s %10s' % ('tests', 'path', 'seconds',
+                                             'results', 'afe_calls',
+                                             'tko_calls'))
+    for num_tests in args.tests:
+        for name, wait_for_results in (
+                ('legacy', _legacy_wait_for_results),
+                ('batched', _batched_wait_for_results)):
+            print('%-8d %-8s %10.2f %10d %10d %10d' % (
+                    (num_tests, name) +
+                    _measure(wait_for_results, num_tests, args.polls,
+                             args.latency / 1000.0)))
+
+
+if __name__ == '__main__':
+    main()
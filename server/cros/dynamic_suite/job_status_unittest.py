@@ -16,6 +16,7 @@ import mox
 import os
 import shutil
 import six
+import socket
 from six.moves import map
 from six.moves import range
 import tempfile
@@ -24,6 +25,7 @@ import unittest
 
 import common
 
+from autotest_lib.frontend.afe.json_rpc import proxy
 from autotest_lib.server import frontend
 from autotest_lib.server.cros.dynamic_suite import host_spec
 from autotest_lib.server.cros.dynamic_suite import job_status
@@ -61,6 +63,15 @@ class StatusTest(mox.MoxTestBase):
                     job.statuses)
 
 
+    def expect_yield_jobs_entries(self, jobs):
+        job_ids = [job.id for job in jobs]
+        self.afe.get_host_queue_entries_by_job(job_ids).AndReturn(
+                dict((job.id, [s.entry for s in job.statuses])
+                     for job in jobs))
+        self.tko.get_jobs_test_statuses_from_db(job_ids).AndReturn(
+                dict((job.id, job.statuses) for job in jobs))
+
+
     def testJobResultWaiter(self):
         """Should gather status and return records for job summaries."""
         jobs = [FakeJob(0, [FakeStatus('GOOD', 'T0', ''),
@@ -90,13 +101,20 @@ class StatusTest(mox.MoxTestBase):
                 jobs[3:6]
             ]
         self.mox.StubOutWithMock(time, 'sleep')
-        for yield_this in yield_values:
+        for i, yield_this in enumerate(yield_values):
             self.afe.get_jobs(id__in=list(job_id_set),
                               finished=True).AndReturn(yield_this)
+            self.expect_yield_jobs_entries(yield_this)
             for job in yield_this:
-                self.expect_yield_job_entries(job)
                 job_id_set.remove(job.id)
-            time.sleep(mox.IgnoreArg())
+            if i == 0:
+                # The AFE doesn't support waiting, poll from then on.
+                self.expect_wait_for_jobs_finished(list(job_id_set)).AndRaise(
+                        proxy.JSONRPCException(
+                                'ServiceMethodNotFound: '
+                                'wait_for_jobs_finished'))
+            if job_id_set:
+                time.sleep(mox.IgnoreArg())
         self.mox.ReplayAll()
 
         waiter = job_status.JobResultWaiter(self.afe, self.tko)
@@ -107,6 +125,59 @@ class StatusTest(mox.MoxTestBase):
                 self.assertTrue(True in list(map(status.equals_record, results)))
 
 
+    def testJobResultWaiterWaitForJobsFinished(self):
+        """Should block in the AFE instead of sleeping between polls."""
+        jobs = [FakeJob(0, [FakeStatus('GOOD', 'T0', '')]),
+                FakeJob(1, [FakeStatus('FAIL', 'T1', 'broken')])]
+        self.mox.StubOutWithMock(time, 'sleep')
+        self.afe.get_jobs(id__in=[0, 1], finished=True).AndReturn(jobs[:1])
+        self.expect_yield_jobs_entries(jobs[:1])
+        self.expect_wait_for_jobs_finished([1]).AndReturn([1])
+        self.afe.get_jobs(id__in=[1], finished=True).AndReturn(jobs[1:])
+        self.expect_yield_jobs_entries(jobs[1:])
+        self.mox.ReplayAll()
+
+        waiter = job_status.JobResultWaiter(self.afe, self.tko)
+        waiter.add_jobs(jobs)
+        results = list(waiter.wait_for_results())
+        for job in jobs:
+            for status in job.statuses:
+                self.assertTrue(any(map(status.equals_record, results)))
+
+
+    def testJobResultWaiterWaitForJobsFinishedTimeout(self):
+        """Should sleep once when waiting in the AFE fails."""
+        jobs = [FakeJob(i, [FakeStatus('GOOD', 'T%d' % i, '')])
+                for i in range(3)]
+        self.mox.StubOutWithMock(time, 'sleep')
+        self.afe.get_jobs(id__in=[0, 1, 2], finished=True).AndReturn(jobs[:1])
+        self.expect_yield_jobs_entries(jobs[:1])
+        self.expect_wait_for_jobs_finished([1, 2]).AndRaise(
+                socket.timeout('timed out'))
+        time.sleep(mox.IgnoreArg())
+        self.afe.get_jobs(id__in=[1, 2], finished=True).AndReturn(jobs[1:2])
+        self.expect_yield_jobs_entries(jobs[1:2])
+        # Still waiting in the AFE after the failure.
+        self.expect_wait_for_jobs_finished([2]).AndReturn([2])
+        self.afe.get_jobs(id__in=[2], finished=True).AndReturn(jobs[2:])
+        self.expect_yield_jobs_entries(jobs[2:])
+        self.mox.ReplayAll()
+
+        waiter = job_status.JobResultWaiter(self.afe, self.tko)
+        waiter.add_jobs(jobs)
+        results = list(waiter.wait_for_results())
+        for job in jobs:
+            for status in job.statuses:
+                self.assertTrue(any(map(status.equals_record, results)))
+
+
+    def expect_wait_for_jobs_finished(self, job_ids):
+        return self.afe.run('wait_for_jobs_finished',
+                            job_ids=mox.SameElementsAs(job_ids),
+                            timeout_secs=mox.IgnoreArg(),
+                            min_rpc_timeout=mox.IgnoreArg())
+
+
     def testYieldSubdir(self):
         """Make sure subdir are properly set for test and non-test status."""
         job_tag = '0-owner/172.33.44.55'
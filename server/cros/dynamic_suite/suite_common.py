@@ -26,10 +26,13 @@ from autotest_lib.client.common_lib.cros import dev_server
 from autotest_lib.server.cros import provision
 from autotest_lib.server.cros.dynamic_suite import constants
 from autotest_lib.server.cros.dynamic_suite import control_file_getter
+from autotest_lib.server.cros.dynamic_suite import control_file_index
 from autotest_lib.server.cros.dynamic_suite import tools
 
 ENABLE_CONTROLS_IN_BATCH = global_config.global_config.get_config_value(
         'CROS', 'enable_getting_controls_in_batch', type=bool, default=False)
+ENABLE_CONTROL_FILE_INDEX = global_config.global_config.get_config_value(
+        'CROS', 'enable_control_file_index', type=bool, default=True)
 
 
 def canonicalize_suite_name(suite_name):
@@ -391,10 +394,66 @@ def retrieve_for_suite(cf_getter, suite_name='', forgiving_error=False,
     @returns a dictionary of ControlData objects that based on given
              parameters.
     """
-    control_file_texts = get_cf_texts_for_suite(cf_getter, suite_name)
-    return parse_cf_text_many(control_file_texts,
-                              forgiving_error=forgiving_error,
-                              test_args=test_args)
+    scope = (cf_getter.get_index_scope() if ENABLE_CONTROL_FILE_INDEX
+             else None)
+    if scope is None:
+        control_file_texts = get_cf_texts_for_suite(cf_getter, suite_name)
+        return parse_cf_text_many(control_file_texts,
+                                  forgiving_error=forgiving_error,
+                                  test_args=test_args)
+
+    # Injecting test_args changes the parsed control files.
+    index = control_file_index.ControlFileIndex('%s:%s:%r' % (
+            scope, suite_name,
+            sorted(six.iteritems(test_args)) if test_args else None))
+    tests = _retrieve_for_suite_indexed(cf_getter, index, suite_name,
+                                        forgiving_error, test_args)
+    index.save()
+    return tests
+
+
+def _retrieve_for_suite_indexed(cf_getter, index, suite_name,
+                                forgiving_error, test_args):
+    """Find the tests of a suite, only parsing the changed control files.
+
+    Control files are only fetched and parsed when their stamp from the
+    getter differs from the one in the index.
+
+    @param index: control_file_index.ControlFileIndex of the suite.
+
+    See retrieve_for_suite for the other params & returns.
+    """
+    if _should_batch_with(cf_getter):
+        texts = dict(_get_cf_texts_for_suite_batched(cf_getter, suite_name))
+        paths = list(texts)
+    else:
+        texts = None
+        paths = list(_filter_cf_paths(
+                cf_getter.get_control_file_list(suite_name=suite_name)))
+
+    tests = {}
+    stamps = {}
+    changed = []
+    for path in paths:
+        stamp = cf_getter.get_control_file_stamp(path)
+        test = index.get(path, stamp)
+        if test is not None:
+            tests[path] = test
+            continue
+        stamps[path] = stamp
+        if texts is not None:
+            changed.append((path, texts[path]))
+        else:
+            changed.append((path, cf_getter.get_control_file_contents(path)))
+    logging.info('Parsing %d changed of %d control files.', len(changed),
+                 len(paths))
+
+    parsed = parse_cf_text_many(changed, forgiving_error=forgiving_error,
+                                test_args=test_args)
+    for path, test in six.iteritems(parsed):
+        index.add(path, stamps[path], test)
+    tests.update(parsed)
+    return tests
 
 
 def filter_tests(tests, predicate=lambda t: True):
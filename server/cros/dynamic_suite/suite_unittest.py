@@ -68,6 +68,8 @@ class SuiteTest(mox.MoxTestBase):
         self.maxDiff = None
         self.use_batch = suite_common.ENABLE_CONTROLS_IN_BATCH
         suite_common.ENABLE_CONTROLS_IN_BATCH = False
+        self.use_index = suite_common.ENABLE_CONTROL_FILE_INDEX
+        suite_common.ENABLE_CONTROL_FILE_INDEX = False
         self.afe = self.mox.CreateMock(frontend.AFE)
         self.tko = self.mox.CreateMock(frontend.TKO)
 
@@ -103,6 +105,7 @@ class SuiteTest(mox.MoxTestBase):
     def tearDown(self):
         """Teardown."""
         suite_common.ENABLE_CONTROLS_IN_BATCH = self.use_batch
+        suite_common.ENABLE_CONTROL_FILE_INDEX = self.use_index
         super(SuiteTest, self).tearDown()
         shutil.rmtree(self.tmpdir, ignore_errors=True)
 
@@ -149,18 +149,50 @@ class TKO(RpcClient):
         @param job_id: The afe job id to look up.
         @returns a TestStatus object of the resulting information.
         """
+        where = 'job_tag like "%s-%%"' % job_id
+        return self._get_test_statuses_from_db((where, None))
+
+
+    @metrics.SecondsTimerDecorator(
+            'chromeos/autotest/tko/get_jobs_status_duration')
+    def get_jobs_test_statuses_from_db(self, job_ids):
+        """Get the test statuses of several jobs from the database at once.
+
+        Like get_job_test_statuses_from_db, but with a single query on the
+        indexed afe_job_id column rather than a LIKE scan per job.
+
+        @param job_ids: An iterable of afe job ids.
+        @returns a dict mapping each job id to a list of TestStatus objects,
+                 which is empty if the job has no results.
+        """
+        job_ids = list(job_ids)
+        statuses = dict((job_id, []) for job_id in job_ids)
+        if not job_ids:
+            return statuses
+        where = ('afe_job_id IN (%s)' % ','.join(['%s'] * len(job_ids)),
+                 job_ids)
+        for status in self._get_test_statuses_from_db(where):
+            statuses.setdefault(int(status.afe_job_id), []).append(status)
+        return statuses
+
+
+    def _get_test_statuses_from_db(self, where):
+        """Get the test statuses matching a where clause of tko_test_view_2.
+
+        @param where: A where tuple of (clause, values) for db.select.
+        @returns a list of TestStatus objects.
+        """
         if self._db is None:
             self._db = db.db()
         fields = ['status', 'test_name', 'subdir', 'reason',
                   'test_started_time', 'test_finished_time', 'afe_job_id',
                   'job_owner', 'hostname', 'job_tag']
         table = 'tko_test_view_2'
-        where = 'job_tag like "%s-%%"' % job_id
         test_status = []
         # Run commit before we query to ensure that we are pulling the latest
         # results.
         self._db.commit()
-        for entry in self._db.select(','.join(fields), table, (where, None)):
+        for entry in self._db.select(','.join(fields), table, where):
             status_dict = {}
             for key,value in zip(fields, entry):
                 # All callers expect values to be a str object.
@@ -590,6 +622,22 @@ class AFE(RpcClient):
         return self._entries_to_statuses(entries)
 
 
+    def get_host_queue_entries_by_job(self, job_ids):
+        """Get the raw HQEs of several jobs with a single RPC.
+
+        @param job_ids: An iterable of job ids.
+        @returns a dict mapping each job id to a list of HQE dictionaries, as
+                 returned by the get_host_queue_entries RPC.
+        """
+        job_ids = list(job_ids)
+        entries = dict((job_id, []) for job_id in job_ids)
+        if not job_ids:
+            return entries
+        for entry in self.run('get_host_queue_entries', job__id__in=job_ids):
+            entries.setdefault(entry['job']['id'], []).append(entry)
+        return entries
+
+
     def get_host_queue_entries_by_insert_time(self, **kwargs):
         """Like get_host_queue_entries, but using the insert index table.
 
@@ -47,6 +47,57 @@ class RpcClientTest(BaseRpcClientTest):
         self.god.check_playback()
 
 
+class _FakeTkoDb(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.wheres = []
+
+
+    def commit(self):
+        pass
+
+
+    def select(self, fields, table, where):
+        self.wheres.append(where)
+        return self.rows
+
+
+class BatchedResultsTest(unittest.TestCase):
+    def test_get_jobs_test_statuses_from_db(self):
+        tko = frontend.TKO.__new__(frontend.TKO)
+        tko._db = _FakeTkoDb([
+                ('GOOD', 'test1', 'subdir1', '', None, None, 11, 'owner',
+                 'host1', '11-owner/host1'),
+                ('FAIL', 'test2', 'subdir2', 'failed', None, None, 12, 'owner',
+                 'host2', '12-owner/host2'),
+                ('GOOD', 'test3', 'subdir3', '', None, None, 11, 'owner',
+                 'host1', '11-owner/host1')])
+        statuses = tko.get_jobs_test_statuses_from_db([11, 12, 13])
+        self.assertEqual([('afe_job_id IN (%s,%s,%s)', [11, 12, 13])],
+                         tko._db.wheres)
+        self.assertEqual(['test1', 'test3'],
+                         [s.test_name for s in statuses[11]])
+        self.assertEqual(['test2'], [s.test_name for s in statuses[12]])
+        self.assertEqual([], statuses[13])
+
+
+    def test_get_host_queue_entries_by_job(self):
+        afe = frontend.AFE.__new__(frontend.AFE)
+        calls = []
+        def run(call, **dargs):
+            calls.append((call, dargs))
+            return [{'id': 1, 'job': {'id': 11}},
+                    {'id': 2, 'job': {'id': 12}},
+                    {'id': 3, 'job': {'id': 11}}]
+        afe.run = run
+        entries = afe.get_host_queue_entries_by_job([11, 12, 13])
+        self.assertEqual([('get_host_queue_entries',
+                           {'job__id__in': [11, 12, 13]})], calls)
+        self.assertEqual([1, 3], [e['id'] for e in entries[11]])
+        self.assertEqual([2], [e['id'] for e in entries[12]])
+        self.assertEqual([], entries[13])
+
+
 class CrosVersionFormatTestCase(unittest.TestCase):
     def test_format_cros_image_name(self):
         test_board = 'fubar-board'
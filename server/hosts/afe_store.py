@@ -5,6 +5,8 @@
 import logging
 
 import common
+from autotest_lib.client.common_lib import error
+from autotest_lib.frontend.afe import rpc_client_lib
 from autotest_lib.frontend.afe.json_rpc import proxy as rpc_proxy
 from autotest_lib.server.hosts import host_info
 from autotest_lib.server.cros.dynamic_suite import frontend_wrappers
@@ -14,13 +16,18 @@ class AfeStore(host_info.CachingHostInfoStore):
 
     _RETRYING_AFE_TIMEOUT_MIN = 5
     _RETRYING_AFE_RETRY_DELAY_SEC = 10
+    # Commits are given up if the host keeps changing on the AFE meanwhile.
+    _MAX_COMMIT_ATTEMPTS = 3
 
-    def __init__(self, hostname, afe=None):
+    def __init__(self, hostname, afe=None, afe_host=None):
         """
         @param hostname: The name of the host for which we want to track host
                 information.
         @param afe: A frontend.AFE object to make RPC calls. Will create one
                 internally if None.
+        @param afe_host: A frontend.Host object for the host, already obtained
+                from the AFE, to initialize the cached HostInfo with. The
+                HostInfo is obtained from the AFE when first needed if None.
         """
         super(AfeStore, self).__init__()
         self._hostname = hostname
@@ -29,6 +36,9 @@ class AfeStore(host_info.CachingHostInfoStore):
             self._afe = frontend_wrappers.RetryingAFE(
                     timeout_min=self._RETRYING_AFE_TIMEOUT_MIN,
                     delay_sec=self._RETRYING_AFE_RETRY_DELAY_SEC)
+        if afe_host is not None:
+            self._cached_info = host_info.HostInfo(afe_host.labels,
+                                                   afe_host.attributes)
 
 
     def __str__(self):
@@ -57,65 +67,61 @@ class AfeStore(host_info.CachingHostInfoStore):
     def _commit_impl(self, new_info):
         """Commits HostInfo back to the AFE.
 
-        @param new_info: The new HostInfo to commit.
-        """
-        # TODO(pprabhu) crbug.com/680322
-        # This method has a potentially malignent race condition. We obtain a
-        # copy of HostInfo from the AFE and then add/remove labels / attribtes
-        # based on that. If another user tries to commit it's changes in
-        # parallel, we'll end up with corrupted labels / attributes.
-        old_info = self._refresh_impl()
-        self._remove_labels_on_afe(
-                list(set(old_info.labels) - set(new_info.labels)))
-        self._add_labels_on_afe(
-                list(set(new_info.labels) - set(old_info.labels)))
-        self._update_attributes_on_afe(old_info.attributes, new_info.attributes)
-
-
-    def _remove_labels_on_afe(self, labels):
-        """Requests the AFE to remove the given labels.
-
-        @param labels: Remove these.
-        """
-        if not labels:
-            return
-
-        logging.debug('removing labels: %s', labels)
-        try:
-            self._afe.run('host_remove_labels', id=self._hostname,
-                          labels=labels)
-        except rpc_proxy.JSONRPCException as e:
-            raise host_info.StoreError(e)
-
-
-    def _add_labels_on_afe(self, labels):
-        """Requests the AFE to add the given labels.
+        The changes from the HostInfo last read from or committed to the AFE
+        are sent in a single update_host_info RPC, which only applies them if
+        the host didn't change on the AFE since. Otherwise they are applied
+        again on top of a fresh HostInfo, so that concurrent commits don't
+        undo each other's changes.
 
-        @param labels: Add these.
+        @param new_info: The new HostInfo to commit.
         """
-        if not labels:
+        old_info = self._cached_info
+        if old_info is None:
+            old_info = self._refresh_impl()
+        labels_to_remove, labels_to_add = self._diff_labels(old_info, new_info)
+        left_only, right_only, differing = _dict_diff(old_info.attributes,
+                                                      new_info.attributes)
+        attributes_to_set = {key: new_info.attributes[key]
+                             for key in right_only | differing}
+        if not (labels_to_remove or labels_to_add or left_only or
+                attributes_to_set):
             return
 
-        logging.info('adding labels: %s', labels)
-        try:
-            self._afe.run('host_add_labels', id=self._hostname, labels=labels)
-        except rpc_proxy.JSONRPCException as e:
-            raise host_info.StoreError(e)
+        logging.info('removing labels: %s, adding labels: %s',
+                     labels_to_remove, labels_to_add)
+        base_info = old_info
+        for _ in range(self._MAX_COMMIT_ATTEMPTS):
+            try:
+                self._afe.run(
+                        'update_host_info', hostname=self._hostname,
+                        labels_to_add=labels_to_add,
+                        labels_to_remove=labels_to_remove,
+                        attributes_to_set=attributes_to_set,
+                        attributes_to_delete=list(left_only),
+                        expected_version=rpc_client_lib.get_host_info_version(
+                                base_info.labels, base_info.attributes))
+                return
+            except error.HostInfoVersionMismatchException as e:
+                logging.info('HostInfo changed on the AFE, applying the '
+                             'changes again: %s', e)
+                base_info = self._refresh_impl()
+            except rpc_proxy.JSONRPCException as e:
+                raise host_info.StoreError(e)
+        raise host_info.StoreError(
+                'HostInfo of %s kept changing on the AFE, gave up after %d '
+                'attempts' % (self._hostname, self._MAX_COMMIT_ATTEMPTS))
+
+
+    def _diff_labels(self, old_info, new_info):
+        """Calculate the labels to remove/add to commit a HostInfo.
+
+        @param old_info: The HostInfo the host has previously.
+        @param new_info: The HostInfo to commit.
 
-
-    def _update_attributes_on_afe(self, old_attributes, new_attributes):
-        """Updates host attributes on the afe to give dict.
-
-        @param old_attributes: The current attributes on AFE.
-        @param new_attributes: The new host attributes dict to set to.
+        @returns: A tuple of list (labels_to_remove, labels_to_add).
         """
-        left_only, right_only, differing = _dict_diff(old_attributes,
-                                                      new_attributes)
-        for key in left_only:
-            self._afe.set_host_attribute(key, None, hostname=self._hostname)
-        for key in right_only | differing:
-            self._afe.set_host_attribute(key, new_attributes[key],
-                                         hostname=self._hostname)
+        return (list(set(old_info.labels) - set(new_info.labels)),
+                list(set(new_info.labels) - set(old_info.labels)))
 
 
 class AfeStoreKeepPool(AfeStore):
@@ -138,23 +144,7 @@ class AfeStoreKeepPool(AfeStore):
 
         return labels_to_remove, labels_to_add
 
-    def _commit_impl(self, new_info):
-        """Commits HostInfo back to the AFE.
-
-        @param new_info: The new HostInfo to commit.
-
-        It won't delete pool label if no pool label will be added later.
-        """
-        # TODO(pprabhu) crbug.com/680322
-        # This method has a potentially malignent race condition. We obtain a
-        # copy of HostInfo from the AFE and then add/remove labels / attribtes
-        # based on that. If another user tries to commit it's changes in
-        # parallel, we'll end up with corrupted labels / attributes.
-        old_info = self._refresh_impl()
-        labels_to_remove, labels_to_add = self._adjust_pool(old_info, new_info)
-        self._remove_labels_on_afe(labels_to_remove)
-        self._add_labels_on_afe(labels_to_add)
-        self._update_attributes_on_afe(old_info.attributes, new_info.attributes)
+    _diff_labels = _adjust_pool
 
 
 def _dict_diff(left_dict, right_dict):
@@ -11,6 +11,8 @@ import mock
 import unittest
 
 import common
+from autotest_lib.client.common_lib import error
+from autotest_lib.frontend.afe import rpc_client_lib
 from autotest_lib.frontend.afe.json_rpc import proxy as rpc_proxy
 from autotest_lib.server import frontend
 from autotest_lib.server.hosts import afe_store
@@ -48,6 +50,18 @@ class AfeStoreTest(unittest.TestCase):
         self.assertDictEqual(info.attributes, {'attrib1': 'val1'})
 
 
+    def test_seeded_from_afe_host(self):
+        """Test that a store seeded with an AFE host doesn't refresh."""
+        store = afe_store.AfeStore(
+                self.hostname, afe=self.mock_afe,
+                afe_host=self._create_mock_host(['label1'],
+                                                {'attrib1': 'val1'}))
+        info = store.get()
+        self.assertListEqual(info.labels, ['label1'])
+        self.assertDictEqual(info.attributes, {'attrib1': 'val1'})
+        self.assertFalse(self.mock_afe.get_hosts.called)
+
+
     def test_refresh_no_host_raises(self):
         """Test that refresh complains if no host is found."""
         self.mock_afe.get_hosts.return_value = []
@@ -65,21 +79,44 @@ class AfeStoreTest(unittest.TestCase):
         self.assertDictEqual(info.attributes, {'attrib1': 'val1'})
 
 
+    def _assert_update(self, call, old_info, labels_to_add=(),
+                       labels_to_remove=(), attributes_to_set=None,
+                       attributes_to_delete=()):
+        """Verifies an update_host_info RPC call.
+
+        @param call: The mock call of AFE.run.
+        @param old_info: The HostInfo the update is based on.
+        @param labels_to_add: The expected labels to add.
+        @param labels_to_remove: The expected labels to remove.
+        @param attributes_to_set: The expected attributes to set.
+        @param attributes_to_delete: The expected attributes to delete.
+        """
+        args, kwargs = call
+        self.assertEqual(args, ('update_host_info',))
+        self.assertEqual(kwargs.pop('hostname'), self.hostname)
+        self.assertEqual(kwargs.pop('expected_version'),
+                         rpc_client_lib.get_host_info_version(
+                                 old_info.labels, old_info.attributes))
+        self.assertEqual(
+                {key: sorted(value) if isinstance(value, list) else value
+                 for key, value in kwargs.items()},
+                {'labels_to_add': sorted(labels_to_add),
+                 'labels_to_remove': sorted(labels_to_remove),
+                 'attributes_to_set': attributes_to_set or {},
+                 'attributes_to_delete': sorted(attributes_to_delete)})
+
+
     def test_commit_labels(self):
         """Tests that labels are updated correctly on commit."""
         self.mock_afe.get_hosts.return_value = [
                 self._create_mock_host(['label1'], {})]
         info = host_info.HostInfo(['label2'], {})
         self.store._commit_impl(info)
-        self.assertEqual(self.mock_afe.run.call_count, 2)
-        expected_run_calls = [
-                mock.call('host_remove_labels', id='some-host',
-                          labels=['label1']),
-                mock.call('host_add_labels', id='some-host',
-                          labels=['label2']),
-        ]
-        self.mock_afe.run.assert_has_calls(expected_run_calls,
-                                           any_order=True)
+        self.assertEqual(self.mock_afe.run.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo(['label1'], {}),
+                            labels_to_add=['label2'],
+                            labels_to_remove=['label1'])
 
 
     def test_commit_labels_raises(self):
@@ -98,9 +135,10 @@ class AfeStoreTest(unittest.TestCase):
                 self._create_mock_host([], {})]
         info = host_info.HostInfo([], {'attrib1': 'val1'})
         self.store._commit_impl(info)
-        self.assertEqual(self.mock_afe.set_host_attribute.call_count, 1)
-        self.mock_afe.set_host_attribute.assert_called_once_with(
-                'attrib1', 'val1', hostname=self.hostname)
+        self.assertEqual(self.mock_afe.run.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo([], {}),
+                            attributes_to_set={'attrib1': 'val1'})
 
 
     def test_commit_updates_attributes(self):
@@ -109,9 +147,10 @@ class AfeStoreTest(unittest.TestCase):
                 self._create_mock_host([], {'attrib1': 'val1'})]
         info = host_info.HostInfo([], {'attrib1': 'val1_updated'})
         self.store._commit_impl(info)
-        self.assertEqual(self.mock_afe.set_host_attribute.call_count, 1)
-        self.mock_afe.set_host_attribute.assert_called_once_with(
-                'attrib1', 'val1_updated', hostname=self.hostname)
+        self.assertEqual(self.mock_afe.run.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo([], {'attrib1': 'val1'}),
+                            attributes_to_set={'attrib1': 'val1_updated'})
 
 
     def test_commit_deletes_attributes(self):
@@ -120,9 +159,68 @@ class AfeStoreTest(unittest.TestCase):
                 self._create_mock_host([], {'attrib1': 'val1'})]
         info = host_info.HostInfo([], {})
         self.store._commit_impl(info)
-        self.assertEqual(self.mock_afe.set_host_attribute.call_count, 1)
-        self.mock_afe.set_host_attribute.assert_called_once_with(
-                'attrib1', None, hostname=self.hostname)
+        self.assertEqual(self.mock_afe.run.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo([], {'attrib1': 'val1'}),
+                            attributes_to_delete=['attrib1'])
+
+
+    def test_commit_uses_cached_info(self):
+        """Tests that commit doesn't read the host from the AFE again."""
+        self.mock_afe.get_hosts.return_value = [
+                self._create_mock_host(['label1'], {})]
+        info = self.store.get()
+        info.labels.append('label2')
+        self.store.commit(info)
+        self.assertEqual(self.mock_afe.get_hosts.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo(['label1'], {}),
+                            labels_to_add=['label2'])
+
+        info.labels.remove('label1')
+        self.store.commit(info)
+        self.assertEqual(self.mock_afe.get_hosts.call_count, 1)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo(['label1', 'label2'], {}),
+                            labels_to_remove=['label1'])
+
+
+    def test_commit_no_changes(self):
+        """Tests that no RPC is made to commit an unchanged HostInfo."""
+        self.mock_afe.get_hosts.return_value = [
+                self._create_mock_host(['label1'], {'attrib1': 'val1'})]
+        info = self.store.get()
+        self.store.commit(info)
+        self.assertFalse(self.mock_afe.run.called)
+
+
+    def test_commit_version_mismatch(self):
+        """Tests that changes are applied again if the host changed."""
+        self.mock_afe.get_hosts.return_value = [
+                self._create_mock_host(['label1'], {})]
+        info = self.store.get()
+        info.labels.append('label2')
+        self.mock_afe.get_hosts.return_value = [
+                self._create_mock_host(['label1', 'label3'], {})]
+        self.mock_afe.run.side_effect = [
+                error.HostInfoVersionMismatchException('changed'), None]
+        self.store.commit(info)
+        self.assertEqual(self.mock_afe.run.call_count, 2)
+        self._assert_update(self.mock_afe.run.call_args,
+                            host_info.HostInfo(['label1', 'label3'], {}),
+                            labels_to_add=['label2'])
+
+
+    def test_commit_version_mismatch_gives_up(self):
+        """Tests that commit gives up if the host keeps changing."""
+        self.mock_afe.get_hosts.return_value = [
+                self._create_mock_host(['label1'], {})]
+        self.mock_afe.run.side_effect = (
+                error.HostInfoVersionMismatchException('changed'))
+        with self.assertRaises(host_info.StoreError):
+            self.store._commit_impl(host_info.HostInfo(['label2'], {}))
+        self.assertEqual(self.mock_afe.run.call_count,
+                         self.store._MAX_COMMIT_ATTEMPTS)
 
 
     def test_str(self):
@@ -6,8 +6,13 @@
 
 
 import logging
+import re
+import time
+import uuid
 
 import common
+from autotest_lib.client.common_lib import error
+from autotest_lib.client.common_lib import utils
 from autotest_lib.server.hosts import afe_store
 from autotest_lib.server.hosts import host_info
 from autotest_lib.server.hosts import shadowing_store
@@ -43,9 +48,14 @@ class BaseLabel(object):
 
     @property _NAME String that is either the label returned or a prefix of a
                     generated label.
+    @property _PROBE_COMMANDS Commands the label runs on the host with
+                              host.run(), which LabelRetriever runs ahead
+                              of time in one round trip.  See
+                              get_probe_commands().
     """
 
     _NAME = None
+    _PROBE_COMMANDS = ()
 
     def generate_labels(self, host):
         """
@@ -85,6 +95,23 @@ class BaseLabel(object):
             return []
 
 
+    def get_probe_commands(self, host):
+        """
+        Return the commands the label will run on the host.
+
+        The commands are run by LabelRetriever in one round trip before
+        calling get(), and host.run() calls for them made by get() return
+        the results collected.  Subclasses running commands only under some
+        conditions, e.g. when the label isn't cached, can override this
+        method to only return the commands they will run.
+
+        @param host: The host object to check on.
+
+        @returns a list of command strings.
+        """
+        return list(self._PROBE_COMMANDS)
+
+
     def get_all_labels(self):
         """
         Return all possible labels generated by this label class.
@@ -190,6 +217,97 @@ class StringPrefixLabel(StringLabel):
         return prefix_labels, full_labels
 
 
+class _ProbedHost(object):
+    """
+    Host proxy returning the results of commands run ahead of time.
+
+    Other attributes, and commands not probed, are passed through to the
+    host.
+    """
+
+    # Arguments of host.run() which don't change the result of a command.
+    _CACHEABLE_ARGS = frozenset(['ignore_status', 'timeout'])
+
+    def __init__(self, host, results):
+        """
+        @param host: The host to pass through to.
+        @param results: Dictionary of CmdResults by command.
+        """
+        self._host = host
+        self._results = results
+
+
+    def __getattr__(self, name):
+        return getattr(self._host, name)
+
+
+    def run(self, command, *args, **dargs):
+        """Return the probed result of a command, or run it on the host."""
+        result = self._results.get(command)
+        if result is None or args or set(dargs) - self._CACHEABLE_ARGS:
+            return self._host.run(command, *args, **dargs)
+        if not dargs.get('ignore_status') and result.exit_status > 0:
+            msg = result.stderr.strip()
+            if not msg:
+                msg = result.stdout.strip()
+                if msg:
+                    msg = msg.splitlines()[-1]
+            raise error.AutoservRunError('command execution error (%d): %r' %
+                                         (result.exit_status, msg), result)
+        return result
+
+
+    def run_output(self, command, *args, **dargs):
+        """Run a command and return its stdout stripped of whitespace."""
+        return self.run(command, *args, **dargs).stdout.rstrip()
+
+
+def _probe_commands(host, commands):
+    """
+    Run commands on the host in a single remote script.
+
+    Each command runs in a subshell with stdin from /dev/null, and its
+    stdout, stderr and exit status are collected separately, as if it ran
+    on its own.
+
+    @param host: The host to run the commands on.
+    @param commands: List of command strings.
+
+    @returns a dictionary of CmdResults by command, empty if the script
+        couldn't run.
+    """
+    marker = 'LABEL_PROBE_%s' % uuid.uuid4().hex
+    script = ['d=$(mktemp -d) || exit 1']
+    for i, command in enumerate(commands):
+        script.append('(\n%s\n) >"$d/%d.out" 2>"$d/%d.err" </dev/null; '
+                      'echo $? >"$d/%d.rc"' % (command, i, i, i))
+    for i in range(len(commands)):
+        for kind in ('out', 'err', 'rc'):
+            script.append('printf "\\n%s:%d:%s\\n"; cat "$d/%d.%s"' % (
+                    marker, i, kind, i, kind))
+    script.append('rm -rf "$d"')
+    try:
+        output = host.run('\n'.join(script), ignore_status=True).stdout
+    except Exception as e:
+        logging.warning('Failed to probe label commands: %s', e)
+        return {}
+    sections = {}
+    parts = re.split(r'\n%s:(\d+):(out|err|rc)\n' % marker, output)
+    for i, kind, content in zip(parts[1::3], parts[2::3], parts[3::3]):
+        sections[int(i), kind] = content
+    results = {}
+    for i, command in enumerate(commands):
+        try:
+            exit_status = int(sections[i, 'rc'])
+        except (KeyError, ValueError):
+            logging.warning('No result probing label command %r', command)
+            continue
+        results[command] = utils.CmdResult(
+                command=command, stdout=sections[i, 'out'],
+                stderr=sections[i, 'err'], exit_status=exit_status)
+    return results
+
+
 class LabelRetriever(object):
     """This class will assist in retrieving/updating the host labels."""
 
@@ -217,14 +335,53 @@ class LabelRetriever(object):
 
         @param host: The host to get the labels for.
         """
+        return self._get_labels(host, self._labels, 'checking label %s')
+
+
+    def _get_labels(self, host, labels_to_check, message):
+        """
+        Retrieve the labels of some of the label classes for the host.
+
+        The commands the label classes declare are run first in one round
+        trip, then each label class is checked in turn.  The time taken by
+        each label class is logged.
+
+        @param host: The host to get the labels for.
+        @param labels_to_check: List of the label classes to check.
+        @param message: Message logged before checking each label class,
+                with the name of the label class.
+
+        @returns the list of labels.
+        """
+        start = time.time()
+        commands = []
+        for label in labels_to_check:
+            try:
+                for command in label.get_probe_commands(host):
+                    if command not in commands:
+                        commands.append(command)
+            except Exception:
+                logging.exception('error getting probe commands of label %s.',
+                                  label.__class__.__name__)
+        probed_host = host
+        if commands:
+            probed_host = _ProbedHost(host, _probe_commands(host, commands))
+        timings = [('probe', time.time() - start)]
+
         labels = []
-        for label in self._labels:
-            logging.info('checking label %s', label.__class__.__name__)
+        for label in labels_to_check:
+            logging.info(message, label.__class__.__name__)
+            label_start = time.time()
             try:
-                labels.extend(label.get(host))
+                labels.extend(label.get(probed_host))
             except Exception:
                 logging.exception('error getting label %s.',
                                   label.__class__.__name__)
+            timings.append((label.__class__.__name__,
+                            time.time() - label_start))
+        logging.info('Label detection took %.2f seconds: %s',
+                     time.time() - start,
+                     ', '.join('%s %.2f' % timing for timing in timings))
         return labels
 
 
@@ -237,18 +394,17 @@ class LabelRetriever(object):
 
         @returns labels to be updated
         """
-        labels = []
+        labels_to_check = []
         for label in self._labels:
             try:
                 # get only the labels which need to be updated for this task.
                 if label.update_for_task(task_name):
-                    logging.info('checking label update %s',
-                                 label.__class__.__name__)
-                    labels.extend(label.get(host))
+                    labels_to_check.append(label)
             except Exception:
                 logging.exception('error getting label %s.',
                                   label.__class__.__name__)
-        return labels
+        return self._get_labels(host, labels_to_check,
+                                'checking label update %s')
 
 
     def _is_known_label(self, label):
@@ -7,6 +7,8 @@ import unittest
 
 import common
 
+from autotest_lib.client.common_lib import error
+from autotest_lib.client.common_lib import utils as common_utils
 from autotest_lib.server import utils
 from autotest_lib.server.hosts import host_info
 from autotest_lib.server.hosts import base_label
@@ -53,6 +55,31 @@ class TestStringPrefixLabel(base_label.StringPrefixLabel):
         return [self.label_to_return]
 
 
+class TestProbeLabel(base_label.StringPrefixLabel):
+    """TestProbeLabel generates labels from the output of commands."""
+
+    _NAME = 'probe'
+    _PROBE_COMMANDS = ('echo first; echo error >&2; exit 3',
+                       'printf "second\\nline"')
+
+    def generate_labels(self, host):
+        first = host.run(self._PROBE_COMMANDS[0], ignore_status=True)
+        second = host.run_output(self._PROBE_COMMANDS[1])
+        return [first.stdout.strip(), first.stderr.strip(),
+                str(first.exit_status), second.replace('\n', '_')]
+
+
+class TestFailingProbeLabel(base_label.BaseLabel):
+    """TestFailingProbeLabel runs a failing command without ignore_status."""
+
+    _NAME = 'failing_probe'
+    _PROBE_COMMANDS = ('exit 1',)
+
+    def exists(self, host):
+        host.run(self._PROBE_COMMANDS[0])
+        return True
+
+
 class MockAFEHost(utils.EmptyAFEHost):
 
     def __init__(self, labels=None, attributes=None):
@@ -68,6 +95,29 @@ class MockHost(object):
         self.host_info_store = store
 
 
+class LocalHost(MockHost):
+    """MockHost running commands locally."""
+
+    def __init__(self, fail_script=False):
+        super(LocalHost, self).__init__()
+        self.commands = []
+        self._fail_script = fail_script
+
+
+    def run(self, command, ignore_status=False):
+        self.commands.append(command)
+        if self._fail_script and 'LABEL_PROBE' in command:
+            raise error.AutoservRunError('ssh failed', None)
+        try:
+            return common_utils.run(command, ignore_status=ignore_status)
+        except error.CmdError as e:
+            raise error.AutoservRunError(str(e), e.result_obj)
+
+
+    def run_output(self, command):
+        return self.run(command).stdout.rstrip()
+
+
 class BaseLabelUnittests(unittest.TestCase):
     """Unittest for testing base_label.BaseLabel."""
 
@@ -189,6 +239,28 @@ class LabelRetrieverUnittests(unittest.TestCase):
         )
 
 
+    def test_probe_commands(self):
+        """Check the commands of labels are run in one round trip."""
+        host = LocalHost()
+        retriever = base_label.LabelRetriever(
+                [TestProbeLabel(), TestFailingProbeLabel()])
+        self.assertEqual(retriever.get_labels(host),
+                         ['probe:first', 'probe:error', 'probe:3',
+                          'probe:second_line'])
+        self.assertEqual(len(host.commands), 1)
+
+
+    def test_probe_failure(self):
+        """Check labels run their commands when probing fails."""
+        host = LocalHost(fail_script=True)
+        retriever = base_label.LabelRetriever([TestProbeLabel()])
+        self.assertEqual(retriever.get_labels(host),
+                         ['probe:first', 'probe:error', 'probe:3',
+                          'probe:second_line'])
+        self.assertEqual(host.commands[1:],
+                         list(TestProbeLabel._PROBE_COMMANDS))
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -53,19 +53,24 @@ class DeviceSkuLabel(base_label.StringPrefixLabel):
     """Determine the correct device_sku label for the device."""
 
     _NAME =  ds_constants.DEVICE_SKU_LABEL
+    _SKU_CMD = 'mosys platform sku'
 
     def generate_labels(self, host):
         device_sku = host.host_info_store.get().device_sku
         if device_sku:
             return [device_sku]
 
-        mosys_cmd = 'mosys platform sku'
-        result = host.run(command=mosys_cmd, ignore_status=True)
+        result = host.run(command=self._SKU_CMD, ignore_status=True)
         if result.exit_status == 0:
             return [result.stdout.strip()]
 
         return []
 
+    def get_probe_commands(self, host):
+        if host.host_info_store.get().device_sku:
+            return []
+        return [self._SKU_CMD]
+
     def update_for_task(self, task_name):
         # This label is stored in the lab config.
         return task_name in (DEPLOY_TASK_NAME, REPAIR_TASK_NAME, '')
@@ -75,19 +80,24 @@ class BrandCodeLabel(base_label.StringPrefixLabel):
     """Determine the correct brand_code (aka RLZ-code) for the device."""
 
     _NAME =  ds_constants.BRAND_CODE_LABEL
+    _BRAND_CODE_CMD = 'cros_config / brand-code'
 
     def generate_labels(self, host):
         brand_code = host.host_info_store.get().brand_code
         if brand_code:
             return [brand_code]
 
-        cros_config_cmd = 'cros_config / brand-code'
-        result = host.run(command=cros_config_cmd, ignore_status=True)
+        result = host.run(command=self._BRAND_CODE_CMD, ignore_status=True)
         if result.exit_status == 0:
             return [result.stdout.strip()]
 
         return []
 
+    def get_probe_commands(self, host):
+        if host.host_info_store.get().brand_code:
+            return []
+        return [self._BRAND_CODE_CMD]
+
 
 class BluetoothPeerLabel(base_label.StringPrefixLabel):
     """Return the Bluetooth peer labels.
@@ -133,13 +143,15 @@ class Cr50Label(base_label.StringPrefixLabel):
     """Label indicating the cr50 image type."""
 
     _NAME = 'cr50'
+    _VERSION_CMD = 'gsctool -a -f'
+    _PROBE_COMMANDS = (_VERSION_CMD,)
 
     def __init__(self):
         self.ver = None
 
     def exists(self, host):
         # Make sure the gsctool version command runs ok
-        self.ver = host.run('gsctool -a -f', ignore_status=True)
+        self.ver = host.run(self._VERSION_CMD, ignore_status=True)
         return self.ver.exit_status == 0
 
     def _get_version(self, region):
@@ -242,6 +254,11 @@ class AudioLoopbackDongleLabel(base_label.BaseLabel):
         # produces.
         return self._host_run_exists(host)
 
+    def get_probe_commands(self, host):
+        if self._cached_exists(host):
+            return []
+        return [cras_utils.get_cras_nodes_cmd()]
+
     def _cached_exists(self, host):
         """Get the state of AudioLoopbackDongle in the data store"""
         info = host.host_info_store.get()
@@ -339,6 +356,8 @@ class HWIDLabel(base_label.StringLabel):
     """Return all the labels generated from the hwid."""
 
     # We leave out _NAME because hwid_lib will generate everything for us.
+    _HWID_CMD = 'crossystem hwid'
+    _PROBE_COMMANDS = (_HWID_CMD,)
 
     def __init__(self):
         # Grab the key file needed to access the hwid service.
@@ -401,7 +420,7 @@ class HWIDLabel(base_label.StringLabel):
         # use previous values as default
         old_hwid_labels = self._old_label_values(host)
         logging.info("old_hwid_labels: %r", old_hwid_labels)
-        hwid = host.run_output('crossystem hwid').strip()
+        hwid = host.run_output(self._HWID_CMD).strip()
         hwid_info_list = []
         try:
             hwid_info_response = hwid_lib.get_hwid_info(
@@ -128,7 +128,9 @@ class ACPowerVerifier(hosts.Verifier):
     # Setting level to 90% in case we have wearout of it.
     BATTERY_DISCHARGE_MIN = 90
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         info = self._load_info(host)
@@ -273,7 +275,9 @@ class WritableVerifier(hosts.Verifier):
     # encrypted stateful if unencrypted fails.
     _TEST_DIRECTORIES = ['/mnt/stateful_partition', '/var/tmp']
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         # This deliberately stops looking after the first error.
@@ -294,7 +298,9 @@ class EXT4fsErrorVerifier(hosts.Verifier):
     Confirm we have not seen critical file system kernel errors.
     """
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         # grep for stateful FS errors of the type "EXT4-fs error (device sda1):"
@@ -336,7 +342,9 @@ class UpdateSuccessVerifier(hosts.Verifier):
     it still exists.
     """
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         result = host.run('test -f %s' % provisioner.PROVISION_FAILED,
@@ -354,7 +362,9 @@ class UpdateSuccessVerifier(hosts.Verifier):
 class TPMStatusVerifier(hosts.Verifier):
     """Verify that the host's TPM is in a good state."""
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         if _is_virtual_machine(host):
@@ -397,7 +407,9 @@ class TPMStatusVerifier(hosts.Verifier):
 class PythonVerifier(hosts.Verifier):
     """Confirm the presence of a working Python interpreter."""
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         result = host.run('python -c "import json"',
@@ -420,7 +432,9 @@ class PythonVerifier(hosts.Verifier):
 class DevModeVerifier(hosts.Verifier):
     """Verify that the host is not in dev mode."""
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         # Some pools are allowed to be in dev mode
@@ -442,7 +456,9 @@ class DevModeVerifier(hosts.Verifier):
 class DevDefaultBootVerifier(hosts.Verifier):
     """Verify that the host is set to boot the internal disk by default."""
 
-    @timeout_util.TimeoutDecorator(cros_constants.VERIFY_TIMEOUT_SEC)
+    THREAD_SAFE = True
+
+    @repair_utils.verify_timeout(cros_constants.VERIFY_TIMEOUT_SEC)
     def verify(self, host):
         # pylint: disable=missing-docstring
         result = host.run('crossystem dev_default_boot', ignore_status=True)
@@ -5,12 +5,15 @@
 
 import itertools
 import mock
+import threading
+import time
 import unittest
 
 import common
 from autotest_lib.client.common_lib import error
 from autotest_lib.client.common_lib import hosts
 from autotest_lib.client.common_lib.cros import retry
+from autotest_lib.client.common_lib.hosts import repair
 from autotest_lib.server.hosts import cros_firmware
 from autotest_lib.server.hosts import cros_repair
 from autotest_lib.server.hosts import repair_utils
@@ -474,5 +477,74 @@ class CrosRepairUnittests(unittest.TestCase):
                          ctx.exception.message)
 
 
+class _SlowHost(object):
+    """Host answering the commands of cros verifiers after a delay."""
+
+    hostname = 'fake-host'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = 0
+        self.max_running = 0
+
+    def is_up(self):
+        return True
+
+    def run(self, command, ignore_status=False):
+        with self._lock:
+            self._running += 1
+            self.max_running = max(self.max_running, self._running)
+        try:
+            time.sleep(0.2)
+        finally:
+            with self._lock:
+                self._running -= 1
+        if command.startswith('test -f'):
+            return mock.Mock(exit_status=1, stdout='')
+        if command == 'crossystem dev_default_boot':
+            return mock.Mock(exit_status=0, stdout='disk')
+        return mock.Mock(exit_status=0, stdout='')
+
+
+class ThreadSafeVerifierTests(unittest.TestCase):
+    """Tests running the thread safe cros verifiers concurrently."""
+
+    VERIFY_DAG = (
+            (repair_utils.SshVerifier, 'ssh', ()),
+            (cros_repair.PythonVerifier, 'python', ('ssh', )),
+            (cros_repair.DevDefaultBootVerifier, 'dev_default_boot',
+             ('ssh', )),
+            (cros_repair.UpdateSuccessVerifier, 'good_provision', ('ssh', )),
+            (cros_repair.EXT4fsErrorVerifier, 'ext4', ('ssh', )),
+    )
+
+    def test_verifiers_overlap(self):
+        """The independent verifiers run at the same time."""
+        host = _SlowHost()
+        strategy = hosts.RepairStrategy(self.VERIFY_DAG, (), 'cros')
+        with mock.patch.object(repair, 'VERIFY_MAX_WORKERS', 4):
+            strategy.verify(host, silent=True)
+        self.assertGreater(host.max_running, 1)
+        for _, tag, _ in self.VERIFY_DAG:
+            self.assertEqual(hosts.VERIFY_SUCCESS,
+                             strategy.verifier_is_good(tag))
+
+    def test_verify_timeout(self):
+        """Verifiers run in a thread still time out."""
+        @repair_utils.verify_timeout(0.1)
+        def hang():
+            time.sleep(5)
+        outcome = []
+        def call():
+            try:
+                hang()
+            except error.TimeoutException as e:
+                outcome.append(e)
+        thread = threading.Thread(target=call)
+        thread.start()
+        thread.join(2)
+        self.assertEqual(1, len(outcome))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,10 +2,16 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import functools
 import logging
 import socket
+import sys
+import threading
+
+import six
 
 import common
+from autotest_lib.client.common_lib import error
 from autotest_lib.client.common_lib import hosts
 from autotest_lib.server import utils
 from autotest_lib.server.hosts import servo_constants
@@ -14,6 +20,45 @@ from autotest_lib.server.hosts import cros_constants
 from chromite.lib import timeout_util
 
 
+def verify_timeout(max_time):
+    """Decorator to time out a verifier's `verify()` in any thread.
+
+    In the main thread, this is `timeout_util.TimeoutDecorator`, which
+    relies on SIGALRM.  In other threads, e.g. for verifiers with
+    `THREAD_SAFE` set, the call is made in a helper thread that is
+    abandoned if it doesn't finish in time.
+
+    @param max_time     The timeout, in seconds.
+    """
+    def decorator(func):
+        alarm_func = timeout_util.TimeoutDecorator(max_time)(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if isinstance(threading.current_thread(), threading._MainThread):
+                return alarm_func(*args, **kwargs)
+            outcome = []
+            def call():
+                try:
+                    outcome.append((func(*args, **kwargs), None))
+                except Exception:
+                    outcome.append((None, sys.exc_info()))
+            thread = threading.Thread(target=call)
+            thread.daemon = True
+            thread.start()
+            thread.join(max_time)
+            if not outcome:
+                raise error.TimeoutException(
+                        '%s() timed out after %s seconds' %
+                        (func.__name__, max_time))
+            result, exc_info = outcome[0]
+            if exc_info:
+                six.reraise(*exc_info)
+            return result
+        return wrapper
+    return decorator
+
+
 def require_servo(host, ignore_state=False):
     """Require a DUT to have a working servo for a repair action.
 
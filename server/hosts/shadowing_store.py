@@ -56,13 +56,18 @@ class ShadowingStore(host_info.CachingHostInfoStore):
                 mismatch_callback if mismatch_callback is not None
                 else _log_info_mismatch)
         try:
-            self._shadow_store.commit(self._primary_store.get())
+            primary_info = self._primary_store.get()
+            self._shadow_store.commit(primary_info)
         except host_info.StoreError as e:
             metrics.Counter(
                     _METRICS_PREFIX + 'initialization_fail_count').increment()
             logger.exception(
                     'Failed to initialize shadow store. '
                     'Expect primary / shadow desync in the future.')
+        else:
+            # Both stores were just synced, the first get() needn't refresh
+            # them again.
+            self._cached_info = primary_info
 
     def commit_with_substitute(self, info, primary_store=None,
                                shadow_store=None):
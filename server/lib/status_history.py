@@ -35,7 +35,11 @@ the logs explaining a failure or repair event.
 """
 
 import common
+import collections
+import json
+import logging
 import os
+import tempfile
 from autotest_lib.frontend import setup_django_environment
 from django.db import models as django_models
 
@@ -44,6 +48,7 @@ from autotest_lib.client.common_lib import utils
 from autotest_lib.client.common_lib import time_utils
 from autotest_lib.frontend.afe import models as afe_models
 from autotest_lib.server import constants
+from autotest_lib.server import frontend
 
 
 # Values used to describe the diagnosis of a DUT.  These values are
@@ -76,6 +81,14 @@ status_names = {
 }
 
 
+# Number of hosts whose events `HistoryLoader` fetches with a single
+# query.
+_HOSTS_PER_QUERY = 100
+
+# Version of the format of `HistoryLoader` cache files.
+_CACHE_VERSION = 1
+
+
 def parse_time(time_string):
     """Parse time according to a canonical form.
 
@@ -490,6 +503,8 @@ class HostJobHistory(object):
         self._host = afehost
         # Don't spend time on queries until they're needed.
         self._history = None
+        # Set by a `HistoryLoader` loading `_history` with other hosts.
+        self._loader = None
         self._status_interval = None
         self._status_diagnosis = None
         self._status_task = None
@@ -507,6 +522,8 @@ class HostJobHistory(object):
 
 
     def __iter__(self):
+        if self._history is None and self._loader is not None:
+            self._loader.load(self)
         if self._history is None:
             self._history = self._get_history(self.start_time,
                                               self.end_time)
@@ -632,6 +649,270 @@ class HostJobHistory(object):
         return diagnosis, self._status_task
 
 
+class HistoryLoader(object):
+    """Load the histories of a set of hosts with a few bulk queries.
+
+    Iterating a `HostJobHistory` queries the special tasks and the
+    HQEs of its host.  When the histories of many hosts are iterated,
+    a `HistoryLoader` shared by the histories instead fetches the
+    events of up to `_HOSTS_PER_QUERY` hosts with two queries: the
+    host of the history being iterated, and the next hosts with
+    histories not loaded yet.  Share a loader only among histories
+    that will all be iterated.
+
+    The events can be cached in a local file.  A later loader using
+    the file, for a time interval starting inside the cached one, only
+    fetches the events that finished after the cached interval.
+
+    """
+
+    def __init__(self, afe, histories, cache_file=None):
+        """Load the given histories together.
+
+        @param afe         Autotest frontend
+        @param histories   The `HostJobHistory` instances to load.
+        @param cache_file  Path of a file to cache the events in, or
+                           `None` not to cache them.
+
+        """
+        self._afe = afe
+        self._pending = collections.OrderedDict(
+                (id(history), history) for history in histories)
+        self._cache_file = cache_file
+        self._cache = None
+        start_times = [history.start_time for history in histories
+                       if history.start_time is not None]
+        self._oldest_start = min(start_times) if start_times else None
+        for history in histories:
+            history._loader = self
+
+
+    def load(self, history):
+        """Fill in a history, with the next histories not loaded yet.
+
+        Histories of hosts whose events could not be fetched are left
+        to query them on their own.
+
+        @param history  The `HostJobHistory` about to be iterated.
+
+        """
+        if self._pending.pop(id(history), None) is None:
+            return
+        batch = [history]
+        while self._pending and len(batch) < _HOSTS_PER_QUERY:
+            batch.append(self._pending.popitem(last=False)[1])
+        if self._cache is None:
+            self._cache = self._read_cache()
+        windows = collections.defaultdict(list)
+        for pending in batch:
+            windows[pending.start_time, pending.end_time].append(pending)
+        for (start_time, end_time), histories in windows.items():
+            self._load_window(histories, start_time, end_time, self._cache)
+        if self._oldest_start is not None:
+            # Entries ending before all the intervals can't be used
+            # again.
+            for host_id, entry in list(self._cache.items()):
+                if entry['end'] < self._oldest_start:
+                    del self._cache[host_id]
+        self._write_cache(self._cache)
+
+
+    def _load_window(self, histories, start_time, end_time, cache):
+        """Fill in the histories of a time interval.
+
+        @param histories   The `HostJobHistory` instances to load.
+        @param start_time  Start time of the interval, or `None`.
+        @param end_time    End time of the interval.
+        @param cache       Dict of the cache entries of the hosts,
+                           updated with the fetched events.
+
+        """
+        entries = {}
+        # Hosts to fetch the events of, by the time after which the
+        # events must have finished, `None` for all the events.
+        fetches = collections.defaultdict(list)
+        for history in histories:
+            host_id = history.host.id
+            entry = None
+            if start_time is not None:
+                entry = cache.get(str(host_id))
+            if (entry is not None and
+                    entry['start'] <= start_time <= entry['end']):
+                if end_time > entry['end']:
+                    fetches[entry['end']].append(host_id)
+            else:
+                entry = {'end': end_time, 'tasks': [], 'hqes': []}
+                fetches[None].append(host_id)
+            entries[host_id] = entry
+
+        fetched_tasks = collections.defaultdict(list)
+        fetched_hqes = collections.defaultdict(list)
+        failed_host_ids = set()
+        for finished_after, host_ids in fetches.items():
+            tasks, hqes, failed = self._fetch(host_ids, start_time, end_time,
+                                              finished_after)
+            failed_host_ids.update(failed)
+            for task in tasks:
+                fetched_tasks[task['host']['id']].append(task)
+            for hqe in hqes:
+                fetched_hqes[hqe['host']['id']].append(hqe)
+
+        for history in histories:
+            host_id = history.host.id
+            if host_id in failed_host_ids:
+                continue
+            entry = entries[host_id]
+            tasks = _merge_rows(
+                    [t for t in entry['tasks']
+                     if _in_window(t['time_started'], start_time, None)],
+                    fetched_tasks[host_id])
+            hqes = _merge_rows(
+                    [h for h in entry['hqes']
+                     if _in_window(h['started_on'], start_time, None)],
+                    fetched_hqes[host_id])
+            if start_time is not None:
+                cache[str(host_id)] = {
+                        'start': start_time,
+                        'end': max(end_time, entry['end']),
+                        'tasks': tasks,
+                        'hqes': hqes,
+                }
+            events = [_SpecialTaskEvent(frontend.SpecialTask(self._afe, t))
+                      for t in tasks
+                      if _in_window(t['time_finished'], None, end_time)]
+            events.extend(_TestJobEvent(frontend.JobStatus(self._afe, h))
+                          for h in hqes
+                          if _in_window(h['started_on'], None, end_time))
+            events.sort(reverse=True)
+            history._history = events
+
+
+    def _fetch(self, host_ids, start_time, end_time, finished_after):
+        """Fetch the special tasks and HQEs of hosts in a time interval.
+
+        Selects the events the same way as `_SpecialTaskEvent.get_tasks`
+        and `_TestJobEvent.get_hqes`.
+
+        @param host_ids        Database ids of the hosts.
+        @param start_time      Start time of the interval, or `None`.
+        @param end_time        End time of the interval.
+        @param finished_after  Only fetch events finished after this
+                               time, if not `None`.
+
+        @return A tuple of the lists of special task and HQE rows, as
+                returned by the AFE RPCs, and of the ids of the hosts
+                whose special tasks could not be fetched.
+
+        """
+        query_end = time_utils.epoch_time_to_date_string(end_time)
+        task_filter = {'time_finished__lte': query_end, 'is_complete': 1}
+        hqe_filter = {'insert_time_before': query_end,
+                      'started_on__lte': query_end,
+                      'complete': 1}
+        if start_time is not None:
+            query_start = time_utils.epoch_time_to_date_string(start_time)
+            task_filter['time_started__gte'] = query_start
+            hqe_filter.update(insert_time_after=query_start,
+                              started_on__gte=query_start)
+        if finished_after is not None:
+            query_after = time_utils.epoch_time_to_date_string(finished_after)
+            task_filter['time_finished__gt'] = query_after
+            hqe_filter['finished_on__gt'] = query_after
+        tasks = []
+        hqes = []
+        failed_host_ids = []
+        # The raw rows are fetched rather than the objects of the AFE
+        # methods, so that they can be cached.
+        for i in range(0, len(host_ids), _HOSTS_PER_QUERY):
+            chunk = host_ids[i : i + _HOSTS_PER_QUERY]
+            result = self._afe.run('get_hosts_special_tasks',
+                                   host_ids=chunk, **task_filter)
+            tasks.extend(result['tasks'])
+            failed_host_ids.extend(result['failed_host_ids'])
+            hqes.extend(self._afe.run('get_host_queue_entries_by_insert_time',
+                                      host_id__in=chunk, **hqe_filter))
+        logging.debug('Fetched %d special tasks and %d HQEs of %d hosts',
+                      len(tasks), len(hqes), len(host_ids))
+        return tasks, hqes, failed_host_ids
+
+
+    def _read_cache(self):
+        """Return the host entries of the cache file.
+
+        @return A dict mapping host ids, as strings, to dicts with the
+                'start' and 'end' of the cached interval, and the
+                'tasks' and 'hqes' rows of the host.
+
+        """
+        if not self._cache_file or not os.path.exists(self._cache_file):
+            return {}
+        try:
+            with open(self._cache_file) as f:
+                cache = json.load(f)
+        except (IOError, ValueError) as e:
+            logging.warning('Ignoring history cache %s: %s',
+                            self._cache_file, e)
+            return {}
+        if (cache.get('version') != _CACHE_VERSION or
+                cache.get('server') != getattr(self._afe, 'server', None)):
+            return {}
+        return cache['hosts']
+
+
+    def _write_cache(self, hosts):
+        """Replace the cache file.
+
+        @param hosts  Host entries as returned by `_read_cache`.
+
+        """
+        if not self._cache_file:
+            return
+        cache = {'version': _CACHE_VERSION,
+                 'server': getattr(self._afe, 'server', None),
+                 'hosts': hosts}
+        try:
+            fd, temp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(os.path.abspath(self._cache_file)))
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(cache, f)
+                os.rename(temp_path, self._cache_file)
+            except:
+                os.unlink(temp_path)
+                raise
+        except (IOError, OSError) as e:
+            logging.warning('Failed to write history cache %s: %s',
+                            self._cache_file, e)
+
+
+def _in_window(time_string, start_time, end_time):
+    """Return whether a time is inside a time interval.
+
+    @param time_string  Time, as returned by the AFE RPCs.
+    @param start_time   Start time of the interval, or `None`.
+    @param end_time     End time of the interval, or `None`.
+
+    """
+    if time_string is None:
+        return False
+    event_time = parse_time(time_string)
+    return ((start_time is None or event_time >= start_time) and
+            (end_time is None or event_time <= end_time))
+
+
+def _merge_rows(rows, new_rows):
+    """Merge rows fetched at different times, dropping duplicates.
+
+    @param rows      Rows, as returned by the AFE RPCs.
+    @param new_rows  Rows fetched later, replacing the rows with the
+                     same ids.
+
+    """
+    merged = collections.OrderedDict((row['id'], row) for row in rows)
+    merged.update((row['id'], row) for row in new_rows)
+    return list(merged.values())
+
+
 def get_diagnosis_interval(host_id, end_time, success):
     """Return the last diagnosis interval for a given host and time.
 
@@ -0,0 +1,232 @@
+#!/usr/bin/python2
+#
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for HistoryLoader in server/lib/status_history.py."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+import common
+from autotest_lib.client.common_lib import time_utils
+from autotest_lib.server import frontend
+from autotest_lib.server.lib import status_history
+
+
+_START = 1500000000
+_HOUR = 60 * 60
+
+
+def _time(epoch_time):
+    return time_utils.epoch_time_to_date_string(epoch_time)
+
+
+class _FakeAFE(object):
+    """An AFE serving special tasks and HQEs from lists of rows."""
+
+    server = 'cautotest'
+
+    def __init__(self):
+        self.tasks = []
+        self.hqes = []
+        self.calls = []
+        # Hosts whose shard fails to answer.
+        self.failed_host_ids = set()
+
+
+    def add_task(self, host_id, start, end, task='Verify', success=True):
+        """Add a special task running on a host from start to end."""
+        self.tasks.append({
+                'id': len(self.tasks) + 1, 'task': task, 'success': success,
+                'is_aborted': False, 'host': {'id': host_id,
+                                             'hostname': 'host%d' % host_id},
+                'time_started': _time(start), 'time_finished': _time(end)})
+
+
+    def add_hqe(self, host_id, start, end):
+        """Add an HQE running on a host from start to end."""
+        job_id = len(self.hqes) + 1
+        self.hqes.append({
+                'id': job_id, 'status': 'Completed',
+                'host': {'id': host_id, 'hostname': 'host%d' % host_id},
+                'job': {'id': job_id, 'name': 'job%d' % job_id,
+                        'owner': 'me'},
+                'started_on': _time(start), 'finished_on': _time(end)})
+
+
+    def _match(self, row, filters, fields):
+        for key, value in filters.items():
+            field, _, op = key.partition('__')
+            field = fields.get(field, field)
+            if field not in row:
+                continue
+            if op == 'in':
+                if row[field]['id'] not in value:
+                    return False
+            elif op in ('gte', 'lte', 'gt'):
+                row_time = status_history.parse_time(row[field])
+                limit = status_history.parse_time(value)
+                if not {'gte': row_time >= limit, 'lte': row_time <= limit,
+                        'gt': row_time > limit}[op]:
+                    return False
+        return True
+
+
+    def run(self, call, **dargs):
+        """Serve the bulk RPCs of HistoryLoader."""
+        self.calls.append((call, len(dargs.get('host_ids') or
+                                     dargs.get('host_id__in'))))
+        if call == 'get_hosts_special_tasks':
+            host_ids = dargs.pop('host_ids')
+            dargs['host__in'] = [i for i in host_ids
+                                 if i not in self.failed_host_ids]
+            return {'tasks': [t for t in self.tasks
+                              if self._match(t, dargs, {})],
+                    'failed_host_ids': [i for i in host_ids
+                                        if i in self.failed_host_ids]}
+        dargs.pop('insert_time_after', None)
+        dargs.pop('insert_time_before', None)
+        return [h for h in self.hqes
+                if self._match(h, dargs, {'host_id': 'host'})]
+
+
+    def get_host_special_tasks(self, host_id, **dargs):
+        """Serve the special tasks of a single host."""
+        self.calls.append(('get_host_special_tasks', 1))
+        if host_id in self.failed_host_ids:
+            raise IOError('shard down')
+        dargs['host__in'] = [host_id]
+        return [frontend.SpecialTask(self, t) for t in self.tasks
+                if self._match(t, dargs, {})]
+
+
+    def get_host_queue_entries_by_insert_time(self, host_id, **dargs):
+        """Serve the HQEs of a single host."""
+        self.calls.append(('get_host_queue_entries_by_insert_time', 1))
+        dargs.pop('insert_time_after', None)
+        dargs.pop('insert_time_before', None)
+        dargs['host_id__in'] = [host_id]
+        return [frontend.JobStatus(self, h) for h in self.hqes
+                if self._match(h, dargs, {'host_id': 'host'})]
+
+
+class HistoryLoaderTest(unittest.TestCase):
+    """Tests HistoryLoader."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmpdir, 'history.json')
+        self.afe = _FakeAFE()
+        self.hosts = [frontend.Host(self.afe, {'id': i, 'hostname': 'host%d' % i,
+                                               'labels': []})
+                      for i in range(1, 4)]
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def _histories(self, start_time, end_time, cache_file=None):
+        histories = [status_history.HostJobHistory(self.afe, host,
+                                                   start_time, end_time)
+                     for host in self.hosts]
+        status_history.HistoryLoader(self.afe, histories,
+                                     cache_file=cache_file)
+        return histories
+
+
+    def _events(self, history):
+        return [(event.is_special, event.id) for event in history]
+
+
+    def test_bulk_load(self):
+        """The histories of all hosts are loaded with one query each."""
+        self.afe.add_task(1, _START + 10, _START + 20)
+        self.afe.add_hqe(1, _START + 30, _START + 40)
+        self.afe.add_task(2, _START + 50, _START + 60, 'Repair', False)
+        # Out of the interval.
+        self.afe.add_task(3, _START - 10, _START + 10)
+        self.afe.add_hqe(3, _START + _HOUR + 1, _START + _HOUR + 2)
+
+        histories = self._histories(_START, _START + _HOUR)
+        self.assertEqual(self._events(histories[0]), [(False, 1), (True, 1)])
+        self.assertEqual([e.diagnosis for e in histories[1]],
+                         [status_history.BROKEN])
+        self.assertEqual(self._events(histories[2]), [])
+        self.assertEqual(self.afe.calls,
+                         [('get_hosts_special_tasks', 3),
+                          ('get_host_queue_entries_by_insert_time', 3)])
+
+
+    def test_load_on_demand(self):
+        """Histories are loaded by chunks, when first iterated."""
+        self.hosts = [frontend.Host(self.afe, {'id': i,
+                                               'hostname': 'host%d' % i,
+                                               'labels': []})
+                      for i in range(1, 8)]
+        self.afe.add_task(7, _START + 10, _START + 20)
+        with mock.patch.object(status_history, '_HOSTS_PER_QUERY', 3):
+            histories = self._histories(_START, _START + _HOUR)
+            self.assertEqual(self.afe.calls, [])
+            self.assertEqual(self._events(histories[6]), [(True, 1)])
+            self.assertEqual(self.afe.calls,
+                             [('get_hosts_special_tasks', 3),
+                              ('get_host_queue_entries_by_insert_time', 3)])
+            for history in histories:
+                list(history)
+        self.assertEqual([n for _, n in self.afe.calls], [3, 3, 3, 3, 1, 1])
+
+
+    def test_failed_shard(self):
+        """Hosts on a failed shard are queried on their own."""
+        self.afe.add_task(1, _START + 10, _START + 20)
+        self.afe.add_task(2, _START + 30, _START + 40)
+        self.afe.failed_host_ids.add(2)
+        histories = self._histories(_START, _START + _HOUR)
+        self.assertEqual(self._events(histories[0]), [(True, 1)])
+        self.assertEqual(len(self.afe.calls), 2)
+        self.assertRaises(IOError, list, histories[1])
+        self.assertEqual(self.afe.calls[2:],
+                         [('get_host_special_tasks', 1)])
+        self.assertEqual(self._events(histories[2]), [])
+        self.assertEqual(len(self.afe.calls), 3)
+
+
+    def test_cache(self):
+        """Only events finished after the cached interval are fetched."""
+        self.afe.add_task(1, _START + 10, _START + 20)
+        histories = self._histories(_START, _START + _HOUR, self.cache_file)
+        self.assertEqual(self._events(histories[0]), [(True, 1)])
+
+        # Running at the end of the first interval.
+        self.afe.add_hqe(1, _START + _HOUR - 10, _START + _HOUR + 10)
+        self.afe.add_task(2, _START + _HOUR + 20, _START + _HOUR + 30)
+        # Hide the first task, to check it comes from the cache.
+        self.afe.tasks[0]['host'] = {'id': 99, 'hostname': 'host99'}
+        histories = self._histories(_START + 5, _START + 2 * _HOUR,
+                                    self.cache_file)
+        self.assertEqual(self._events(histories[0]), [(False, 1), (True, 1)])
+        self.assertEqual(self._events(histories[1]), [(True, 2)])
+        self.assertEqual(len(self.afe.calls), 4)
+
+        # The cache covers the whole interval.
+        histories = self._histories(_START + 5, _START + _HOUR,
+                                    self.cache_file)
+        self.assertEqual(self._events(histories[0]), [(False, 1), (True, 1)])
+        self.assertEqual(len(self.afe.calls), 4)
+
+        # The interval starts before the cached one.
+        histories = self._histories(_START - 5, _START + 2 * _HOUR,
+                                    self.cache_file)
+        self.assertEqual(self._events(histories[0]), [(False, 1)])
+        self.assertEqual(len(self.afe.calls), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,369 @@
+# Lint as: python2, python3
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Drone wide cache of the package tarballs autoserv serves to clients.
+
+When a client asks for a test, profiler or dep package that isn't in the
+package repositories, autoserv tars the package from its own client
+directory. The tarballs are cached in a directory shared by all autoserv
+processes of the drone, keyed by a hash of the package name and the contents
+of its source directory, so that each version of a package is only built
+once however many jobs and hosts ask for it.
+
+Each cache entry is a directory named after the hash holding the tarball.
+Entries are built in a temporary directory and renamed into place, so a
+tarball is never seen half written, and entry locks keep concurrent
+autoserv processes from building the same one. The least recently used
+entries are removed once the cache grows over its size limit, except for
+the tarballs being sent, on which their users hold a shared lock.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import common
+from autotest_lib.client.common_lib import global_config
+from autotest_lib.client.common_lib import utils as client_utils
+
+try:
+    from chromite.lib import metrics
+except ImportError:
+    metrics = client_utils.metrics_mock
+
+
+_CONFIG = global_config.global_config
+ENABLE_PACKAGE_CACHE = _CONFIG.get_config_value(
+        'PACKAGES', 'enable_server_package_cache', type=bool, default=True)
+PACKAGE_CACHE_DIR = (_CONFIG.get_config_value(
+        'PACKAGES', 'server_package_cache_dir', default='') or
+                     os.path.join(tempfile.gettempdir(),
+                                  'autoserv_package_cache'))
+PACKAGE_CACHE_MAX_SIZE_MB = _CONFIG.get_config_value(
+        'PACKAGES', 'server_package_cache_max_size_mb', type=int,
+        default=2048)
+# Entries used this recently aren't evicted, another autoserv may be about to
+# send them.
+MIN_EVICTION_AGE_SECS = 10 * 60
+
+_METRICS_PREFIX = 'chromeos/autotest/autoserv/package_cache/'
+_CACHE_LOCK = '.lock'
+# Entries are locked by the first two digits of their hash, so that there
+# are at most 256 lock files.
+_ENTRY_LOCK = '.lock-%s'
+_BUILD_PREFIX = '.build-'
+# Builds left over by killed autoserv processes are removed after this long.
+_MAX_BUILD_AGE_SECS = 24 * 60 * 60
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_package(pkg_name, src_dir):
+    """Hash the name of a package and the contents of its source directory.
+
+    Covers what ends up in the tarball: the relative paths, permissions and
+    contents of the files, and the targets of the symlinks.
+
+    @param pkg_name: The tarball name of the package, e.g.
+                     test-dummy_Pass.tar.bz2.
+    @param src_dir: The directory the package is built from.
+
+    @return: The hex digest of the package.
+    """
+    digest = hashlib.sha1(pkg_name.encode('utf-8'))
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(dirs + files):
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            digest.update(('\0%s\0%o\0' % (os.path.relpath(path, src_dir),
+                                           st.st_mode)).encode('utf-8'))
+            if stat.S_ISLNK(st.st_mode):
+                digest.update(os.readlink(path).encode('utf-8'))
+            elif stat.S_ISREG(st.st_mode):
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PackageCache(object):
+    """A directory of package tarballs shared by autoserv processes."""
+
+    def __init__(self, cache_dir=None, max_size_mb=None):
+        """
+        @param cache_dir: Directory of the cache. Defaults to
+                          PACKAGE_CACHE_DIR.
+        @param max_size_mb: Size the cache is trimmed down to. Defaults to
+                            PACKAGE_CACHE_MAX_SIZE_MB.
+        """
+        self._cache_dir = cache_dir or PACKAGE_CACHE_DIR
+        if max_size_mb is None:
+            max_size_mb = PACKAGE_CACHE_MAX_SIZE_MB
+        self._max_size_bytes = max_size_mb * 1024 * 1024
+
+
+    @contextlib.contextmanager
+    def get_package(self, pkg_name, src_dir, build_package):
+        """Get the tarball of a package, building it if it isn't cached.
+
+        Use as a context manager; the tarball isn't evicted until the
+        context is left.
+
+        @param pkg_name: The tarball name of the package.
+        @param src_dir: The directory the package is built from.
+        @param build_package: Function taking (pkg_name, src_dir, dest_dir)
+                              building the tarball in dest_dir and returning
+                              its path, e.g. tar_package of the package
+                              manager.
+
+        @yield: The path of the cached tarball, or None if the cache can't
+                be used. Errors building the package are raised.
+        """
+        tarball_file = None
+        try:
+            tarball_file = self._get_locked_package(pkg_name, src_dir,
+                                                    build_package)
+        except (IOError, OSError) as e:
+            logging.warning('Not using the package cache for %s: %s',
+                            pkg_name, e)
+        try:
+            yield tarball_file.name if tarball_file else None
+        finally:
+            if tarball_file:
+                # Closing the tarball releases its lock.
+                tarball_file.close()
+
+
+    def _get_locked_package(self, pkg_name, src_dir, build_package):
+        """Open the tarball of a package, building it if it isn't cached.
+
+        @param pkg_name: The tarball name of the package.
+        @param src_dir: The directory the package is built from.
+        @param build_package: See get_package.
+
+        @return: The tarball, opened with a shared lock keeping it from
+                 being evicted, or None if the cache can't be used.
+        """
+        if not self._prepare_cache_dir():
+            return None
+        digest = hash_package(pkg_name, src_dir)
+        entry_dir = os.path.join(self._cache_dir, digest)
+        tarball_path = os.path.join(entry_dir, pkg_name)
+        with self._lock(os.path.join(self._cache_dir,
+                                     _ENTRY_LOCK % digest[:2])):
+            tarball_file = self._open_shared(tarball_path)
+            if tarball_file:
+                # Mark the entry as recently used for the eviction.
+                os.utime(entry_dir, None)
+                self._count('hit', pkg_name)
+                return tarball_file
+            self._count('miss', pkg_name)
+            self._build(pkg_name, src_dir, build_package, entry_dir)
+            tarball_file = open(tarball_path, 'rb')
+            fcntl.flock(tarball_file, fcntl.LOCK_SH)
+        self._evict(entry_dir)
+        return tarball_file
+
+
+    def _open_shared(self, tarball_path):
+        """Open a cached tarball with a shared lock, if it is still cached.
+
+        @param tarball_path: The path of the tarball.
+
+        @return: The opened tarball, or None if it isn't cached.
+        """
+        try:
+            tarball_file = open(tarball_path, 'rb')
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        fcntl.flock(tarball_file, fcntl.LOCK_SH)
+        # The entry may have been evicted while we waited for the lock.
+        if not os.path.exists(tarball_path):
+            tarball_file.close()
+            return None
+        return tarball_file
+
+
+    def _prepare_cache_dir(self):
+        """Create the cache directory and check only we can write to it.
+
+        The cached tarballs are installed on the DUTs, so they must not come
+        from a directory anyone else can write to, like a shared /tmp.
+
+        @return: True if the cache directory can be used.
+        """
+        if not os.path.isdir(self._cache_dir):
+            try:
+                os.makedirs(self._cache_dir, 0o700)
+            except OSError:
+                # Another autoserv may have created it meanwhile.
+                if not os.path.isdir(self._cache_dir):
+                    raise
+        st = os.stat(self._cache_dir)
+        if st.st_uid != os.getuid() or st.st_mode & 0o022:
+            logging.warning('Not using the package cache, %s is writable by '
+                            'others.', self._cache_dir)
+            return False
+        return True
+
+
+    @contextlib.contextmanager
+    def _lock(self, path):
+        """Hold an exclusive lock on a lock file.
+
+        @param path: The path of the lock file.
+        """
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def _build(self, pkg_name, src_dir, build_package, entry_dir):
+        """Build a package and publish it as a cache entry.
+
+        @param pkg_name: The tarball name of the package.
+        @param src_dir: The directory the package is built from.
+        @param build_package: See get_package.
+        @param entry_dir: The directory of the cache entry.
+        """
+        logging.info('Bundling %s into %s', src_dir, pkg_name)
+        build_dir = tempfile.mkdtemp(prefix=_BUILD_PREFIX, dir=self._cache_dir)
+        try:
+            tarball_path = build_package(pkg_name, src_dir, build_dir)
+            if os.path.basename(tarball_path) != pkg_name:
+                os.rename(tarball_path, os.path.join(build_dir, pkg_name))
+            os.chmod(build_dir, 0o755)
+            if os.path.isdir(entry_dir):
+                # An entry left without its tarball, e.g. by a crash.
+                shutil.rmtree(entry_dir)
+            os.rename(build_dir, entry_dir)
+        except:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+
+    def _evict(self, keep):
+        """Remove the least recently used entries over the size limit.
+
+        @param keep: An entry not to remove, the one just used.
+        """
+        with self._lock(os.path.join(self._cache_dir, _CACHE_LOCK)):
+            entries = []
+            total_size = 0
+            for name in os.listdir(self._cache_dir):
+                path = os.path.join(self._cache_dir, name)
+                if name.startswith(_BUILD_PREFIX):
+                    self._remove_old_build(path)
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, f))
+                               for f in os.listdir(path))
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except OSError:
+                    continue
+                total_size += size
+            if total_size <= self._max_size_bytes:
+                return
+            newest = time.time() - MIN_EVICTION_AGE_SECS
+            for mtime, size, path in sorted(entries):
+                if total_size <= self._max_size_bytes or mtime > newest:
+                    break
+                # Skip entries used since they were listed.
+                if path == keep or os.stat(path).st_mtime > newest:
+                    continue
+                tarball_files = self._lock_entry_for_eviction(path)
+                if tarball_files is None:
+                    continue
+                try:
+                    # Rename first so that the entry disappears at once.
+                    evicted = tempfile.mkdtemp(prefix=_BUILD_PREFIX,
+                                               dir=self._cache_dir)
+                    os.rename(path, os.path.join(evicted, 'entry'))
+                    shutil.rmtree(evicted, ignore_errors=True)
+                finally:
+                    for tarball_file in tarball_files:
+                        tarball_file.close()
+                total_size -= size
+                self._count('eviction')
+
+
+    def _lock_entry_for_eviction(self, entry_dir):
+        """Lock the tarballs of an entry, unless they are being sent.
+
+        @param entry_dir: The directory of the entry.
+
+        @return: The list of the tarballs, opened with an exclusive lock, or
+                 None if one of them is locked by one of its users.
+        """
+        tarball_files = []
+        try:
+            for name in os.listdir(entry_dir):
+                tarball_file = open(os.path.join(entry_dir, name), 'rb')
+                tarball_files.append(tarball_file)
+                fcntl.flock(tarball_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError) as e:
+            for tarball_file in tarball_files:
+                tarball_file.close()
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK,
+                               errno.ENOENT):
+                raise
+            return None
+        return tarball_files
+
+
+    def _remove_old_build(self, path):
+        """Remove a build directory left over by a killed autoserv.
+
+        @param path: The path of the build directory.
+        """
+        try:
+            if os.stat(path).st_mtime < time.time() - _MAX_BUILD_AGE_SECS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+    def _count(self, event, pkg_name=None):
+        """Increment the counter of a cache event.
+
+        @param event: One of 'hit', 'miss' or 'eviction'.
+        @param pkg_name: The package of the event, if any.
+        """
+        fields = {'package': pkg_name} if pkg_name else None
+        metrics.Counter(_METRICS_PREFIX + event).increment(fields=fields)
+
+
+@contextlib.contextmanager
+def get_package(pkg_name, src_dir, build_package):
+    """Get the tarball of a package from the drone's package cache.
+
+    See PackageCache.get_package.
+
+    @yield: The path of the cached tarball, or None if the cache is disabled
+            or can't be used.
+    """
+    if not ENABLE_PACKAGE_CACHE:
+        yield None
+        return
+    with PackageCache().get_package(pkg_name, src_dir,
+                                    build_package) as tarball_path:
+        yield tarball_path
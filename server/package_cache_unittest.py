@@ -0,0 +1,153 @@
+#!/usr/bin/python2
+#
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for server/package_cache.py."""
+
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import unittest
+
+import common
+from autotest_lib.server import package_cache
+
+
+_PKG_NAME = 'test-dummy_Pass.tar.bz2'
+
+
+class PackageCacheTest(unittest.TestCase):
+    """Tests PackageCache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.src_dir = os.path.join(self.tmpdir, 'dummy_Pass')
+        os.makedirs(os.path.join(self.src_dir, 'src'))
+        self._write('control', 'job.run_test("dummy_Pass")\n')
+        self._write('src/data', 'data')
+        self.builds = []
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def _write(self, name, data):
+        with open(os.path.join(self.src_dir, name), 'w') as f:
+            f.write(data)
+
+
+    def _build_package(self, pkg_name, src_dir, dest_dir):
+        self.builds.append(pkg_name)
+        tarball_path = os.path.join(dest_dir, pkg_name)
+        with tarfile.open(tarball_path, 'w:bz2') as tar:
+            tar.add(src_dir, '.')
+        return tarball_path
+
+
+    def _get_package(self, pkg_name=_PKG_NAME, max_size_mb=1):
+        cache = package_cache.PackageCache(self.cache_dir, max_size_mb)
+        with cache.get_package(pkg_name, self.src_dir,
+                               self._build_package) as path:
+            return path
+
+
+    def test_hit(self):
+        """A package is only built again when its contents change."""
+        path = self._get_package()
+        self.assertEqual(os.path.basename(path), _PKG_NAME)
+        with tarfile.open(path) as tar:
+            self.assertIn('./src/data', tar.getnames())
+        self.assertEqual(self._get_package(), path)
+        self.assertEqual(len(self.builds), 1)
+
+        self._write('src/data', 'new data')
+        new_path = self._get_package()
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(len(self.builds), 2)
+
+
+    def test_hash_package(self):
+        """The hash covers the package name, paths, modes and contents."""
+        digest = package_cache.hash_package(_PKG_NAME, self.src_dir)
+        self.assertEqual(package_cache.hash_package(_PKG_NAME, self.src_dir),
+                         digest)
+        self.assertNotEqual(
+                package_cache.hash_package('dep-other.tar.bz2', self.src_dir),
+                digest)
+        os.chmod(os.path.join(self.src_dir, 'control'), 0o755)
+        mode_digest = package_cache.hash_package(_PKG_NAME, self.src_dir)
+        self.assertNotEqual(mode_digest, digest)
+        os.rename(os.path.join(self.src_dir, 'src', 'data'),
+                  os.path.join(self.src_dir, 'src', 'moved'))
+        self.assertNotEqual(
+                package_cache.hash_package(_PKG_NAME, self.src_dir),
+                mode_digest)
+
+
+    def test_failed_build(self):
+        """Failed builds are raised and leave no entry behind."""
+        def build_package(pkg_name, src_dir, dest_dir):
+            raise ValueError('tar failed')
+
+        cache = package_cache.PackageCache(self.cache_dir, 1)
+        with self.assertRaises(ValueError):
+            with cache.get_package(_PKG_NAME, self.src_dir, build_package):
+                pass
+        self.assertEqual([name for name in os.listdir(self.cache_dir)
+                          if not name.startswith('.lock')], [])
+        self._get_package()
+        self.assertEqual(len(self.builds), 1)
+
+
+    def test_eviction(self):
+        """The least recently used entries over the limit are evicted."""
+        self._write('src/data', os.urandom(700 * 1024))
+        old_path = self._get_package()
+        old_time = time.time() - package_cache.MIN_EVICTION_AGE_SECS - 60
+        os.utime(os.path.dirname(old_path), (old_time, old_time))
+
+        self._write('src/data', os.urandom(700 * 1024))
+        new_path = self._get_package()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+
+        # Recently used entries are kept over the limit.
+        self._write('src/data', os.urandom(700 * 1024))
+        self._get_package()
+        self.assertTrue(os.path.exists(new_path))
+
+
+    def test_no_eviction_while_sent(self):
+        """Entries are not evicted while a tarball is being sent."""
+        self._write('src/data', os.urandom(700 * 1024))
+        cache = package_cache.PackageCache(self.cache_dir, 1)
+        with cache.get_package(_PKG_NAME, self.src_dir,
+                               self._build_package) as old_path:
+            old_time = time.time() - package_cache.MIN_EVICTION_AGE_SECS - 60
+            os.utime(os.path.dirname(old_path), (old_time, old_time))
+
+            self._write('src/data', os.urandom(700 * 1024))
+            self._get_package()
+            self.assertTrue(os.path.exists(old_path))
+
+        self._write('src/data', os.urandom(700 * 1024))
+        self._get_package()
+        self.assertFalse(os.path.exists(old_path))
+
+
+    def test_unsafe_dir(self):
+        """A cache directory others can write to isn't used."""
+        os.makedirs(self.cache_dir)
+        os.chmod(self.cache_dir, 0o777)
+        self.assertIsNone(self._get_package())
+        self.assertEqual(self.builds, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
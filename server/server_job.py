@@ -35,6 +35,7 @@ import uuid
 import warnings
 
 from datetime import datetime
+from multiprocessing import pool
 
 from autotest_lib.client.bin import sysinfo
 from autotest_lib.client.common_lib import base_job
@@ -91,6 +92,8 @@ PROVISION_CONTROL_FILE = _control_segment_path('provision')
 VERIFY_JOB_REPO_URL_CONTROL_FILE = _control_segment_path('verify_job_repo_url')
 RESET_CONTROL_FILE = _control_segment_path('reset')
 GET_NETWORK_STATS_CONTROL_FILE = _control_segment_path('get_network_stats')
+# Number of host info stores get_machine_dicts creates at once.
+_HOST_INFO_STORE_THREADS = 8
 
 
 def get_machine_dicts(machine_names, store_dir, in_lab, use_shadow_store,
@@ -126,6 +129,11 @@ def get_machine_dicts(machine_names, store_dir, in_lab, use_shadow_store,
         raise error.AutoservError(
                 'in_lab and host_attribute are mutually exclusive.')
 
+    if in_lab and use_shadow_store and machine_names:
+        afe_hosts = _get_afe_hosts(machine_names)
+        host_info_stores = _create_afe_backed_host_info_stores(store_dir,
+                                                               afe_hosts)
+
     machine_dict_list = []
     for machine in machine_names:
         if not in_lab:
@@ -136,9 +144,8 @@ def get_machine_dicts(machine_names, store_dir, in_lab, use_shadow_store,
                 info = host_info.HostInfo(attributes=host_attributes)
                 host_info_store.commit(info)
         elif use_shadow_store:
-            afe_host = _create_afe_host(machine)
-            host_info_store = _create_afe_backed_host_info_store(store_dir,
-                                                                 machine)
+            afe_host = afe_hosts[machine]
+            host_info_store = host_info_stores[machine]
         else:
             afe_host = server_utils.EmptyAFEHost()
             host_info_store = _create_file_backed_host_info_store(store_dir,
@@ -673,6 +680,7 @@ class server_job(base_job.base_job):
         @return boolean
         """
         path = os.getcwd()
+        self._logger.flush()
 
         # TODO(ayatane): Copied from tko/parse.py.  Needs extensive refactor to
         # make code reuse plausible.
@@ -1596,6 +1604,27 @@ def _create_afe_host(hostname):
     return hosts[0]
 
 
+def _get_afe_hosts(hostnames):
+    """Get the afe_host objects of several hosts with a single RPC.
+
+    @param hostnames: Names of the hosts for which we want the Host objects.
+    @returns: A dict mapping the hostnames to objects of type frontend.Host.
+    """
+    hostnames = list(set(hostnames))
+    if not hostnames:
+        # An empty hostnames list would not filter the hosts at all.
+        return {}
+    afe = frontend_wrappers.RetryingAFE(timeout_min=5, delay_sec=10)
+    afe_hosts = dict((host.hostname, host)
+                     for host in afe.get_hosts(hostnames=hostnames))
+    for hostname in hostnames:
+        # The AFE matches hostnames case insensitively, look up the host
+        # again to find it the same way as alone.
+        if hostname not in afe_hosts:
+            afe_hosts[hostname] = _create_afe_host(hostname)
+    return afe_hosts
+
+
 def _create_file_backed_host_info_store(store_dir, hostname):
     """Create a CachingHostInfoStore backed by an existing file.
 
@@ -1613,20 +1642,50 @@ def _create_file_backed_host_info_store(store_dir, hostname):
     return file_store.FileStore(backing_file_path)
 
 
-def _create_afe_backed_host_info_store(store_dir, hostname):
-    """Create a CachingHostInfoStore backed by the AFE.
+def _create_afe_backed_host_info_stores(store_dir, afe_hosts):
+    """Create the CachingHostInfoStores backed by the AFE of several hosts.
+
+    The stores are initialized with the HostInfo of the given Host objects
+    rather than refreshed from the AFE one by one, and write their shadow
+    files concurrently.
+
+    @param store_dir: A directory to contain store backing files.
+    @param afe_hosts: A dict mapping hostnames to their frontend.Host objects.
+
+    @returns: A dict mapping the hostnames to objects of type
+            CachingHostInfoStore.
+    """
+    primary_stores = dict(
+            (hostname, afe_store.AfeStore(hostname, afe_host=afe_host))
+            for hostname, afe_host in afe_hosts.items())
+
+    def create_store(hostname):
+        return _create_shadowing_store(store_dir, hostname,
+                                       primary_stores[hostname])
+
+    hostnames = list(primary_stores)
+    if len(hostnames) < 2:
+        return dict((hostname, create_store(hostname))
+                    for hostname in hostnames)
+    thread_pool = pool.ThreadPool(min(len(hostnames),
+                                         _HOST_INFO_STORE_THREADS))
+    try:
+        stores = thread_pool.map(create_store, hostnames)
+    finally:
+        thread_pool.close()
+        thread_pool.join()
+    return dict(zip(hostnames, stores))
+
+
+def _create_shadowing_store(store_dir, hostname, primary_store):
+    """Shadow a CachingHostInfoStore with a FileStore.
 
     @param store_dir: A directory to contain store backing files.
     @param hostname: Name of the host for which we want the store.
+    @param primary_store: The CachingHostInfoStore to shadow.
 
     @returns: An object of type CachingHostInfoStore.
     """
-    primary_store = afe_store.AfeStore(hostname)
-    try:
-        primary_store.get(force_refresh=True)
-    except host_info.StoreError:
-        raise error.AutoservError(
-                'Could not obtain HostInfo for hostname %s' % hostname)
     # Since the store wasn't initialized external to autoserv, we must
     # ensure that the store we create is unique within store_dir.
     backing_file_path = os.path.join(
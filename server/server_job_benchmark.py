@@ -0,0 +1,130 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark creating the machine dicts of a multi-DUT autoserv job.
+
+Times get_machine_dicts for an AFE backed job the way it worked before,
+looking up the Host object and refreshing the HostInfo of each machine with
+separate RPCs one machine after the other, and as it does now, with a single
+RPC for all machines and the shadow files written concurrently. Both include
+the first HostInfo lookup of each machine. The AFE is simulated with the given
+RPC latency, e.g.
+
+    ./server_job_benchmark.py --machines 20 --rpc-latency-ms 150
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import common
+from autotest_lib.server import frontend
+from autotest_lib.server import server_job
+from autotest_lib.server.hosts import afe_store
+from autotest_lib.server.hosts import file_store
+from autotest_lib.server.hosts import shadowing_store
+
+
+class _SimulatedAFE(object):
+    """An AFE answering get_hosts after a fixed latency."""
+
+    latency_secs = 0
+    hosts = {}
+    calls = 0
+
+    def __init__(self, **dargs):
+        pass
+
+
+    def get_hosts(self, hostnames=(), **dargs):
+        """Get the Host objects of the given hostnames."""
+        if 'hostname' in dargs:
+            hostnames = [dargs['hostname']]
+        _SimulatedAFE.calls += 1
+        time.sleep(self.latency_secs)
+        return [frontend.Host(self, self.hosts[hostname])
+                for hostname in hostnames]
+
+
+def _legacy_get_machine_dicts(machine_names, store_dir):
+    """Create the machine dicts like get_machine_dicts did before."""
+    machine_dicts = []
+    for machine in machine_names:
+        afe_host = server_job._create_afe_host(machine)
+        primary_store = afe_store.AfeStore(machine)
+        primary_store.get(force_refresh=True)
+        backing_file_path = os.path.join(
+                server_job._make_unique_subdir(store_dir),
+                '%s.store' % machine)
+        store = shadowing_store.ShadowingStore(
+                primary_store, file_store.FileStore(backing_file_path))
+        machine_dicts.append({'hostname': machine, 'afe_host': afe_host,
+                              'host_info_store': store,
+                              'connection_pool': None})
+    return machine_dicts
+
+
+def _legacy_get_info(store):
+    """Get the HostInfo of a store like the first get did before."""
+    return store.get(force_refresh=True)
+
+
+def _get_machine_dicts(machine_names, store_dir):
+    """Create the machine dicts with get_machine_dicts."""
+    return server_job.get_machine_dicts(machine_names, store_dir, in_lab=True,
+                                        use_shadow_store=True)
+
+
+def _get_info(store):
+    """Get the HostInfo of a store."""
+    return store.get()
+
+
+def main():
+    """Create the machine dicts of a simulated job both ways."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--machines', type=int, default=20,
+                        help='Number of machines of the job.')
+    parser.add_argument('--rpc-latency-ms', type=int, default=150,
+                        help='Latency of the simulated AFE RPCs.')
+    parser.add_argument('--labels', type=int, default=60,
+                        help='Number of labels of each host.')
+    parser.add_argument('--dir', default=None,
+                        help='Directory to write the shadow files in, on the '
+                             'filesystem to measure.')
+    args = parser.parse_args()
+
+    machines = ['chromeos1-row1-rack1-host%d' % i
+                for i in range(args.machines)]
+    _SimulatedAFE.latency_secs = args.rpc_latency_ms / 1000.0
+    _SimulatedAFE.hosts = dict(
+            (machine, {'hostname': machine,
+                       'labels': ['label%d' % i for i in range(args.labels)],
+                       'attributes': {'serial_number': machine}})
+            for machine in machines)
+    server_job.frontend_wrappers.RetryingAFE = _SimulatedAFE
+
+    print('%-8s %10s %6s' % ('path', 'seconds', 'rpcs'))
+    for name, get_machine_dicts, get_info in (
+            ('legacy', _legacy_get_machine_dicts, _legacy_get_info),
+            ('new', _get_machine_dicts, _get_info)):
+        store_dir = tempfile.mkdtemp(dir=args.dir)
+        try:
+            _SimulatedAFE.calls = 0
+            start = time.time()
+            for machine_dict in get_machine_dicts(machines, store_dir):
+                get_info(machine_dict['host_info_store'])
+            print('%-8s %10.2f %6d' % (name, time.time() - start,
+                                       _SimulatedAFE.calls))
+        finally:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
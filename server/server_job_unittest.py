@@ -1,11 +1,16 @@
 #!/usr/bin/python2
 
+import glob
 import os
+import shutil
 import tempfile
 import unittest
 
 import common
+from autotest_lib.server import frontend
 from autotest_lib.server import server_job
+from autotest_lib.server.hosts import file_store
+from autotest_lib.server.hosts import host_info
 from autotest_lib.client.common_lib import base_job_unittest
 from autotest_lib.client.common_lib.test_utils import mock
 
@@ -132,5 +137,87 @@ class WarningManagerTest(unittest.TestCase):
         self.assertEqual(manager.is_valid(35, "MSGTYPE2"), True)
 
 
+class _FakeAFE(object):
+    """An AFE serving a few hosts, recording the get_hosts calls."""
+
+    calls = []
+    hosts = {}
+
+    def __init__(self, **dargs):
+        pass
+
+
+    def get_hosts(self, hostnames=(), **dargs):
+        """Get the Host objects of the given hostnames."""
+        if 'hostname' in dargs:
+            hostnames = [dargs['hostname']]
+        self.calls.append(list(hostnames))
+        return [frontend.Host(self, self.hosts[hostname])
+                for hostname in hostnames if hostname in self.hosts]
+
+
+class GetMachineDictsTest(unittest.TestCase):
+    """Tests get_machine_dicts with AFE backed stores."""
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.retrying_afe = server_job.frontend_wrappers.RetryingAFE
+        server_job.frontend_wrappers.RetryingAFE = _FakeAFE
+        _FakeAFE.calls = []
+        _FakeAFE.hosts = dict(
+                ('host%d' % i, {'hostname': 'host%d' % i,
+                                'labels': ['board:b', 'label%d' % i],
+                                'attributes': {'attr': str(i)}})
+                for i in range(4))
+
+
+    def tearDown(self):
+        server_job.frontend_wrappers.RetryingAFE = self.retrying_afe
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+
+    def test_bulk_prefetch(self):
+        """The hosts are obtained with a single RPC."""
+        machines = ['host0', 'host1', 'host2', 'host3']
+        machine_dicts = server_job.get_machine_dicts(
+                machines, self.store_dir, in_lab=True, use_shadow_store=True)
+        self.assertEqual(len(_FakeAFE.calls), 1)
+        self.assertEqual(sorted(_FakeAFE.calls[0]), machines)
+
+        self.assertEqual([m['hostname'] for m in machine_dicts], machines)
+        for i, machine_dict in enumerate(machine_dicts):
+            self.assertEqual(machine_dict['afe_host'].hostname, 'host%d' % i)
+            expected = host_info.HostInfo(['board:b', 'label%d' % i],
+                                          {'attr': str(i)})
+            self.assertEqual(machine_dict['host_info_store'].get(), expected)
+        self.assertEqual(len(_FakeAFE.calls), 1)
+
+        store_files = glob.glob(os.path.join(self.store_dir, '*', '*.store'))
+        self.assertEqual(sorted(os.path.basename(path)
+                                for path in store_files),
+                         ['%s.store' % machine for machine in machines])
+        for path in store_files:
+            hostname = os.path.basename(path)[:-len('.store')]
+            self.assertEqual(file_store.FileStore(path).get().labels,
+                             _FakeAFE.hosts[hostname]['labels'])
+
+
+    def test_missing_host(self):
+        """Hosts missing from the bulk RPC are looked up alone."""
+        _FakeAFE.hosts['HOST0'] = _FakeAFE.hosts.pop('host0')
+        self.assertRaises(server_job.error.AutoservError,
+                          server_job.get_machine_dicts, ['HOST0', 'host5'],
+                          self.store_dir, in_lab=True, use_shadow_store=True)
+        self.assertEqual(_FakeAFE.calls[1:], [['host5']])
+
+
+    def test_no_machines(self):
+        """Hostless jobs do not query the AFE."""
+        self.assertEqual(server_job.get_machine_dicts(
+                [], self.store_dir, in_lab=True, use_shadow_store=True), [])
+        self.assertEqual(server_job._get_afe_hosts([]), {})
+        self.assertEqual(_FakeAFE.calls, [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,7 +7,7 @@ __author__ = """Copyright Andy Whitcroft, Martin J. Bligh - 2006, 2007"""
 
 import sys, os, signal, time, six.moves.cPickle, logging
 
-from autotest_lib.client.common_lib import error, utils
+from autotest_lib.client.common_lib import base_job, error, utils
 from autotest_lib.client.common_lib.cros import retry
 from six.moves import zip
 
@@ -163,6 +163,7 @@ class subcommand(object):
     def fork_start(self):
         sys.stdout.flush()
         sys.stderr.flush()
+        base_job.flush_status_logs()
         r, w = os.pipe()
         self.returncode = None
         self.pid = os.fork()
@@ -199,6 +200,7 @@ class subcommand(object):
         finally:
             sys.stdout.flush()
             sys.stderr.flush()
+            base_job.flush_status_logs()
             os._exit(exit_code)
 
 
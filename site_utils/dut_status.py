@@ -201,7 +201,7 @@ def _print_event_summary(event):
           event.job_url))
 
 
-def _print_hosts(history_list, arguments):
+def _print_hosts(afe, history_list, arguments):
     """Print hosts, optionally with a job history.
 
     This function handles both the default format for --working
@@ -209,11 +209,19 @@ def _print_hosts(history_list, arguments):
     --full_history and --diagnosis options.  The `arguments`
     parameter determines the format to use.
 
+    @param afe          Autotest frontend
     @param history_list A list of HostHistory objects to be printed.
     @param arguments    Parsed arguments object as returned by
                         ArgumentParser.parse_args().
 
     """
+    if arguments.full_history:
+        # Load the histories of the hosts to print together.
+        status_history.HistoryLoader(
+                afe,
+                [history for history in history_list
+                 if _include_status(history.last_diagnosis()[0], arguments)],
+                cache_file=arguments.history_cache)
     for history in history_list:
         status, _ = history.last_diagnosis()
         if not _include_status(status, arguments):
@@ -448,6 +456,9 @@ def _parse_command(argv):
                         help='Master autotest frontend hostname. If no value '
                              'is given, the one in global config will be used.',
                         default=None)
+    parser.add_argument('--history-cache', metavar='FILE', default=None,
+                        help='File to cache job histories in, so that later '
+                             'runs only query the jobs that finished since.')
     arguments = parser.parse_args(argv[1:])
     return arguments
 
@@ -464,7 +475,7 @@ def main(argv):
     if arguments.oneline:
         _print_host_summaries(history_list, arguments)
     else:
-        _print_hosts(history_list, arguments)
+        _print_hosts(afe, history_list, arguments)
 
 
 if __name__ == '__main__':
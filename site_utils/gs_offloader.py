@@ -35,7 +35,7 @@ import urllib
 from optparse import OptionParser
 
 import common
-from autotest_lib.client.common_lib import file_utils
+from autotest_lib.client.bin.result_tools import compression_lib
 from autotest_lib.client.common_lib import global_config
 from autotest_lib.client.common_lib import utils
 from autotest_lib.site_utils import job_directories
@@ -80,6 +80,10 @@ OFFLOAD_TIMEOUT_SECS = 60 * 60
 # Sleep time per loop.
 SLEEP_TIME_SECS = 5
 
+# Maximum number of seconds between full scans of the results directory. In
+# between, only directories modified since the last scan are listed again.
+FULL_SCAN_INTERVAL_SECS = 60 * 60
+
 # Minimum number of seconds between e-mail reports.
 REPORT_INTERVAL_SECS = 60 * 60
 
@@ -111,6 +115,32 @@ LIMIT_FILE_COUNT = global_config.global_config.get_config_value(
 GS_OFFLOADER_MULTIPROCESSING = global_config.global_config.get_config_value(
         'CROS', 'gs_offloader_multiprocessing', type=bool, default=False)
 
+# Codec to compress folders with when limiting the file count, gzip or zstd.
+# zstd falls back to gzip if it's not available.
+COMPRESSION_CODEC = global_config.global_config.get_config_value(
+        'CROS', 'gs_offloader_compression_codec', default=compression_lib.GZIP)
+
+# Maximum number of processes to compress folders concurrently. Set to 0 to
+# use the number of CPUs, up to compression_lib.MAX_PROCESSES.
+COMPRESSION_PROCESSES = global_config.global_config.get_config_value(
+        'CROS', 'gs_offloader_compression_processes', type=int, default=0)
+
+# Maximum number of small jobs uploaded to the same destination with a single
+# gsutil command. Set to 1 to upload every job with its own command. Jobs are
+# never grouped when uploading with rsync, which takes a single source.
+BATCH_SIZE = global_config.global_config.get_config_value(
+        'CROS', 'gs_offloader_batch_size', type=int, default=10)
+
+# A job with at most this many files and bytes is small enough to be grouped
+# with others.
+SMALL_JOB_FILE_COUNT = 100
+SMALL_JOB_BYTES = 10 * 1024 * 1024
+
+# A job with at least this many files or bytes is uploaded with the -m option
+# of gsutil, to spread it over parallel gsutil processes.
+HUGE_JOB_FILE_COUNT = 1000
+HUGE_JOB_BYTES = 1024 * 1024 * 1024
+
 D = '[0-9][0-9]'
 TIMESTAMP_PATTERN = '%s%s.%s.%s_%s.%s.%s' % (D, D, D, D, D, D, D)
 CTS_RESULT_PATTERN = 'testResult.xml'
@@ -210,6 +240,112 @@ def _get_finish_cmd_list(gs_path):
         ]
 
 
+class GSEndpoint(object):
+    """Upload results to Google Storage with gsutil."""
+
+    def can_batch(self):
+        """Check if several directories can be uploaded with one command.
+
+        @return False if uploading with rsync, which takes a single source.
+        """
+        return not USE_RSYNC_ENABLED
+
+
+    def get_cmd_list(self, multiprocessing, dir_entries, gs_path):
+        """Return the command to offload directories.
+
+        @param multiprocessing: True to turn on -m option for gsutil.
+        @param dir_entries: List of directory entries to offload.
+        @param gs_path: Location in google storage where we will
+                        offload the directories.
+
+        @return A command list to be executed by Popen.
+        """
+        if len(dir_entries) == 1:
+            return _get_cmd_list(multiprocessing, dir_entries[0], gs_path)
+        if not self.can_batch():
+            raise ValueError('Cannot rsync more than one directory at once.')
+        cmd = ['gsutil']
+        if multiprocessing:
+            cmd.append('-m')
+        return cmd + ['cp', '-eR'] + list(dir_entries) + [gs_path]
+
+
+    def get_finish_cmd_list(self, gs_path):
+        """Return the command to mark a gs path as finished.
+
+        @param gs_path: Location in google storage to mark as finished.
+
+        @return A command list to be executed by Popen.
+        """
+        return _get_finish_cmd_list(gs_path)
+
+
+    def get_remove_cmd_list(self, gs_path):
+        """Return the command to remove a file from google storage.
+
+        @param gs_path: Location of the file in google storage.
+
+        @return A command list to be executed by Popen.
+        """
+        return ['gsutil', 'rm', gs_path]
+
+
+class LocalEndpoint(GSEndpoint):
+    """Copy results to a local directory standing in for Google Storage.
+
+    It's used for file:// URIs, e.g. file:///tmp/fake_gs/, to benchmark or
+    test offloading without access to Google Storage.
+    """
+
+    SCHEME = 'file://'
+
+    def _get_local_path(self, uri):
+        """Return the local path of a file:// URI."""
+        return uri[len(self.SCHEME):]
+
+
+    def can_batch(self):
+        """Several directories can always be copied with one command."""
+        return True
+
+
+    def get_cmd_list(self, multiprocessing, dir_entries, gs_path):
+        """See GSEndpoint.get_cmd_list. multiprocessing is ignored."""
+        target = self._get_local_path(gs_path)
+        # Unlike gsutil, cp doesn't create the destination directory.
+        try:
+            os.makedirs(target)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return ['cp', '-R'] + list(dir_entries) + [target]
+
+
+    def get_finish_cmd_list(self, gs_path):
+        """See GSEndpoint.get_finish_cmd_list."""
+        target = os.path.join(self._get_local_path(gs_path),
+                              '.finished_offload')
+        return ['cp', '/dev/null', target]
+
+
+    def get_remove_cmd_list(self, gs_path):
+        """See GSEndpoint.get_remove_cmd_list."""
+        return ['rm', '-f', self._get_local_path(gs_path)]
+
+
+def get_endpoint(gs_uri):
+    """Return the endpoint to offload to the given URI.
+
+    @param gs_uri: gs:// URI, or file:// URI of a local directory.
+
+    @return A GSEndpoint instance.
+    """
+    if gs_uri.startswith(LocalEndpoint.SCHEME):
+        return LocalEndpoint()
+    return GSEndpoint()
+
+
 def sanitize_dir(dirpath):
     """Sanitize directory for gs upload.
 
@@ -327,7 +463,7 @@ def limit_file_count(dir_entry):
     @param dir_entry: Directory entry to be checked.
     """
     try:
-        count = _count_files(dir_entry)
+        count = _count_files(dir_entry, limit=_MAX_FILE_COUNT)
     except ValueError:
         logging.warning('Fail to get the file count in folder %s.', dir_entry)
         return
@@ -347,16 +483,75 @@ def limit_file_count(dir_entry):
             subfolders.extend(_get_zippable_folders(folder))
         folders = subfolders
 
-    for folder in folders:
-        _make_into_tarball(folder)
+    _make_into_tarballs(folders)
 
 
-def _count_files(dirpath):
+def _count_files(dirpath, limit=None):
     """Count the number of files in a directory recursively.
 
     @param dirpath: Directory path string.
+    @param limit: Stop counting once this many files are found. Default is
+                  None to count all files.
+    @return The number of files, or `limit` if there are more files.
     """
-    return sum(len(files) for _path, _dirs, files in os.walk(dirpath))
+    count = 0
+    for _path, _dirs, files in os.walk(dirpath):
+        count += len(files)
+        if limit is not None and count >= limit:
+            return limit
+    return count
+
+
+def _get_dir_stats(dirpath, max_files=None, max_bytes=None):
+    """Get the number of files and bytes in a directory recursively.
+
+    Symlinks are not followed.
+
+    @param dirpath: Directory path string.
+    @param max_files: Stop walking once more files than this are found.
+                      Default is None to count all files.
+    @param max_bytes: Stop walking once more bytes than this are found.
+                      Default is None to count all files.
+    @return A tuple of (file count, total size in bytes). If walking stopped
+            early, the counts only exceed the limit.
+    """
+    file_count = 0
+    total_bytes = 0
+    for path, _dirs, files in os.walk(dirpath):
+        for name in files:
+            try:
+                total_bytes += os.lstat(os.path.join(path, name)).st_size
+            except OSError:
+                continue
+            file_count += 1
+            if ((max_files is not None and file_count > max_files) or
+                    (max_bytes is not None and total_bytes > max_bytes)):
+                return file_count, total_bytes
+    return file_count, total_bytes
+
+
+def _get_small_job_stats(dirpath):
+    """Get the stats of a job directory small enough to be grouped.
+
+    @param dirpath: Directory path string.
+    @return A tuple of (file count, total size in bytes) of the directory,
+            or None if it is not small.
+    """
+    file_count, total_bytes = _get_dir_stats(
+            dirpath, SMALL_JOB_FILE_COUNT, SMALL_JOB_BYTES)
+    if (file_count <= SMALL_JOB_FILE_COUNT
+            and total_bytes <= SMALL_JOB_BYTES):
+        return file_count, total_bytes
+    return None
+
+
+def _is_huge_job(file_count, total_bytes):
+    """Check if a job is big enough to be uploaded with gsutil -m.
+
+    @param file_count: Number of files in the job directory.
+    @param total_bytes: Size of the job directory in bytes.
+    """
+    return file_count >= HUGE_JOB_FILE_COUNT or total_bytes >= HUGE_JOB_BYTES
 
 
 def _make_into_tarball(dirpath):
@@ -364,10 +559,24 @@ def _make_into_tarball(dirpath):
 
     @param dirpath: Directory path string.
     """
-    tarpath = '%s.tgz' % dirpath
-    with tarfile.open(tarpath, 'w:gz') as tar:
-        tar.add(dirpath, arcname=os.path.basename(dirpath))
-    shutil.rmtree(dirpath)
+    _make_into_tarballs([dirpath])
+
+
+def _make_into_tarballs(dirpaths):
+    """Make directories into tarballs concurrently.
+
+    A directory failed to be compressed is left in place to be offloaded as
+    is.
+
+    @param dirpaths: A list of directory path strings.
+    """
+    with compression_lib.Pool(COMPRESSION_PROCESSES or None) as pool:
+        results = pool.compress(dirpaths, COMPRESSION_CODEC)
+    for dirpath, _, error in results:
+        if error:
+            logging.error('Failed to compress %s: %s', dirpath, error)
+        else:
+            shutil.rmtree(dirpath)
 
 
 def correct_results_folder_permission(dir_entry):
@@ -638,6 +847,10 @@ class BaseGSOffloader(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Path of a file to append the statistics of each offloaded job to, see
+    # _append_job_stats(). Set by the Offloader for each offload cycle.
+    stats_file = None
+
     def offload(self, dir_entry, dest_path, job_complete_time):
         """Safely offload a directory entry to Google Storage.
 
@@ -668,6 +881,21 @@ class BaseGSOffloader(object):
             logging.debug('Exception in offload for %s', dir_entry)
             logging.debug('Ignoring this error: %s', str(e))
 
+    def offload_batch(self, jobs, dir_stats=None):
+        """Safely offload a batch of directory entries to Google Storage.
+
+        The jobs are offloaded one by one, subclasses may offload them
+        together. Like `offload()`, this method must not raise any
+        exceptions.
+
+        @param jobs: List of [dir_entry, dest_path, job_complete_time]
+                     arguments of `offload()`.
+        @param dir_stats: Dict mapping directory entries to their known
+                          (file count, total size in bytes), or None.
+        """
+        for job in jobs:
+            self.offload(*job)
+
     @abc.abstractmethod
     def _full_offload(self, dir_entry, dest_path, job_complete_time):
         """Offload a directory entry to Google Storage.
@@ -727,33 +955,135 @@ class GSOffloader(BaseGSOffloader):
                     self._try_offload(dir_entry, dest_path, stdout_file,
                                       stderr_file)
             except _OffloadError as e:
-                metrics_fields = _get_metrics_fields(dir_entry)
-                m_any_error = 'chromeos/autotest/errors/gs_offloader/any_error'
-                metrics.Counter(m_any_error).increment(fields=metrics_fields)
-
-                # Rewind the log files for stdout and stderr and log
-                # their contents.
-                stdout_file.seek(0)
-                stderr_file.seek(0)
-                stderr_content = stderr_file.read()
-                logging.warning('Error occurred when offloading %s:', dir_entry)
-                logging.warning('Stdout:\n%s \nStderr:\n%s', stdout_file.read(),
-                                stderr_content)
-
-                # Some result files may have wrong file permission. Try
-                # to correct such error so later try can success.
-                # TODO(dshi): The code is added to correct result files
-                # with wrong file permission caused by bug 511778. After
-                # this code is pushed to lab and run for a while to
-                # clean up these files, following code and function
-                # correct_results_folder_permission can be deleted.
-                if 'CommandException: Error opening file' in stderr_content:
-                    correct_results_folder_permission(dir_entry)
+                self._handle_offload_error([dir_entry], stdout_file,
+                                           stderr_file)
             else:
-                self._prune(dir_entry, job_complete_time)
-                swarming_req_dir = _get_swarming_req_dir(dir_entry)
-                if swarming_req_dir:
-                    self._prune_swarming_req_dir(swarming_req_dir)
+                self._prune_offloaded(dir_entry, job_complete_time)
+
+
+    def offload_batch(self, jobs, dir_stats=None):
+        """Safely offload a batch of directory entries to Google Storage.
+
+        Jobs to the same destination, without a side effects config, are
+        uploaded with a single command. See `BaseGSOffloader.offload_batch()`.
+
+        @param jobs: List of [dir_entry, dest_path, job_complete_time]
+                     arguments of `offload()`.
+        @param dir_stats: Dict mapping directory entries to their known
+                          (file count, total size in bytes), or None.
+        """
+        if len(jobs) == 1 or not get_endpoint(self._gs_uri).can_batch():
+            super(GSOffloader, self).offload_batch(jobs)
+            return
+        try:
+            self._full_offload_batch(jobs, dir_stats or {})
+        except Exception as e:
+            logging.debug('Exception in offload for %s',
+                          ', '.join(job[0] for job in jobs))
+            logging.debug('Ignoring this error: %s', str(e))
+
+
+    @metrics.SecondsTimerDecorator(
+            'chromeos/autotest/gs_offloader/batch_offload_duration')
+    def _full_offload_batch(self, jobs, dir_stats):
+        """Offload directory entries to Google storage with one command.
+
+        Entries which are already uploaded, have a side effects config or a
+        permission issue go through `offload()` instead.
+
+        @param jobs: List of [dir_entry, dest_path, job_complete_time]
+                     arguments of `offload()`, all with the same dest_path.
+        @param dir_stats: Dict mapping directory entries to their known
+                          (file count, total size in bytes).
+        """
+        batch = []
+        for dir_entry, dest_path, job_complete_time in jobs:
+            stats = dir_stats.get(dir_entry)
+            if _is_uploaded(dir_entry) or config_loader.load(dir_entry):
+                self.offload(dir_entry, dest_path, job_complete_time)
+                continue
+            try:
+                self._prepare_dir(dir_entry, True)
+            except OSError:
+                self.offload(dir_entry, dest_path, job_complete_time)
+                continue
+            batch.append((dir_entry, job_complete_time,
+                          stats or _get_dir_stats(dir_entry)))
+        if not batch:
+            return
+
+        dir_entries = [dir_entry for dir_entry, _, _ in batch]
+        gs_path = '%s%s' % (self._gs_uri, jobs[0][1])
+        file_count = sum(stats[0] for _, _, stats in batch)
+        total_bytes = sum(stats[1] for _, _, stats in batch)
+        multiprocessing = (self._multiprocessing
+                           or _is_huge_job(file_count, total_bytes))
+        with tempfile.TemporaryFile('w+') as stdout_file, \
+             tempfile.TemporaryFile('w+') as stderr_file:
+            start_time = time.time()
+            try:
+                self._upload(dir_entries, gs_path, multiprocessing,
+                             stdout_file, stderr_file,
+                             _get_metrics_fields(dir_entries[0]),
+                             _OffloadError(start_time))
+            except _OffloadError:
+                self._handle_offload_error(dir_entries, stdout_file,
+                                           stderr_file)
+                return
+            seconds = time.time() - start_time
+            for dir_entry, job_complete_time, stats in batch:
+                # Split the upload time between jobs by their size.
+                job_seconds = seconds * stats[1] / max(total_bytes, 1)
+                try:
+                    self._record_job_stats(dir_entry,
+                                           _get_metrics_fields(dir_entry),
+                                           stats[0], stats[1], job_seconds)
+                    try:
+                        self._finish_offload(dir_entry, gs_path, stats[1],
+                                             _OffloadError(start_time))
+                    except _OffloadError:
+                        self._handle_offload_error([dir_entry], stdout_file,
+                                                   stderr_file)
+                    else:
+                        self._prune_offloaded(dir_entry, job_complete_time)
+                except Exception as e:
+                    # Don't let one job keep the others from finishing.
+                    logging.debug('Exception in offload for %s', dir_entry)
+                    logging.debug('Ignoring this error: %s', str(e))
+
+
+    def _handle_offload_error(self, dir_entries, stdout_file, stderr_file):
+        """Report and log a failed offload.
+
+        @param dir_entries: List of directory entries failed to offload.
+        @param stdout_file: Log file of the offload commands.
+        @param stderr_file: Log file of the offload commands.
+        """
+        m_any_error = 'chromeos/autotest/errors/gs_offloader/any_error'
+        for dir_entry in dir_entries:
+            metrics_fields = _get_metrics_fields(dir_entry)
+            metrics.Counter(m_any_error).increment(fields=metrics_fields)
+
+        # Rewind the log files for stdout and stderr and log
+        # their contents.
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        stderr_content = stderr_file.read()
+        logging.warning('Error occurred when offloading %s:',
+                        ', '.join(dir_entries))
+        logging.warning('Stdout:\n%s \nStderr:\n%s', stdout_file.read(),
+                        stderr_content)
+
+        # Some result files may have wrong file permission. Try
+        # to correct such error so later try can success.
+        # TODO(dshi): The code is added to correct result files
+        # with wrong file permission caused by bug 511778. After
+        # this code is pushed to lab and run for a while to
+        # clean up these files, following code and function
+        # correct_results_folder_permission can be deleted.
+        if 'CommandException: Error opening file' in stderr_content:
+            for dir_entry in dir_entries:
+                correct_results_folder_permission(dir_entry)
 
 
     def _try_offload(self, dir_entry, dest_path,
@@ -789,18 +1119,53 @@ class GSOffloader(BaseGSOffloader):
           # from uploading files via default credential.
           logging.debug('Failed to load the side effects config in %s.',
                         dir_entry)
-        try:
-            sanitize_dir(dir_entry)
-            if DEFAULT_CTS_RESULTS_GSURI and cts_enabled:
-                _upload_cts_testresult(dir_entry, self._multiprocessing)
+        self._prepare_dir(dir_entry, cts_enabled)
+
+        gs_path = '%s%s' % (self._gs_uri, dest_path)
+        file_count, total_bytes = _get_dir_stats(dir_entry)
+        multiprocessing = (self._multiprocessing
+                           or _is_huge_job(file_count, total_bytes))
+        upload_start_time = time.time()
+        self._upload([dir_entry], gs_path, multiprocessing, stdout_file,
+                     stderr_file, metrics_fields, error_obj)
+        self._record_job_stats(dir_entry, metrics_fields, file_count,
+                               total_bytes, time.time() - upload_start_time)
+        self._finish_offload(dir_entry, gs_path, total_bytes, error_obj)
+
 
-            if LIMIT_FILE_COUNT:
-                limit_file_count(dir_entry)
+    def _prepare_dir(self, dir_entry, cts_enabled):
+        """Prepare a directory entry to be uploaded.
 
-            process = None
+        @param dir_entry: Directory entry to offload.
+        @param cts_enabled: True to upload the CTS results of the directory.
+        """
+        sanitize_dir(dir_entry)
+        if DEFAULT_CTS_RESULTS_GSURI and cts_enabled:
+            _upload_cts_testresult(dir_entry, self._multiprocessing)
+
+        if LIMIT_FILE_COUNT:
+            limit_file_count(dir_entry)
+
+
+    def _upload(self, dir_entries, gs_path, multiprocessing, stdout_file,
+                stderr_file, metrics_fields, error_obj):
+        """Upload directory entries to Google storage with one command.
+
+        @param dir_entries: List of directory entries to offload.
+        @param gs_path: Location in google storage where we will
+                        offload the directories.
+        @param multiprocessing: True to turn on -m option for gsutil.
+        @param stdout_file: Log file.
+        @param stderr_file: Log file.
+        @param metrics_fields: Metrics fields to report a timeout with.
+        @param error_obj: _OffloadError to raise if the upload fails.
+        """
+        endpoint = get_endpoint(gs_path)
+        process = None
+        try:
             with timeout_util.Timeout(OFFLOAD_TIMEOUT_SECS):
-                gs_path = '%s%s' % (self._gs_uri, dest_path)
-                cmd = _get_cmd_list(self._multiprocessing, dir_entry, gs_path)
+                cmd = endpoint.get_cmd_list(multiprocessing, dir_entries,
+                                            gs_path)
                 logging.debug('Attempting an offload command %s', cmd)
                 process = subprocess.Popen(
                     cmd, stdout=stdout_file, stderr=stderr_file)
@@ -808,20 +1173,6 @@ class GSOffloader(BaseGSOffloader):
                 logging.debug('Offload command %s completed; '
                               'marking offload complete.', cmd)
                 _mark_upload_finished(gs_path, stdout_file, stderr_file)
-
-            _emit_gs_returncode_metric(process.returncode)
-            if process.returncode != 0:
-                raise error_obj
-            _emit_offload_metrics(dir_entry)
-
-            if self._console_client:
-                gcs_uri = os.path.join(gs_path,
-                        os.path.basename(dir_entry))
-                if not self._console_client.send_test_job_offloaded_message(
-                        gcs_uri):
-                    raise error_obj
-
-            _mark_uploaded(dir_entry)
         except timeout_util.TimeoutError:
             m_timeout = 'chromeos/autotest/errors/gs_offloader/timed_out_count'
             metrics.Counter(m_timeout).increment(fields=metrics_fields)
@@ -837,9 +1188,68 @@ class GSOffloader(BaseGSOffloader):
                     # process".
                     pass
             logging.error('Offloading %s timed out after waiting %d '
-                          'seconds.', dir_entry, OFFLOAD_TIMEOUT_SECS)
+                          'seconds.', ', '.join(dir_entries),
+                          OFFLOAD_TIMEOUT_SECS)
             raise error_obj
 
+        _emit_gs_returncode_metric(process.returncode)
+        if process.returncode != 0:
+            raise error_obj
+
+
+    def _finish_offload(self, dir_entry, gs_path, total_bytes, error_obj):
+        """Report and mark an uploaded directory entry.
+
+        @param dir_entry: Directory entry uploaded.
+        @param gs_path: Location in google storage where the directory
+                        was uploaded.
+        @param total_bytes: Number of bytes uploaded.
+        @param error_obj: _OffloadError to raise if the cloud console
+                          can't be notified.
+        """
+        _emit_offload_metrics(dir_entry, total_bytes)
+
+        if self._console_client:
+            gcs_uri = os.path.join(gs_path,
+                    os.path.basename(dir_entry))
+            if not self._console_client.send_test_job_offloaded_message(
+                    gcs_uri):
+                raise error_obj
+
+        _mark_uploaded(dir_entry)
+
+
+    def _record_job_stats(self, dir_entry, metrics_fields, file_count,
+                          total_bytes, seconds):
+        """Report the size and upload time of a job.
+
+        @param dir_entry: Directory entry uploaded.
+        @param metrics_fields: Metrics fields of the directory entry.
+        @param file_count: Number of files uploaded.
+        @param total_bytes: Number of bytes uploaded.
+        @param seconds: Time taken to upload the job.
+        """
+        logging.debug('Uploaded %s: %d files, %d bytes in %.1f seconds',
+                      dir_entry, file_count, total_bytes, seconds)
+        _emit_job_stats_metrics(metrics_fields, file_count, total_bytes,
+                                seconds)
+        if self.stats_file:
+            _append_job_stats(self.stats_file, file_count, total_bytes,
+                              seconds)
+
+
+    def _prune_offloaded(self, dir_entry, job_complete_time):
+        """Prune an offloaded directory entry and its swarming request.
+
+        @param dir_entry: Directory entry offloaded.
+        @param job_complete_time: The complete time of the job from the AFE
+                                  database.
+        """
+        self._prune(dir_entry, job_complete_time)
+        swarming_req_dir = _get_swarming_req_dir(dir_entry)
+        if swarming_req_dir:
+            self._prune_swarming_req_dir(swarming_req_dir)
+
     def _prune(self, dir_entry, job_complete_time):
         """Prune directory if it is uploaded and expired.
 
@@ -982,12 +1392,13 @@ def _is_expired(job, age_limit):
     return job_directories.is_job_expired(age_limit, job_timestamp)
 
 
-def _emit_offload_metrics(dirpath):
+def _emit_offload_metrics(dirpath, total_bytes):
     """Emit gs offload metrics.
 
     @param dirpath: Offloaded directory path.
+    @param total_bytes: Number of bytes offloaded.
     """
-    dir_size = file_utils.get_directory_size_kibibytes(dirpath)
+    dir_size = total_bytes // 1024
     metrics_fields = _get_metrics_fields(dirpath)
 
     m_offload_count = (
@@ -1000,6 +1411,61 @@ def _emit_offload_metrics(dirpath):
             dir_size, fields=metrics_fields)
 
 
+def _emit_job_stats_metrics(metrics_fields, file_count, total_bytes,
+                            seconds):
+    """Emit the size and upload time of an offloaded job.
+
+    @param metrics_fields: Metrics fields of the job directory.
+    @param file_count: Number of files uploaded.
+    @param total_bytes: Number of bytes uploaded.
+    @param seconds: Time taken to upload the job.
+    """
+    metrics.CumulativeDistribution(
+            'chromeos/autotest/gs_offloader/job_files').add(
+                    file_count, fields=metrics_fields)
+    metrics.CumulativeDistribution(
+            'chromeos/autotest/gs_offloader/job_bytes').add(
+                    total_bytes, fields=metrics_fields)
+    metrics.SecondsDistribution(
+            'chromeos/autotest/gs_offloader/job_upload_duration').add(
+                    seconds, fields=metrics_fields)
+
+
+def _append_job_stats(stats_file, file_count, total_bytes, seconds):
+    """Append the size and upload time of an offloaded job to a file.
+
+    Offload processes append to the same file. Each job is a single short
+    write in append mode, which isn't interleaved with the others.
+
+    @param stats_file: Path to the file.
+    @param file_count: Number of files uploaded.
+    @param total_bytes: Number of bytes uploaded.
+    @param seconds: Time taken to upload the job.
+    """
+    fd = os.open(stats_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, '%d %d %.3f\n' % (file_count, total_bytes, seconds))
+    finally:
+        os.close(fd)
+
+
+def _read_job_stats(stats_file):
+    """Sum up the job statistics appended to a file.
+
+    @param stats_file: Path to the file.
+
+    @return A tuple of (job count, file count, total bytes).
+    """
+    job_count = file_count = total_bytes = 0
+    with open(stats_file) as f:
+        for line in f:
+            files, size, _seconds = line.split()
+            job_count += 1
+            file_count += int(files)
+            total_bytes += int(size)
+    return job_count, file_count, total_bytes
+
+
 def _is_uploaded(dirpath):
     """Return whether directory has been uploaded.
 
@@ -1024,7 +1490,7 @@ def _mark_upload_finished(gs_path, stdout_file, stderr_file):
     @param gs_path: gs:// url of the remote directory that is finished
                     upload.
     """
-    cmd = _get_finish_cmd_list(gs_path)
+    cmd = get_endpoint(gs_path).get_finish_cmd_list(gs_path)
     process = subprocess.Popen(cmd, stdout=stdout_file, stderr=stderr_file)
     process.wait()
     logging.debug('Finished marking as complete %s', cmd)
@@ -1057,17 +1523,16 @@ def wait_for_gs_write_access(gs_uri):
     """
     # TODO (sbasi) Try to use the gsutil command to check write access.
     # Ensure we have write access to gs_uri.
+    endpoint = get_endpoint(gs_uri)
     dummy_file = tempfile.NamedTemporaryFile()
-    test_cmd = _get_cmd_list(False, dummy_file.name, gs_uri)
+    test_cmd = endpoint.get_cmd_list(False, [dummy_file.name], gs_uri)
     while True:
         logging.debug('Checking for write access with dummy file %s',
                       dummy_file.name)
         try:
             subprocess.check_call(test_cmd)
-            subprocess.check_call(
-                    ['gsutil', 'rm',
-                     os.path.join(gs_uri,
-                                  os.path.basename(dummy_file.name))])
+            subprocess.check_call(endpoint.get_remove_cmd_list(
+                    os.path.join(gs_uri, os.path.basename(dummy_file.name))))
             break
         except subprocess.CalledProcessError:
             t = 120
@@ -1077,6 +1542,110 @@ def wait_for_gs_write_access(gs_uri):
     logging.debug('Dummy file write check to gs succeeded.')
 
 
+class _OffloadScheduler(object):
+    """Group the offloads of a cycle into tasks for the offload processes.
+
+    Implements `put()`, to be passed as the queue of `_enqueue_offload()`.
+    Small jobs to the same destination are grouped into tasks of up to
+    `batch_size` jobs, which are uploaded with a single command. Other jobs,
+    and jobs failed to offload before, get a task each. These are handed out
+    first, since they probably take the longest.
+    """
+
+    def __init__(self, batch_size, retried_dirs=()):
+        """Initialize the scheduler.
+
+        @param batch_size: Maximum number of jobs in a task.
+        @param retried_dirs: Directories of jobs failed to offload before,
+                             which are not grouped with other jobs.
+        """
+        self._batch_size = batch_size
+        self._retried_dirs = set(retried_dirs)
+        # (file count, total size in bytes) of the grouped jobs.
+        self.dir_stats = {}
+        self._single_tasks = []
+        self._batch_tasks = []
+        self._open_batches = {}
+
+
+    def put(self, offload_args):
+        """Schedule the offload of a job.
+
+        @param offload_args: [dir_entry, dest_path, job_complete_time]
+                             arguments of `BaseGSOffloader.offload()`.
+        """
+        dir_entry, dest_path = offload_args[0], offload_args[1]
+        stats = None
+        if self._batch_size > 1 and dir_entry not in self._retried_dirs:
+            stats = _get_small_job_stats(dir_entry)
+        if stats is None:
+            self._single_tasks.append([offload_args])
+            return
+        self.dir_stats[dir_entry] = stats
+        batch = self._open_batches.setdefault(dest_path, [])
+        batch.append(offload_args)
+        if len(batch) >= self._batch_size:
+            self._batch_tasks.append(batch)
+            del self._open_batches[dest_path]
+
+
+    def get_tasks(self):
+        """Return the scheduled tasks.
+
+        @return A list of tasks, each a list of arguments of
+                `BaseGSOffloader.offload()`.
+        """
+        return (self._single_tasks + self._batch_tasks
+                + self._open_batches.values())
+
+
+class _ThroughputTuner(object):
+    """Adjust the number of offload processes to the upload throughput.
+
+    After each offload cycle uploading enough data to be measured, the
+    number of processes moves one step, between 1 and the maximum. The step
+    keeps its direction while the throughput improves and turns around when
+    it drops, so the number of processes hovers around the best one.
+    """
+
+    # Cycles uploading less than this are too short to measure throughput.
+    MIN_MEASURED_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_processes):
+        """Initialize the tuner, starting with the maximum processes.
+
+        @param max_processes: Maximum number of offload processes.
+        """
+        self.processes = max_processes
+        self._max_processes = max_processes
+        self._step = -1
+        self._last_throughput = None
+
+
+    def update(self, total_bytes, seconds):
+        """Update the number of processes with the result of a cycle.
+
+        @param total_bytes: Number of bytes uploaded during the cycle.
+        @param seconds: Duration of the cycle.
+
+        @return The number of processes for the next cycle.
+        """
+        if total_bytes < self.MIN_MEASURED_BYTES or seconds <= 0:
+            return self.processes
+        throughput = total_bytes / seconds
+        if (self._last_throughput is not None
+                and throughput < self._last_throughput):
+            self._step = -self._step
+        self._last_throughput = throughput
+        if not 1 <= self.processes + self._step <= self._max_processes:
+            self._step = -self._step
+        self.processes = max(1, min(self._max_processes,
+                                    self.processes + self._step))
+        logging.debug('Upload throughput %.1f MB/s, using %d processes.',
+                      throughput / (1024 * 1024), self.processes)
+        return self.processes
+
+
 class Offloader(object):
     """State of the offload process.
 
@@ -1086,15 +1655,23 @@ class Offloader(object):
         offloaded.
       * _processes:  Maximum number of outstanding offload processes
         to allow during an offload cycle.
+      * _tuner:  _ThroughputTuner adjusting `_processes` after each
+        cycle, or None to keep the number of processes fixed.
+      * _batch_size:  Maximum number of small jobs offloaded together.
       * _age_limit:  Minimum age in days at which a job may be
         offloaded.
       * _open_jobs: a dictionary mapping directory paths to Job
         objects.
+      * _lister: job_directories.DirectoryLister kept across offload
+        cycles, so only directories modified since the last cycle are
+        listed again.
+      * _listed_dirs: set of job directories found in the last cycle.
     """
 
     def __init__(self, options):
         self._upload_age_limit = options.age_to_upload
         self._delete_age_limit = options.age_to_delete
+        self._batch_size = 1
         if options.delete_only:
             self._gs_offloader = FakeGSOffloader()
         else:
@@ -1114,6 +1691,8 @@ class Offloader(object):
             self._gs_offloader = GSOffloader(
                     self.gs_uri, multiprocessing, self._delete_age_limit,
                     console_client)
+            if get_endpoint(self.gs_uri).can_batch():
+                self._batch_size = BATCH_SIZE
         classlist = [
                 job_directories.SwarmingJobDirectory,
         ]
@@ -1124,7 +1703,13 @@ class Offloader(object):
         self._jobdir_classes = classlist
         assert self._jobdir_classes
         self._processes = options.parallelism
+        self._tuner = None
+        if options.adaptive_parallelism:
+            self._tuner = _ThroughputTuner(options.parallelism)
         self._open_jobs = {}
+        self._lister = None
+        self._last_full_scan_time = 0
+        self._listed_dirs = set()
         self._pusub_topic = None
         self._offload_count_limit = 3
 
@@ -1135,22 +1720,40 @@ class Offloader(object):
         Go through the file system looking for valid job directories
         that are currently not in `self._open_jobs`, and add them in.
 
+        The first call lists all the directories, later calls only list
+        directories modified since then. Every `FULL_SCAN_INTERVAL_SECS`
+        all the directories are listed again, in case a change was missed.
+
         """
+        if time.time() - self._last_full_scan_time >= FULL_SCAN_INTERVAL_SECS:
+            self._lister = job_directories.DirectoryLister()
+            self._last_full_scan_time = time.time()
+        listed_dirs = set()
         new_job_count = 0
         for cls in self._jobdir_classes:
-            for resultsdir in cls.get_job_directories():
+            for resultsdir in cls.get_job_directories(self._lister):
+                listed_dirs.add(resultsdir)
                 if resultsdir in self._open_jobs:
                     continue
                 self._open_jobs[resultsdir] = cls(resultsdir)
                 new_job_count += 1
+        self._lister.prune()
+        self._listed_dirs = listed_dirs
         logging.debug('Start of offload cycle - found %d new jobs',
                       new_job_count)
 
 
     def _remove_offloaded_jobs(self):
-        """Removed offloaded jobs from `self._open_jobs`."""
+        """Removed offloaded jobs from `self._open_jobs`.
+
+        Only jobs with an offload attempt, or no longer found by the last
+        `_add_new_jobs()`, can have been offloaded or removed, the others
+        are not checked on disk.
+        """
         removed_job_count = 0
         for jobkey, job in self._open_jobs.items():
+            if not job.offload_count and jobkey in self._listed_dirs:
+                continue
             if (
                     not os.path.exists(job.dirname)
                     or _is_uploaded(job.dirname)):
@@ -1184,7 +1787,8 @@ class Offloader(object):
         Find all job directories for new jobs that we haven't seen
         before.  Then, attempt to offload the directories for any
         jobs that have finished running.  Offload of multiple jobs
-        is done in parallel, up to `self._processes` at a time.
+        is done in parallel, up to `self._processes` at a time, with
+        small jobs grouped into batches of up to `self._batch_size`.
 
         After we've tried uploading all directories, go through the list
         checking the status of all uploaded directories.  If necessary,
@@ -1193,15 +1797,53 @@ class Offloader(object):
         """
         self._add_new_jobs()
         self._report_current_jobs_count()
-        with parallel.BackgroundTaskRunner(
-                self._gs_offloader.offload, processes=self._processes) as queue:
-            for job in self._open_jobs.values():
-                _enqueue_offload(job, queue, self._upload_age_limit)
+        scheduler = _OffloadScheduler(
+                self._batch_size,
+                [job.dirname for job in self._open_jobs.values()
+                 if job.offload_count])
+        for job in self._open_jobs.values():
+            _enqueue_offload(job, scheduler, self._upload_age_limit)
+        tasks = scheduler.get_tasks()
+        if tasks:
+            self._run_offload_tasks(tasks, scheduler.dir_stats)
         self._give_up_on_jobs_over_limit()
         self._remove_offloaded_jobs()
         self._report_failed_jobs()
 
 
+    def _run_offload_tasks(self, tasks, dir_stats):
+        """Run offload tasks in parallel and measure the throughput.
+
+        @param tasks: List of tasks from `_OffloadScheduler.get_tasks()`.
+        @param dir_stats: Dict mapping directory entries to their known
+                          (file count, total size in bytes).
+        """
+        fd, stats_file = tempfile.mkstemp(prefix='gs_offloader_stats_')
+        os.close(fd)
+        self._gs_offloader.stats_file = stats_file
+        try:
+            start_time = time.time()
+            with parallel.BackgroundTaskRunner(
+                    self._gs_offloader.offload_batch,
+                    processes=self._processes) as queue:
+                for task in tasks:
+                    queue.put([task, dict(
+                            (job[0], dir_stats[job[0]]) for job in task
+                            if job[0] in dir_stats)])
+            seconds = time.time() - start_time
+            job_count, file_count, total_bytes = _read_job_stats(stats_file)
+        finally:
+            self._gs_offloader.stats_file = None
+            os.remove(stats_file)
+        logging.debug('Uploaded %d jobs: %d files, %d bytes in %.1f seconds '
+                      'with %d processes', job_count, file_count, total_bytes,
+                      seconds, self._processes)
+        if self._tuner:
+            self._processes = self._tuner.update(total_bytes, seconds)
+            metrics.Gauge('chromeos/autotest/gs_offloader/processes').set(
+                    self._processes)
+
+
     def _give_up_on_jobs_over_limit(self):
         """Give up on jobs that have gone over the offload limit.
 
@@ -1302,6 +1944,11 @@ def parse_options():
                       'CROS.gs_offloading_enabled is False, --delete_only '
                       'is automatically True.',
                       default=not GS_OFFLOADING_ENABLED)
+    parser.add_option('-A', '--adaptive_parallelism',
+                      dest='adaptive_parallelism', action='store_true',
+                      help='Adjust the number of parallel workers after each '
+                      'offload cycle, between 1 and --parallelism, to the '
+                      'measured upload throughput.')
     parser.add_option('-d', '--days_old', dest='days_old',
                       help='Minimum job age in days before a result can be '
                       'offloaded.', type='int', default=0)
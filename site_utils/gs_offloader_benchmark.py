@@ -0,0 +1,103 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Benchmark offloading generated job results to a local directory.
+
+Offloads the same generated jobs one command per job, as gs_offloader did
+before, and with small jobs grouped into batches, using the file:// endpoint
+in place of Google Storage, e.g.
+
+    ./gs_offloader_benchmark.py --small-jobs 500 --large-jobs 5 -p 4
+
+Each command run against Google Storage also pays the start up time of
+gsutil, so the number of commands matters as much as the time shown here.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import common
+from autotest_lib.site_utils import gs_offloader
+from chromite.lib import parallel
+
+
+def _generate_jobs(root, small_jobs, large_jobs, large_job_files):
+    """Create small and large job directories under root.
+
+    @return: A list of job directory names.
+    """
+    jobs = []
+    for i in range(small_jobs + large_jobs):
+        jobdir = '%d-debug' % (i + 1)
+        files = large_job_files if i < large_jobs else 10
+        os.makedirs(os.path.join(root, jobdir, 'sysinfo'))
+        for j in range(files):
+            with open(os.path.join(root, jobdir, 'sysinfo',
+                                   'log.%d' % j), 'w') as f:
+                f.write('x' * 4096)
+        jobs.append(jobdir)
+    return jobs
+
+
+def _offload(jobs, gs_uri, batch_size, processes):
+    """Offload jobs in the current directory to gs_uri.
+
+    @return: A tuple of (seconds, number of upload commands).
+    """
+    offloader = gs_offloader.GSOffloader(gs_uri, False, 0)
+    scheduler = gs_offloader._OffloadScheduler(batch_size)
+    start = time.time()
+    for jobdir in jobs:
+        scheduler.put([jobdir, '', None])
+    tasks = scheduler.get_tasks()
+    with parallel.BackgroundTaskRunner(offloader.offload_batch,
+                                       processes=processes) as queue:
+        for task in tasks:
+            queue.put([task, scheduler.dir_stats])
+    return time.time() - start, len(tasks)
+
+
+def main():
+    """Generate the jobs, offload them in both modes and print a comparison."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--small-jobs', type=int, default=500,
+                        help='Number of small jobs, with 10 files each.')
+    parser.add_argument('--large-jobs', type=int, default=5,
+                        help='Number of large jobs.')
+    parser.add_argument('--large-job-files', type=int, default=2000,
+                        help='Number of files in each large job.')
+    parser.add_argument('-p', '--parallelism', type=int, default=4,
+                        help='Number of parallel workers.')
+    args = parser.parse_args()
+
+    # Leave out the parts talking to other services.
+    gs_offloader.DEFAULT_CTS_RESULTS_GSURI = None
+    gs_offloader.LIMIT_FILE_COUNT = False
+    cwd = os.getcwd()
+    print('%-10s %10s %10s' % ('mode', 'seconds', 'commands'))
+    for mode, batch_size in (('per-job', 1),
+                             ('batched', gs_offloader.BATCH_SIZE)):
+        results_dir = tempfile.mkdtemp(prefix='gs_offloader_benchmark_')
+        gs_dir = tempfile.mkdtemp(prefix='gs_offloader_benchmark_gs_')
+        try:
+            jobs = _generate_jobs(results_dir, args.small_jobs,
+                                  args.large_jobs, args.large_job_files)
+            os.chdir(results_dir)
+            seconds, commands = _offload(jobs, 'file://%s/' % gs_dir,
+                                         batch_size, args.parallelism)
+            print('%-10s %10.2f %10d' % (mode, seconds, commands))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(results_dir, ignore_errors=True)
+            shutil.rmtree(gs_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1061,7 +1061,8 @@ class OffladerConfigTests(_TempResultsDirTestBase):
                          stderr=stderr).AndReturn(_get_fake_process())
         gs_offloader._OffloadError(mox.IgnoreArg())
         gs_offloader._emit_gs_returncode_metric(mox.IgnoreArg()).AndReturn(True)
-        gs_offloader._emit_offload_metrics(mox.IgnoreArg()).AndReturn(True)
+        gs_offloader._emit_offload_metrics(
+                mox.IgnoreArg(), mox.IgnoreArg()).AndReturn(True)
         sub_offloader = gs_offloader.GSOffloader(results_dir, True, 0, None)
         subprocess.Popen(mox.IgnoreArg(),
                          stdout=stdout,
@@ -1479,6 +1480,191 @@ class ReportingTests(_TempResultsDirTestBase):
         self._run_update(new_jobs)
 
 
+    def test_listed_jobs_not_checked(self):
+        """Test `_remove_offloaded_jobs()` skips listed jobs not offloaded.
+
+        Jobs found by the last `_add_new_jobs()` and not attempted to be
+        offloaded are kept without checking the disk; removed ones are
+        dropped once they are no longer listed.
+
+        """
+        for d in self.REGULAR_JOBLIST:
+            self._add_job(d)
+            os.rmdir(d)
+        new_jobs = self._offloader._open_jobs.copy()
+        self._offloader._listed_dirs = set(new_jobs)
+        self._expect_log_message(new_jobs, False)
+        self._expect_failed_jobs([])
+        self._run_update(new_jobs)
+
+        self._offloader._listed_dirs = set()
+        self._expect_log_message({}, False)
+        self._expect_failed_jobs([])
+        self._run_update({})
+
+
+class LocalEndpointTests(_TempResultsDirTestCase):
+    """Tests offloading to a local directory through `LocalEndpoint`."""
+
+    def setUp(self):
+        super(LocalEndpointTests, self).setUp()
+        self._saved_loglevel = logging.getLogger().getEffectiveLevel()
+        logging.getLogger().setLevel(logging.CRITICAL + 1)
+        self._gs_root = tempfile.mkdtemp()
+        self._gs_uri = 'file://%s/' % self._gs_root
+        self._jobs = []
+        for jobdir in self.REGULAR_JOBLIST[:3]:
+            job = self.make_job(jobdir)
+            with open(os.path.join(jobdir, 'status.log'), 'w') as f:
+                f.write('x' * 100)
+            self._jobs.append(job)
+
+
+    def tearDown(self):
+        logging.getLogger().setLevel(self._saved_loglevel)
+        shutil.rmtree(self._gs_root)
+        super(LocalEndpointTests, self).tearDown()
+
+
+    def _check_offloaded(self, jobdir):
+        """Check a job directory is moved to the local "bucket"."""
+        with open(os.path.join(self._gs_root, jobdir, 'status.log')) as f:
+            self.assertEqual('x' * 100, f.read())
+        self.assertFalse(os.path.exists(jobdir))
+
+
+    def test_get_endpoint(self):
+        """Test `get_endpoint()` picks the endpoint by URI scheme."""
+        self.assertIsInstance(gs_offloader.get_endpoint(self._gs_uri),
+                              gs_offloader.LocalEndpoint)
+        endpoint = gs_offloader.get_endpoint('gs://a-test-bucket/')
+        self.assertNotIsInstance(endpoint, gs_offloader.LocalEndpoint)
+        gs_offloader.USE_RSYNC_ENABLED = False
+        self.assertEqual(
+                ['gsutil', 'cp', '-eR', 'a', 'b', 'gs://a-test-bucket/'],
+                endpoint.get_cmd_list(False, ['a', 'b'],
+                                      'gs://a-test-bucket/'))
+
+
+    def test_offload_batch(self):
+        """Test `offload_batch()` uploads small jobs with one command."""
+        offloader = gs_offloader.GSOffloader(self._gs_uri, False, None)
+        stats_file = os.path.join(self._gs_root, 'stats')
+        offloader.stats_file = stats_file
+        with mock.patch.object(gs_offloader, '_upload_cts_testresult'), \
+             mock.patch.object(subprocess, 'Popen',
+                               wraps=subprocess.Popen) as popen:
+            offloader.offload_batch([job.queue_args for job in self._jobs])
+        # One command to copy the jobs and one to mark them finished.
+        self.assertEqual(
+                2, len([c for c in popen.call_args_list if c[0][0][0] == 'cp']))
+        for job in self._jobs:
+            self._check_offloaded(job.dirname)
+        self.assertTrue(os.path.isfile(
+                os.path.join(self._gs_root, '.finished_offload')))
+        self.assertEqual((3, 3, 300),
+                         gs_offloader._read_job_stats(stats_file))
+
+
+    def test_offload_batch_known_stats(self):
+        """Test `offload_batch()` does not walk jobs with known stats."""
+        offloader = gs_offloader.GSOffloader(self._gs_uri, False, None)
+        stats_file = os.path.join(self._gs_root, 'stats')
+        offloader.stats_file = stats_file
+        dir_stats = dict((job.dirname, (2, 50)) for job in self._jobs)
+        with mock.patch.object(gs_offloader, '_upload_cts_testresult'), \
+             mock.patch.object(gs_offloader, '_get_dir_stats') as get_stats:
+            offloader.offload_batch([job.queue_args for job in self._jobs],
+                                    dir_stats)
+        self.assertFalse(get_stats.called)
+        for job in self._jobs:
+            self._check_offloaded(job.dirname)
+        self.assertEqual((3, 6, 150),
+                         gs_offloader._read_job_stats(stats_file))
+
+
+    def test_offload_single(self):
+        """Test `offload()` of a special job to a local directory."""
+        job = self.make_job(self.SPECIAL_JOBLIST[0])
+        offloader = gs_offloader.GSOffloader(self._gs_uri, False, None)
+        with open(os.path.join(job.dirname, 'status.log'), 'w') as f:
+            f.write('x' * 100)
+        with mock.patch.object(gs_offloader, '_upload_cts_testresult'):
+            offloader.offload(*job.queue_args)
+        self._check_offloaded(job.dirname)
+
+
+class OffloadSchedulingTests(_TempResultsDirTestCase):
+    """Tests for `_OffloadScheduler` and `_ThroughputTuner`."""
+
+    def test_scheduler_groups_small_jobs(self):
+        """Test small jobs are grouped by destination, others are not."""
+        for jobdir in self.REGULAR_JOBLIST + self.SPECIAL_JOBLIST:
+            self.make_job(jobdir)
+        with open(os.path.join('114-snafu', 'big.log'), 'w') as f:
+            f.truncate(gs_offloader.SMALL_JOB_BYTES + 1)
+        scheduler = gs_offloader._OffloadScheduler(
+                2, retried_dirs=['113-fubar'])
+        for jobdir in self.REGULAR_JOBLIST + self.SPECIAL_JOBLIST:
+            scheduler.put([jobdir, os.path.dirname(jobdir), None])
+        tasks = [[args[0] for args in task]
+                 for task in scheduler.get_tasks()]
+        self.assertEqual([['113-fubar'], ['114-snafu'],
+                          ['111-fubar', '112-fubar'],
+                          ['hosts/host1/333-reset', 'hosts/host1/334-reset']],
+                         tasks[:4])
+        self.assertItemsEqual([['hosts/host2/444-reset'],
+                               ['hosts/host3/555-reset']], tasks[4:])
+        # The stats of the grouped jobs are passed on to the uploads.
+        self.assertItemsEqual(
+                ['111-fubar', '112-fubar', 'hosts/host1/333-reset',
+                 'hosts/host1/334-reset', 'hosts/host2/444-reset',
+                 'hosts/host3/555-reset'],
+                scheduler.dir_stats.keys())
+
+
+    def test_scheduler_batch_size_one(self):
+        """Test no job is grouped with a batch size of 1."""
+        for jobdir in self.REGULAR_JOBLIST:
+            self.make_job(jobdir)
+        scheduler = gs_offloader._OffloadScheduler(1)
+        for jobdir in self.REGULAR_JOBLIST:
+            scheduler.put([jobdir, '', None])
+        self.assertEqual([[[jobdir, '', None]]
+                          for jobdir in self.REGULAR_JOBLIST],
+                         scheduler.get_tasks())
+
+
+    def test_get_dir_stats(self):
+        """Test `_get_dir_stats()` counts files and stops early."""
+        os.makedirs('job/sub')
+        for i in range(3):
+            with open(os.path.join('job/sub', 'file%d' % i), 'w') as f:
+                f.write('x' * 10)
+        self.assertEqual((3, 30), gs_offloader._get_dir_stats('job'))
+        self.assertEqual(
+                (2, 20), gs_offloader._get_dir_stats('job', max_files=1))
+        self.assertEqual(
+                (1, 10), gs_offloader._get_dir_stats('job', max_bytes=5))
+        self.assertEqual((3, 30), gs_offloader._get_small_job_stats('job'))
+        self.assertFalse(gs_offloader._is_huge_job(3, 30))
+
+
+    def test_throughput_tuner(self):
+        """Test the tuner follows the throughput within its bounds."""
+        mb = gs_offloader._ThroughputTuner.MIN_MEASURED_BYTES
+        tuner = gs_offloader._ThroughputTuner(3)
+        # Too little data to be measured.
+        self.assertEqual(3, tuner.update(1, 1))
+        self.assertEqual(2, tuner.update(mb, 1))
+        # Better throughput, keep going down.
+        self.assertEqual(1, tuner.update(2 * mb, 1))
+        # Bounce back from the lower bound.
+        self.assertEqual(2, tuner.update(3 * mb, 1))
+        # Worse throughput, turn around.
+        self.assertEqual(1, tuner.update(mb, 1))
+
+
 class GsOffloaderMockTests(_TempResultsDirTestCase):
     """Tests using mock instead of mox."""
 
@@ -1,11 +1,13 @@
 import abc
 import datetime
+import fnmatch
 import glob
 import json
 import logging
 import os
 import re
 import shutil
+import time
 
 import common
 from autotest_lib.client.common_lib import time_utils
@@ -89,6 +91,109 @@ def _get_swarming_run_id(path):
     return None
 
 
+class DirectoryLister(object):
+    """Lists directories, reusing listings of directories not modified since.
+
+    Adding, removing or renaming an entry updates the mtime of its parent
+    directory, so a directory is listed again only when its mtime changes.
+    Keeping one lister across offload cycles turns the scan for new job
+    directories into a stat of each parent directory, after the first cycle
+    did the full listing.
+    """
+
+    # A listing is not reused if the directory was modified less than this
+    # many seconds before it was listed, as later changes within the
+    # resolution of the mtime would go unnoticed.
+    RACY_SECS = 2
+
+    def __init__(self):
+        # Directory path -> (mtime, {entry name: True if it's a directory}).
+        self._listings = {}
+        # Paths of the directories listed since the last prune().
+        self._listed = set()
+
+    def prune(self):
+        """Drop the listings of directories not listed since the last call.
+
+        Call once per scan, so that the listings of directories removed or
+        no longer searched, e.g. of offloaded jobs, are not kept forever.
+        """
+        for path in set(self._listings) - self._listed:
+            del self._listings[path]
+        self._listed = set()
+
+    def listdir(self, path):
+        """List the entries of a directory.
+
+        @param path: Path to the directory.
+        @returns: A dictionary mapping each entry name to True if the entry is
+                  a directory. Empty if path is not a directory.
+        """
+        self._listed.add(path)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._listings.pop(path, None)
+            return {}
+        listing = self._listings.get(path)
+        if listing and listing[0] == mtime:
+            return listing[1]
+        listed_time = time.time()
+        try:
+            names = os.listdir(path)
+        except OSError:
+            self._listings.pop(path, None)
+            return {}
+        entries = {name: os.path.isdir(os.path.join(path, name))
+                   for name in names}
+        if listed_time - mtime >= self.RACY_SECS:
+            self._listings[path] = (mtime, entries)
+        else:
+            self._listings.pop(path, None)
+        return entries
+
+    def glob(self, pattern):
+        """Find directories matching a relative glob pattern.
+
+        Matches like glob.glob(), except that only directories are returned.
+
+        @param pattern: A relative glob pattern, e.g., 'hosts/*/[0-9]*-*'.
+        @returns: A list of paths of the matching directories.
+        """
+        paths = ['']
+        for part in pattern.split('/'):
+            matches = []
+            for parent in paths:
+                for name, is_dir in self.listdir(parent or os.curdir).items():
+                    if (is_dir and fnmatch.fnmatchcase(name, part) and
+                            (part.startswith('.') or
+                             not name.startswith('.'))):
+                        matches.append(os.path.join(parent, name))
+            paths = matches
+        return paths
+
+    def find(self, top, filename):
+        """Find directories under a directory containing a file.
+
+        @param top: Path to the directory to search in, inclusive.
+        @param filename: Name of the file to look for.
+        @returns: A list of paths of the directories containing the file.
+        """
+        found = []
+        pending = [top]
+        while pending:
+            path = pending.pop()
+            entries = self.listdir(path)
+            if filename in entries and not entries[filename]:
+                found.append(path)
+            for name, is_dir in entries.items():
+                subdir = os.path.join(path, name)
+                # Like os.walk(), don't follow symlinks to directories.
+                if is_dir and not os.path.islink(subdir):
+                    pending.append(subdir)
+        return found
+
+
 class _JobDirectory(object):
     """State associated with a job to be offloaded.
 
@@ -125,9 +230,16 @@ class _JobDirectory(object):
         self.first_offload_start = 0
 
     @classmethod
-    def get_job_directories(cls):
-        """Return a list of directories of jobs that need offloading."""
-        return [d for d in glob.glob(cls.GLOB_PATTERN) if os.path.isdir(d)]
+    def get_job_directories(cls, lister=None):
+        """Return a list of directories of jobs that need offloading.
+
+        @param lister: A DirectoryLister to reuse listings of directories
+                       not modified since the last call. Default is None
+                       to list all directories.
+        """
+        if lister is None:
+            lister = DirectoryLister()
+        return lister.glob(cls.GLOB_PATTERN)
 
     @abc.abstractmethod
     def get_timestamp_if_finished(self):
@@ -227,15 +339,6 @@ class SpecialJobDirectory(_JobDirectory):
         return entry[0].time_finished if entry else None
 
 
-def _find_results_dir(dirname):
-    subdirs = []
-    for root, dirs, files in os.walk(dirname, topdown=True):
-        for f in files:
-            if f == _OFFLOAD_MARKER:
-                subdirs.append(root)
-    return subdirs
-
-
 _OFFLOAD_MARKER = ".ready_for_offload"
 _marker_parse_error_metric = metrics.Counter(
     'chromeos/autotest/gs_offloader/offload_marker_parse_errors',
@@ -246,30 +349,31 @@ class SwarmingJobDirectory(_JobDirectory):
     """Subclass of _JobDirectory for Skylab swarming jobs."""
 
     @classmethod
-    def get_job_directories(cls):
-        """Return a list of directories of jobs that need offloading."""
+    def get_job_directories(cls, lister=None):
+        """Return a list of directories of jobs that need offloading.
+
+        @param lister: A DirectoryLister to reuse listings of directories
+                       not modified since the last call. Default is None
+                       to list all directories.
+        """
+        if lister is None:
+            lister = DirectoryLister()
         # Legacy swarming results are in directories like
         #   .../results/swarming-3e4391423c3a4311
         # In particular, the ending digit is never 0
-        jobdirs = [
-                d for d in glob.glob('swarming-[0-9a-f]*[1-9a-f]')
-                if os.path.isdir(d)
-        ]
+        jobdirs = lister.glob('swarming-[0-9a-f]*[1-9a-f]')
         # New style swarming results are in directories like
         #   .../results/swarming-3e4391423c3a4310/1
         # - Results are one directory deeper.
         # - Ending digit of first directory is always 0.
-        new_style_topdir = [
-                d for d in glob.glob('swarming-[0-9a-f]*0') if os.path.isdir(d)
-        ]
+        new_style_topdir = lister.glob('swarming-[0-9a-f]*0')
         # When there are multiple tests run in one test_runner build,
         # the results will be one level deeper with the test_id
         # as one further subdirectory.
         # Example: .../results/swarming-3e4391423c3a4310/1/test_id
         for topdir in new_style_topdir:
-            for d in glob.glob('%s/[1-9a-f]*' % topdir):
-                subdirs = _find_results_dir(d)
-                jobdirs += subdirs
+            for d in lister.glob('%s/[1-9a-f]*' % topdir):
+                jobdirs += lister.find(d, _OFFLOAD_MARKER)
 
         return jobdirs
 
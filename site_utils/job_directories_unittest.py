@@ -10,6 +10,7 @@ import mox
 import os
 import shutil
 import tempfile
+import time
 import unittest
 
 import common
@@ -53,6 +54,62 @@ class SwarmingJobDirectoryTestCase(unittest.TestCase):
                     })
 
 
+class DirectoryListerTestCase(unittest.TestCase):
+    """Tests DirectoryLister."""
+
+    def test_reuse_listing_of_unmodified_directory(self):
+        with _change_to_tempdir():
+            os.makedirs("hosts/host1/1-repair")
+            old_time = time.time() - 60
+            os.utime("hosts/host1", (old_time, old_time))
+            lister = job_directories.DirectoryLister()
+            self.assertEqual(lister.glob("hosts/*/[0-9]*-*"),
+                             ["hosts/host1/1-repair"])
+
+            # The listing is reused while the mtime is unchanged.
+            os.mkdir("hosts/host1/2-verify")
+            os.utime("hosts/host1", (old_time, old_time))
+            self.assertEqual(lister.glob("hosts/*/[0-9]*-*"),
+                             ["hosts/host1/1-repair"])
+
+            os.utime("hosts/host1", None)
+            self.assertEqual(set(lister.glob("hosts/*/[0-9]*-*")),
+                             {"hosts/host1/1-repair", "hosts/host1/2-verify"})
+
+    def test_recently_modified_directory_is_listed_again(self):
+        with _change_to_tempdir():
+            os.mkdir("1-job")
+            lister = job_directories.DirectoryLister()
+            self.assertEqual(lister.glob("[0-9]*-*"), ["1-job"])
+            os.mkdir("2-job")
+            self.assertEqual(set(lister.glob("[0-9]*-*")), {"1-job", "2-job"})
+
+    def test_glob_skips_files_and_hidden_directories(self):
+        with _change_to_tempdir():
+            os.mkdir("1-job")
+            os.mkdir(".2-job")
+            open("3-job", "w").close()
+            lister = job_directories.DirectoryLister()
+            self.assertEqual(lister.glob("*"), ["1-job"])
+            self.assertEqual(lister.glob(".*"), [".2-job"])
+
+    def test_prune_drops_listings_no_longer_listed(self):
+        with _change_to_tempdir():
+            os.makedirs("1-job/sub")
+            old_time = time.time() - 60
+            for path in (".", "1-job", "1-job/sub"):
+                os.utime(path, (old_time, old_time))
+            lister = job_directories.DirectoryLister()
+            self.assertEqual(lister.find(".", "missing"), [])
+            lister.prune()
+            self.assertEqual(len(lister._listings), 3)
+
+            # Only the top directory is listed in the next scan.
+            lister.glob("[0-9]*-*")
+            lister.prune()
+            self.assertEqual(list(lister._listings), ["."])
+
+
 class GetJobIDOrTaskID(unittest.TestCase):
     """Tests get_job_id_or_task_id."""
 
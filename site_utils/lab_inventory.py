@@ -1023,15 +1023,18 @@ def _perform_pool_inventory(arguments, inventory, timestamp):
                 pool_message + '\n\n\n' + idle_message)
 
 
-def _dut_in_repair_loop(history):
+def _dut_in_repair_loop(history, diagnosis):
     """Return whether a DUT's history indicates a repair loop.
 
     A DUT is considered looping if it runs no tests, and no tasks pass
     other than repair tasks.
 
-    @param history  An instance of `status_history.HostJobHistory` to be
-                    scanned for a repair loop.  The caller guarantees
-                    that this history corresponds to a working DUT.
+    @param history    An instance of `status_history.HostJobHistory` to
+                      be scanned for a repair loop.  The caller
+                      guarantees that this history corresponds to a
+                      working DUT.
+    @param diagnosis  The `_Diagnosis` of the history, as returned by
+                      `_get_diagnosis()`.
     @returns  Return a true value if the DUT's most recent history
               indicates a repair loop.
     """
@@ -1047,7 +1050,7 @@ def _dut_in_repair_loop(history):
     # time of this writing, this check against the diagnosis task
     # reduces the cost of finding loops in the full inventory from hours
     # to minutes.
-    if _get_diagnosis(history).task.name != 'Repair':
+    if diagnosis.task.name != 'Repair':
         return False
     repair_ok_count = 0
     for task in history:
@@ -1081,7 +1084,7 @@ def _report_untestable_dut(history, state):
     _UNTESTABLE_PRESENCE_METRIC.set(True, fields=fields)
 
 
-def _report_untestable_dut_metrics(inventory):
+def _report_untestable_dut_metrics(afe, inventory, history_cache=None):
     """Scan the inventory for DUTs unable to run tests.
 
     DUTs in the inventory are judged "untestable" if they meet one of
@@ -1099,9 +1102,18 @@ def _report_untestable_dut_metrics(inventory):
     inventory runs which schedules trivial work on any DUT that appears
     idle.
 
-    @param inventory  `_LabInventory` object to be reported on.
+    The full histories scanned for repair loops are loaded together,
+    see `status_history.HistoryLoader`.
+
+    @param afe            Autotest frontend
+    @param inventory      `_LabInventory` object to be reported on.
+    @param history_cache  File to cache the job histories in, or
+                          `None`.
     """
     logging.info('Scanning for untestable DUTs.')
+    idle_statuses = {status_history.UNUSED, status_history.UNKNOWN}
+    # (history, diagnosis) of the working DUTs
+    working_duts = []
     for history in _all_dut_histories(inventory):
         # Managed DUTs with names that don't match
         # _HOSTNAME_PATTERN shouldn't be possible.  However, we
@@ -1110,12 +1122,22 @@ def _report_untestable_dut_metrics(inventory):
         # anomalies.
         if not _HOSTNAME_PATTERN.match(history.hostname):
             continue
-        if _host_is_working(history):
-            if _dut_in_repair_loop(history):
-                _report_untestable_dut(history, 'repair_loop')
-        elif _host_is_idle(history):
+        diagnosis = _get_diagnosis(history)
+        if diagnosis.status == status_history.WORKING:
+            working_duts.append((history, diagnosis))
+        elif diagnosis.status in idle_statuses:
             if not history.host.locked:
                 _report_untestable_dut(history, 'idle_unlocked')
+    # Only DUTs last diagnosed by a repair can be looping, see
+    # `_dut_in_repair_loop`.
+    status_history.HistoryLoader(
+            afe,
+            [history for history, diagnosis in working_duts
+             if diagnosis.task.name == 'Repair'],
+            cache_file=history_cache)
+    for history, diagnosis in working_duts:
+        if _dut_in_repair_loop(history, diagnosis):
+            _report_untestable_dut(history, 'repair_loop')
 
 
 def _log_startup(arguments, startup_time):
@@ -1142,14 +1164,14 @@ def _log_startup(arguments, startup_time):
     return timestamp
 
 
-def _create_inventory(arguments, end_time):
+def _create_inventory(afe, arguments, end_time):
     """Create the `_LabInventory` instance to use for reporting.
 
+    @param afe        Autotest frontend
     @param end_time   A UNIX timestamp for the end of the time range
                       to be searched in this inventory run.
     """
     start_time = end_time - arguments.duration * 60 * 60
-    afe = frontend_wrappers.RetryingAFE(server=None)
     inventory = _LabInventory.create_inventory(
             afe, start_time, end_time, arguments.modelnames)
     logging.info('Found %d hosts across %d models',
@@ -1169,7 +1191,8 @@ def _perform_inventory_reports(arguments):
     """
     startup_time = time.time()
     timestamp = _log_startup(arguments, startup_time)
-    inventory = _create_inventory(arguments, startup_time)
+    afe = frontend_wrappers.RetryingAFE(server=None)
+    inventory = _create_inventory(afe, arguments, startup_time)
     if arguments.debug:
         _populate_model_counts(inventory)
     if arguments.model_notify:
@@ -1177,7 +1200,8 @@ def _perform_inventory_reports(arguments):
     if arguments.pool_notify:
         _perform_pool_inventory(arguments, inventory, timestamp)
     if arguments.report_untestable:
-        _report_untestable_dut_metrics(inventory)
+        _report_untestable_dut_metrics(afe, inventory,
+                                       arguments.history_cache)
 
 
 def _separate_email_addresses(address_list):
@@ -1277,6 +1301,10 @@ def _parse_command(argv):
                               'recommendation)'))
     parser.add_argument('--report-untestable', action='store_true',
                         help='Check for devices unable to run tests.')
+    parser.add_argument('--history-cache', metavar='FILE', default=None,
+                        help='File to cache DUT job histories in, so that '
+                             'later runs only query the jobs that finished '
+                             'since.')
     parser.add_argument('--debug', action='store_true',
                         help='Print e-mail, metrics messages on stdout '
                              'without sending them.')
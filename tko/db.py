@@ -58,6 +58,36 @@ class MySQLTooManyRows(Exception):
     pass
 
 
+# Maximum number of rows sent to the database in a single multi-row statement.
+# Keeps the statements built by the bulk helpers well under MySQL's
+# max_allowed_packet for jobs with thousands of perf keyvals.
+_BULK_CHUNK_SIZE = 1000
+
+# Tables holding per-test results, keyed on test_idx.
+_TEST_RESULT_TABLES = ('tko_iteration_result', 'tko_iteration_perf_value',
+                       'tko_iteration_attributes')
+
+
+def _chunks(items, size):
+    """Split a sequence into lists of at most |size| items.
+
+    @param items: The sequence to split.
+    @param size: Maximum number of items per chunk.
+    """
+    items = list(items)
+    return [items[i:i + size] for i in xrange(0, len(items), size)]
+
+
+def _in_clause(field, values):
+    """Build a parameterized 'field IN (...)' where tuple.
+
+    @param field: The name of the field to match.
+    @param values: The list of values the field may take.
+    """
+    return ('%s IN (%s)' % (field, ','.join(['%s'] * len(values))),
+            list(values))
+
+
 def _connection_retry_callback():
     """Callback method used to increment a retry metric."""
     metrics.Counter('chromeos/autotest/tko/connection_retries').increment()
@@ -412,6 +442,42 @@ class db_sql(object):
         self._exec_sql_with_commit(cmd, values, commit)
 
 
+    def _exec_many_with_commit(self, sql, rows, commit):
+        if self.autocommit:
+            # re-run the query until it succeeds
+            def _exec_sql():
+                self.cur.executemany(sql, rows)
+                self.con.commit()
+            self.run_with_retry(_exec_sql)
+        else:
+            # take one shot at running the query
+            self.cur.executemany(sql, rows)
+            if commit:
+                self.con.commit()
+
+
+    def insert_many(self, table, fields, rows, commit=None):
+        """\
+                'insert into table (fields) values (%s ... %s), ...', rows
+
+                The driver folds the rows into multi-row VALUES statements
+                of at most _BULK_CHUNK_SIZE rows each.
+
+        @param table: The name of the table.
+        @param fields: The sequence of field names.
+        @param rows: A list of value sequences, in the order of |fields|.
+        @param commit: If commit the transaction .
+        """
+        if not rows:
+            return
+        cmd = ('insert into %s (%s) values (%s)' %
+               (table, ','.join(self._quote(field) for field in fields),
+                ','.join(['%s'] * len(fields))))
+        for chunk in _chunks(rows, _BULK_CHUNK_SIZE):
+            self.dprint('%s [%d rows]' % (cmd, len(chunk)))
+            self._exec_many_with_commit(cmd, chunk, commit)
+
+
     def delete(self, table, where, commit = None):
         """Delete entries.
 
@@ -466,18 +532,38 @@ class db_sql(object):
         @param commit: If commit the transaction .
         """
         job_idx = self.find_job(tag)
-        for test_idx in self.find_tests(job_idx):
-            where = {'test_idx' : test_idx}
-            self.delete('tko_iteration_result', where)
-            self.delete('tko_iteration_perf_value', where)
-            self.delete('tko_iteration_attributes', where)
-            self.delete('tko_test_attributes', where)
-            self.delete('tko_test_labels_tests', {'test_id': test_idx})
+        self._delete_test_children(self.find_tests(job_idx), commit=commit)
         where = {'job_idx' : job_idx}
         self.delete('tko_tests', where)
         self.delete('tko_jobs', where)
 
 
+    def _delete_test_children(self, test_idxs, commit=None):
+        """Delete all rows referencing the given tests, in bulk.
+
+        @param test_idxs: A sequence of test_idx values.
+        @param commit: If commit the transaction .
+        """
+        for chunk in _chunks(test_idxs, _BULK_CHUNK_SIZE):
+            where = _in_clause('test_idx', chunk)
+            for table in _TEST_RESULT_TABLES + ('tko_test_attributes',):
+                self.delete(table, where, commit=commit)
+            self.delete('tko_test_labels_tests', _in_clause('test_id', chunk),
+                        commit=commit)
+
+
+    def delete_tests(self, test_idxs, commit=None):
+        """Delete tests and all their results with one query per table.
+
+        @param test_idxs: A sequence of test_idx values.
+        @param commit: If commit the transaction .
+        """
+        self._delete_test_children(test_idxs, commit=commit)
+        for chunk in _chunks(test_idxs, _BULK_CHUNK_SIZE):
+            self.delete('tko_tests', _in_clause('test_idx', chunk),
+                        commit=commit)
+
+
     def insert_job(self, tag, job, commit=None):
         """Insert a tko job.
 
@@ -574,60 +660,88 @@ class db_sql(object):
         @param test: The test object.
         @param commit: If commit the transaction .
         """
-        kver = self.insert_kernel(test.kernel, commit=commit)
-        data = {'job_idx':job.job_idx, 'test':test.testname,
-                'subdir':test.subdir, 'kernel_idx':kver,
-                'status':self.status_idx[test.status],
-                'reason':test.reason, 'machine_idx':job.machine_idx,
-                'started_time': test.started_time,
-                'finished_time':test.finished_time}
-        is_update = hasattr(test, "test_idx")
-        if is_update:
-            test_idx = test.test_idx
-            self.update('tko_tests', data,
-                        {'test_idx': test_idx}, commit=commit)
-            where = {'test_idx': test_idx}
-            self.delete('tko_iteration_result', where)
-            self.delete('tko_iteration_perf_value', where)
-            self.delete('tko_iteration_attributes', where)
-            where['user_created'] = 0
-            self.delete('tko_test_attributes', where)
-        else:
-            self.insert('tko_tests', data, commit=commit)
-            test_idx = test.test_idx = self.get_last_autonumber_value()
-        data = {'test_idx': test_idx}
-
-        for i in test.iterations:
-            data['iteration'] = i.index
-            for key, value in i.attr_keyval.iteritems():
-                data['attribute'] = key
-                data['value'] = value
-                self.insert('tko_iteration_attributes', data,
-                            commit=commit)
-            for key, value in i.perf_keyval.iteritems():
-                data['attribute'] = key
-                if math.isnan(value) or math.isinf(value):
-                    data['value'] = None
-                else:
-                    data['value'] = value
-                self.insert('tko_iteration_result', data,
-                            commit=commit)
+        self.insert_tests(job, [test], commit=commit)
 
-        data = {'test_idx': test_idx}
 
-        for key, value in test.attributes.iteritems():
-            data = {'test_idx': test_idx, 'attribute': key,
-                    'value': value}
-            try:
-                self.insert('tko_test_attributes', data, commit=commit)
-            except:
-                _log_error('Uploading attribute %r' % (data))
-                raise
-
-        if not is_update:
-            for label_index in test.labels:
-                data = {'test_id': test_idx, 'testlabel_id': label_index}
-                self.insert('tko_test_labels_tests', data, commit=commit)
+    def insert_tests(self, job, tests, commit=None):
+        """Inserts or updates all the given tests of a job.
+
+        Each tko_tests row is still written on its own, since its test_idx is
+        needed by the rows referencing it. Iteration results, attributes and
+        labels of all tests are collected in memory and written with one
+        multi-row statement per table, and the stale results of reparsed
+        tests are deleted with one statement per table.
+
+        @param job: The job object.
+        @param tests: A list of test objects.
+        @param commit: If commit the transaction .
+        """
+        updated_idxs = [test.test_idx for test in tests
+                        if hasattr(test, 'test_idx')]
+        for chunk in _chunks(updated_idxs, _BULK_CHUNK_SIZE):
+            where = _in_clause('test_idx', chunk)
+            for table in _TEST_RESULT_TABLES:
+                self.delete(table, where, commit=commit)
+            self.delete('tko_test_attributes',
+                        (where[0] + ' and user_created=0', where[1]),
+                        commit=commit)
+
+        kernels = {}
+        iteration_attributes = []
+        iteration_results = []
+        test_attributes = []
+        test_labels = []
+        for test in tests:
+            kernel_hash = test.kernel.kernel_hash
+            if kernel_hash not in kernels:
+                kernels[kernel_hash] = self.insert_kernel(test.kernel,
+                                                          commit=commit)
+            data = {'job_idx':job.job_idx, 'test':test.testname,
+                    'subdir':test.subdir, 'kernel_idx':kernels[kernel_hash],
+                    'status':self.status_idx[test.status],
+                    'reason':test.reason, 'machine_idx':job.machine_idx,
+                    'started_time': test.started_time,
+                    'finished_time':test.finished_time}
+            is_update = hasattr(test, "test_idx")
+            if is_update:
+                test_idx = test.test_idx
+                self.update('tko_tests', data,
+                            {'test_idx': test_idx}, commit=commit)
+            else:
+                self.insert('tko_tests', data, commit=commit)
+                test_idx = test.test_idx = self.get_last_autonumber_value()
+
+            for i in test.iterations:
+                for key, value in i.attr_keyval.iteritems():
+                    iteration_attributes.append(
+                            (test_idx, i.index, key, value))
+                for key, value in i.perf_keyval.iteritems():
+                    if math.isnan(value) or math.isinf(value):
+                        value = None
+                    iteration_results.append((test_idx, i.index, key, value))
+
+            for key, value in test.attributes.iteritems():
+                test_attributes.append((test_idx, key, value))
+
+            if not is_update:
+                for label_index in test.labels:
+                    test_labels.append((test_idx, label_index))
+
+        iteration_fields = ('test_idx', 'iteration', 'attribute', 'value')
+        self.insert_many('tko_iteration_attributes', iteration_fields,
+                         iteration_attributes, commit=commit)
+        self.insert_many('tko_iteration_result', iteration_fields,
+                         iteration_results, commit=commit)
+        try:
+            self.insert_many('tko_test_attributes',
+                             ('test_idx', 'attribute', 'value'),
+                             test_attributes, commit=commit)
+        except:
+            _log_error('Uploading %d attributes of job %r'
+                       % (len(test_attributes), job.job_idx))
+            raise
+        self.insert_many('tko_test_labels_tests', ('test_id', 'testlabel_id'),
+                         test_labels, commit=commit)
 
 
     def read_machine_map(self):
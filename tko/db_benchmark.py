@@ -0,0 +1,191 @@
+#!/usr/bin/python2
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Compare the per-row and the bulk TKO write paths.
+
+Writes a synthetic job with many perf keyvals through db_sql against a fake
+MySQL connection that counts round trips and charges a fixed latency for
+each of them, e.g.
+
+    ./db_benchmark.py --keyvals 5000 --latency-ms 0.5
+"""
+
+import argparse
+import math
+import time
+
+import common
+from autotest_lib.tko import db as tko_db
+from autotest_lib.tko import models
+
+
+class _FakeCursor(object):
+    """MySQLdb cursor stand-in counting round trips."""
+
+    def __init__(self, latency):
+        self._latency = latency
+        self._last_id = 0
+        self._rows = []
+        self.round_trips = 0
+
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self._latency:
+            time.sleep(self._latency)
+
+
+    def execute(self, sql, values=None):
+        self._round_trip()
+        if sql.startswith('insert'):
+            self._last_id += 1
+            self._rows = []
+        elif sql == 'SELECT LAST_INSERT_ID()':
+            self._rows = [(self._last_id,)]
+        elif 'tko_status' in sql:
+            self._rows = [(1, 'GOOD'), (2, 'FAIL')]
+        else:
+            self._rows = []
+        return len(self._rows)
+
+
+    def executemany(self, sql, rows):
+        # MySQLdb folds 'insert ... values (...)' into one statement.
+        self._round_trip()
+        self._rows = []
+        return len(rows)
+
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeConnection(object):
+    """MySQLdb connection stand-in."""
+
+    def __init__(self, latency):
+        self.cur = _FakeCursor(latency)
+
+
+    def cursor(self):
+        return self.cur
+
+
+    def commit(self):
+        pass
+
+
+    def close(self):
+        pass
+
+
+class _BenchmarkDb(tko_db.db_sql):
+    """db_sql talking to a _FakeConnection."""
+
+    def __init__(self, latency):
+        self._latency = latency
+        super(_BenchmarkDb, self).__init__(autocommit=False)
+
+
+    def _load_config(self, host, database, user, password):
+        self.host = self.database = self.user = self.password = ''
+        self.port = ''
+        self.query_timeout = 0
+        self.min_delay = self.max_delay = 0
+
+
+    def connect(self, host, database, user, password, port):
+        return _FakeConnection(self._latency)
+
+
+def _legacy_insert_test(db, job, test):
+    """The per-row write path db_sql.insert_test used before batching."""
+    kver = db.insert_kernel(test.kernel)
+    data = {'job_idx': job.job_idx, 'test': test.testname,
+            'subdir': test.subdir, 'kernel_idx': kver,
+            'status': db.status_idx[test.status],
+            'reason': test.reason, 'machine_idx': job.machine_idx,
+            'started_time': test.started_time,
+            'finished_time': test.finished_time}
+    db.insert('tko_tests', data)
+    test_idx = db.get_last_autonumber_value()
+    data = {'test_idx': test_idx}
+    for i in test.iterations:
+        data['iteration'] = i.index
+        for key, value in i.attr_keyval.iteritems():
+            data['attribute'] = key
+            data['value'] = value
+            db.insert('tko_iteration_attributes', data)
+        for key, value in i.perf_keyval.iteritems():
+            data['attribute'] = key
+            if math.isnan(value) or math.isinf(value):
+                data['value'] = None
+            else:
+                data['value'] = value
+            db.insert('tko_iteration_result', data)
+    for key, value in test.attributes.iteritems():
+        db.insert('tko_test_attributes',
+                  {'test_idx': test_idx, 'attribute': key, 'value': value})
+    for label_index in test.labels:
+        db.insert('tko_test_labels_tests',
+                  {'test_id': test_idx, 'testlabel_id': label_index})
+
+
+def _make_job(num_tests, num_keyvals):
+    """Build a job whose tests share |num_keyvals| perf keyvals in total."""
+    job = models.job('/results/1-bench', 'bench', 'bench', 'host1', None,
+                     None, None, None, None, None, None, {})
+    job.job_idx = 1
+    job.machine_idx = 1
+    kernel = models.kernel('4.4', [], 'hash')
+    per_test = max(1, num_keyvals // num_tests)
+    for t in xrange(num_tests):
+        perf = dict(('perf_%d' % k, float(k)) for k in xrange(per_test))
+        attr = {'iteration_attr': 'value'}
+        iterations = [models.iteration(1, attr, perf)]
+        job.tests.append(models.test(
+                'test_%d' % t, 'test_%d' % t, 'GOOD', '', kernel, 'host1',
+                None, None, iterations, {'attr': 'value'}, [], [1, 2]))
+    return job
+
+
+def _measure(write, latency, num_tests, num_keyvals):
+    """Return (round trips, seconds) spent in write(db, job)."""
+    db = _BenchmarkDb(latency)
+    job = _make_job(num_tests, num_keyvals)
+    cursor = db.cur
+    cursor.round_trips = 0
+    start = time.time()
+    write(db, job)
+    return cursor.round_trips, time.time() - start
+
+
+def main():
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tests', type=int, default=10,
+                        help='Number of tests in the synthetic job.')
+    parser.add_argument('--keyvals', type=int, default=5000,
+                        help='Total number of perf keyvals in the job.')
+    parser.add_argument('--latency-ms', type=float, default=0.5,
+                        help='Simulated latency of one database round trip.')
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000.0
+
+    def legacy(db, job):
+        for test in job.tests:
+            _legacy_insert_test(db, job, test)
+
+    def bulk(db, job):
+        db.insert_tests(job, job.tests)
+
+    print '%-8s %12s %10s' % ('path', 'round trips', 'seconds')
+    for name, write in (('per-row', legacy), ('bulk', bulk)):
+        trips, seconds = _measure(write, latency, args.tests, args.keyvals)
+        print '%-8s %12d %10.3f' % (name, trips, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -36,5 +36,71 @@ class FormatOperationalErrorTestCase(unittest.TestCase):
         self.assertIn('An operational error occurred', got)
 
 
+class _FakeCursor(object):
+    """Records the statements sent to the database."""
+
+    def __init__(self):
+        self.statements = []
+
+
+    def execute(self, sql, values=None):
+        self.statements.append((sql, values))
+
+
+    def executemany(self, sql, rows):
+        self.statements.append((sql, rows))
+
+
+def _make_db(cursor):
+    """Build a db_sql object talking to |cursor| without connecting."""
+    sql = db.db_sql.__new__(db.db_sql)
+    sql.debug = False
+    sql.autocommit = False
+    sql.cur = cursor
+    return sql
+
+
+class BulkWriteTestCase(unittest.TestCase):
+    """Tests for the bulk write helpers of db_sql."""
+
+    def setUp(self):
+        self.cursor = _FakeCursor()
+        self.db = _make_db(self.cursor)
+
+
+    def test_insert_many_chunks_rows(self):
+        """Test insert_many() sends one statement per chunk of rows."""
+        rows = [(i, 'attr', i) for i in xrange(db._BULK_CHUNK_SIZE + 1)]
+        self.db.insert_many('tko_iteration_result',
+                            ('test_idx', 'attribute', 'value'), rows)
+        self.assertEqual(len(self.cursor.statements), 2)
+        sql, chunk = self.cursor.statements[0]
+        self.assertEqual(sql, 'insert into tko_iteration_result '
+                         '(`test_idx`,`attribute`,`value`) values (%s,%s,%s)')
+        self.assertEqual(len(chunk), db._BULK_CHUNK_SIZE)
+        self.assertEqual(self.cursor.statements[1][1], rows[-1:])
+
+
+    def test_insert_many_no_rows(self):
+        """Test insert_many() skips the database for empty row lists."""
+        self.db.insert_many('tko_test_labels_tests', ('test_id',), [])
+        self.assertEqual(self.cursor.statements, [])
+
+
+    def test_delete_tests(self):
+        """Test delete_tests() deletes with one query per table."""
+        self.db.delete_tests([1, 2, 3])
+        tables = [sql.split()[2] for sql, _ in self.cursor.statements]
+        self.assertEqual(tables, ['tko_iteration_result',
+                                  'tko_iteration_perf_value',
+                                  'tko_iteration_attributes',
+                                  'tko_test_attributes',
+                                  'tko_test_labels_tests',
+                                  'tko_tests'])
+        for sql, values in self.cursor.statements:
+            self.assertIn(' IN (%s,%s,%s)', sql)
+            self.assertEqual(values, [1, 2, 3])
+
+
 if __name__ == "__main__":
     unittest.main()
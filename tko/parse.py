@@ -3,10 +3,13 @@
 import collections
 import errno
 import fcntl
+import hashlib
 import json
+import multiprocessing
 import optparse
 import os
 import socket
+import pickle
 import subprocess
 import sys
 import time
@@ -39,7 +42,17 @@ except ImportError:
 _ParseOptions = collections.namedtuple(
     'ParseOptions', ['reparse', 'mail_on_failure', 'dry_run', 'suite_report',
                      'datastore_creds', 'export_to_gcloud_path',
-                     'disable_perf_upload'])
+                     'disable_perf_upload', 'incremental'])
+
+# Parser state saved by --incremental parses, next to the status log.
+_CHECKPOINT_FILE = '.parse.checkpoint'
+_CHECKPOINT_VERSION = 1
+# Number of bytes of status log read at a time by --incremental parses.
+_STATUS_LOG_CHUNK_SIZE = 1024 * 1024
+# Number of bytes before the checkpoint offset used to detect rewritten logs.
+_CHECKPOINT_DIGEST_SIZE = 4096
+# Lock of a single leaf job directory, held by the workers of --jobs parses.
+_JOB_LOCK_FILE = '.parse.job.lock'
 
 _HARDCODED_CONTROL_FILE_NAMES = (
         # client side test control, as saved in old Autotest paths.
@@ -111,6 +124,18 @@ def parse_args():
                       help=("Do not upload perf results to chrome perf."),
                       dest="disable_perf_upload", action="store_true",
                       default=False)
+    parser.add_option("--jobs",
+                      help=("Number of worker processes used to parse job "
+                            "directories in parallel. Each worker uses its "
+                            "own database connection."),
+                      dest="jobs", type="int", default=1)
+    parser.add_option("--incremental",
+                      help=("Stream status.log from the checkpoint left by the "
+                            "previous --incremental parse of the job instead "
+                            "of from the start. If the job is still running, "
+                            "publish the tests found so far and save a new "
+                            "checkpoint."),
+                      dest="incremental", action="store_true", default=False)
     options, args = parser.parse_args()
 
     # we need a results directory
@@ -342,7 +367,11 @@ def parse_one(db, pid_file_manager, jobname, path, parse_options):
 
     tko_utils.dprint("\nScanning %s (%s)" % (jobname, path))
     old_job_idx = db.find_job(jobname)
-    if old_job_idx is not None and not reparse:
+    # Jobs with a checkpoint only had partial results published so far,
+    # whether or not this parse is incremental.
+    checkpoint_path = os.path.join(path, _CHECKPOINT_FILE)
+    resuming = os.path.exists(checkpoint_path)
+    if old_job_idx is not None and not reparse and not resuming:
         tko_utils.dprint("! Job is already parsed, done")
         return
 
@@ -357,7 +386,19 @@ def parse_one(db, pid_file_manager, jobname, path, parse_options):
     if not status_log_path:
         tko_utils.dprint("! Unable to parse job, no status file")
         return
-    _parse_status_log(parser, job, status_log_path)
+    if parse_options.incremental:
+        finished = _parse_status_log_incremental(parser, job, path,
+                                                 status_log_path,
+                                                 status_version)
+    else:
+        _parse_status_log(parser, job, status_log_path)
+        finished = True
+    if not finished and not os.path.exists(checkpoint_path):
+        # Partial results in the DB would mark the job as parsed, and its
+        # final results would never be.
+        tko_utils.dprint("! Job is still running and its parse cannot be "
+                         "resumed, skipping")
+        return
 
     if old_job_idx is not None:
         job.job_idx = old_job_idx
@@ -384,6 +425,15 @@ def parse_one(db, pid_file_manager, jobname, path, parse_options):
     if 'suite' in job.keyval_dict:
       job.suite = job.keyval_dict['suite']
 
+    if not finished:
+        # Only publish what is known so far; throttling, uploads and
+        # reports have to wait for the job to finish.
+        tko_utils.dprint("+ Job is still running, writing partial results")
+        if not dry_run:
+            _write_job_to_db(db, jobname, job)
+            db.commit()
+        return
+
     result_utils_lib.LOG =  tko_utils.dprint
     _throttle_result_size(path)
 
@@ -475,6 +525,9 @@ def parse_one(db, pid_file_manager, jobname, path, parse_options):
 
     if not dry_run:
         db.commit()
+        # The full results are in, so the job must not be resumed again.
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
 
     # Generate a suite report.
     # Check whether this is a suite job, a suite job will be a hostless job, its
@@ -547,8 +600,7 @@ def _write_job_to_db(db, jobname, job):
             'skylab' if tko_utils.is_skylab_task(jobname) else 'afe',
     )
     db.update_job_keyvals(job)
-    for test in job.tests:
-        db.insert_test(job, test)
+    db.insert_tests(job, job.tests)
 
 
 def _find_status_log_path(path):
@@ -573,6 +625,157 @@ def _parse_status_log(parser, job, status_log_path):
             job.tests.append(test)
 
 
+def _is_job_finished(path):
+    """Check whether autoserv is done writing the results of a job.
+
+    @param path: The path to the results of the job.
+
+    @return: False if the job's .autoserv_execute pidfile has no exit code
+             yet, True otherwise.
+    """
+    top_dir = tko_utils.find_toplevel_job_dir(path)
+    if not top_dir:
+        return True
+    execute_path = os.path.join(top_dir, '.autoserv_execute')
+    if not os.path.exists(execute_path):
+        return True
+    with open(execute_path) as f:
+        return len(f.readlines()) >= 2
+
+
+def _status_log_digest(status_log, offset):
+    """Hash the bytes of a status log just before a given offset.
+
+    @param status_log: An open status log file.
+    @param offset: The byte offset.
+    """
+    start = max(0, offset - _CHECKPOINT_DIGEST_SIZE)
+    status_log.seek(start)
+    return hashlib.md5(status_log.read(offset - start)).hexdigest()
+
+
+def _load_checkpoint(checkpoint_path, status_log, status_log_path,
+                     status_version):
+    """Load the checkpoint of a previous incremental parse, if still valid.
+
+    @param checkpoint_path: The path of the checkpoint file.
+    @param status_log: The status log, opened for reading.
+    @param status_log_path: The path of the status log.
+    @param status_version: The status log version of the job.
+
+    @return: The checkpoint dictionary, or None.
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, 'rb') as f:
+            checkpoint = pickle.load(f)
+    except Exception as e:
+        tko_utils.dprint('! Ignoring unreadable checkpoint %s: %s' %
+                         (checkpoint_path, e))
+        return None
+    offset = checkpoint.get('offset', 0)
+    if (checkpoint.get('version') != _CHECKPOINT_VERSION
+        or checkpoint.get('status_log') != os.path.basename(status_log_path)
+        or checkpoint.get('status_version') != status_version
+        or os.fstat(status_log.fileno()).st_size < offset
+        or _status_log_digest(status_log, offset) != checkpoint.get('digest')):
+        tko_utils.dprint('! Ignoring stale checkpoint %s' % checkpoint_path)
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    """Atomically write the checkpoint of an incremental parse.
+
+    @param checkpoint_path: The path of the checkpoint file.
+    @param checkpoint: The checkpoint dictionary.
+    """
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(temp_path, checkpoint_path)
+
+
+def _parse_status_log_incremental(parser, job, path, status_log_path,
+                                  status_version):
+    """Parse the part of a status log not covered by the last checkpoint.
+
+    The log is read in chunks from the offset saved by the previous
+    incremental parse, with the parser resumed from the saved state. While
+    the job is running, only complete lines are parsed and the new state is
+    saved for the next run, if the parser supports resuming; once it has
+    finished, the parse is completed and
+    the checkpoint removed.
+
+    @param parser: A parser_lib parser.
+    @param job: The job object; job.tests is set to all tests found so far.
+    @param path: The path to the results of the job.
+    @param status_log_path: The path of the status log.
+    @param status_version: The status log version of the job.
+
+    @return: True if the job has finished and job.tests is final.
+    """
+    checkpoint_path = os.path.join(path, _CHECKPOINT_FILE)
+    # Check before reading, so that no line written after this is missed.
+    finished = _is_job_finished(path)
+    with open(status_log_path, 'rb') as status_log:
+        checkpoint = _load_checkpoint(checkpoint_path, status_log,
+                                      status_log_path, status_version)
+        if checkpoint:
+            offset = checkpoint['offset']
+            tests = checkpoint['tests']
+            parser.start(job, checkpoint['state'])
+            tko_utils.dprint('+ Resuming parse of %s at byte %d' %
+                             (status_log_path, offset))
+        else:
+            offset = 0
+            tests = []
+            parser.start(job)
+
+        status_log.seek(offset)
+        remainder = ''
+        while True:
+            chunk = status_log.read(_STATUS_LOG_CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (remainder + chunk).split('\n')
+            remainder = lines.pop()
+            tests.extend(parser.process_lines(
+                    [line + '\n' for line in lines]))
+        offset = status_log.tell() - len(remainder)
+
+    if finished:
+        tests.extend(parser.end([remainder] if remainder else []))
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    else:
+        state = parser.get_checkpoint()
+        if state is not None:
+            with open(status_log_path, 'rb') as status_log:
+                digest = _status_log_digest(status_log, offset)
+            _save_checkpoint(checkpoint_path, {
+                    'version': _CHECKPOINT_VERSION,
+                    'status_log': os.path.basename(status_log_path),
+                    'status_version': status_version,
+                    'offset': offset,
+                    'digest': digest,
+                    'state': state,
+                    'tests': tests,
+            })
+        elif os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    # the parser can return the same object multiple times, so filter out dups
+    job.tests = []
+    already_added = set()
+    for test in tests:
+        if test not in already_added:
+            already_added.add(test)
+            job.tests.append(test)
+    return finished
+
+
 def _match_existing_tests(db, job):
     """Find entries in the DB corresponding to the job's tests, update job.
 
@@ -599,14 +802,7 @@ def _match_existing_tests(db, job):
 
 
 def _delete_tests_from_db(db, tests):
-    for test_idx in tests.itervalues():
-        where = {'test_idx' : test_idx}
-        db.delete('tko_iteration_result', where)
-        db.delete('tko_iteration_perf_value', where)
-        db.delete('tko_iteration_attributes', where)
-        db.delete('tko_test_attributes', where)
-        db.delete('tko_test_labels_tests', {'test_id': test_idx})
-        db.delete('tko_tests', where)
+    db.delete_tests(tests.values())
 
 
 def _get_job_subdirs(path):
@@ -626,6 +822,7 @@ def _get_job_subdirs(path):
     # if this dir contains ONLY subdirectories, return them
     contents = set(os.listdir(path))
     contents.discard(".parse.lock")
+    contents.discard(_CHECKPOINT_FILE)
     subdirs = set(sub for sub in contents if
                   os.path.isdir(os.path.join(path, sub)))
     if len(contents) == len(subdirs) != 0:
@@ -653,42 +850,243 @@ def parse_leaf_path(db, pid_file_manager, path, level, parse_options):
     return jobname
 
 
-def parse_path(db, pid_file_manager, path, level, parse_options):
-    """Parse a path
+def _find_leaf_paths(path, level):
+    """Find the leaf job directories under a path, in parse order.
 
-    @param db: database handle.
-    @param pid_file_manager: pidfile.PidFileManager object.
     @param path: The path to the results to be parsed.
     @param level: Integer, level of subdirectories to include in the job name.
-    @param parse_options: _ParseOptions instance.
 
-    @returns: A set of job names of the parsed jobs.
-              set(['123-chromeos-test/host1', '123-chromeos-test/host2'])
+    @returns: A list of (path, level) tuples, one per leaf job directory.
     """
-    processed_jobs = set()
+    leaf_paths = []
     job_subdirs = _get_job_subdirs(path)
     if job_subdirs is not None:
         # parse status.log in current directory, if it exists. multi-machine
         # synchronous server side tests record output in this directory. without
         # this check, we do not parse these results.
         if os.path.exists(os.path.join(path, 'status.log')):
-            new_job = parse_leaf_path(db, pid_file_manager, path, level,
-                                      parse_options)
-            processed_jobs.add(new_job)
+            leaf_paths.append((path, level))
         # multi-machine job
         for subdir in job_subdirs:
             jobpath = os.path.join(path, subdir)
-            new_jobs = parse_path(db, pid_file_manager, jobpath, level + 1,
-                                  parse_options)
-            processed_jobs.update(new_jobs)
+            leaf_paths.extend(_find_leaf_paths(jobpath, level + 1))
     else:
         # single machine job
-        new_job = parse_leaf_path(db, pid_file_manager, path, level,
+        leaf_paths.append((path, level))
+    return leaf_paths
+
+
+def parse_path(db, pid_file_manager, path, level, parse_options):
+    """Parse a path
+
+    @param db: database handle.
+    @param pid_file_manager: pidfile.PidFileManager object.
+    @param path: The path to the results to be parsed.
+    @param level: Integer, level of subdirectories to include in the job name.
+    @param parse_options: _ParseOptions instance.
+
+    @returns: A set of job names of the parsed jobs.
+              set(['123-chromeos-test/host1', '123-chromeos-test/host2'])
+    """
+    processed_jobs = set()
+    for leaf_path, leaf_level in _find_leaf_paths(path, level):
+        new_job = parse_leaf_path(db, pid_file_manager, leaf_path, leaf_level,
                                   parse_options)
         processed_jobs.add(new_job)
     return processed_jobs
 
 
+def _lock_path(path, noblock, shared=False, name=".parse.lock"):
+    """Lock a lock file of a path.
+
+    @param path: The path to the results to be parsed.
+    @param noblock: If True, give up when another parse holds the lock.
+    @param shared: If True, take a shared lock rather than an exclusive one.
+    @param name: Name of the lock file in the path.
+
+    @returns: The open lock file, or None if noblock is set and another
+              parse holds the lock.
+    """
+    lockfile = open(os.path.join(path, name), "w")
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if noblock:
+        flags |= fcntl.LOCK_NB
+    try:
+        fcntl.flock(lockfile, flags)
+    except IOError, e:
+        lockfile.close()
+        # lock is not available and nonblock has been requested
+        if e.errno == errno.EWOULDBLOCK:
+            return None
+        raise # something unexpected happened
+    return lockfile
+
+
+def _unlock_path(lockfile):
+    """Release a lock taken by _lock_path.
+
+    @param lockfile: The open lock file.
+    """
+    fcntl.flock(lockfile, fcntl.LOCK_UN)
+    lockfile.close()
+
+
+def _parse_locked_path(db, pid_file_manager, path, level, parse_options,
+                       noblock):
+    """Parse a path while holding its .parse.lock.
+
+    @param db: database handle.
+    @param pid_file_manager: pidfile.PidFileManager object.
+    @param path: The path to the results to be parsed.
+    @param level: Integer, level of subdirectories to include in the job name.
+    @param parse_options: _ParseOptions instance.
+    @param noblock: If True, skip the path when another parse holds its lock.
+
+    @returns: A set of job names of the parsed jobs.
+    """
+    lockfile = _lock_path(path, noblock)
+    if lockfile is None:
+        return set()
+    try:
+        return parse_path(db, pid_file_manager, path, level, parse_options)
+    finally:
+        _unlock_path(lockfile)
+
+
+def _parse_locked_leaf_path(db, pid_file_manager, path, leaf_path, leaf_level,
+                            parse_options, noblock):
+    """Parse a leaf job directory while holding its own lock.
+
+    The .parse.lock of the path the leaf was found under is held shared, so
+    that other leaves of the path can be parsed at the same time, but not
+    while _parse_locked_path parses the whole path. The lock of the job
+    itself, held exclusively, is _JOB_LOCK_FILE in the leaf directory.
+
+    @param db: database handle.
+    @param pid_file_manager: pidfile.PidFileManager object.
+    @param path: The path the leaf job directory was found under.
+    @param leaf_path: The path to the results of the job.
+    @param leaf_level: Integer, level of subdirectories to include in the job
+                       name.
+    @param parse_options: _ParseOptions instance.
+    @param noblock: If True, skip the job when another parse holds a lock.
+
+    @returns: A set with the job name of the job, or an empty set if it was
+              skipped.
+    """
+    path_lockfile = _lock_path(path, noblock, shared=True)
+    if path_lockfile is None:
+        return set()
+    try:
+        job_lockfile = _lock_path(leaf_path, noblock, name=_JOB_LOCK_FILE)
+        if job_lockfile is None:
+            return set()
+        try:
+            return set([parse_leaf_path(db, pid_file_manager, leaf_path,
+                                        leaf_level, parse_options)])
+        finally:
+            _unlock_path(job_lockfile)
+    finally:
+        _unlock_path(path_lockfile)
+
+
+# Per-process state of the --jobs worker pool, set up by _init_parse_worker.
+_worker_state = {}
+
+
+def _init_parse_worker(db_args, parse_options, noblock):
+    """Set up a parse worker process with its own database connection.
+
+    @param db_args: Keyword arguments for tko_db.db().
+    @param parse_options: _ParseOptions instance.
+    @param noblock: If True, skip jobs when another parse holds their lock.
+    """
+    _worker_state.update(db=tko_db.db(**db_args), parse_options=parse_options,
+                         noblock=noblock)
+
+
+def _parse_leaf_path_in_worker(leaf):
+    """Parse one leaf job directory in a worker process.
+
+    Failures are reported back instead of raised, so that one bad job does
+    not stop the pool from parsing the others.
+
+    @param leaf: A tuple (path, leaf path, leaf level) of the path the job
+                 was found under, the path to the results of the job and the
+                 level of subdirectories to include in its name.
+
+    @returns: A tuple (leaf path, job names, number of failed tests, error),
+              where error is a formatted traceback or None.
+    """
+    path, leaf_path, leaf_level = leaf
+    pid_file_manager = pidfile.PidFileManager("parser", leaf_path)
+    jobs = set()
+    error = None
+    try:
+        jobs = _parse_locked_leaf_path(_worker_state['db'], pid_file_manager,
+                                       path, leaf_path, leaf_level,
+                                       _worker_state['parse_options'],
+                                       _worker_state['noblock'])
+    except Exception:
+        error = traceback.format_exc()
+    return leaf_path, list(jobs), pid_file_manager.num_tests_failed, error
+
+
+def _parse_paths_in_parallel(jobs_list, num_workers, db_args, level,
+                             parse_options, noblock, pid_file_manager):
+    """Parse the leaf job directories of paths on a pool of worker processes.
+
+    @param jobs_list: List of paths to parse.
+    @param num_workers: Number of worker processes.
+    @param db_args: Keyword arguments for tko_db.db().
+    @param level: Integer, level of subdirectories to include in the job name.
+    @param parse_options: _ParseOptions instance.
+    @param noblock: If True, skip jobs when another parse holds their lock.
+    @param pid_file_manager: pidfile.PidFileManager object, updated with the
+                             number of failed tests found by the workers.
+
+    @returns: A set of job names of the parsed jobs.
+    @raises Exception: if any of the jobs failed to parse, after all the
+                       others have been parsed.
+    """
+    # Find all leaf job directories up front, so that the jobs of a
+    # multi-machine path are parsed in parallel too.
+    leaves = [(path, leaf_path, leaf_level)
+              for path in jobs_list
+              for leaf_path, leaf_level in _find_leaf_paths(path, level)]
+    tko_utils.dprint('Parsing %d leaf job directories in %d paths with %d '
+                     'workers' % (len(leaves), len(jobs_list), num_workers))
+
+    # Workers must not share the parent's django connection.
+    from django import db as django_db
+    django_db.connection.close()
+
+    processed_jobs = set()
+    failures = []
+    pool = multiprocessing.Pool(num_workers, _init_parse_worker,
+                                (db_args, parse_options, noblock))
+    try:
+        for leaf_path, jobs, num_tests_failed, error in pool.imap_unordered(
+                _parse_leaf_path_in_worker, leaves):
+            processed_jobs.update(jobs)
+            pid_file_manager.num_tests_failed += num_tests_failed
+            if error:
+                tko_utils.dprint('! Failed to parse %s:\n%s' %
+                                 (leaf_path, error))
+                failures.append(leaf_path)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    if failures:
+        raise Exception('Failed to parse %d of %d jobs: %s' %
+                        (len(failures), len(leaves), ', '.join(failures)))
+    return processed_jobs
+
+
 def _detach_from_parent_process():
     """Allow reparenting the parse process away from caller.
 
@@ -735,7 +1133,8 @@ def _main_with_options(options, args):
                                   options.dry_run, options.suite_report,
                                   options.datastore_creds,
                                   options.export_to_gcloud_path,
-                                  options.disable_perf_upload)
+                                  options.disable_perf_upload,
+                                  options.incremental)
 
     pid_file_manager = pidfile.PidFileManager("parser", results_dir)
 
@@ -750,35 +1149,25 @@ def _main_with_options(options, args):
             jobs_list = [os.path.join(results_dir, subdir)
                          for subdir in os.listdir(results_dir)]
 
-        # build up the database
-        db = tko_db.db(autocommit=False, host=options.db_host,
+        db_args = dict(autocommit=False, host=options.db_host,
                        user=options.db_user, password=options.db_pass,
                        database=options.db_name)
 
-        # parse all the jobs
-        for path in jobs_list:
-            lockfile = open(os.path.join(path, ".parse.lock"), "w")
-            flags = fcntl.LOCK_EX
-            if options.noblock:
-                flags |= fcntl.LOCK_NB
-            try:
-                fcntl.flock(lockfile, flags)
-            except IOError, e:
-                # lock is not available and nonblock has been requested
-                if e.errno == errno.EWOULDBLOCK:
-                    lockfile.close()
-                    continue
-                else:
-                    raise # something unexpected happened
-            try:
-                new_jobs = parse_path(db, pid_file_manager, path, options.level,
-                                      parse_options)
+        if options.jobs > 1:
+            processed_jobs.update(_parse_paths_in_parallel(
+                    jobs_list, options.jobs, db_args, options.level,
+                    parse_options, options.noblock, pid_file_manager))
+        else:
+            # build up the database
+            db = tko_db.db(**db_args)
+
+            # parse all the jobs
+            for path in jobs_list:
+                new_jobs = _parse_locked_path(db, pid_file_manager, path,
+                                              options.level, parse_options,
+                                              options.noblock)
                 processed_jobs.update(new_jobs)
 
-            finally:
-                fcntl.flock(lockfile, fcntl.LOCK_UN)
-                lockfile.close()
-
     except Exception as e:
         pid_file_manager.close_file(1)
         raise
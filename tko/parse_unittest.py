@@ -0,0 +1,149 @@
+#!/usr/bin/python2
+#
+# Copyright 2026 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for the incremental parses of tko/parse.py."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+import common
+from autotest_lib.tko import parse
+
+
+_STATUS_LOG = ('START\t----\tdummy_Pass\ttimestamp=1500000000\t'
+               'localtime=Jul 14 02:40:00\t\n')
+
+
+class IncrementalParseTest(unittest.TestCase):
+    """Tests parse_one with incremental parses of running jobs."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, '.autoserv_execute'), 'w') as f:
+            f.write('1234\n')
+        with open(os.path.join(self.path, 'status.log'), 'w') as f:
+            f.write(_STATUS_LOG)
+        os.mkdir(os.path.join(self.path, 'host_keyvals'))
+        with open(os.path.join(self.path, 'host_keyvals', 'host1'), 'w') as f:
+            f.write('labels=board%3Ab\n')
+        self.db = mock.Mock()
+        self.db.find_job.return_value = None
+        self.options = parse._ParseOptions(
+                reparse=False, mail_on_failure=False, dry_run=False,
+                suite_report=False, datastore_creds=None,
+                export_to_gcloud_path=None, disable_perf_upload=True,
+                incremental=True)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+    def _write_status_version(self, version):
+        with open(os.path.join(self.path, 'keyval'), 'w') as f:
+            f.write('status_version=%d\nhostname=host1\n' % version)
+
+
+    def _parse(self):
+        parse.parse_one(self.db, mock.Mock(num_tests_failed=0),
+                        '1234-me/host1', self.path, self.options)
+
+
+    def test_running_job_checkpointed(self):
+        """The partial results of a resumable parse are written."""
+        self._write_status_version(1)
+        self._parse()
+        self.assertTrue(os.path.exists(os.path.join(self.path,
+                                                    parse._CHECKPOINT_FILE)))
+        self.assertTrue(self.db.insert_job.called)
+
+
+    def test_running_version_0_job(self):
+        """Running jobs without a checkpoint are not written to the DB."""
+        self._write_status_version(0)
+        self._parse()
+        self.assertFalse(os.path.exists(os.path.join(self.path,
+                                                     parse._CHECKPOINT_FILE)))
+        self.assertFalse(self.db.insert_job.called)
+        self.assertFalse(self.db.commit.called)
+
+
+    def test_plain_parse_after_incremental(self):
+        """A plain parse completes the partial results of an incremental one.
+        """
+        self._write_status_version(1)
+        self._parse()
+        checkpoint_path = os.path.join(self.path, parse._CHECKPOINT_FILE)
+        self.assertTrue(os.path.exists(checkpoint_path))
+
+        with open(os.path.join(self.path, '.autoserv_execute'), 'a') as f:
+            f.write('0\n')
+        self.db.reset_mock()
+        self.db.find_job.return_value = 1
+        self.db.find_tests.return_value = []
+        self.db.select.return_value = []
+        self.options = self.options._replace(incremental=False)
+        with mock.patch.object(parse, '_throttle_result_size'), \
+                mock.patch.object(parse.site_utils, 'collect_result_sizes'), \
+                mock.patch.object(parse.sponge_utils, 'upload_results',
+                                  return_value=None):
+            self._parse()
+        self.assertTrue(self.db.insert_job.called or
+                        self.db.update_job.called)
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+        # The job is now fully parsed.
+        self.db.reset_mock()
+        self.db.find_job.return_value = 1
+        self._parse()
+        self.assertFalse(self.db.commit.called)
+
+
+class ParallelParseTest(unittest.TestCase):
+    """Tests parsing paths with a pool of workers."""
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+
+
+    def _parse_leaf_path(self, db, pid_file_manager, path, level,
+                         parse_options):
+        return '%s@%d' % (os.path.relpath(path, self.results_dir), level)
+
+
+    def test_leaf_paths(self):
+        """The leaf job directories are parsed by separate workers."""
+        job_path = os.path.join(self.results_dir, '1-me')
+        os.mkdir(job_path)
+        with open(os.path.join(job_path, '.machines'), 'w') as f:
+            f.write('host1\nhost2\n')
+        for host in ('host1', 'host2'):
+            os.mkdir(os.path.join(job_path, host))
+        os.mkdir(os.path.join(self.results_dir, '2-me'))
+
+        with mock.patch.object(parse, 'parse_leaf_path',
+                               self._parse_leaf_path), \
+                mock.patch.object(parse.tko_db, 'db'):
+            jobs = parse._parse_paths_in_parallel(
+                    [job_path, os.path.join(self.results_dir, '2-me')], 3,
+                    {}, 1, None, False, mock.Mock(num_tests_failed=0))
+        self.assertEqual(jobs, set(['1-me/host1@2', '1-me/host2@2',
+                                    '2-me@1']))
+        for host in ('host1', 'host2'):
+            self.assertTrue(os.path.exists(os.path.join(
+                    job_path, host, parse._JOB_LOCK_FILE)))
+
+
+if __name__ == '__main__':
+    unittest.main()
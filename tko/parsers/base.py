@@ -9,17 +9,38 @@ class parser(object):
     standard parser interfaction functions. The derived classes must
     implement a state_iterator method for this class to be useful.
     """
-    def start(self, job):
+    def start(self, job, resume_state=None):
         """ Initialize the parser for processing the results of
-        'job'."""
+        'job'. If 'resume_state' is given, the state machine picks
+        up from a state returned by get_checkpoint() instead of from
+        the beginning of the status log."""
         # initialize all the basic parser parameters
         self.job = job
         self.finished = False
+        self.resume_state = resume_state
+        self.checkpoint = None
         self.line_buffer = status_lib.line_buffer()
         # create and prime the parser state machine
         self.state = self.state_iterator(self.line_buffer)
         next(self.state)
 
+    def process_lines(self, lines):
+        """ Feed 'lines' into the parser state machine, and return
+        a list of all the new test results produced."""
+        self.line_buffer.put_multiple(lines)
+        return next(self.state)
+
+
+    def get_checkpoint(self):
+        """ Return the state of the parser state machine as of the
+        last time it ran out of lines, as a picklable object that
+        can be passed to start(), or None if the parser does not
+        support resuming. The state shares objects with the tests
+        already returned, so pickle it together with them and before
+        feeding any more lines."""
+        return self.checkpoint
+
+
     def end(self, lines=[]):
         """ Feed 'lines' into the parser state machine, signal to the
         state machine that no more lines are forthcoming, and then
@@ -320,6 +320,7 @@ class parser(base.parser):
         subdir_stack = [None]
         testname_stack = [None]
         running_test = None
+        running_client = None
         running_reasons = set()
         ignored_lines = []
         yield []   # We're ready to start running.
@@ -344,11 +345,55 @@ class parser(base.parser):
                 tko_utils.dprint('The following line was ignored:')
                 tko_utils.dprint('%r' % ignored_lines[0])
 
-        # Create a RUNNING SERVER_JOB entry to represent the entire test.
-        running_job = test.parse_partial_test(self.job, '----', 'SERVER_JOB',
-                                              '', current_kernel,
-                                              self.job.started_time)
-        new_tests.append(running_job)
+        def save_checkpoint():
+            """
+            Snapshots the state machine into self.checkpoint.
+            """
+            self.checkpoint = {
+                    'line': line,
+                    'job_count': job_count,
+                    'boot_count': boot_count,
+                    'min_stack_size': min_stack_size,
+                    'stack': stack,
+                    'current_kernel': current_kernel,
+                    'current_status': current_status,
+                    'current_reason': current_reason,
+                    'started_time_stack': started_time_stack,
+                    'subdir_stack': subdir_stack,
+                    'testname_stack': testname_stack,
+                    'running_job': running_job,
+                    'running_test': running_test,
+                    'running_client': running_client,
+                    'running_reasons': running_reasons,
+                    'ignored_lines': ignored_lines,
+            }
+
+        if self.resume_state:
+            # Pick up where a previous parse of this log ran out of lines.
+            state = self.resume_state
+            line = state['line']
+            job_count = state['job_count']
+            boot_count = state['boot_count']
+            min_stack_size = state['min_stack_size']
+            stack = state['stack']
+            current_kernel = state['current_kernel']
+            current_status = state['current_status']
+            current_reason = state['current_reason']
+            started_time_stack = state['started_time_stack']
+            subdir_stack = state['subdir_stack']
+            testname_stack = state['testname_stack']
+            running_job = state['running_job']
+            running_test = state['running_test']
+            running_client = state['running_client']
+            running_reasons = state['running_reasons']
+            ignored_lines = state['ignored_lines']
+        else:
+            # Create a RUNNING SERVER_JOB entry to represent the entire test.
+            running_job = test.parse_partial_test(self.job, '----',
+                                                  'SERVER_JOB', '',
+                                                  current_kernel,
+                                                  self.job.started_time)
+            new_tests.append(running_job)
 
         while True:
             # Are we finished with parsing?
@@ -381,6 +426,7 @@ class parser(base.parser):
 
             # Stop processing once the buffer is empty.
             if buffer.size() == 0:
+                save_checkpoint()
                 yield new_tests
                 new_tests = []
                 continue
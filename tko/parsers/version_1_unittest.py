@@ -1,6 +1,6 @@
 #!/usr/bin/python2
 
-import datetime, time, unittest
+import datetime, os, pickle, shutil, tempfile, time, unittest
 
 import common
 from autotest_lib.client.common_lib import utils
@@ -366,5 +366,60 @@ class DummyAbortTestCase(unittest.TestCase):
             '\t' * self.indent, self.subdir, self.testname, self.reason))
 
 
+class ParserCheckpointTestCase(unittest.TestCase):
+    """Tests for resuming the parser from a checkpoint."""
+
+    def setUp(self):
+        self.job_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.job_dir, 'keyval'), 'w') as f:
+            f.write('hostname=host1\n')
+        os.mkdir(os.path.join(self.job_dir, 'host_keyvals'))
+        with open(os.path.join(self.job_dir, 'host_keyvals', 'host1'),
+                  'w') as f:
+            f.write('labels=board%3Aeve\n')
+        self.lines = ['START\t----\t----\ttimestamp=1000\n']
+        for i in xrange(4):
+            self.lines += [
+                    '\tSTART\tt%d\tt%d\ttimestamp=%d\n' % (i, i, 1001 + i),
+                    '\t\tFAIL\tt%d\tt%d\ttimestamp=%d\tbad\n' % (
+                            i, i, 1001 + i),
+                    '\tEND FAIL\tt%d\tt%d\ttimestamp=%d\n' % (
+                            i, i, 1002 + i)]
+        self.lines.append('END GOOD\t----\t----\ttimestamp=2000\n')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.job_dir)
+
+
+    def _summarize(self, tests):
+        """Returns the distinct tests as comparable tuples."""
+        summary = []
+        for test in tests:
+            entry = (test.subdir, test.testname, test.status, test.reason)
+            if entry not in summary:
+                summary.append(entry)
+        return summary
+
+
+    def test_resume_matches_single_pass(self):
+        """Tests a pickled checkpoint resumes to the single pass result."""
+        parser = version_1.parser()
+        parser.start(parser.make_job(self.job_dir))
+        expected = self._summarize(parser.end(self.lines))
+
+        parser = version_1.parser()
+        parser.start(parser.make_job(self.job_dir))
+        tests = parser.process_lines(self.lines[:5])
+        tests, state = pickle.loads(
+                pickle.dumps((tests, parser.get_checkpoint())))
+
+        parser = version_1.parser()
+        parser.start(parser.make_job(self.job_dir), state)
+        tests += parser.process_lines(self.lines[5:])
+        tests += parser.end()
+        self.assertEqual(self._summarize(tests), expected)
+
+
 if __name__ == '__main__':
     unittest.main()